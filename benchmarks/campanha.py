@@ -0,0 +1,202 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/campanha.py — campanha de WhatsApp: vazão, queda e retomada
+# ===============================
+#
+#   python benchmarks/campanha.py [--convidados 3000] [--mps 400] [--latencia-ms 20]
+#
+# Tudo em processo, contra os stand-ins (benchmarks/stand_ins.py): o PostgREST
+# com os cadastros e a Graph API com limite de --mps (429 acima disso).
+#   1. simulação: conta e monta as mensagens, não envia nada;
+#   2. queda no meio (tarefa cancelada, como um kill): ninguém recebe duas
+#      vezes e no máximo --simultaneos ficam incertos;
+#   3. retomada: termina a campanha sem repetir ninguém; números inválidos
+#      falham de vez e não voltam;
+#   4. parada pedida (Ctrl-C): espera os envios em voo, nada fica incerto;
+#   5. Graph API com 5% de 503: novas tentativas, todos recebem uma vez;
+#   vazão medida contra o limite, sem nenhum 429.
+# Cada etapa confere o resultado; sai com código 1 se algo não bater.
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import httpx  # noqa: E402
+
+from benchmarks.stand_ins import Falhas, montar_graph, montar_postgrest  # noqa: E402
+from campanha import Campanha, Disparo, Progresso  # noqa: E402
+from identidade import normalizar_telefone  # noqa: E402
+from repositorio import RepositorioCadastros  # noqa: E402
+from whatsapp import ClienteWhatsApp  # noqa: E402
+
+SIMULTANEOS = 20
+TEXTO = "Oi {primeiro_nome}! Amanhã é o Natal da Prelude 🎄"
+
+falhas_conferencia = []
+
+
+def conferir(condicao: bool, descricao: str) -> None:
+    print(f"  {'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas_conferencia.append(descricao)
+
+
+def cadastros(n: int) -> tuple:
+    """Cadastros da semente, os números que devem receber e os inválidos (que a Graph recusa)."""
+    status = ("convidado", "socio", "Founder", "aguardando")
+    linhas, esperados, invalidos = [], set(), set()
+    for i in range(n):
+        if i % 97 == 0:
+            whatsapp = None  # sem WhatsApp
+        elif i % 89 == 0:
+            whatsapp = f"9{i:04d}"  # inválido: a Graph API responde 400
+        elif i % 83 == 0:
+            whatsapp = f"(21) 9{i - 1:08d}"  # mesmo número do cadastro anterior
+        else:
+            whatsapp = f"+55 21 9{i:08d}"
+        linhas.append({"nome": f"Pessoa {i}", "apelido": None, "whatsapp": whatsapp,
+                       "status": status[i % len(status)], "convites_disponiveis": 0})
+        numero = normalizar_telefone(whatsapp)
+        if status[i % len(status)] != "aguardando" and numero:
+            (esperados if len(numero) >= 12 else invalidos).add(numero)
+    return linhas, esperados, invalidos
+
+
+class Ambiente:
+    def __init__(self, graph, pasta: str):
+        self.graph = graph
+        self.pasta = pasta
+        self.transporte_graph = httpx.ASGITransport(app=graph)
+        self.controle = httpx.AsyncClient(transport=self.transporte_graph, base_url="http://graph")
+
+    def disparo(self, repositorio, campanha: str, **opcoes) -> tuple:
+        whatsapp = ClienteWhatsApp("token", "123", url_base="http://graph", max_conexoes=SIMULTANEOS,
+                                   transport=self.transporte_graph)
+        progresso = Progresso(os.path.join(self.pasta, "campanhas.sqlite3"))
+        opcoes = {"simultaneos": SIMULTANEOS, "atraso_base": 0.05, "atraso_max": 0.5, **opcoes}
+        return Disparo(Campanha(campanha, texto=TEXTO), repositorio, whatsapp, progresso, **opcoes), whatsapp
+
+    async def entregues(self) -> dict:
+        return (await self.controle.get("/__entregues")).json()
+
+    async def contagem(self) -> dict:
+        return (await self.controle.get("/__contagem")).json()
+
+
+async def rodar(ambiente: Ambiente, repositorio, campanha: str, **opcoes) -> dict:
+    disparo, whatsapp = ambiente.disparo(repositorio, campanha, **opcoes)
+    try:
+        return await disparo.executar()
+    finally:
+        await whatsapp.fechar()
+        disparo.progresso.fechar()
+
+
+async def interromper(ambiente: Ambiente, repositorio, campanha: str, apos: int, cancelar: bool,
+                      **opcoes) -> dict:
+    """Roda até `apos` entregas e então cancela a tarefa (queda) ou pede parada (Ctrl-C)."""
+    disparo, whatsapp = ambiente.disparo(repositorio, campanha, **opcoes)
+    tarefa = asyncio.create_task(disparo.executar())
+    while sum((await ambiente.entregues()).values()) < apos and not tarefa.done():
+        await asyncio.sleep(0.01)
+    if cancelar:
+        tarefa.cancel()
+        await asyncio.gather(tarefa, return_exceptions=True)
+        relatorio = None
+    else:
+        disparo.parar()
+        relatorio = await tarefa
+    await whatsapp.fechar()
+    resumo = disparo.progresso.resumo(campanha)
+    disparo.progresso.fechar()
+    return relatorio or {}, resumo
+
+
+async def principal(n: int, mps: float, latencia_ms: float) -> int:
+    transporte = httpx.ASGITransport(app=montar_postgrest())
+    repositorio = RepositorioCadastros("http://stand-in", "chave", transport=transporte)
+    falhas_graph = Falhas(latencia_ms=latencia_ms)
+    ambiente = Ambiente(montar_graph(falhas_graph, mps=mps), tempfile.mkdtemp(prefix="campanha-"))
+
+    linhas, esperados, invalidos = cadastros(n)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://stand-in") as controle:
+        await controle.post("/__semear", json={"cadastros": linhas})
+    print(f"{n} cadastros, {len(esperados)} números que devem receber | Graph: {mps:.0f} msg/s, "
+          f"{latencia_ms:.0f} ms")
+
+    print("1. Simulação")
+    relatorio = await rodar(ambiente, repositorio, "lembrete", simular=True, mps=mps)
+    conferir(not await ambiente.entregues(), "nada enviado")
+    conferir(relatorio["enviados"] == len(esperados) + len(invalidos) and relatorio["repetidos"] > 0,
+             f"{relatorio['enviados']} mensagens seriam enviadas, {relatorio['repetidos']} números repetidos")
+    conferir(relatorio["exemplos"][0]["mensagem"].startswith("Oi Pessoa!"), "texto montado por pessoa")
+
+    print("2. Queda no meio (tarefa cancelada)")
+    _, resumo = await interromper(ambiente, repositorio, "lembrete", len(esperados) // 3, cancelar=True, mps=mps)
+    entregues = await ambiente.entregues()
+    print(f"  {sum(entregues.values())} entregues antes da queda; checkpoint: {resumo}")
+    conferir(max(entregues.values()) == 1, "ninguém recebeu duas vezes")
+    conferir(resumo["enviando"] <= SIMULTANEOS, f"{resumo['enviando']} incertos (no máximo {SIMULTANEOS} em voo)")
+
+    print("3. Retomada")
+    await ambiente.controle.post("/__reset")
+    relatorio = await rodar(ambiente, repositorio, "lembrete", mps=mps)
+    contagem = await ambiente.contagem()
+    entregues_retomada = await ambiente.entregues()
+    print(f"  {relatorio['enviados']} enviados em {relatorio['duracao_s']}s → {relatorio['vazao_msgs_s']} msg/s "
+          f"(limite {mps:.0f}); pulados: {relatorio['ja_enviados']} já enviados, "
+          f"{relatorio['incertos_anteriores']} incertos, {relatorio['repetidos']} repetidos")
+    conferir(not set(entregues_retomada) & set(entregues), "quem recebeu antes da queda não recebe de novo")
+    recebidos = set(entregues) | set(entregues_retomada)
+    conferir(recebidos <= esperados and len(esperados - recebidos) <= resumo["enviando"],
+             "todos receberam, menos os incertos que não chegaram a sair")
+    conferir(relatorio["progresso"]["falhou_definitivo"] == len(invalidos),
+             f"{len(invalidos)} números inválidos falharam de vez")
+    conferir(contagem.get("limite_vazao", 0) == 0, "nenhum 429: o balde segura a vazão no limite")
+    # o balde começa cheio: até `mps` mensagens de rajada além de mps × duração
+    conferir(relatorio["enviados"] <= mps * (relatorio["duracao_s"] + 1) * 1.05,
+             "vazão não passa do limite (mais a rajada inicial de um segundo)")
+    de_novo = await rodar(ambiente, repositorio, "lembrete", mps=mps)
+    conferir(de_novo["enviados"] == 0 and de_novo["falhas_definitivas"] == 0,
+             "terceira rodada: nada a enviar, inválidos não voltam")
+
+    print("4. Parada pedida (Ctrl-C)")
+    await ambiente.controle.post("/__reset")
+    relatorio, resumo = await interromper(ambiente, repositorio, "lembrete-b", len(esperados) // 2,
+                                          cancelar=False, mps=mps)
+    conferir(relatorio["interrompido"] and resumo["enviando"] == 0, "parada espera os envios em voo: zero incertos")
+    await rodar(ambiente, repositorio, "lembrete-b", mps=mps)
+    entregues = await ambiente.entregues()
+    conferir(set(entregues) == esperados and max(entregues.values()) == 1, "retomada: todos uma vez só")
+
+    print("5. Graph API com 5% de 503")
+    await ambiente.controle.post("/__reset")
+    falhas_graph.atualizar({"taxa_erro": 0.05})
+    relatorio = await rodar(ambiente, repositorio, "lembrete-c", mps=mps)
+    falhas_graph.atualizar({"taxa_erro": 0.0})
+    entregues = await ambiente.entregues()
+    print(f"  {relatorio['novas_tentativas']} novas tentativas, {relatorio['falhas_temporarias']} esgotadas")
+    conferir(relatorio["novas_tentativas"] > 0, "503 tentado de novo")
+    faltam = await rodar(ambiente, repositorio, "lembrete-c", mps=mps)
+    entregues = await ambiente.entregues()
+    conferir(faltam["enviados"] == relatorio["falhas_temporarias"], "falha temporária esgotada volta na rodada seguinte")
+    conferir(set(entregues) == esperados and max(entregues.values()) == 1, "todos receberam uma vez só")
+
+    await ambiente.controle.aclose()
+    await repositorio.fechar()
+    print("\n" + ("❌ Falhas: " + "; ".join(falhas_conferencia) if falhas_conferencia else "✅ Tudo certo."))
+    return 1 if falhas_conferencia else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Campanha de WhatsApp: vazão, queda e retomada")
+    parser.add_argument("--convidados", type=int, default=3000)
+    parser.add_argument("--mps", type=float, default=400, help="limite da Graph API falsa (e da campanha)")
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(principal(args.convidados, args.mps, args.latencia_ms)))
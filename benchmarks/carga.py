@@ -0,0 +1,404 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/carga.py — teste de carga offline (main, server e bot)
+# ===============================
+#
+#   python benchmarks/carga.py                                  # todos os cenários
+#   python benchmarks/carga.py --cenarios server-socio,bot-webhook
+#   python benchmarks/carga.py --latencia-ms 40 --taxa-erro 0.02 --concorrencia 50
+#   python benchmarks/carga.py --saida antes.json               # resultado para diff
+#   python benchmarks/carga.py --comparar antes.json            # diferença vs. rodada anterior
+#   LIMITES_ATIVOS=0 python benchmarks/carga.py --cenarios server-verificar-abuso   # sem limites.py
+#
+# Sobe os stand-ins (benchmarks/stand_ins.py) e cada app com uvicorn, como em
+# produção, só que apontando SUPABASE_URL e GRAPH_API_URL para localhost. Por
+# cenário: vazão, latência p50/p95/p99, status devolvidos e quantas chamadas
+# chegaram ao Supabase e à Graph API. Nada sai da máquina.
+#
+# Cenários "-abuso": o mesmo tráfego legítimo (poucos clientes, IPs
+# distintos) é medido duas vezes, sozinho e com um robô disparando ao lado
+# com --concorrencia conexões; a latência legítima deve ficar parecida.
+#
+# O gerador de carga divide a CPU com os apps e os stand-ins: compare rodadas
+# feitas na mesma máquina, não números absolutos entre máquinas diferentes.
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAND_INS = os.path.join(RAIZ, "benchmarks", "stand_ins.py")
+
+FOUNDER_WHATSAPP = "5521990000000"
+
+
+# ============================================================
+# 🚀 PROCESSOS
+# ============================================================
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def subir(comando: list, env: dict, url_pronto: str, limite_s: float = 30.0) -> subprocess.Popen:
+    proc = subprocess.Popen(comando, cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite_s:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{' '.join(comando)} saiu com código {proc.returncode}")
+        try:
+            httpx.get(url_pronto, timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError(f"{' '.join(comando)} não respondeu em {limite_s:.0f}s")
+
+
+class Ambiente:
+    """Stand-ins + um uvicorn por app, todos em portas livres de localhost."""
+
+    APPS = {"main": "/", "server": "/health", "bot": "/openapi.json"}
+
+    def __init__(self, latencia_ms: float, jitter_ms: float, taxa_erro: float, apps):
+        self.pasta = tempfile.mkdtemp(prefix="carga-")
+        self.processos = []
+        self.postgrest = f"http://127.0.0.1:{porta_livre()}"
+        self.graph = f"http://127.0.0.1:{porta_livre()}"
+        for servico, url in (("postgrest", self.postgrest), ("graph", self.graph)):
+            self.processos.append(subir(
+                [sys.executable, STAND_INS, servico, "--porta", url.rsplit(":", 1)[1],
+                 "--latencia-ms", str(latencia_ms), "--jitter-ms", str(jitter_ms),
+                 "--taxa-erro", str(taxa_erro)],
+                dict(os.environ), f"{url}/__contagem",
+            ))
+
+        env = dict(os.environ)
+        env.update({
+            "SUPABASE_URL": self.postgrest,
+            "SUPABASE_KEY": "chave-de-teste",
+            "GRAPH_API_URL": self.graph,
+            "WHATSAPP_TOKEN": "token-de-teste",
+            "PHONE_NUMBER_ID": "1234567890",
+            "WHATSAPP_INTERVALO_DESTINO": "0",
+            "DIARIO_DIR": os.path.join(self.pasta, "diario"),
+            "DEAD_LETTER_DIR": os.path.join(self.pasta, "dead-letter"),
+            "MENSAGENS_DB": os.path.join(self.pasta, "mensagens.sqlite3"),
+            "REPLICA_DB": os.path.join(self.pasta, "replica.sqlite3"),
+        })
+        # Os cenários reusam os 200 cadastros da semente várias vezes por minuto
+        env.setdefault("LIMITE_IDENTIDADE_RAJADA", "20")
+        self.apps = {}
+        for app in apps:
+            url = f"http://127.0.0.1:{porta_livre()}"
+            self.processos.append(subir(
+                [sys.executable, "-m", "uvicorn", f"{app}:app", "--port", url.rsplit(":", 1)[1],
+                 "--log-level", "warning", "--no-access-log"],
+                env, f"{url}{self.APPS[app]}",
+            ))
+            self.apps[app] = url
+
+    def encerrar(self) -> None:
+        for proc in self.processos:
+            proc.terminate()
+        for proc in self.processos:
+            proc.wait()
+
+    # Controle dos stand-ins
+    def reiniciar(self, cadastros: list) -> list:
+        httpx.post(f"{self.postgrest}/__reset", json={"dados": True})
+        httpx.post(f"{self.graph}/__reset")
+        return httpx.post(f"{self.postgrest}/__semear", json={"cadastros": cadastros}).json()["cadastros"]
+
+    def zerar_contagem(self) -> None:
+        httpx.post(f"{self.postgrest}/__reset", json={})
+        httpx.post(f"{self.graph}/__reset")
+
+    def contagem(self) -> dict:
+        return {
+            "supabase": httpx.get(f"{self.postgrest}/__contagem").json(),
+            "graph": httpx.get(f"{self.graph}/__contagem").json(),
+        }
+
+    def contagem_estavel(self, espera_s: float = 0.5, limite_s: float = 60.0) -> dict:
+        """Contagem depois que o trabalho em segundo plano (fila do bot) termina."""
+        anterior = self.contagem()
+        inicio = time.perf_counter()
+        while time.perf_counter() - inicio < limite_s:
+            time.sleep(espera_s)
+            atual = self.contagem()
+            if atual == anterior:
+                return atual
+            anterior = atual
+        return anterior
+
+
+# ============================================================
+# 🎬 CENÁRIOS
+# ============================================================
+def cadastros_semente(n: int = 200) -> list:
+    linhas = [{
+        "email": f"socio{i}@exemplo.com", "whatsapp": f"55219{i:08d}", "status": "socio",
+        "nome": f"Sócio {i}", "convites_disponiveis": 1_000_000,
+    } for i in range(n)]
+    linhas.append({"email": "founder@exemplo.com", "whatsapp": FOUNDER_WHATSAPP, "status": "Founder",
+                   "convites_disponiveis": 1_000_000})
+    return linhas
+
+
+def _ip(i: int, contexto: dict) -> dict:
+    # Um IP por convidado: o uvicorn aceita X-Forwarded-For vindo de 127.0.0.1
+    return {"X-Forwarded-For": f"10.{contexto['rodada'] % 250}.{i // 250 % 250}.{i % 250}"}
+
+
+def _verificar(i: int, contexto: dict) -> tuple:
+    # 80% cadastros existentes (repetidos), 20% e-mails novos
+    if i % 5:
+        email, whatsapp = f"socio{i % 200}@exemplo.com", f"55219{i % 200:08d}"
+    else:
+        email, whatsapp = f"novo{i}-{contexto['rodada']}@exemplo.com", f"55118{contexto['rodada']}{i:06d}"
+    return "POST", "/verificar", {"data": {"email": email, "whatsapp": whatsapp}, "headers": _ip(i, contexto)}
+
+
+def _robo_verificar(i: int, contexto: dict) -> tuple:
+    # Metade de um IP só com e-mails sempre novos (cada um custaria busca +
+    # insert), metade trocando de IP mas martelando o mesmo cadastro
+    if i % 2:
+        email = f"robo{i}-{contexto['rodada']}@exemplo.com"
+        return "POST", "/verificar", {"data": {"email": email}, "headers": {"X-Forwarded-For": "203.0.113.7"}}
+    return "POST", "/verificar", {
+        "data": {"email": "socio0@exemplo.com"},
+        "headers": {"X-Forwarded-For": f"198.51.{i // 250 % 250}.{i % 250}"},
+    }
+
+
+def _socio(i: int, contexto: dict) -> tuple:
+    return "GET", f"/api/socio/{contexto['ids'][i % len(contexto['ids'])]}", {}
+
+
+def _socio_revalidado(i: int, contexto: dict) -> tuple:
+    id = contexto["ids"][i % len(contexto["ids"])]
+    return "GET", f"/api/socio/{id}", {"headers": {"If-None-Match": contexto["etags"].get(id, "")}}
+
+
+def _convidar(i: int, contexto: dict) -> tuple:
+    # O sócio vem da sessão: cada requisição leva o cookie de um deles
+    sessao = contexto["sessoes"][i % len(contexto["sessoes"])]
+    return "POST", "/api/convidar", {"headers": {"Cookie": f"prelude_sessao={sessao}"}, "json": {
+        "nome": f"Convidado {i}", "whatsapp": f"55117{contexto['rodada']}{i:06d}",
+        "email": f"convidado{i}-{contexto['rodada']}@exemplo.com",
+    }}
+
+
+def _webhook(i: int, contexto: dict) -> tuple:
+    mensagem = {
+        "id": f"wamid.carga.{contexto['rodada']}.{i}", "from": FOUNDER_WHATSAPP,
+        "text": {"body": f"indico 2197{i:07d}0 e 2196{i:07d}0"},
+    }
+    return "POST", "/webhook", {"json": {"entry": [{"changes": [{"value": {"messages": [mensagem]}}]}]}}
+
+
+def _preparar_sessoes(ambiente: Ambiente, contexto: dict) -> None:
+    with httpx.Client(base_url=ambiente.apps["server"]) as cliente:
+        contexto["sessoes"] = [
+            cliente.post("/verificar", data={"email": f"socio{i}@exemplo.com"},
+                         headers={"X-Forwarded-For": f"192.0.{i // 250 % 250}.{i % 250}"}).cookies["prelude_sessao"]
+            for i in range(len(contexto["ids"]))
+        ]
+
+
+def _preparar_etags(ambiente: Ambiente, contexto: dict) -> None:
+    with httpx.Client(base_url=ambiente.apps["server"]) as cliente:
+        contexto["etags"] = {id: cliente.get(f"/api/socio/{id}").headers.get("etag", "")
+                             for id in contexto["ids"]}
+
+
+CENARIOS = {
+    "main-verificar": {"app": "main", "requisicao": _verificar},
+    "server-verificar": {"app": "server", "requisicao": _verificar},
+    "server-verificar-abuso": {"app": "server", "requisicao": _verificar, "abuso": _robo_verificar},
+    "server-socio": {"app": "server", "requisicao": _socio},
+    "server-socio-304": {"app": "server", "requisicao": _socio_revalidado, "preparar": _preparar_etags},
+    "server-convidar": {"app": "server", "requisicao": _convidar, "preparar": _preparar_sessoes},
+    "bot-webhook": {"app": "bot", "requisicao": _webhook, "segundo_plano": True},
+}
+CONCORRENCIA_LEGITIMA = 4
+
+
+# ============================================================
+# 📏 EXECUÇÃO
+# ============================================================
+def percentil(ordenados: list, q: float) -> float:
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, round(q * (len(ordenados) - 1)))]
+
+
+def resumir(latencias: list) -> dict:
+    latencias.sort()
+    return {
+        "p50": round(percentil(latencias, 0.50), 2),
+        "p95": round(percentil(latencias, 0.95), 2),
+        "p99": round(percentil(latencias, 0.99), 2),
+        "max": round(latencias[-1], 2),
+    }
+
+
+async def disparar(url: str, gerar, contexto: dict, total: int, concorrencia: int, parar=None) -> dict:
+    """`total` requisições com `concorrencia` clientes; com `parar`, segue até o evento."""
+    latencias = []
+    status = Counter()
+    proximo = itertools.count() if parar else iter(range(total))
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=30) as cliente:
+        async def trabalhador():
+            for i in proximo:
+                if parar and parar.is_set():
+                    return
+                metodo, caminho, opcoes = gerar(i, contexto)
+                inicio = time.perf_counter()
+                try:
+                    resp = await cliente.request(metodo, caminho, **opcoes)
+                    status[str(resp.status_code)] += 1
+                except httpx.HTTPError as e:
+                    status[type(e).__name__] += 1
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+        duracao = time.perf_counter() - inicio
+
+    return {
+        "requisicoes": len(latencias),
+        "duracao_s": round(duracao, 3),
+        "vazao_rps": round(len(latencias) / duracao, 1),
+        "latencia_ms": resumir(latencias),
+        "status": dict(status),
+    }
+
+
+async def sob_abuso(url: str, cenario: dict, contexto: dict, requisicoes: int, concorrencia: int) -> dict:
+    """Tráfego legítimo medido enquanto o robô do cenário dispara até ele acabar."""
+    parar = asyncio.Event()
+    robo = asyncio.create_task(disparar(url, cenario["abuso"], contexto, 0, concorrencia, parar))
+    legitimo = await disparar(url, cenario["requisicao"], contexto, requisicoes, CONCORRENCIA_LEGITIMA)
+    parar.set()
+    legitimo["abuso"] = await robo
+    return legitimo
+
+
+def rodar_cenario(ambiente: Ambiente, nome: str, requisicoes: int, concorrencia: int, rodada: int) -> dict:
+    cenario = CENARIOS[nome]
+    contexto = {"rodada": rodada, "ids": ambiente.reiniciar(cadastros_semente())[:-1]}
+    if cenario.get("preparar"):
+        cenario["preparar"](ambiente, contexto)
+
+    url = ambiente.apps[cenario["app"]]
+    # Aquecimento: conexões, caches de rota e JIT do Jinja fora da medição
+    asyncio.run(disparar(url, cenario["requisicao"], dict(contexto, rodada=rodada + 1), 20, 4))
+    if cenario.get("segundo_plano"):
+        ambiente.contagem_estavel()
+    ambiente.zerar_contagem()
+
+    if cenario.get("abuso"):
+        # Mesmo tráfego legítimo (outros IPs e e-mails novos), primeiro sozinho
+        sozinho = asyncio.run(disparar(
+            url, cenario["requisicao"], dict(contexto, rodada=rodada + 2), requisicoes, CONCORRENCIA_LEGITIMA,
+        ))
+        ambiente.zerar_contagem()
+        resultado = asyncio.run(sob_abuso(url, cenario, contexto, requisicoes, concorrencia))
+        resultado["sem_abuso"] = {k: sozinho[k] for k in ("vazao_rps", "latencia_ms", "status")}
+        requisicoes += resultado["abuso"]["requisicoes"]
+    else:
+        resultado = asyncio.run(disparar(url, cenario["requisicao"], contexto, requisicoes, concorrencia))
+    contagem = ambiente.contagem_estavel() if cenario.get("segundo_plano") else ambiente.contagem()
+    chamadas = {
+        servico: {rota: n for rota, n in sorted(rotas.items())}
+        for servico, rotas in contagem.items()
+    }
+    total_upstream = sum(n for rotas in chamadas.values() for rota, n in rotas.items() if rota != "erros_injetados")
+    resultado["upstream"] = chamadas
+    resultado["upstream_por_requisicao"] = round(total_upstream / requisicoes, 3)
+    return resultado
+
+
+def comparar(atual: dict, anterior: dict) -> None:
+    print("\nvs. rodada anterior (positivo = pior):")
+    for nome, r in atual["cenarios"].items():
+        a = anterior.get("cenarios", {}).get(nome)
+        if not a:
+            continue
+        dp95 = r["latencia_ms"]["p95"] - a["latencia_ms"]["p95"]
+        dvazao = (a["vazao_rps"] - r["vazao_rps"]) / a["vazao_rps"] * 100 if a["vazao_rps"] else 0
+        dup = r["upstream_por_requisicao"] - a["upstream_por_requisicao"]
+        print(f"  {nome:<18} p95 {dp95:+8.2f} ms | vazão {dvazao:+6.1f}% | upstream/req {dup:+.3f}")
+
+
+def imprimir(resultados: dict) -> None:
+    print(f"{'cenário':<18} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}  upstream/req  status")
+    for nome, r in resultados["cenarios"].items():
+        lat = r["latencia_ms"]
+        print(f"{nome:<18} {r['vazao_rps']:8.1f} {lat['p50']:8.2f} {lat['p95']:8.2f} {lat['p99']:8.2f}"
+              f"  {r['upstream_por_requisicao']:12.3f}  {r['status']}")
+        if "abuso" in r:
+            lat = r["sem_abuso"]["latencia_ms"]
+            print(f"  └ sem o robô    {r['sem_abuso']['vazao_rps']:8.1f} {lat['p50']:8.2f} {lat['p95']:8.2f}"
+                  f" {lat['p99']:8.2f}  {'':>12}  {r['sem_abuso']['status']}")
+            print(f"  └ robô          {r['abuso']['vazao_rps']:8.1f} {'':>8} {'':>8} {'':>8}"
+                  f"  {'':>12}  {r['abuso']['status']}")
+
+
+def principal() -> None:
+    parser = argparse.ArgumentParser(description="Teste de carga offline com stand-ins do Supabase e da Graph API")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS))
+    parser.add_argument("--requisicoes", type=int, default=500)
+    parser.add_argument("--concorrencia", type=int, default=20)
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--saida", help="grava o resultado em JSON neste arquivo")
+    parser.add_argument("--comparar", help="JSON de uma rodada anterior")
+    args = parser.parse_args()
+
+    nomes = [n.strip() for n in args.cenarios.split(",") if n.strip()]
+    desconhecidos = [n for n in nomes if n not in CENARIOS]
+    if desconhecidos:
+        parser.error(f"cenário(s) desconhecido(s): {', '.join(desconhecidos)}")
+
+    apps = sorted({CENARIOS[n]["app"] for n in nomes})
+    ambiente = Ambiente(args.latencia_ms, args.jitter_ms, args.taxa_erro, apps)
+    rodada = int(time.time()) % 10_000 * 10  # entra nos e-mails/telefones novos; o aquecimento usa +1
+    try:
+        resultados = {
+            "config": {k: v for k, v in vars(args).items() if k not in ("saida", "comparar")},
+            "cenarios": {},
+        }
+        for nome in nomes:
+            resultados["cenarios"][nome] = rodar_cenario(ambiente, nome, args.requisicoes, args.concorrencia, rodada)
+    finally:
+        ambiente.encerrar()
+
+    imprimir(resultados)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultado em {args.saida}")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(resultados, json.load(f))
+
+
+if __name__ == "__main__":
+    principal()
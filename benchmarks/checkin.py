@@ -0,0 +1,165 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/checkin.py — portaria: latência da conferência, lotes e queda
+# ===============================
+#
+#   python benchmarks/checkin.py [--convidados 20000]
+#
+# Tudo em processo, contra o stand-in do PostgREST (benchmarks/stand_ins.py):
+#   1. carga do índice e atualização incremental (status, exclusão, entrada
+#      feita por outro aparelho);
+#   2. conferência por QR, e-mail e WhatsApp, só memória;
+#   3. envio em lotes: um POST por lote, repetir não duplica;
+#   4. queda (stand-in respondendo 503): a porta segue conferindo, o diário
+#      guarda tudo, um "reinício" relê o diário e a volta esvazia a fila.
+# Cada etapa confere o resultado; sai com código 1 se algo não bater.
+
+import argparse
+import asyncio
+import math
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import httpx  # noqa: E402
+
+from benchmarks.stand_ins import Falhas, montar_postgrest  # noqa: E402
+from checkin import IndiceConvidados, Portaria, assinar_qr  # noqa: E402
+from diario import DiarioLocal  # noqa: E402
+from repositorio import ErroRepositorio, RepositorioCadastros  # noqa: E402
+
+SEGREDO = "segredo-de-teste"
+LOTE = 200
+
+falhas_conferencia = []
+
+
+def conferir(condicao: bool, descricao: str) -> None:
+    print(f"  {'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas_conferencia.append(descricao)
+
+
+def microssegundos(amostras: list) -> str:
+    amostras.sort()
+    return f"p50 {amostras[len(amostras) // 2] * 1e6:6.1f} µs | p99 {amostras[int(len(amostras) * 0.99)] * 1e6:6.1f} µs"
+
+
+def nova_portaria(pasta: str) -> Portaria:
+    return Portaria(IndiceConvidados(janela=0.0), DiarioLocal(os.path.join(pasta, "checkin")), SEGREDO, lote=LOTE)
+
+
+async def principal(n: int) -> int:
+    falhas = Falhas()
+    transporte = httpx.ASGITransport(app=montar_postgrest(falhas))
+    repositorio = RepositorioCadastros("http://stand-in", "chave", transport=transporte)
+    controle = httpx.AsyncClient(transport=transporte, base_url="http://stand-in")
+    pasta = tempfile.mkdtemp(prefix="checkin-")
+
+    # 4 em 5 liberados (sócio, convidado, Founder); o resto aguardando
+    status = ("convidado", "socio", "convidado", "Founder", "aguardando")
+    ids = (await controle.post("/__semear", json={"cadastros": [
+        {"nome": f"Pessoa {i}", "email": f"Pessoa{i}@Exemplo.com", "whatsapp": f"(21) 9{i:08d}",
+         "status": status[i % len(status)], "convites_disponiveis": 0}
+        for i in range(n)
+    ]})).json()["cadastros"]
+    liberados = [id for i, id in enumerate(ids) if status[i % len(status)] != "aguardando"]
+
+    print(f"1. Índice ({n} cadastros)")
+    portaria = nova_portaria(pasta)
+    inicio = time.perf_counter()
+    await portaria.indice.atualizar(repositorio)
+    print(f"  carga completa em {time.perf_counter() - inicio:.2f}s")
+    conferir(len(portaria.indice) == len(liberados), f"{len(liberados)} liberados no índice")
+    conferir(portaria.conferir(email="pessoa4@exemplo.com")["resultado"] == "nao_encontrado",
+             "status aguardando não entra")
+
+    await repositorio.atualizar(liberados[0], {"status": "aguardando"})
+    await repositorio.excluir(liberados[1])
+    await controle.post("/__semear", json={"checkins": [
+        {"cadastro_id": liberados[2], "entrou_em": "2025-12-24T21:00:00+00:00", "portaria": "outro aparelho"}
+    ]})
+    inicio = time.perf_counter()
+    vieram = await portaria.indice.atualizar(repositorio)
+    print(f"  incremental: {vieram} linhas em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    conferir(portaria.indice.buscar(id=liberados[0]) is None, "quem deixou de ser liberado sai do índice")
+    conferir(portaria.indice.buscar(id=liberados[1]) is None, "exclusão sai do índice")
+    conferir(portaria.conferir(qr=assinar_qr(liberados[2], SEGREDO))["resultado"] == "ja_entrou",
+             "entrada feita por outro aparelho já vale aqui")
+
+    print("2. Conferência (só memória)")
+    disponiveis = liberados[3:]
+    posicao = {id: i for i, id in enumerate(ids)}
+    amostras = {"qr": [], "email": [], "whatsapp": []}
+    resultados = set()
+    for i, id in enumerate(disponiveis[:3000]):
+        modo = ("qr", "email", "whatsapp")[i % 3]
+        argumento = {
+            "qr": assinar_qr(id, SEGREDO),
+            "email": f"pessoa{posicao[id]}@exemplo.com",
+            "whatsapp": f"5521 9{posicao[id]:08d}",
+        }[modo]
+        inicio = time.perf_counter()
+        resultados.add(portaria.conferir(**{modo: argumento}, portaria="porta 1")["resultado"])
+        amostras[modo].append(time.perf_counter() - inicio)
+    for modo, lista in amostras.items():
+        print(f"  {modo:<9} {microssegundos(lista)}")
+    conferir(resultados == {"ok"}, "3000 entradas liberadas")
+    conferir(portaria.conferir(qr=assinar_qr(disponiveis[0], SEGREDO))["resultado"] == "ja_entrou",
+             "segunda leitura do mesmo QR: já entrou")
+    conferir(portaria.conferir(qr=f"{disponiveis[-1]}.assinatura-falsa")["resultado"] == "nao_encontrado",
+             "QR com assinatura errada não entra")
+
+    print("3. Envio em lotes")
+    await controle.post("/__reset", json={})
+    enviados = await portaria.enviar(repositorio)
+    posts = (await controle.get("/__contagem")).json().get("POST /rest/v1/checkins", 0)
+    print(f"  {enviados} check-ins em {posts} POSTs")
+    conferir(posts == math.ceil(3000 / LOTE), f"um POST a cada {LOTE} check-ins")
+    linhas = await repositorio.selecionar({}, "cadastro_id", tabela="checkins")
+    conferir(len(linhas) == 3001, "3000 linhas novas em checkins (+1 do outro aparelho)")
+
+    print("4. Queda do Supabase (stand-in respondendo 503)")
+    falhas.atualizar({"taxa_erro": 1.0})
+    na_queda = disponiveis[3000:3300]
+    resultados = {portaria.conferir(qr=assinar_qr(id, SEGREDO))["resultado"] for id in na_queda}
+    conferir(resultados == {"ok"}, "porta segue conferindo sem Supabase")
+    try:
+        await portaria.enviar(repositorio)
+        conferir(False, "envio durante a queda deveria falhar")
+    except ErroRepositorio:
+        conferir(portaria.pendentes() == 300, "300 check-ins esperando, nada perdido")
+    portaria.diario.descarregar()
+
+    # "Reinício": outra portaria lê o mesmo diário
+    reiniciada = nova_portaria(pasta)
+    retomados = reiniciada.retomar()
+    conferir(retomados == 300, "diário relido na partida: 300 pendentes")
+    conferir(na_queda[0] in reiniciada.indice.entradas, "quem entrou antes do reinício continua dentro")
+
+    print("5. Volta do Supabase")
+    falhas.atualizar({"taxa_erro": 0.0})
+    conferir(await reiniciada.enviar(repositorio) == 300, "fila do diário enviada")
+    conferir(await portaria.enviar(repositorio) == 300, "a portaria antiga reenvia o mesmo lote")
+    linhas = await repositorio.selecionar({}, "cadastro_id", tabela="checkins")
+    conferir(len(linhas) == 3301 and len({l["cadastro_id"] for l in linhas}) == 3301,
+             "reenvio não duplica: 3301 linhas, uma por pessoa")
+    reiniciada.diario.descarregar()
+    conferir(not reiniciada.diario.pendentes(), "diário sem pendentes")
+
+    portaria.fechar()
+    reiniciada.fechar()
+    await controle.aclose()
+    await repositorio.fechar()
+    print("\n" + ("❌ Falhas: " + "; ".join(falhas_conferencia) if falhas_conferencia else "✅ Tudo certo."))
+    return 1 if falhas_conferencia else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Portaria: latência da conferência, lotes e queda")
+    parser.add_argument("--convidados", type=int, default=20000)
+    sys.exit(asyncio.run(principal(parser.parse_args().convidados)))
@@ -0,0 +1,196 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/convites.py — convites resgatados em paralelo não estouram o saldo
+# ===============================
+#
+#   python benchmarks/convites.py [--paralelos 50] [--convites 10] [--latencia-ms 20]
+#   python benchmarks/convites.py --postgres postgresql://localhost/descartavel
+#
+# Sobe o stand-in do PostgREST e o server.py com uvicorn (benchmarks/carga.py).
+# Um sócio com --convites convites dispara --paralelos chamadas ao mesmo tempo:
+#   1. /api/convidar, um convidado cada: exatamente --convites dão certo, as
+#      demais recebem "sem convites" e o saldo termina em 0;
+#   2. /api/convidar/lote, 3 convidados cada: só lotes inteiros entram, nenhum
+#      débito parcial, saldo = convites - 3 × lotes aceitos.
+# O stand-in repete os passos do registrar_convites (sql/001) cedendo o laço
+# entre a leitura e a escrita; o que segura o saldo é a trava de linha emulada.
+# Com --postgres o mesmo par de cenários roda direto na função do sql/001 num
+# Postgres descartável (nunca o de produção), com pgbench abrindo uma conexão
+# por chamada e psql para preparar e conferir. Sai com código 1 se algo não bater.
+
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import httpx  # noqa: E402
+
+from benchmarks.carga import Ambiente  # noqa: E402
+
+LOTE = 3
+
+falhas_conferencia = []
+
+
+def conferir(condicao: bool, descricao: str) -> None:
+    print(f"  {'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas_conferencia.append(descricao)
+
+
+async def clientes_do_socio(url: str, email: str, n: int) -> list:
+    """`n` clientes com a mesma sessão do sócio (abas/aparelhos dele ao mesmo tempo)."""
+    async with httpx.AsyncClient(base_url=url, timeout=30) as cliente:
+        resposta = await cliente.post("/verificar", data={"email": email})
+    cookie = resposta.cookies.get("prelude_sessao")
+    assert cookie, resposta.text
+    return [httpx.AsyncClient(base_url=url, timeout=30, cookies={"prelude_sessao": cookie}) for _ in range(n)]
+
+
+async def disparar(clientes: list, caminho: str, corpos: list) -> Counter:
+    respostas = await asyncio.gather(*(c.post(caminho, json=corpo) for c, corpo in zip(clientes, corpos)))
+    return Counter(r.status_code for r in respostas)
+
+
+def saldo(ambiente: Ambiente, email: str) -> tuple:
+    linhas = httpx.get(f"{ambiente.postgrest}/rest/v1/cadastros", params={"select": "*"}).json()
+    socio = next(l for l in linhas if l.get("email") == email)
+    convidados = sum(1 for l in linhas if l.get("quem_indicou") == socio["id"])
+    return socio["convites_disponiveis"], convidados
+
+
+async def principal(paralelos: int, convites: int, latencia_ms: float) -> int:
+    os.environ.update({"REPLICA_ATIVA": "0", "CHECKIN_ATIVO": "0"})
+    ambiente = Ambiente(latencia_ms, latencia_ms / 2, 0.0, ["server"])
+    try:
+        ambiente.reiniciar([
+            {"email": f"{nome}@exemplo.com", "whatsapp": f"552190000000{i}", "status": "socio",
+             "nome": nome, "convites_disponiveis": convites}
+            for i, nome in enumerate(("avulso", "lote"))
+        ])
+        url = ambiente.apps["server"]
+        print(f"{paralelos} chamadas simultâneas contra {convites} convites | Supabase {latencia_ms:.0f} ms")
+
+        print("1. /api/convidar")
+        clientes = await clientes_do_socio(url, "avulso@exemplo.com", paralelos)
+        status = await disparar(clientes, "/api/convidar", [
+            {"nome": f"Amigo {i}", "whatsapp": f"5521970{i:06d}"} for i in range(paralelos)
+        ])
+        restante, convidados = saldo(ambiente, "avulso@exemplo.com")
+        print(f"  respostas: {dict(status)}")
+        conferir(status[200] == convites, f"{status[200]} convites aceitos (saldo era {convites})")
+        conferir(status[400] == paralelos - convites, f"{status[400]} recusados por falta de saldo")
+        conferir(restante == 0 and convidados == convites, f"saldo final {restante}, {convidados} convidados gravados")
+
+        print(f"2. /api/convidar/lote ({LOTE} por lote)")
+        clientes_lote = await clientes_do_socio(url, "lote@exemplo.com", paralelos)
+        status = await disparar(clientes_lote, "/api/convidar/lote", [
+            {"convidados": [{"nome": f"Amigo {i}.{j}", "whatsapp": f"5521960{i:04d}{j:02d}"} for j in range(LOTE)]}
+            for i in range(paralelos)
+        ])
+        restante, convidados = saldo(ambiente, "lote@exemplo.com")
+        aceitos = convites // LOTE
+        print(f"  respostas: {dict(status)}")
+        conferir(status[200] == aceitos, f"{status[200]} lotes aceitos ({aceitos} cabem no saldo)")
+        conferir(restante == convites - LOTE * aceitos and convidados == LOTE * aceitos,
+                 f"saldo final {restante}, {convidados} convidados: nenhum lote pela metade")
+
+        for cliente in clientes + clientes_lote:
+            await cliente.aclose()
+    finally:
+        ambiente.encerrar()
+
+    print("\n" + ("❌ Falhas: " + "; ".join(falhas_conferencia) if falhas_conferencia else "✅ Tudo certo."))
+    return 1 if falhas_conferencia else 0
+
+
+TABELA_MINIMA = """
+create table if not exists public.cadastros (
+  id bigserial primary key,
+  nome text, apelido text, whatsapp text, email text, status text,
+  quem_indicou bigint, convites_disponiveis int
+);
+"""
+
+CHAMADA_AVULSA = """select public.registrar_convites(:socio, jsonb_build_array(jsonb_build_object(
+  'nome', 'Amigo ' || :client_id, 'whatsapp', '5521970' || lpad((:client_id)::text, 6, '0'))));
+"""
+
+CHAMADA_LOTE = """select public.registrar_convites(:socio, (
+  select jsonb_agg(jsonb_build_object('nome', format('Amigo %s.%s', :client_id, j),
+                                      'whatsapp', format('5521960%s%s', lpad((:client_id)::text, 4, '0'), lpad(j::text, 2, '0'))))
+    from generate_series(0, """ + str(LOTE - 1) + """) as j));
+"""
+
+
+def psql(dsn: str, sql: str) -> str:
+    return subprocess.run(["psql", "-X", "-q", "-At", "-v", "ON_ERROR_STOP=1", "-d", dsn, "-c", sql],
+                          check=True, capture_output=True, text=True).stdout.strip()
+
+
+def pgbench(dsn: str, paralelos: int, socio: int, script: str) -> None:
+    """`paralelos` conexões chamando a função ao mesmo tempo, uma vez cada."""
+    with tempfile.NamedTemporaryFile("w", suffix=".sql") as arquivo:
+        arquivo.write(script)
+        arquivo.flush()
+        subprocess.run(["pgbench", "-n", "-c", str(paralelos), "-j", str(paralelos), "-t", "1",
+                        "-D", f"socio={socio}", "-f", arquivo.name, dsn],
+                       check=True, capture_output=True, text=True)
+
+
+def saldo_postgres(dsn: str, socio: int) -> tuple:
+    linha = psql(dsn, f"select convites_disponiveis, (select count(*) from public.cadastros where quem_indicou = {socio})"
+                      f" from public.cadastros where id = {socio}")
+    restante, convidados = linha.split("|")
+    return int(restante), int(convidados)
+
+
+def principal_postgres(dsn: str, paralelos: int, convites: int) -> int:
+    faltando = [p for p in ("psql", "pgbench") if shutil.which(p) is None]
+    if faltando:
+        print(f"❌ {', '.join(faltando)} não encontrado no PATH")
+        return 1
+    psql(dsn, TABELA_MINIMA)
+    with open(os.path.join(RAIZ, "sql", "001_registrar_convites.sql"), encoding="utf-8") as f:
+        psql(dsn, f.read())
+    socios = [int(psql(dsn, "insert into public.cadastros (nome, email, status, convites_disponiveis)"
+                            f" values ('{nome}', '{nome}.bench@exemplo.com', 'socio', {convites}) returning id"))
+              for nome in ("avulso", "lote")]
+    print(f"{paralelos} conexões simultâneas contra {convites} convites | Postgres")
+    try:
+        print("1. registrar_convites, um convidado cada")
+        pgbench(dsn, paralelos, socios[0], CHAMADA_AVULSA)
+        restante, convidados = saldo_postgres(dsn, socios[0])
+        conferir(restante == 0 and convidados == convites, f"saldo final {restante}, {convidados} convidados gravados")
+
+        print(f"2. registrar_convites, {LOTE} convidados cada")
+        pgbench(dsn, paralelos, socios[1], CHAMADA_LOTE)
+        restante, convidados = saldo_postgres(dsn, socios[1])
+        aceitos = convites // LOTE
+        conferir(restante == convites - LOTE * aceitos and convidados == LOTE * aceitos,
+                 f"saldo final {restante}, {convidados} convidados: nenhum lote pela metade")
+    finally:
+        ids = ", ".join(map(str, socios))
+        psql(dsn, f"delete from public.cadastros where quem_indicou in ({ids}) or id in ({ids})")
+
+    print("\n" + ("❌ Falhas: " + "; ".join(falhas_conferencia) if falhas_conferencia else "✅ Tudo certo."))
+    return 1 if falhas_conferencia else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convites resgatados em paralelo não estouram o saldo")
+    parser.add_argument("--paralelos", type=int, default=50)
+    parser.add_argument("--convites", type=int, default=10)
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    parser.add_argument("--postgres", metavar="DSN", help="roda contra a função do sql/001 num Postgres descartável")
+    args = parser.parse_args()
+    if args.postgres:
+        sys.exit(principal_postgres(args.postgres, args.paralelos, args.convites))
+    sys.exit(asyncio.run(principal(args.paralelos, args.convites, args.latencia_ms)))
@@ -0,0 +1,223 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/deduplicacao.py — deduplicação vetorizada: 1M linhas e mescla
+# ===============================
+#
+#   python benchmarks/deduplicacao.py [--linhas 1000000] [--mescla 3000]
+#
+#   1. Plano em memória para --linhas cadastros sintéticos (~8% duplicados:
+#      telefone com/sem +55, e-mail com outra caixa, pares só-e-mail /
+#      só-WhatsApp ligados por um terceiro). Compara com o mesmo trabalho
+#      linha a linha em Python (normalizar_* + union-find com dicts) e confere
+#      que os dois acham exatamente os mesmos grupos.
+#   2. Ponta a ponta contra o stand-in do PostgREST (benchmarks/stand_ins.py)
+#      com --mescla cadastros: simulação não muda nada; a aplicação mescla,
+#      soma convites, religa quem_indicou e o check-in, e uma segunda rodada
+#      não acha mais nada.
+# Cada etapa confere o resultado; sai com código 1 se algo não bater.
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from benchmarks.stand_ins import montar_postgrest  # noqa: E402
+from deduplicacao import carregar, chaves_email, chaves_telefone, deduplicar, planejar  # noqa: E402
+from identidade import normalizar_email, normalizar_telefone  # noqa: E402
+from repositorio import RepositorioCadastros  # noqa: E402
+
+falhas_conferencia = []
+
+
+def conferir(condicao: bool, descricao: str) -> None:
+    print(f"  {'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas_conferencia.append(descricao)
+
+
+def sinteticos(n: int, semente: int = 7) -> list:
+    """n cadastros; a cada 100, 8 repetem alguém de antes com outra grafia."""
+    aleatorio = np.random.default_rng(semente)
+    status = ("convidado", "socio", "aguardando", "interessado", "Founder")
+    linhas = []
+    for i in range(n):
+        resto = i % 100
+        base = i - resto // 2 - 1  # alguém já inserido, do mesmo bloco
+        if resto in (10, 20, 30) and base >= 0:
+            # mesmo telefone, outro formato
+            linha = {"email": None, "whatsapp": f"+55 (21) 9{base:08d}"}
+        elif resto in (40, 50, 60) and base >= 0:
+            # mesmo e-mail, outra caixa e espaços
+            linha = {"email": f"  Pessoa{base}@Exemplo.COM ", "whatsapp": None}
+        elif resto == 70:
+            # só e-mail, só WhatsApp e um terceiro com os dois (grupo de três)
+            linhas.append({"email": f"ponte{i}@exemplo.com", "whatsapp": None})
+            linhas.append({"email": None, "whatsapp": f"0219{i:08d}"})
+            linha = {"email": f"PONTE{i}@exemplo.com", "whatsapp": f"5521 9{i:08d}"}
+        else:
+            linha = {"email": f"pessoa{i}@exemplo.com", "whatsapp": f"219{i:08d}"}
+        linhas.append(linha)
+    for id, linha in enumerate(linhas, start=1):
+        linha.update({
+            "id": id, "nome": f"Pessoa {id}", "apelido": None,
+            "status": status[int(aleatorio.integers(len(status)))],
+            "convites_disponiveis": int(aleatorio.integers(0, 4)),
+            "quem_indicou": int(aleatorio.integers(1, id)) if id > 1 and aleatorio.random() < 0.3 else None,
+            "created_at": "2025-12-01T20:00:00",
+        })
+    return linhas
+
+
+def grupos_em_python(linhas: list) -> dict:
+    """O mesmo agrupamento linha a linha: normalizar_* e union-find com dicts."""
+    pai = {}
+
+    def raiz(x):
+        while pai[x] != x:
+            pai[x] = pai[pai[x]]
+            x = pai[x]
+        return x
+
+    dono = {}
+    for linha in linhas:
+        pai[linha["id"]] = linha["id"]
+        for chave in (("e", normalizar_email(linha["email"])), ("w", normalizar_telefone(linha["whatsapp"]))):
+            if not chave[1]:
+                continue
+            if chave in dono:
+                a, b = raiz(dono[chave]), raiz(linha["id"])
+                pai[max(a, b)] = min(a, b)
+            else:
+                dono[chave] = linha["id"]
+    grupos = {}
+    for id in pai:
+        grupos.setdefault(raiz(id), []).append(id)
+    return {manter: sorted(set(ids) - {manter}) for manter, ids in grupos.items() if len(ids) > 1}
+
+
+# Espaço só é tirado nas pontas; tab, quebra de linha e NBSP ficam (btrim(email) em sql/002)
+EMAILS_BORDA = [
+    " A@X.com ", "a@x.com\t", "\ta@x.com", "a@x.com\n", "a@x.com \r\n", "\xa0a@x.com",
+    "  ", "\t", "", None, "Ção@X.com ", "a b@x.com", "A@X.COM",
+]
+
+
+def paridade() -> None:
+    print("0. Chaves de e-mail vetorizadas = normalizar_email")
+    vetorizadas = chaves_email(pd.Series(EMAILS_BORDA, dtype=object)).tolist()
+    esperadas = [normalizar_email(e) or None for e in EMAILS_BORDA]
+    diferentes = [
+        (e, v, x) for e, v, x in zip(EMAILS_BORDA, vetorizadas, esperadas)
+        if (None if pd.isna(v) else v) != x
+    ]
+    for e, v, x in diferentes:
+        print(f"    {e!r}: vetorizado {v!r}, normalizar_email {x!r}")
+    conferir(not diferentes, f"{len(EMAILS_BORDA)} casos de borda de espaço/caixa com a mesma chave")
+
+
+def em_memoria(n: int) -> None:
+    print(f"1. Plano em memória ({n} cadastros)")
+    linhas = sinteticos(n)
+    df = pd.DataFrame.from_records(linhas)
+
+    inicio = time.perf_counter()
+    chaves_email(df["email"])
+    chaves_telefone(df["whatsapp"])
+    vetorizado_chaves = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for linha in linhas:
+        normalizar_email(linha["email"])
+        normalizar_telefone(linha["whatsapp"])
+    python_chaves = time.perf_counter() - inicio
+    print(f"  chaves:  vetorizado {vetorizado_chaves:6.2f}s | linha a linha {python_chaves:6.2f}s")
+
+    inicio = time.perf_counter()
+    grupos, relatorio = planejar(df)
+    vetorizado = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    esperado = grupos_em_python(linhas)
+    python = time.perf_counter() - inicio
+    print(f"  plano:   vetorizado {vetorizado:6.2f}s | linha a linha (só os grupos) {python:6.2f}s")
+    print(f"  {relatorio['grupos']} grupos, {relatorio['removidos']} a remover, "
+          f"{relatorio['religados']} indicações religadas, {relatorio['convites_somados']} convites somados")
+    conferir({g["manter"]: g["remover"] for g in grupos} == esperado, "mesmos grupos que o union-find em Python")
+    conferir(all(g["manter"] < min(g["remover"]) for g in grupos), "fica sempre o menor id")
+    trios = [g for g in grupos if len(g["remover"]) == 2]
+    conferir(len(trios) >= n // 100 - 1, "pares só-e-mail / só-WhatsApp juntados pelo terceiro")
+
+
+async def ponta_a_ponta(n: int) -> None:
+    print(f"2. Ponta a ponta no stand-in ({n} cadastros)")
+    transporte = httpx.ASGITransport(app=montar_postgrest())
+    repositorio = RepositorioCadastros("http://stand-in", "chave", transport=transporte)
+    controle = httpx.AsyncClient(transport=transporte, base_url="http://stand-in")
+
+    linhas = sinteticos(n)
+    for linha in linhas:
+        linha.pop("id")
+    # ids do stand-in seguem a ordem da semente
+    ids = (await controle.post("/__semear", json={"cadastros": linhas})).json()["cadastros"]
+    antes = await carregar(repositorio)
+    convites_antes = int(antes["convites_disponiveis"].sum())
+    grupos, relatorio = planejar(antes)
+    alvo = grupos[0]
+    await controle.post("/__semear", json={"checkins": [
+        {"cadastro_id": alvo["remover"][0], "entrou_em": "2025-12-24T21:00:00+00:00", "portaria": "porta 1"}
+    ]})
+    agrupados = {id for g in grupos for id in (g["manter"], *g["remover"])}
+    indicado = next(l for l in antes.itertuples() if l.id not in agrupados)
+    await repositorio.atualizar(indicado.id, {"quem_indicou": alvo["remover"][0]})
+
+    _, simulado = await deduplicar(repositorio, simular=True)
+    conferir(simulado["grupos"] == relatorio["grupos"], f"simulação acha {relatorio['grupos']} grupos")
+    conferir(len(await carregar(repositorio)) == len(ids), "simulação não muda nada")
+
+    await controle.post("/__reset", json={})
+    inicio = time.perf_counter()
+    _, aplicado = await deduplicar(repositorio, simular=False, tamanho_lote=50)
+    print(f"  aplicado em {time.perf_counter() - inicio:.2f}s: {aplicado['aplicado']}")
+    rpcs = (await controle.get("/__contagem")).json().get("POST /rest/v1/rpc/mesclar_cadastros", 0)
+    conferir(rpcs == -(-relatorio["grupos"] // 50), "uma RPC a cada 50 grupos")
+
+    depois = await carregar(repositorio)
+    conferir(len(depois) == len(ids) - relatorio["removidos"], f"{relatorio['removidos']} duplicados removidos")
+    conferir(int(depois["convites_disponiveis"].sum()) == convites_antes, "total de convites preservado")
+    existentes = set(depois["id"])
+    conferir(depois["quem_indicou"].dropna().astype(int).isin(existentes).all(),
+             "nenhum quem_indicou aponta para removido")
+    conferir(depois.set_index("id").loc[indicado.id, "quem_indicou"] == alvo["manter"],
+             "indicação de um removido passa ao mantido")
+    checkins = await repositorio.selecionar({}, "cadastro_id", tabela="checkins")
+    conferir([c["cadastro_id"] for c in checkins] == [alvo["manter"]], "check-in do removido passa ao mantido")
+    mantido = depois.set_index("id").loc[alvo["manter"]]
+    conferir(mantido["status"] == alvo["campos"]["status"], "status de maior precedência no mantido")
+
+    _, de_novo = await deduplicar(repositorio, simular=True)
+    conferir(de_novo["grupos"] == 0, "segunda rodada não acha duplicados")
+
+    await controle.aclose()
+    await repositorio.fechar()
+
+
+def principal() -> int:
+    parser = argparse.ArgumentParser(description="Deduplicação vetorizada: 1M linhas e mescla")
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--mescla", type=int, default=3000)
+    args = parser.parse_args()
+    paridade()
+    em_memoria(args.linhas)
+    asyncio.run(ponta_a_ponta(args.mescla))
+    print("\n" + ("❌ Falhas: " + "; ".join(falhas_conferencia) if falhas_conferencia else "✅ Tudo certo."))
+    return 1 if falhas_conferencia else 0
+
+
+if __name__ == "__main__":
+    sys.exit(principal())
@@ -0,0 +1,85 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/diario.py — cadastros/s sustentados no diário local
+# ===============================
+#
+#   python benchmarks/diario.py [quantidade] [threads]
+#
+# Compara o backup antigo (DataFrame de uma linha + to_csv por cadastro) com o
+# DiarioLocal em cada modo de fsync. "enfileirar" é o custo visto pela rota;
+# "sustentado" inclui esperar o flusher gravar tudo em disco.
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from diario import DiarioLocal, MODOS_FSYNC  # noqa: E402
+
+
+def registro(i: int) -> dict:
+    return {
+        "email": f"pessoa{i}@exemplo.com",
+        "whatsapp": f"55219{i:08d}",
+        "status": "restrito",
+        "apelido": None,
+        "conhecido_como": None,
+        "quem_indicou": None,
+        "convites_disponiveis": 0,
+        "created_at": "2025-12-01T20:00:00",
+    }
+
+
+def csv_legado(quantidade: int, diretorio: str) -> float:
+    import pandas as pd
+
+    caminho = os.path.join(diretorio, "backup_database.csv")
+    inicio = time.perf_counter()
+    for i in range(quantidade):
+        df = pd.DataFrame([registro(i)])
+        if os.path.exists(caminho):
+            df.to_csv(caminho, mode="a", index=False, header=False)
+        else:
+            df.to_csv(caminho, index=False)
+    return time.perf_counter() - inicio
+
+
+def diario(quantidade: int, threads: int, modo: str, diretorio: str) -> tuple:
+    d = DiarioLocal(diretorio, modo_fsync=modo)
+    por_thread = quantidade // threads
+
+    def produtor(base: int) -> None:
+        for i in range(base, base + por_thread):
+            d.marcar_sincronizado(d.registrar(registro(i)))
+
+    inicio = time.perf_counter()
+    trabalhadores = [threading.Thread(target=produtor, args=(t * por_thread,)) for t in range(threads)]
+    for t in trabalhadores:
+        t.start()
+    for t in trabalhadores:
+        t.join()
+    enfileirar = time.perf_counter() - inicio
+    d.descarregar()
+    sustentado = time.perf_counter() - inicio
+    d.fechar()
+    return enfileirar, sustentado
+
+
+if __name__ == "__main__":
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    total = (quantidade // threads) * threads
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legado = csv_legado(min(quantidade, 1000), tmp)
+        print(f"csv legado (pandas)   : {min(quantidade, 1000) / legado:10.0f} cadastros/s")
+
+        for modo in MODOS_FSYNC:
+            enfileirar, sustentado = diario(total, threads, modo, os.path.join(tmp, modo))
+            print(
+                f"diário fsync={modo:<9}: {total / sustentado:10.0f} cadastros/s sustentados "
+                f"({enfileirar / total * 1e6:.1f} µs para enfileirar)"
+            )
@@ -0,0 +1,87 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/estilos.py — requisições bloqueantes e bytes antes/depois
+# ===============================
+#
+#   python benchmarks/estilos.py [--json]
+#
+# Para cada página servida pelo CachePaginas compara:
+#   antes  — <link> bloqueante do style.css + CSS do Google Fonts, fonte WOFF2 inteira
+#   depois — CSS crítico inline, style.css assíncrono, subset WOFF2 local com preload
+# Conta requisições que bloqueiam a renderização, origens externas no caminho
+# crítico e os bytes de CSS/fontes necessários para a primeira pintura.
+
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.templating import Jinja2Templates  # noqa: E402
+from markupsafe import Markup  # noqa: E402
+
+import estilos  # noqa: E402
+import imagens  # noqa: E402
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGINAS = ["index.html", "socio.html", "convidado.html", "restrito.html"]
+FONTE_LEGADA = "/static/fonts/dd4859ed4bc3e51f1e18d2ace306faeb.woff2"
+# socio.html é renderizada com o registro da sessão
+CONTEXTO = {"socio": {"id": 1, "status": "socio", "convites_disponiveis": 3}}
+
+
+def tamanho_local(url: str) -> int:
+    caminho = os.path.join(RAIZ, url.lstrip("/"))
+    return os.path.getsize(caminho) if os.path.exists(caminho) else 0
+
+
+def analisar(html: str, fontes: list) -> dict:
+    head = html.split("</head>", 1)[0]
+    bloqueantes = []
+    for tag in re.findall(r"<link[^>]*>", re.sub(r"<noscript>.*?</noscript>", "", head, flags=re.S)):
+        if 'rel="stylesheet"' in tag and 'media="print"' not in tag:
+            bloqueantes.append(re.search(r'href="([^"]+)"', tag).group(1))
+    externos = sorted({re.match(r"https?://([^/]+)", h).group(1) for h in bloqueantes if h.startswith("http")})
+    css_inline = sum(len(c.encode()) for c in re.findall(r"<style>(.*?)</style>", head, re.S))
+    css_bloqueante = sum(tamanho_local(h) for h in bloqueantes if h.startswith("/"))
+    return {
+        "requisicoes_bloqueantes": len(bloqueantes),
+        "origens_externas_bloqueantes": externos,
+        "bytes_css_caminho_critico": css_inline + css_bloqueante,
+        "bytes_fontes": sum(tamanho_local(f) for f in fontes),
+    }
+
+
+def renderizar(nome: str, legado: bool) -> str:
+    templates = Jinja2Templates(directory=os.path.join(RAIZ, "templates"))
+    imagens.registrar_helpers(templates)
+    if legado:
+        link = f'<link href="{estilos.GOOGLE_FONTS_CSS}" rel="stylesheet">'
+        templates.env.globals["fontes_head"] = lambda: Markup(link)
+        return templates.env.get_template(nome).render(**CONTEXTO)
+    estilos.registrar_helpers(templates)
+    return estilos.inlinar_css_critico(templates.env.get_template(nome).render(**CONTEXTO))
+
+
+if __name__ == "__main__":
+    fontes_depois = [f["url"] for f in estilos.carregar_fontes() if f["familia"] == estilos.FONTE_PRINCIPAL]
+    resultados = {}
+    for nome in PAGINAS:
+        resultados[nome] = {
+            "antes": analisar(renderizar(nome, legado=True), [FONTE_LEGADA]),
+            "depois": analisar(renderizar(nome, legado=False), fontes_depois),
+        }
+
+    if "--json" in sys.argv:
+        print(json.dumps(resultados, indent=2, ensure_ascii=False))
+        sys.exit(0)
+
+    for nome, r in resultados.items():
+        a, d = r["antes"], r["depois"]
+        print(
+            f"{nome:<15} bloqueantes {a['requisicoes_bloqueantes']} → {d['requisicoes_bloqueantes']}"
+            f" | externas {len(a['origens_externas_bloqueantes'])} → {len(d['origens_externas_bloqueantes'])}"
+            f" | CSS crítico {a['bytes_css_caminho_critico']} → {d['bytes_css_caminho_critico']} B"
+            f" | fontes {a['bytes_fontes']} → {d['bytes_fontes']} B"
+        )
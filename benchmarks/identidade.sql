@@ -0,0 +1,45 @@
+-- ===============================
+-- PRELUDE GOLDEN CHRISTMAS 2025
+-- benchmarks/identidade.sql — ilike '%x%' vs. chave normalizada indexada
+-- ===============================
+--
+-- Roda num Postgres descartável (nunca no banco de produção):
+--   psql -f sql/002_chaves_identidade.sql   (só a função normalizar_telefone)
+--   psql -v linhas=100000 -f benchmarks/identidade.sql
+-- Repita com linhas=10000, 100000 e 1000000: o tempo da busca exata fica
+-- plano (Index Scan, poucos buffers), o ilike cresce linear (Seq Scan).
+
+\timing on
+\if :{?linhas}
+\else
+  \set linhas 100000
+\endif
+
+drop table if exists bench_cadastros;
+create table bench_cadastros (
+  id bigserial primary key,
+  email text,
+  whatsapp text,
+  email_norm text generated always as (nullif(lower(btrim(email)), '')) stored,
+  whatsapp_norm text generated always as (public.normalizar_telefone(whatsapp)) stored
+);
+
+insert into bench_cadastros (email, whatsapp)
+select format('Pessoa%s@Exemplo.com', g), format('+55 21 9%s', lpad(g::text, 8, '0'))
+  from generate_series(1, :linhas) as g;
+
+create unique index on bench_cadastros (email_norm) where email_norm is not null;
+create unique index on bench_cadastros (whatsapp_norm) where whatsapp_norm is not null;
+analyze bench_cadastros;
+
+\echo '--- antes: ilike com curinga à esquerda'
+explain (analyze, buffers) select * from bench_cadastros where email ilike '%pessoa4242@exemplo.com%';
+explain (analyze, buffers) select * from bench_cadastros where whatsapp ilike '%900004242%';
+
+\echo '--- depois: igualdade exata nas chaves normalizadas'
+explain (analyze, buffers) select * from bench_cadastros where email_norm = 'pessoa4242@exemplo.com';
+explain (analyze, buffers) select * from bench_cadastros where whatsapp_norm = '5521900004242';
+explain (analyze, buffers) select * from bench_cadastros
+ where email_norm = 'pessoa4242@exemplo.com' or whatsapp_norm = '5521900004242';
+
+drop table bench_cadastros;
@@ -0,0 +1,94 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/metricas.py — custo da instrumentação por requisição
+# ===============================
+#
+#   python benchmarks/metricas.py [requisicoes]
+#
+# Mesmo app mínimo, com e sem MiddlewareMetricas, chamado direto via ASGI
+# (sem rede) para isolar o custo do middleware; mais o custo de um
+# `cronometrar()` e de gerar o /metrics com as séries de um dia típico.
+
+import asyncio
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import PlainTextResponse  # noqa: E402
+
+from metricas import Metricas, MiddlewareMetricas, cronometrar  # noqa: E402
+
+
+def montar_app(instrumentado: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/socio/{id}")
+    async def socio(id: int):
+        return PlainTextResponse("ok")
+
+    if instrumentado:
+        app.add_middleware(MiddlewareMetricas, nome_app="bench", metricas=Metricas())
+    return app
+
+
+async def chamar(app, caminho: str) -> None:
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": caminho, "raw_path": caminho.encode(), "query_string": b"",
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("t", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(mensagem):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def medir(app, n: int) -> float:
+    for i in range(200):
+        await chamar(app, f"/api/socio/{i}")
+    inicio = time.perf_counter()
+    for i in range(n):
+        await chamar(app, f"/api/socio/{i}")
+    return (time.perf_counter() - inicio) / n * 1e6
+
+
+async def principal(n: int) -> None:
+    # Alterna as rodadas para não favorecer quem roda depois (cache quente)
+    sem, com = [], []
+    for _ in range(3):
+        sem.append(await medir(montar_app(False), n))
+        com.append(await medir(montar_app(True), n))
+    sem_us, com_us = min(sem), min(com)
+    print(f"requisição sem middleware: {sem_us:7.1f} µs")
+    print(f"requisição com middleware: {com_us:7.1f} µs  (+{com_us - sem_us:.1f} µs, "
+          f"{(com_us - sem_us) / sem_us * 100:+.1f}%)")
+
+    def chamada_externa():
+        with cronometrar("supabase", "cadastros", "GET"):
+            pass
+
+    vezes = 100_000
+    print(f"cronometrar():             {timeit.timeit(chamada_externa, number=vezes) / vezes * 1e6:7.2f} µs")
+
+    metricas = Metricas()
+    for app in ("main", "server", "bot"):
+        for rota in range(15):
+            for status in (200, 304, 404, 500):
+                metricas.incrementar("prelude_http_respostas_total", (("app", app), ("rota", f"/r{rota}"),
+                                                                       ("status", status)))
+            metricas.observar("prelude_http_segundos", (("app", app), ("rota", f"/r{rota}")), 0.01)
+    inicio = time.perf_counter()
+    texto = metricas.exportar()
+    print(f"/metrics ({texto.count(chr(10))} linhas):    {(time.perf_counter() - inicio) * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(principal(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
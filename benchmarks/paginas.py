@@ -0,0 +1,97 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/paginas.py — req/s das páginas: render por requisição vs. cache
+# ===============================
+#
+#   python benchmarks/paginas.py [requisicoes]
+#
+# Chama o app ASGI direto (sem rede), para medir só o custo da rota:
+#   antes   — stat do arquivo + TemplateResponse a cada requisição
+#   depois  — CachePaginas (gzip/br pré-comprimidos)
+#   304     — navegador revalidando com If-None-Match
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import HTMLResponse  # noqa: E402
+from fastapi.templating import Jinja2Templates  # noqa: E402
+
+from paginas import CachePaginas  # noqa: E402
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATES_DIR = os.path.join(RAIZ, "templates")
+
+
+def montar_app() -> FastAPI:
+    app = FastAPI()
+    templates = Jinja2Templates(directory=TEMPLATES_DIR)
+    paginas = CachePaginas(templates, TEMPLATES_DIR)
+    paginas.carregar(["index.html"])
+
+    @app.get("/antes", response_class=HTMLResponse)
+    async def antes(request: Request):
+        html_path = os.path.join(TEMPLATES_DIR, "index.html")
+        if not os.path.exists(html_path):
+            return HTMLResponse("não encontrado", status_code=500)
+        return templates.TemplateResponse("index.html", {"request": request})
+
+    @app.get("/depois", response_class=HTMLResponse)
+    async def depois(request: Request):
+        return paginas.resposta("index.html", request)
+
+    etags = paginas.obter("index.html").etags
+    app.state.etag = etags.get("br", etags["gzip"])
+    return app
+
+
+async def chamar(app, caminho: str, headers: list) -> tuple:
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": caminho, "raw_path": caminho.encode(), "query_string": b"",
+        "root_path": "", "headers": headers, "client": ("127.0.0.1", 1), "server": ("t", 80),
+    }
+    status = 0
+    tamanho = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(mensagem):
+        nonlocal status, tamanho
+        if mensagem["type"] == "http.response.start":
+            status = mensagem["status"]
+        elif mensagem["type"] == "http.response.body":
+            tamanho += len(mensagem.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, tamanho
+
+
+async def medir(app, caminho: str, headers: list, n: int) -> tuple:
+    status, tamanho = await chamar(app, caminho, headers)
+    inicio = time.perf_counter()
+    for _ in range(n):
+        await chamar(app, caminho, headers)
+    return n / (time.perf_counter() - inicio), status, tamanho
+
+
+async def principal(n: int) -> None:
+    app = montar_app()
+    aceita = [(b"accept-encoding", b"gzip, deflate, br")]
+    cenarios = [
+        ("antes (render a cada req)", "/antes", aceita),
+        ("depois (cache comprimido)", "/depois", aceita),
+        ("depois + If-None-Match  ", "/depois", aceita + [(b"if-none-match", app.state.etag.encode())]),
+    ]
+    for nome, caminho, headers in cenarios:
+        rps, status, tamanho = await medir(app, caminho, headers, n)
+        print(f"{nome}: {rps:9.0f} req/s  status {status}  {tamanho:6d} bytes")
+
+
+if __name__ == "__main__":
+    asyncio.run(principal(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
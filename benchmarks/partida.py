@@ -0,0 +1,121 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/partida.py — orçamento de partida (import + primeira resposta)
+# ===============================
+#
+#   python benchmarks/partida.py                    # relatório
+#   python benchmarks/partida.py --orcamento-ms 800 # falha se algum import estourar
+#   python benchmarks/partida.py --json             # saída para comparar entre versões
+#
+# Para cada app mede:
+#   - tempo de import via `python -X importtime -c "import <app>"` (e os
+#     módulos que mais pesam);
+#   - tempo até a primeira resposta: do spawn do uvicorn até o primeiro 200.
+# Roda sem Supabase configurado, então não há rede envolvida.
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APPS = {
+    "server": "/health",
+    "main": "/",
+    "bot": "/openapi.json",
+}
+
+
+def ambiente() -> dict:
+    env = dict(os.environ)
+    env.update({"SUPABASE_URL": "", "SUPABASE_KEY": "", "PYTHONDONTWRITEBYTECODE": "0"})
+    return env
+
+
+def medir_import(modulo: str, top: int = 5) -> dict:
+    # Uma rodada para aquecer o __pycache__, outra para medir
+    for _ in range(2):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+            cwd=RAIZ, env=ambiente(), capture_output=True, text=True,
+        )
+    linhas = []
+    for linha in proc.stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        _, acumulado, nome = linha[len("import time:"):].split("|")
+        linhas.append((int(acumulado), len(nome) - len(nome.lstrip()), nome.strip()))
+
+    # O importtime lista os filhos antes do pai: os imports diretos do app são
+    # as linhas logo acima dele com um nível a mais de indentação.
+    indice = next(i for i, (_, _, nome) in enumerate(linhas) if nome == modulo)
+    total, nivel, _ = linhas[indice]
+    diretos = []
+    for acumulado, recuo, nome in reversed(linhas[:indice]):
+        if recuo <= nivel:
+            break
+        if recuo == nivel + 2:
+            diretos.append((nome, acumulado))
+    pesados = sorted(diretos, key=lambda d: d[1], reverse=True)
+    return {
+        "import_ms": round(total / 1000, 1),
+        "mais_pesados": [{"modulo": n, "ms": round(a / 1000, 1)} for n, a in pesados[:top]],
+    }
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def medir_primeira_resposta(modulo: str, caminho: str, limite_s: float = 30.0) -> float:
+    porta = porta_livre()
+    inicio = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{modulo}:app", "--port", str(porta), "--log-level", "warning"],
+        cwd=RAIZ, env=ambiente(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - inicio < limite_s:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{porta}{caminho}", timeout=1) as resp:
+                    if resp.status == 200:
+                        return round((time.perf_counter() - inicio) * 1000, 1)
+            except OSError:
+                time.sleep(0.005)
+        return None
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    saida_json = "--json" in sys.argv
+    orcamento = None
+    if "--orcamento-ms" in sys.argv:
+        orcamento = float(sys.argv[sys.argv.index("--orcamento-ms") + 1])
+
+    resultados = {}
+    for modulo, caminho in APPS.items():
+        resultado = medir_import(modulo)
+        resultado["primeira_resposta_ms"] = medir_primeira_resposta(modulo, caminho)
+        resultados[modulo] = resultado
+
+    if saida_json:
+        print(json.dumps(resultados, indent=2, ensure_ascii=False))
+    else:
+        for modulo, r in resultados.items():
+            print(f"{modulo:<7} import {r['import_ms']:7.1f} ms | primeira resposta {r['primeira_resposta_ms']} ms")
+            for p in r["mais_pesados"]:
+                print(f"          {p['modulo']:<28} {p['ms']:7.1f} ms")
+
+    if orcamento is not None:
+        estourados = [m for m, r in resultados.items() if r["import_ms"] > orcamento]
+        if estourados:
+            print(f"❌ Orçamento de {orcamento:.0f} ms estourado: {', '.join(estourados)}", file=sys.stderr)
+            sys.exit(1)
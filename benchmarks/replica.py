@@ -0,0 +1,147 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/replica.py — réplica local: latência de leitura e failover
+# ===============================
+#
+#   python benchmarks/replica.py [--cadastros 5000]
+#
+# Tudo em processo, contra o stand-in do PostgREST (benchmarks/stand_ins.py):
+#   1. sincronização completa e incremental (updates e exclusões); o saldo
+#      devolvido pelo RPC de convites já vale na réplica;
+#   2. busca local vs. busca no "Supabase" (stand-in, sem latência injetada);
+#   3. queda (stand-in respondendo 503): leituras continuam, escritas vão
+#      para a fila, nada some;
+#   4. volta: a fila é reenviada na ordem e a réplica se atualiza.
+# Cada etapa confere o resultado; sai com código 1 se algo não bater.
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import httpx  # noqa: E402
+
+from benchmarks.stand_ins import Falhas, montar_postgrest  # noqa: E402
+from metricas import METRICAS  # noqa: E402
+from replica import ReplicaCadastros, RepositorioReplicado, medir  # noqa: E402
+from repositorio import ErroRepositorio, RepositorioCadastros  # noqa: E402
+
+falhas_conferencia = []
+
+
+def conferir(condicao: bool, descricao: str) -> None:
+    print(f"  {'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas_conferencia.append(descricao)
+
+
+def microssegundos(amostras: list) -> str:
+    amostras.sort()
+    return f"p50 {amostras[len(amostras) // 2] * 1e6:8.1f} µs | p99 {amostras[int(len(amostras) * 0.99)] * 1e6:8.1f} µs"
+
+
+async def principal(n: int) -> int:
+    falhas = Falhas()
+    transporte = httpx.ASGITransport(app=montar_postgrest(falhas))
+    repositorio = RepositorioCadastros("http://stand-in", "chave", transport=transporte)
+    pasta = tempfile.mkdtemp(prefix="replica-")
+    # O stand-in commita na hora: sem janela de releitura, o incremental traz só o que mudou
+    replica = ReplicaCadastros(os.path.join(pasta, "replica.sqlite3"), janela=0.0)
+    replicado = RepositorioReplicado(repositorio, replica)
+    medir(replica)
+
+    async with httpx.AsyncClient(transport=transporte, base_url="http://stand-in") as controle:
+        await controle.post("/__semear", json={"cadastros": [
+            {"nome": f"Pessoa {i}", "email": f"pessoa{i}@exemplo.com", "whatsapp": f"55219{i:08d}",
+             "status": "convidado", "convites_disponiveis": 0}
+            for i in range(n)
+        ]})
+
+    print(f"1. Sincronização ({n} cadastros)")
+    inicio = time.perf_counter()
+    vieram = await replica.sincronizar(repositorio)
+    print(f"  completa: {vieram} linhas em {time.perf_counter() - inicio:.2f}s")
+    conferir(len(replica) == n, "réplica com todos os cadastros")
+
+    alvo = await repositorio.buscar_por_email("pessoa1@exemplo.com")
+    excluido = await repositorio.buscar_por_email("pessoa2@exemplo.com")
+    await repositorio.atualizar(alvo["id"], {"status": "socio"})
+    await repositorio.excluir(excluido["id"])
+    inicio = time.perf_counter()
+    vieram = await replica.sincronizar(repositorio)
+    print(f"  incremental: {vieram} linhas em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    conferir(vieram < n, "incremental não relê a tabela inteira")
+    conferir(replica.buscar_por_id(alvo["id"])["status"] == "socio", "update chegou à réplica")
+    conferir(replica.buscar_por_id(excluido["id"]) is None, "exclusão chegou à réplica")
+
+    # registrar_convites é RPC (não passa pela fila): o saldo devolvido já vale localmente
+    socio = await repositorio.buscar_por_email("pessoa4@exemplo.com")
+    await repositorio.atualizar(socio["id"], {"status": "socio", "convites_disponiveis": 5})
+    await replica.sincronizar(repositorio)
+    resultado = await replicado.registrar_convites(socio["id"], [{"nome": "Amigo", "whatsapp": "5521977770000"}])
+    local = await replicado.buscar_por_id(socio["id"])
+    conferir(resultado["convites_restantes"] == 4 and local["convites_disponiveis"] == 4,
+             "saldo depois do convite já vem da réplica, sem esperar a sincronização")
+
+    print("2. Latência de leitura")
+    locais, remotas = [], []
+    for i in range(2000):
+        inicio = time.perf_counter()
+        replica.buscar_por_email(f"pessoa{i % n}@exemplo.com")
+        locais.append(time.perf_counter() - inicio)
+    for i in range(200):
+        inicio = time.perf_counter()
+        await repositorio.buscar_por_email(f"pessoa{i % n}@exemplo.com")
+        remotas.append(time.perf_counter() - inicio)
+    print(f"  réplica local:        {microssegundos(locais)}")
+    print(f"  stand-in (sem rede):  {microssegundos(remotas)}")
+
+    print("3. Queda do Supabase (stand-in respondendo 503)")
+    falhas.atualizar({"taxa_erro": 1.0})
+    pessoa = await replicado.buscar_por_email("pessoa3@exemplo.com")
+    conferir(pessoa is not None and pessoa["email"] == "pessoa3@exemplo.com", "leitura servida pela réplica")
+    conferir(await replicado.buscar_por_email("ninguem@exemplo.com") is None, "não encontrado não vira erro")
+    novo = await replicado.inserir({"email": "novo@exemplo.com", "status": "aguardando", "convites_disponiveis": 0})
+    conferir(novo is None, "insert foi para a fila")
+    await replicado.atualizar(pessoa["id"], {"status": "interessado"})
+    await replicado.atualizar(pessoa["id"], {"status": "socio", "apelido": "Três"})
+    await replicado.excluir(alvo["id"])
+    conferir(replica.pendentes() == 4, "quatro escritas na fila")
+    conferir(replica.buscar_por_id(pessoa["id"])["apelido"] == "Três", "réplica já mostra a escrita pendente")
+    conferir(replica.buscar_por_id(alvo["id"]) is None, "exclusão pendente já vale localmente")
+    try:
+        await replica.reenviar(repositorio)
+        conferir(False, "reenvio durante a queda deveria falhar")
+    except ErroRepositorio:
+        conferir(replica.pendentes() == 4, "reenvio durante a queda não perde nada")
+    metricas = METRICAS.exportar()
+    conferir("prelude_replica_atraso_segundos " in metricas and "prelude_replica_fila 4" in metricas,
+             "métricas de atraso e fila expostas")
+
+    print("4. Volta do Supabase")
+    falhas.atualizar({"taxa_erro": 0.0})
+    enviados = await replica.reenviar(repositorio)
+    conferir(enviados == 4 and replica.pendentes() == 0, "fila reenviada por inteiro")
+    remoto = await repositorio.buscar_por_id(pessoa["id"])
+    conferir(remoto["status"] == "socio" and remoto["apelido"] == "Três", "updates aplicados na ordem")
+    conferir(await repositorio.buscar_por_id(alvo["id"]) is None, "exclusão aplicada")
+    conferir(await repositorio.buscar_por_email("novo@exemplo.com") is not None, "insert aplicado")
+    await replica.sincronizar(repositorio)
+    conferir(replica.buscar_por_email("novo@exemplo.com") is not None, "réplica com o cadastro novo")
+    conferir(replica.atraso() < 1, "atraso da réplica zerado")
+
+    await repositorio.fechar()
+    replica.fechar()
+    print("\n" + ("❌ Falhas: " + "; ".join(falhas_conferencia) if falhas_conferencia else "✅ Tudo certo."))
+    return 1 if falhas_conferencia else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Réplica local: latência de leitura e failover")
+    parser.add_argument("--cadastros", type=int, default=5000)
+    sys.exit(asyncio.run(principal(parser.parse_args().cadastros)))
@@ -0,0 +1,308 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/resiliencia.py — orçamentos, disjuntor, novas tentativas e hedge
+# ===============================
+#
+#   python benchmarks/resiliencia.py [--buscas 400] [--lenta-ms 3000] [--sem-apps]
+#
+# Parte 1, em processo, contra os stand-ins (benchmarks/stand_ins.py):
+#   1. cauda lenta (5% das chamadas levam +--lenta-ms): p50/p99/máx das
+#      buscas sem política (como era), só com orçamento e com hedge;
+#   2. queda (503 em tudo): o disjuntor abre, as chamadas seguintes falham
+#      na hora sem chegar ao stand-in; depois da espera, uma chamada de teste
+#      fecha o disjuntor;
+#   3. Supabase pendurado: nenhuma busca passa do orçamento;
+#   4. 20% de 503: leituras repetidas dão certo, escritas não são repetidas;
+#   5. Graph API fora: disjuntor abre, envio falha na hora, sem incerteza e
+#      sem reenvio;
+#   6. resposta degradada: com o disjuntor aberto, a réplica local responde.
+# Parte 2 (sem --sem-apps): main.py e server.py com uvicorn (benchmarks/carga.py)
+# e a mesma cauda injetada no stand-in: p99 do /verificar de cada um.
+# Cada etapa confere o resultado; sai com código 1 se algo não bater.
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import httpx  # noqa: E402
+
+from benchmarks.stand_ins import Falhas, montar_graph, montar_postgrest  # noqa: E402
+from replica import ReplicaCadastros, RepositorioReplicado  # noqa: E402
+from repositorio import ORCAMENTOS, ErroRepositorio, RepositorioCadastros, _temporario  # noqa: E402
+from resiliencia import ABERTO, FECHADO, Disjuntor, Politica  # noqa: E402
+from whatsapp import ClienteWhatsApp, ErroEnvio, _falha_da_graph  # noqa: E402
+
+CADASTROS = 200
+ESPERA_S = 1.0  # disjuntor aberto por 1s, para o teste não demorar
+
+falhas_conferencia = []
+
+
+def conferir(condicao: bool, descricao: str) -> None:
+    print(f"  {'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas_conferencia.append(descricao)
+
+
+def resumo(tempos: list) -> dict:
+    tempos = sorted(tempos)
+    n = len(tempos)
+    return {"p50": tempos[n // 2] * 1000, "p99": tempos[min(n - 1, int(n * 0.99))] * 1000, "max": tempos[-1] * 1000}
+
+
+def linha(nome: str, r: dict) -> str:
+    return f"  {nome:<16} p50 {r['p50']:7.1f} ms | p99 {r['p99']:7.1f} ms | máx {r['max']:7.1f} ms"
+
+
+def politica(hedge_ms: float = 0.0, orcamentos: dict = ORCAMENTOS, **opcoes) -> Politica:
+    return Politica("supabase", orcamentos, orcamento_padrao=5.0, hedge_apos=hedge_ms / 1000,
+                    disjuntor=Disjuntor("supabase", espera=ESPERA_S), temporario=_temporario, **opcoes)
+
+
+def sem_politica() -> Politica:
+    # Como era antes: uma tentativa, só o timeout de 5s, disjuntor que nunca abre
+    return Politica("supabase", orcamento_padrao=5.0, tentativas=1,
+                    disjuntor=Disjuntor("supabase", limiar=2.0), temporario=_temporario)
+
+
+class Supabase:
+    def __init__(self, falhas: Falhas):
+        self.falhas = falhas
+        self.transporte = httpx.ASGITransport(app=montar_postgrest(falhas))
+        self.controle = httpx.AsyncClient(transport=self.transporte, base_url="http://stand-in")
+
+    def repositorio(self, politica: Politica) -> RepositorioCadastros:
+        return RepositorioCadastros("http://stand-in", "chave", transport=self.transporte, politica=politica)
+
+    async def chamadas(self) -> int:
+        contagem = (await self.controle.get("/__contagem")).json()
+        return sum(v for k, v in contagem.items() if k.startswith(("GET ", "POST ", "PATCH ", "DELETE ")))
+
+    async def contagem(self, chave: str) -> int:
+        return (await self.controle.get("/__contagem")).json().get(chave, 0)
+
+
+async def buscas(repositorio, n: int, concorrencia: int = 20) -> tuple:
+    """`n` buscas por e-mail; (tempos, erros)."""
+    tempos, erros = [], 0
+    proximo = iter(range(n))
+
+    async def trabalhador():
+        nonlocal erros
+        for i in proximo:
+            inicio = time.perf_counter()
+            try:
+                await repositorio.buscar_por_email(f"socio{i % CADASTROS}@exemplo.com")
+            except ErroRepositorio:
+                erros += 1
+            tempos.append(time.perf_counter() - inicio)
+
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return tempos, erros
+
+
+# ============================================================
+# 1–4. SUPABASE (repositorio.py)
+# ============================================================
+async def cauda(stand_in: Supabase, n: int, lenta_ms: float) -> None:
+    print(f"1. Cauda lenta: 5% das chamadas com +{lenta_ms:.0f} ms")
+    stand_in.falhas.atualizar({"latencia_ms": 10, "taxa_lenta": 0.05, "lenta_ms": lenta_ms})
+    resultados = {}
+    for nome, p in (("sem política", sem_politica()), ("orçamento", politica()), ("orçamento+hedge", politica(100))):
+        repositorio = stand_in.repositorio(p)
+        tempos, erros = await buscas(repositorio, n)
+        await repositorio.fechar()
+        resultados[nome] = resumo(tempos)
+        print(linha(nome, resultados[nome]) + f" | {erros} erros")
+        if nome == "orçamento+hedge":
+            # só falha quando as duas cópias caem na cauda (5% × 5%)
+            conferir(erros <= n * 0.01, f"com hedge {erros} de {n} buscas falharam")
+    orcamento_ms = ORCAMENTOS["buscar"] * 1000
+    conferir(resultados["sem política"]["max"] >= lenta_ms, "sem política a cauda chega a quem chamou")
+    conferir(resultados["orçamento"]["max"] <= orcamento_ms + 100, f"com orçamento nada passa de {orcamento_ms:.0f} ms")
+    conferir(resultados["orçamento+hedge"]["p99"] < lenta_ms / 5,
+             f"hedge: p99 {resultados['orçamento+hedge']['p99']:.0f} ms, longe dos {lenta_ms:.0f} ms")
+    stand_in.falhas.atualizar({"latencia_ms": 0, "taxa_lenta": 0})
+
+
+async def queda(stand_in: Supabase) -> None:
+    print("2. Queda do Supabase (503 em tudo)")
+    p = politica()
+    repositorio = stand_in.repositorio(p)
+    stand_in.falhas.atualizar({"taxa_erro": 1.0})
+    antes = await stand_in.chamadas()
+    for i in range(p.disjuntor.minimo):
+        try:
+            await repositorio.buscar_por_email(f"socio{i}@exemplo.com")
+        except ErroRepositorio:
+            pass
+    conferir(p.disjuntor.estado == ABERTO, f"disjuntor aberto depois de {await stand_in.chamadas() - antes} chamadas")
+
+    antes = await stand_in.chamadas()
+    tempos, erros = await buscas(repositorio, 200)
+    r = resumo(tempos)
+    print(linha("aberto", r))
+    conferir(erros == 200 and r["p99"] < 5, "com ele aberto, falha na hora")
+    conferir(await stand_in.chamadas() == antes, "nenhuma chamada chega ao Supabase")
+    try:
+        await repositorio.buscar_por_email("socio1@exemplo.com")
+    except ErroRepositorio as e:
+        conferir(e.status is None, "vira ErroRepositorio temporário (réplica e fila assumem)")
+
+    stand_in.falhas.atualizar({"taxa_erro": 0.0})
+    await asyncio.sleep(ESPERA_S)
+    pessoa = await repositorio.buscar_por_email("socio1@exemplo.com")
+    conferir(pessoa is not None and p.disjuntor.estado == FECHADO, "chamada de teste depois da espera fecha o disjuntor")
+    await repositorio.fechar()
+
+
+async def pendurado(stand_in: Supabase) -> None:
+    print("3. Supabase pendurado (10s por chamada)")
+    repositorio = stand_in.repositorio(politica(100))
+    stand_in.falhas.atualizar({"latencia_ms": 10_000})
+    tempos, erros = await buscas(repositorio, 20)
+    r = resumo(tempos)
+    print(linha("pendurado", r))
+    conferir(erros == 20 and r["max"] <= ORCAMENTOS["buscar"] * 1000 + 100,
+             f"toda busca desiste em {ORCAMENTOS['buscar']:.0f}s, não em 10s")
+    stand_in.falhas.atualizar({"latencia_ms": 0})
+    await repositorio.fechar()
+
+
+async def erros_esparsos(stand_in: Supabase) -> None:
+    print("4. 20% de 503")
+    p = politica()
+    repositorio = stand_in.repositorio(p)
+    stand_in.falhas.atualizar({"taxa_erro": 0.2})
+    tempos, erros = await buscas(repositorio, 300)
+    conferir(erros <= 300 * 0.02, f"{300 - erros}/300 leituras deram certo com novas tentativas")
+    conferir(p.disjuntor.estado == FECHADO, "disjuntor continua fechado")
+
+    antes = await stand_in.contagem("POST /rest/v1/cadastros")
+    falharam = 0
+    for i in range(50):
+        try:
+            await repositorio.inserir({"email": f"esparso{i}@exemplo.com", "status": "aguardando",
+                                       "convites_disponiveis": 0})
+        except ErroRepositorio:
+            falharam += 1
+    posts = await stand_in.contagem("POST /rest/v1/cadastros") - antes
+    conferir(posts == 50 and falharam > 0, f"escritas não repetidas: 50 inserts, {posts} POSTs, {falharam} falharam")
+    stand_in.falhas.atualizar({"taxa_erro": 0.0})
+    await repositorio.fechar()
+
+
+# ============================================================
+# 5. GRAPH API (whatsapp.py)
+# ============================================================
+async def graph_fora() -> None:
+    print("5. Graph API fora (503 em tudo)")
+    falhas = Falhas(taxa_erro=1.0)
+    transporte = httpx.ASGITransport(app=montar_graph(falhas))
+    p = Politica("graph", orcamento_padrao=10.0, disjuntor=Disjuntor("graph", espera=ESPERA_S),
+                 temporario=_falha_da_graph)
+    cliente = ClienteWhatsApp("token", "123", url_base="http://graph", transport=transporte, politica=p)
+    erros = []
+    for i in range(30):
+        try:
+            await cliente.enviar_texto(f"55219{i:08d}", "Oi")
+        except ErroEnvio as e:
+            erros.append(e)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://graph") as controle:
+        contagem = (await controle.get("/__contagem")).json()
+    posts = sum(v for k, v in contagem.items() if k.startswith("POST "))
+    conferir(p.disjuntor.estado == ABERTO, f"disjuntor aberto; {posts} envios chegaram à Graph de 30")
+    conferir(posts < 30, "os demais nem saíram (nenhum reenvio)")
+    conferir(all(e.temporario for e in erros) and not any(e.incerto for e in erros[posts:]),
+             "recusados pelo disjuntor: temporários e sem incerteza")
+    await cliente.fechar()
+
+
+# ============================================================
+# 6. RESPOSTA DEGRADADA (replica.py)
+# ============================================================
+async def degradada(stand_in: Supabase) -> None:
+    print("6. Disjuntor aberto com réplica local")
+    p = politica()
+    repositorio = stand_in.repositorio(p)
+    linhas = (await stand_in.controle.get("/rest/v1/cadastros", params={"select": "*"})).json()
+    replica = ReplicaCadastros(os.path.join(tempfile.mkdtemp(prefix="resiliencia-"), "replica.sqlite3"), max_atraso=0)
+    replica.guardar(linhas)  # réplica "atrasada": toda leitura tenta o Supabase primeiro
+    replicado = RepositorioReplicado(repositorio, replica)
+
+    stand_in.falhas.atualizar({"taxa_erro": 1.0})
+    while p.disjuntor.estado != ABERTO:
+        await replicado.buscar_por_email("socio1@exemplo.com")
+    tempos, erros = await buscas(replicado, 200)
+    r = resumo(tempos)
+    print(linha("réplica", r))
+    conferir(erros == 0, "todas as buscas respondidas pela réplica")
+    conferir(r["p99"] < 10, "com o disjuntor aberto, a réplica responde na hora")
+    stand_in.falhas.atualizar({"taxa_erro": 0.0})
+    replica.fechar()
+    await repositorio.fechar()
+
+
+# ============================================================
+# PARTE 2. APPS COM UVICORN
+# ============================================================
+def _so_existentes(i: int, contexto: dict) -> tuple:
+    return "POST", "/verificar", {"data": {"email": f"socio{i % CADASTROS}@exemplo.com"},
+                                  "headers": {"X-Forwarded-For": f"10.7.{i // 250 % 250}.{i % 250}"}}
+
+
+async def apps(n: int, lenta_ms: float) -> None:
+    from benchmarks.carga import Ambiente, cadastros_semente, disparar
+
+    print(f"Parte 2. main.py e server.py, 5% das chamadas ao Supabase com +{lenta_ms:.0f} ms")
+    os.environ.update({"REPLICA_ATIVA": "0", "CHECKIN_ATIVO": "0", "LIMITE_IDENTIDADE_RAJADA": "100000"})
+    ambiente = Ambiente(10.0, 0.0, 0.0, ["main", "server"])
+    try:
+        ambiente.reiniciar(cadastros_semente(CADASTROS))
+        httpx.post(f"{ambiente.postgrest}/__config", json={"taxa_lenta": 0.05, "lenta_ms": lenta_ms})
+        for app in ("main", "server"):
+            r = await disparar(ambiente.apps[app], _so_existentes, {}, n // 2, 8)
+            print(linha(app, {k: r["latencia_ms"][k] for k in ("p50", "p99", "max")}) + f" | {r['status']}")
+            limite = ORCAMENTOS["buscar"] * 1000 + 300
+            conferir(r["latencia_ms"]["p99"] <= limite, f"{app}: p99 do /verificar dentro de {limite:.0f} ms")
+        conferir(r["latencia_ms"]["p99"] < lenta_ms / 5 and r["status"].get("303", 0) >= r["requisicoes"] * 0.99,
+                 "server: o hedge tira a cauda do p99 e 99% são respondidos")
+    finally:
+        ambiente.encerrar()
+
+
+async def principal(n: int, lenta_ms: float, com_apps: bool) -> int:
+    stand_in = Supabase(Falhas())
+    await stand_in.controle.post("/__semear", json={"cadastros": [
+        {"nome": f"Sócio {i}", "email": f"socio{i}@exemplo.com", "whatsapp": f"55219{i:08d}",
+         "status": "socio", "convites_disponiveis": 1}
+        for i in range(CADASTROS)
+    ]})
+
+    await cauda(stand_in, n, lenta_ms)
+    await queda(stand_in)
+    await pendurado(stand_in)
+    await erros_esparsos(stand_in)
+    await graph_fora()
+    await degradada(stand_in)
+    await stand_in.controle.aclose()
+    if com_apps:
+        await apps(n, lenta_ms)
+
+    print("\n" + ("❌ Falhas: " + "; ".join(falhas_conferencia) if falhas_conferencia else "✅ Tudo certo."))
+    return 1 if falhas_conferencia else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Orçamentos, disjuntor, novas tentativas e hedge")
+    parser.add_argument("--buscas", type=int, default=400)
+    parser.add_argument("--lenta-ms", type=float, default=3000.0)
+    parser.add_argument("--sem-apps", action="store_true", help="só a parte em processo")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(principal(args.buscas, args.lenta_ms, not args.sem_apps)))
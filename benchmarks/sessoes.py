@@ -0,0 +1,198 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/sessoes.py — do formulário ao saldo de convites na tela
+# ===============================
+#
+#   python benchmarks/sessoes.py [--visitantes 50] [--rtt-ms 40] [--latencia-ms 20]
+#
+# Sobe o stand-in do PostgREST e o server.py com uvicorn (benchmarks/carga.py)
+# e mede, por visitante, o tempo até o conteúdo da página do sócio, com
+# --rtt-ms de ida e volta entre o navegador e o servidor (o localhost não tem)
+# e --latencia-ms em cada chamada ao Supabase:
+#   antes  — o fluxo antigo, refeito com as rotas que continuam existindo:
+#            POST /verificar, a página sem dados (como era a /socio) e o
+#            fetch de /api/socio/{id} com o cache frio;
+#   depois — POST /verificar → 303 → GET /socio já com o saldo no HTML.
+# Conta as idas ao servidor e ao Supabase de cada fluxo e confere a sessão:
+# sem cookie ou com cookie adulterado não entra; convite e opt-out usam o
+# cadastro da sessão; o cookie pendente (cadastro na fila da réplica) não vale
+# como sessão. Sai com código 1 se algo não bater.
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import httpx  # noqa: E402
+
+from benchmarks.carga import Ambiente, cadastros_semente  # noqa: E402
+from sessoes import Sessoes  # noqa: E402
+
+CONTEUDO = "direito a indicar 1000000 amigo(s)"
+
+falhas_conferencia = []
+
+
+def conferir(condicao: bool, descricao: str) -> None:
+    print(f"  {'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        falhas_conferencia.append(descricao)
+
+
+class RedeLenta(httpx.AsyncHTTPTransport):
+    """Transporte com `rtt` segundos de ida e volta por requisição."""
+
+    def __init__(self, rtt: float):
+        super().__init__()
+        self.rtt = rtt
+        self.requisicoes = 0
+
+    async def handle_async_request(self, request):
+        self.requisicoes += 1
+        await asyncio.sleep(self.rtt)
+        return await super().handle_async_request(request)
+
+
+def navegador(url: str, rede: RedeLenta, i: int) -> httpx.AsyncClient:
+    # Um IP por visitante, como em carga.py
+    return httpx.AsyncClient(base_url=url, transport=rede, timeout=30,
+                             headers={"X-Forwarded-For": f"10.9.{i // 250 % 250}.{i % 250}"})
+
+
+def chamadas_supabase(ambiente: Ambiente) -> int:
+    return sum(ambiente.contagem()["supabase"].values())
+
+
+async def antes(url: str, rtt: float, i: int, email: str, outro_id: int) -> tuple:
+    rede = RedeLenta(rtt)
+    async with navegador(url, rede, i) as cliente:
+        inicio = time.perf_counter()
+        verificado = await cliente.post("/verificar", data={"email": email})
+        pagina = await cliente.get("/convidado")
+        dados = await cliente.get(f"/api/socio/{outro_id}")
+        decorrido = time.perf_counter() - inicio
+        ok = verificado.status_code == 303 and pagina.status_code == 200 and "convites_disponiveis" in dados.json()
+        return decorrido, rede.requisicoes, ok
+
+
+async def depois(url: str, rtt: float, i: int, email: str) -> tuple:
+    rede = RedeLenta(rtt)
+    async with navegador(url, rede, i) as cliente:
+        inicio = time.perf_counter()
+        pagina = await cliente.post("/verificar", data={"email": email}, follow_redirects=True)
+        decorrido = time.perf_counter() - inicio
+        ok = pagina.status_code == 200 and str(pagina.url).endswith("/socio") and CONTEUDO in pagina.text
+        return decorrido, rede.requisicoes, ok
+
+
+async def medir(ambiente: Ambiente, fluxo, argumentos: list) -> dict:
+    tempos, idas, oks = [], 0, 0
+    supabase = chamadas_supabase(ambiente)
+    for args in argumentos:
+        decorrido, requisicoes, ok = await fluxo(*args)
+        tempos.append(decorrido)
+        idas += requisicoes
+        oks += ok
+    tempos.sort()
+    n = len(argumentos)
+    return {
+        "p50_ms": tempos[n // 2] * 1000, "p95_ms": tempos[int(n * 0.95)] * 1000,
+        "idas_servidor": idas / n, "idas_supabase": (chamadas_supabase(ambiente) - supabase) / n, "ok": oks == n,
+    }
+
+
+async def conferir_sessao(url: str) -> None:
+    async with httpx.AsyncClient(base_url=url, timeout=30, headers={"X-Forwarded-For": "10.8.0.1"}) as cliente:
+        sem_cookie = await cliente.get("/socio")
+        conferir(sem_cookie.status_code == 303 and sem_cookie.headers["location"] == "/", "/socio sem sessão volta ao início")
+        restrito = await cliente.get("/restrito")
+        conferir(restrito.status_code == 303, "/restrito sem sessão volta ao início")
+        alheio = await cliente.post("/api/convidar", json={"quem_indicou": 1, "nome": "Intruso", "whatsapp": "5521955551111"})
+        conferir(alheio.status_code == 401, "convite sem sessão não aceita quem_indicou do corpo")
+        conferir((await cliente.get("/optout", params={"id": 1})).status_code == 401, "opt-out sem sessão ignora ?id=")
+        interesse = await cliente.post("/api/interesse", json={"id": 1, "nome": "Intruso"})
+        conferir(interesse.status_code == 401, "interesse sem sessão ignora o id do corpo")
+
+        resposta = await cliente.post("/verificar", data={"email": "socio199@exemplo.com"})
+        cookie = resposta.cookies.get("prelude_sessao", "")
+        conferir("httponly" in resposta.headers["set-cookie"].lower(), "cookie HttpOnly")
+        id, _, resto = cookie.partition(".")
+        cliente.cookies.set("prelude_sessao", f"{int(id) - 1}.{resto}")
+        conferir((await cliente.get("/socio")).status_code == 303, "cookie com outro id não entra")
+
+        cliente.cookies.set("prelude_sessao", cookie)
+        convite = await cliente.post("/api/convidar", json={"nome": "Amigo", "whatsapp": "5521955550000"})
+        conferir(convite.json().get("convites_restantes") == 999_999, "convite sai do sócio da sessão")
+        pagina = await cliente.get("/socio")
+        conferir("indicar 999999 amigo(s)" in pagina.text, "página mostra o saldo novo")
+
+    async with httpx.AsyncClient(base_url=url, timeout=30, headers={"X-Forwarded-For": "10.8.0.2"}) as cliente:
+        resposta = await cliente.post("/verificar", data={"email": "founder@exemplo.com"})
+        conferir(resposta.headers["location"] == "/convidado", "Founder vai para /convidado, como antes")
+        conferir((await cliente.get("/socio")).headers.get("location") == "/convidado",
+                 "/socio redireciona quem não é sócio")
+
+    async with httpx.AsyncClient(base_url=url, timeout=30, headers={"X-Forwarded-For": "10.8.0.3"}) as cliente:
+        novo = await cliente.post("/verificar", data={"email": "novo@exemplo.com"})
+        conferir(novo.headers["location"] == "/restrito" and "prelude_sessao" in novo.cookies,
+                 "cadastro novo abre sessão e vai para /restrito")
+        conferir((await cliente.get("/restrito")).status_code == 200, "/restrito com sessão abre")
+        saida = await cliente.get("/optout")
+        conferir(saida.status_code == 200 and 'prelude_sessao=""' in saida.headers.get("set-cookie", ""),
+                 "opt-out remove o cadastro da sessão e apaga o cookie")
+
+
+def conferir_pendente() -> None:
+    sessoes = Sessoes("segredo", ttl=60)
+    pendente = sessoes.emitir_pendente("e:novo@exemplo.com")
+    conferir(sessoes.ler_pendente(pendente) == "e:novo@exemplo.com", "cookie pendente guarda a chave do cadastro")
+    conferir(sessoes.ler(pendente) is None, "cookie pendente não vale como sessão")
+    conferir(sessoes.ler_pendente(sessoes.emitir(7)) is None, "sessão não vale como pendente")
+    corpo, _, resto = pendente.partition(".")
+    conferir(sessoes.ler_pendente(f"{corpo[:-1]}A.{resto}") is None, "cookie pendente adulterado não vale")
+
+
+async def principal(visitantes: int, rtt_ms: float, latencia_ms: float) -> int:
+    # Sem réplica nem índice da portaria: cada busca vai ao stand-in e nada
+    # em segundo plano entra na contagem
+    os.environ.update({"REPLICA_ATIVA": "0", "CHECKIN_ATIVO": "0"})
+    ambiente = Ambiente(latencia_ms, 0.0, 0.0, ["server"])
+    try:
+        ids = ambiente.reiniciar(cadastros_semente())
+        url = ambiente.apps["server"]
+        rtt = rtt_ms / 1000
+        n = min(visitantes, len(ids) // 3)
+        print(f"{n} visitantes | navegador ↔ servidor {rtt_ms:.0f} ms | servidor ↔ Supabase {latencia_ms:.0f} ms")
+
+        # Sócios distintos em cada fluxo: ninguém aproveita o cache do outro
+        velho = await medir(ambiente, antes, [(url, rtt, i, f"socio{i}@exemplo.com", ids[n + i]) for i in range(n)])
+        novo = await medir(ambiente, depois, [(url, rtt, i, f"socio{2 * n + i}@exemplo.com") for i in range(n)])
+        for nome, r in (("antes ", velho), ("depois", novo)):
+            print(f"  {nome}: p50 {r['p50_ms']:6.1f} ms | p95 {r['p95_ms']:6.1f} ms | "
+                  f"{r['idas_servidor']:.0f} idas ao servidor + {r['idas_supabase']:.1f} ao Supabase")
+        conferir(velho["ok"] and novo["ok"], "os dois fluxos chegam ao saldo de convites")
+        economia = velho["idas_servidor"] + velho["idas_supabase"] - novo["idas_servidor"] - novo["idas_supabase"]
+        conferir(economia >= 2, f"{economia:.0f} idas de rede a menos até o conteúdo")
+        conferir(velho["p50_ms"] - novo["p50_ms"] >= rtt_ms, f"p50 {velho['p50_ms'] - novo['p50_ms']:.0f} ms mais rápido")
+
+        print("Sessão")
+        await conferir_sessao(url)
+        conferir_pendente()
+    finally:
+        ambiente.encerrar()
+
+    print("\n" + ("❌ Falhas: " + "; ".join(falhas_conferencia) if falhas_conferencia else "✅ Tudo certo."))
+    return 1 if falhas_conferencia else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tempo até o conteúdo da página do sócio")
+    parser.add_argument("--visitantes", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=40.0)
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(principal(args.visitantes, args.rtt_ms, args.latencia_ms)))
@@ -0,0 +1,469 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/stand_ins.py — Supabase (PostgREST) e Graph API falsos, locais
+# ===============================
+#
+#   python benchmarks/stand_ins.py postgrest --porta 54321 --latencia-ms 20 --taxa-erro 0.01
+#   python benchmarks/stand_ins.py graph --porta 54322 --latencia-ms 80 --mps 80
+#
+# Servidores HTTP de verdade (uvicorn), para que main.py (requests), server.py
+# e bot.py (httpx) falem com eles sem saber que são falsos. Guardam tudo em
+# memória e implementam só o subconjunto do PostgREST que o projeto usa:
+# filtros eq./in./gt./gte./lt./lte./or=(...,and(...)), select, order (uma ou
+# mais colunas), limit, Prefer return=representation, upsert por id
+# (on_conflict=id), insert ignorando duplicados (on_conflict=coluna[,coluna]),
+# updated_at e cadastros_excluidos (sql/004), e as RPCs registrar_convites /
+# decrementar_convites / decrementar_convites_mensagem (sql/007) /
+# mesclar_cadastros com a mesma regra do SQL.
+#
+# Rotas de controle (não contam como chamadas):
+#   GET  /__contagem   chamadas recebidas por "MÉTODO /rota"
+#   POST /__config     {"latencia_ms": 20, "jitter_ms": 5, "taxa_erro": 0.01,
+#                       "taxa_lenta": 0.05, "lenta_ms": 3000}  (cauda: 5% levam +3s)
+#   POST /__reset      zera contagem (e os dados, com {"dados": true})
+#   POST /__semear     {"cadastros": [...]} insere linhas direto, sem os índices
+#                      únicos do sql/002 (como uma base de antes dele)
+#   GET  /__entregues  (graph) mensagens aceitas por destino
+
+import argparse
+import asyncio
+import itertools
+import operator
+import os
+import random
+import re
+import sys
+from collections import Counter
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import JSONResponse, Response  # noqa: E402
+
+from identidade import normalizar_email, normalizar_telefone  # noqa: E402
+from limites import BaldesDeFichas  # noqa: E402
+
+
+class Falhas:
+    """Latência e erros injetados, ajustáveis em tempo de execução."""
+
+    def __init__(self, latencia_ms: float = 0.0, jitter_ms: float = 0.0, taxa_erro: float = 0.0,
+                 taxa_lenta: float = 0.0, lenta_ms: float = 0.0):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.taxa_erro = taxa_erro
+        self.taxa_lenta = taxa_lenta
+        self.lenta_ms = lenta_ms
+
+    def atualizar(self, config: dict) -> dict:
+        for campo in ("latencia_ms", "jitter_ms", "taxa_erro", "taxa_lenta", "lenta_ms"):
+            if campo in config:
+                setattr(self, campo, float(config[campo]))
+        return vars(self)
+
+
+def _instrumentar(app: FastAPI, falhas: Falhas, contagem: Counter) -> None:
+    @app.middleware("http")
+    async def injetar(request: Request, call_next):
+        if request.url.path.startswith("/__"):
+            return await call_next(request)
+        rota = re.sub(r"/\d+(?=/|$)", "/{id}", request.url.path)
+        contagem[f"{request.method} {rota}"] += 1
+        atraso = falhas.latencia_ms + random.uniform(0, falhas.jitter_ms)
+        if falhas.taxa_lenta and random.random() < falhas.taxa_lenta:
+            contagem["lentas_injetadas"] += 1
+            atraso += falhas.lenta_ms
+        if atraso:
+            await asyncio.sleep(atraso / 1000)
+        if falhas.taxa_erro and random.random() < falhas.taxa_erro:
+            contagem["erros_injetados"] += 1
+            return JSONResponse({"message": "erro injetado"}, status_code=503)
+        return await call_next(request)
+
+    @app.get("/__contagem")
+    async def ver_contagem():
+        return dict(contagem)
+
+    @app.post("/__config")
+    async def configurar(request: Request):
+        return falhas.atualizar(await request.json())
+
+
+# ============================================================
+# 🗄️ POSTGREST
+# ============================================================
+def _valor(texto: str):
+    texto = texto.strip()
+    if len(texto) >= 2 and texto[0] == texto[-1] == '"':
+        return texto[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return texto
+
+
+def _dividir(texto: str) -> list:
+    """Divide por vírgulas fora de aspas e parênteses."""
+    partes, atual, nivel, aspas = [], "", 0, False
+    for c in texto:
+        if c == '"' and not atual.endswith("\\"):
+            aspas = not aspas
+        elif not aspas and c == "(":
+            nivel += 1
+        elif not aspas and c == ")":
+            nivel -= 1
+        if c == "," and not aspas and nivel == 0:
+            partes.append(atual)
+            atual = ""
+        else:
+            atual += c
+    return partes + [atual] if atual else partes
+
+
+COMPARACOES = {"gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+
+def _agora() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _comparar(comparacao, valor, limite: str) -> bool:
+    if valor is None:
+        return False
+    try:
+        return comparacao(float(valor), float(limite))
+    except (TypeError, ValueError):
+        return comparacao(str(valor), limite)  # timestamps ISO no mesmo formato
+
+
+def _condicao(coluna: str, expressao: str):
+    operador, _, argumento = expressao.partition(".")
+    if operador == "eq":
+        valor = _valor(argumento)
+        return lambda linha: str(linha.get(coluna)) == valor
+    if operador == "in":
+        valores = {_valor(v) for v in _dividir(argumento.strip("()"))}
+        return lambda linha: str(linha.get(coluna)) in valores
+    if operador in COMPARACOES:
+        comparacao, limite = COMPARACOES[operador], _valor(argumento)
+        return lambda linha: _comparar(comparacao, linha.get(coluna), limite)
+    if operador == "is" and argumento == "null":
+        return lambda linha: linha.get(coluna) is None
+    raise ValueError(f"operador não suportado: {operador}")
+
+
+def _filtro(params) -> callable:
+    condicoes = []
+    for coluna, expressao in params.multi_items():
+        if coluna in ("select", "limit", "order", "offset", "on_conflict", "columns"):
+            continue
+        if coluna in ("or", "and"):
+            condicoes.append(_logico(coluna, expressao.strip()))
+        else:
+            condicoes.append(_condicao(coluna, expressao))
+    return lambda linha: all(c(linha) for c in condicoes)
+
+
+def _logico(operador: str, lista: str):
+    """or=(a.eq.1,and(b.gt.2,c.eq.3)) → função da linha."""
+    partes = []
+    for parte in _dividir(lista[1:-1]):
+        if parte.startswith(("or(", "and(")):
+            interno, _, resto = parte.partition("(")
+            partes.append(_logico(interno, "(" + resto))
+        else:
+            campo, _, resto = parte.partition(".")
+            partes.append(_condicao(campo, resto))
+    juntar = any if operador == "or" else all
+    return lambda linha: juntar(c(linha) for c in partes)
+
+
+def _projetar(linha: dict, select: str) -> dict:
+    if not select or select == "*":
+        return dict(linha)
+    return {coluna: linha.get(coluna) for coluna in select.split(",")}
+
+
+def montar_postgrest(falhas: Falhas = None) -> FastAPI:
+    app = FastAPI()
+    falhas = falhas or Falhas()
+    contagem = Counter()
+    tabelas = {}
+    sequencia = itertools.count(1)
+    _instrumentar(app, falhas, contagem)
+
+    def tabela(nome: str) -> list:
+        return tabelas.setdefault(nome, [])
+
+    def preparar(nome: str, linha: dict) -> dict:
+        linha = dict(linha)
+        linha.setdefault("id", next(sequencia))
+        if nome == "cadastros":
+            # colunas geradas (sql/002) e trigger de updated_at (sql/004)
+            linha["email_norm"] = normalizar_email(linha.get("email")) or None
+            linha["whatsapp_norm"] = normalizar_telefone(linha.get("whatsapp")) or None
+            linha["updated_at"] = _agora()
+        elif nome == "checkins":
+            linha.setdefault("registrado_em", _agora())  # default now() (sql/005)
+        return linha
+
+    def inserir(nome: str, linhas: list, unicos: bool = True):
+        linhas = [preparar(nome, linha) for linha in linhas]
+        if nome == "cadastros" and unicos:
+            for chave in ("email_norm", "whatsapp_norm"):
+                existentes = {l.get(chave) for l in tabela(nome)}
+                for linha in linhas:
+                    if linha[chave] and linha[chave] in existentes:
+                        return None  # índice único violado
+                    existentes.add(linha[chave])
+        tabela(nome).extend(linhas)
+        return linhas
+
+    @app.post("/__reset")
+    async def reset(request: Request):
+        corpo = await request.json() if await request.body() else {}
+        contagem.clear()
+        if corpo.get("dados"):
+            tabelas.clear()
+        return {"ok": True}
+
+    @app.post("/__semear")
+    async def semear(request: Request):
+        corpo = await request.json()
+        ids = {}
+        for nome, linhas in corpo.items():
+            ids[nome] = [l["id"] for l in inserir(nome, linhas, unicos=False)]
+        return ids
+
+    @app.get("/rest/v1/{nome}")
+    async def selecionar(nome: str, request: Request):
+        params = request.query_params
+        condicao = _filtro(params)
+        linhas = [l for l in tabela(nome) if condicao(l)]
+        # order=a.asc,b.desc: ordena pela última chave primeiro (sort estável)
+        for ordem in reversed([o for o in params.get("order", "").split(",") if o]):
+            coluna, _, direcao = ordem.partition(".")
+            linhas.sort(key=lambda l: (l.get(coluna) is None, l.get(coluna)), reverse=direcao == "desc")
+        linhas = [_projetar(l, params.get("select")) for l in linhas]
+        if params.get("limit"):
+            linhas = linhas[: int(params["limit"])]
+        return linhas
+
+    @app.post("/rest/v1/{nome}")
+    async def criar(nome: str, request: Request):
+        corpo = await request.json()
+        corpo = corpo if isinstance(corpo, list) else [corpo]
+        if request.query_params.get("on_conflict") == "id" and "merge-duplicates" in request.headers.get("prefer", ""):
+            por_id = {l["id"]: l for l in tabela(nome)}
+            for linha in corpo:
+                if linha.get("id") in por_id:
+                    por_id[linha["id"]].update(preparar(nome, linha))
+                else:
+                    tabela(nome).append(preparar(nome, linha))
+            return Response(status_code=201)
+        conflito = request.query_params.get("on_conflict")
+        if conflito and "ignore-duplicates" in request.headers.get("prefer", ""):
+            colunas = conflito.split(",")
+
+            def chave(linha):
+                return tuple(str(linha.get(c)) for c in colunas)
+
+            vistos = {chave(l) for l in tabela(nome)}
+            novas = []
+            for linha in corpo:
+                if chave(linha) not in vistos:
+                    vistos.add(chave(linha))
+                    novas.append(linha)
+            corpo = novas
+        linhas = inserir(nome, corpo)
+        if linhas is None:
+            return JSONResponse({"code": "23505", "message": "duplicate key value"}, status_code=409)
+        if "return=representation" in request.headers.get("prefer", ""):
+            return JSONResponse(linhas, status_code=201)
+        return Response(status_code=201)
+
+    @app.patch("/rest/v1/{nome}")
+    async def atualizar(nome: str, request: Request):
+        campos = await request.json()
+        condicao = _filtro(request.query_params)
+        alteradas = []
+        for linha in tabela(nome):
+            if condicao(linha):
+                linha.update(campos)
+                if nome == "cadastros":
+                    linha["updated_at"] = _agora()
+                alteradas.append(dict(linha))
+        if "return=representation" in request.headers.get("prefer", ""):
+            return alteradas
+        return Response(status_code=204)
+
+    @app.delete("/rest/v1/{nome}")
+    async def excluir(nome: str, request: Request):
+        condicao = _filtro(request.query_params)
+        if nome == "cadastros":
+            # lápides (sql/004)
+            tabela("cadastros_excluidos").extend(
+                {"id": l["id"], "excluido_em": _agora()} for l in tabela(nome) if condicao(l)
+            )
+        tabelas[nome] = [l for l in tabela(nome) if not condicao(l)]
+        return Response(status_code=204)
+
+    travas_linha = {}
+
+    @app.post("/rest/v1/rpc/registrar_convites")
+    async def registrar_convites(request: Request):
+        # Os passos do sql/001, cedendo o laço entre eles como outra conexão do
+        # Postgres seria escalonada: a chamada concorrente lê o saldo enquanto
+        # esta ainda não gravou. O que segura o saldo é o mesmo que no SQL: a
+        # trava de linha do UPDATE (até o fim da "transação") e a condição
+        # convites_disponiveis >= N reavaliada depois dela.
+        corpo = await request.json()
+        convidados = corpo.get("p_convidados") or []
+        if not convidados:
+            return {"ok": False, "erro": "sem_convidados"}
+        socio = next((l for l in tabela("cadastros") if l["id"] == corpo.get("p_socio_id")), None)
+        if socio is None:
+            return {"ok": False, "erro": "socio_nao_encontrado"}
+        await asyncio.sleep(0)
+        async with travas_linha.setdefault(socio["id"], asyncio.Lock()):
+            restantes = socio.get("convites_disponiveis") or 0
+            await asyncio.sleep(0)
+            if restantes < len(convidados):
+                return {"ok": False, "erro": "sem_convites", "convites_restantes": restantes}
+            socio["convites_disponiveis"] = restantes - len(convidados)
+            await asyncio.sleep(0)
+            novos = inserir("cadastros", [
+                {**c, "status": "convidado", "quem_indicou": socio["id"]} for c in convidados
+            ])
+            if novos is None:
+                socio["convites_disponiveis"] = restantes  # rollback do débito
+                return JSONResponse({"code": "23505", "message": "duplicate key value"}, status_code=409)
+            socio["updated_at"] = _agora()
+            return {"ok": True, "convites_restantes": socio["convites_disponiveis"], "ids": [n["id"] for n in novos]}
+
+    @app.post("/rest/v1/rpc/decrementar_convites")
+    async def decrementar_convites(request: Request):
+        founder = normalizar_telefone((await request.json()).get("founder"))
+        for linha in tabela("cadastros"):
+            if linha.get("whatsapp_norm") == founder:
+                linha["convites_disponiveis"] = max(0, (linha.get("convites_disponiveis") or 0) - 1)
+                linha["updated_at"] = _agora()
+                return linha["convites_disponiveis"]
+        return None
+
+    @app.post("/rest/v1/rpc/decrementar_convites_mensagem")
+    async def decrementar_convites_mensagem(request: Request):
+        corpo = await request.json()
+        founder = normalizar_telefone(corpo.get("founder"))
+        debitadas = {l["mensagem_id"] for l in tabela("convites_debitados")}
+        if corpo.get("mensagem_id") not in debitadas:
+            tabela("convites_debitados").append({"mensagem_id": corpo.get("mensagem_id"), "founder_whatsapp": founder})
+            return await decrementar_convites(request)
+        linha = next((l for l in tabela("cadastros") if l.get("whatsapp_norm") == founder), None)
+        return linha and linha.get("convites_disponiveis")
+
+    @app.post("/rest/v1/rpc/mesclar_cadastros")
+    async def mesclar_cadastros(request: Request):
+        resultado = {"grupos": 0, "removidos": 0, "religados": 0}
+        for grupo in (await request.json()).get("p_grupos") or []:
+            por_id = {l["id"]: l for l in tabela("cadastros")}
+            mantido = por_id.get(grupo["manter"])
+            if mantido is None:
+                continue
+            remover = set(grupo["remover"])
+            campos = grupo.get("campos") or {}
+            convites = sum(por_id[id].get("convites_disponiveis") or 0 for id in remover if id in por_id)
+            for linha in tabela("cadastros"):
+                if linha.get("quem_indicou") in remover and linha["id"] not in remover:
+                    linha["quem_indicou"] = None if linha is mantido else mantido["id"]
+                    linha["updated_at"] = _agora()
+                    resultado["religados"] += 1
+            checkins = tabela("checkins")
+            if not any(c["cadastro_id"] == mantido["id"] for c in checkins):
+                herdado = min((c for c in checkins if c["cadastro_id"] in remover),
+                              key=lambda c: c["entrou_em"], default=None)
+                if herdado:
+                    herdado["cadastro_id"] = mantido["id"]
+            tabela("cadastros_excluidos").extend(
+                {"id": id, "excluido_em": _agora()} for id in remover if id in por_id
+            )
+            tabelas["cadastros"] = [l for l in tabela("cadastros") if l["id"] not in remover]
+            tabelas["checkins"] = [c for c in checkins if c["cadastro_id"] not in remover]
+            resultado["removidos"] += sum(id in por_id for id in remover)
+
+            def vazio(valor):
+                return valor is None or not str(valor).strip()
+
+            mantido["convites_disponiveis"] = (mantido.get("convites_disponiveis") or 0) + convites
+            mantido["status"] = campos.get("status") or mantido.get("status")
+            for campo in ("nome", "apelido", "email", "whatsapp"):
+                if vazio(mantido.get(campo)) and campos.get(campo) is not None:
+                    mantido[campo] = campos[campo]
+            if mantido.get("quem_indicou") is None:
+                mantido["quem_indicou"] = campos.get("quem_indicou")
+            mantido.update({k: v for k, v in preparar("cadastros", mantido).items() if k.endswith("_norm")})
+            mantido["updated_at"] = _agora()
+            resultado["grupos"] += 1
+        return resultado
+
+    return app
+
+
+# ============================================================
+# 💬 GRAPH API
+# ============================================================
+def montar_graph(falhas: Falhas = None, mps: float = None) -> FastAPI:
+    """Graph API falsa. Com `mps`, responde 429 (130429) acima dessa vazão,
+    como o limite de mensagens/s do número de telefone. Destino que não é um
+    número com DDI (12+ dígitos) recebe 400, como um número inválido."""
+    app = FastAPI()
+    contagem = Counter()
+    _instrumentar(app, falhas or Falhas(), contagem)
+    sequencia = itertools.count(1)
+    entregues = Counter()  # destino -> mensagens aceitas
+    vazao = BaldesDeFichas(por_minuto=mps * 60, rajada=max(1, int(mps))) if mps else None
+
+    @app.post("/__reset")
+    async def reset():
+        contagem.clear()
+        entregues.clear()
+        return {"ok": True}
+
+    @app.get("/__entregues")
+    async def ver_entregues():
+        return dict(entregues)
+
+    @app.post("/{phone_number_id}/messages")
+    async def mensagens(phone_number_id: str, request: Request):
+        corpo = await request.json()
+        destino = str(corpo.get("to") or "")
+        if vazao and vazao.consumir(("numero",)):
+            contagem["limite_vazao"] += 1
+            return JSONResponse({"error": {"message": "Rate limit hit", "code": 130429}}, status_code=429)
+        if not destino.isdigit() or len(destino) < 12:
+            return JSONResponse({"error": {"message": "Invalid parameter", "code": 100}}, status_code=400)
+        entregues[destino] += 1
+        return {
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": corpo.get("to"), "wa_id": corpo.get("to")}],
+            "messages": [{"id": f"wamid.stand-in.{next(sequencia)}"}],
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stand-ins locais do Supabase e da Graph API")
+    parser.add_argument("servico", choices=["postgrest", "graph"])
+    parser.add_argument("--porta", type=int, default=54321)
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--taxa-lenta", type=float, default=0.0, help="fração das chamadas com +--lenta-ms")
+    parser.add_argument("--lenta-ms", type=float, default=0.0)
+    parser.add_argument("--mps", type=float, help="graph: mensagens/s aceitas antes do 429")
+    args = parser.parse_args()
+
+    falhas = Falhas(args.latencia_ms, args.jitter_ms, args.taxa_erro, args.taxa_lenta, args.lenta_ms)
+    app = montar_postgrest(falhas) if args.servico == "postgrest" else montar_graph(falhas, args.mps)
+    uvicorn.run(app, host="127.0.0.1", port=args.porta, log_level="warning")
@@ -0,0 +1,144 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/webhook.py — reentregas do webhook: trabalho por mensagem única
+# ===============================
+#
+#   python benchmarks/webhook.py [mensagens_unicas] [reentregas]
+#
+# Roda o bot.py contra stand-ins locais do Supabase (PostgREST) e da Graph API,
+# sem rede. Manda N mensagens únicas, agrupadas em payloads de até 5 mensagens
+# como a Meta faz, e depois reentrega cada payload R vezes. Com a
+# deduplicação, as chamadas ao Supabase e os envios não crescem com R.
+# Depois, contra o stand-in de benchmarks/stand_ins.py, reprocessa o mesmo
+# evento (o que uma nova tentativa após timeout faz): nada duplica, e um 4xx
+# não é tentado de novo.
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import bot  # noqa: E402
+from benchmarks.stand_ins import montar_postgrest  # noqa: E402
+from diario import DiarioLocal  # noqa: E402
+from fila import FilaIndicacoes  # noqa: E402
+from idempotencia import RegistroMensagens  # noqa: E402
+from repositorio import ErroRepositorio, RepositorioCadastros  # noqa: E402
+from whatsapp import ClienteWhatsApp  # noqa: E402
+
+FOUNDER = "5521999990000"
+
+
+def montar_stand_ins(contagem: dict) -> tuple:
+    supabase = FastAPI()
+
+    @supabase.get("/rest/v1/cadastros")
+    async def cadastros(request: Request):
+        contagem["supabase"] += 1
+        return [{"whatsapp_norm": FOUNDER}] if FOUNDER in request.query_params["whatsapp_norm"] else []
+
+    @supabase.post("/rest/v1/indicacoes")
+    async def indicacoes(request: Request):
+        contagem["supabase"] += 1
+        contagem["linhas"] += len(await request.json())
+        return JSONResponse(None, status_code=201)
+
+    @supabase.post("/rest/v1/rpc/decrementar_convites_mensagem")
+    async def decrementar(request: Request):
+        contagem["supabase"] += 1
+        return 1
+
+    graph = FastAPI()
+
+    @graph.post("/{phone_number_id}/messages")
+    async def mensagens(phone_number_id: str):
+        contagem["envios"] += 1
+        return {"messages": [{"id": "wamid.stand-in"}]}
+
+    return supabase, graph
+
+
+def payload(ids: list) -> dict:
+    # Cada mensagem repete um número em dois formatos: a normalização junta os dois
+    return {"entry": [{"changes": [{"value": {"messages": [
+        {"id": f"wamid.{i}", "from": FOUNDER,
+         "text": {"body": f"indico +55 21 98{i:07d} e 2198{i:07d}".replace(" ", "")}}
+        for i in ids
+    ]}}]}]}
+
+
+async def principal(unicas: int, reentregas: int) -> None:
+    contagem = {"supabase": 0, "linhas": 0, "envios": 0}
+    supabase, graph = montar_stand_ins(contagem)
+    pasta = tempfile.mkdtemp()
+
+    repositorio = RepositorioCadastros("http://supabase", "chave", transport=httpx.ASGITransport(supabase))
+    whatsapp = ClienteWhatsApp("token", "123", url_base="http://graph", transport=httpx.ASGITransport(graph))
+    bot.app.state.mensagens = RegistroMensagens(os.path.join(pasta, "mensagens.sqlite3"))
+    bot.app.state.fila = FilaIndicacoes(lambda: repositorio, whatsapp, DiarioLocal(os.path.join(pasta, "dl")),
+                                        max_fila=100_000, intervalo_por_destino=0)
+    bot.app.state.fila.iniciar()
+
+    payloads = [payload(range(i, min(i + 5, unicas))) for i in range(0, unicas, 5)]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(bot.app), base_url="http://bot") as cliente:
+        for rodada in range(1 + reentregas):
+            inicio = time.perf_counter()
+            for p in payloads:
+                resp = await cliente.post("/webhook", json=p)
+                assert resp.status_code == 200, resp.text
+            ack_ms = (time.perf_counter() - inicio) * 1000 / len(payloads)
+            await bot.app.state.fila.esperar_vazia()
+            nome = "entrega" if rodada == 0 else f"reentrega {rodada}"
+            print(f"{nome:<12} ack médio {ack_ms:6.2f} ms | supabase {contagem['supabase']:5d} chamadas, "
+                  f"{contagem['linhas']:5d} linhas | envios {contagem['envios']:5d}")
+
+    await bot.app.state.fila.parar()
+    bot.app.state.mensagens.fechar()
+    print(f"✅ {unicas} mensagens únicas, {len(payloads)} payloads, {reentregas} reentrega(s) de cada.")
+    await reprocessar(pasta)
+
+
+async def reprocessar(pasta: str) -> None:
+    transporte = httpx.ASGITransport(montar_postgrest())
+    repositorio = RepositorioCadastros("http://stand-in", "chave", transport=transporte)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://stand-in") as controle:
+        await controle.post("/__semear", json={"cadastros": [
+            {"nome": "Founder", "whatsapp": FOUNDER, "status": "Founder", "convites_disponiveis": 10}
+        ]})
+        fila = FilaIndicacoes(lambda: repositorio, None, DiarioLocal(os.path.join(pasta, "dl-repeticao")),
+                              atraso_base=0.01)
+        evento = {"mensagens": [
+            {"id": f"wamid.r{i}", "founder_whatsapp": FOUNDER, "numeros": [f"5521977{i:06d}", "5521976000000"]}
+            for i in range(3)
+        ]}
+        for _ in range(3):
+            await fila.processar(evento)
+        founder = (await controle.get("/rest/v1/cadastros", params={"whatsapp_norm": f"eq.{FOUNDER}"})).json()[0]
+        indicacoes = (await controle.get("/rest/v1/indicacoes")).json()
+        assert founder["convites_disponiveis"] == 7, founder
+        assert len(indicacoes) == 4, indicacoes
+
+        # 4xx (aqui, RPC inexistente) sobe na primeira tentativa
+        await controle.post("/__reset", json={})
+        try:
+            await fila._com_retentativas(lambda: repositorio.rpc("nao_existe", {}), "rpc inexistente")
+            raise AssertionError("4xx deveria falhar")
+        except ErroRepositorio as e:
+            assert e.status == 404, e
+        assert sum((await controle.get("/__contagem")).json().values()) == 1
+    await repositorio.fechar()
+    print("✅ evento reprocessado 3x: 3 débitos e 4 indicações, como na primeira vez; 4xx sem nova tentativa.")
+
+
+if __name__ == "__main__":
+    asyncio.run(principal(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+    ))
@@ -0,0 +1,234 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# benchmarks/workers.py — vazão do server.py com 1, 2, 4... workers (gunicorn)
+# ===============================
+#
+#   python benchmarks/workers.py                         # 1, 2 e 4 workers
+#   python benchmarks/workers.py --workers 1,2,4,8 --requisicoes 4000
+#
+# Sobe o stand-in do PostgREST (benchmarks/stand_ins.py) e, para cada número
+# de workers, o server.py com gunicorn.conf.py — o mesmo comando do Procfile
+# (web-workers). A carga vem de --geradores processos (padrão: um por CPU),
+# para o gerador não ser o gargalo:
+#   - socio:     GET /api/socio/{id}, servido do cache compartilhado;
+#   - verificar: POST /verificar, com baldes de limite no SQLite comum.
+#
+# Com mais de um worker, confere também que o estado é um só:
+#   - um IP martelando /verificar passa só a rajada (não rajada × workers);
+#   - cada sócio foi buscado no Supabase uma vez, não uma por worker;
+#   - o /metrics de qualquer worker conta as requisições de todos.
+# E, antes de tudo, que um worker segurando o arquivo não para os outros:
+# cache e limite desistem em ESTADO_ESPERA_MS e seguem (fail open); só a
+# invalidação espera a trava sair.
+#
+# A escala só aparece com CPU livre: workers + geradores + stand-in dividem
+# a máquina. Compare rodadas na mesma máquina.
+
+import argparse
+import asyncio
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import Pool
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.carga import (  # noqa: E402
+    Ambiente, _socio, _verificar, cadastros_semente, disparar, porta_livre, subir,
+)
+from compartilhado import AUSENTE, EstadoCompartilhado  # noqa: E402
+
+CENARIOS = {"socio": _socio, "verificar": _verificar}
+IP_ROBO = "203.0.113.9"
+
+
+def subir_gunicorn(ambiente: Ambiente, workers: int, pasta: str) -> tuple:
+    url = f"http://127.0.0.1:{porta_livre()}"
+    env = dict(os.environ)
+    env.update({
+        "PORT": url.rsplit(":", 1)[1],
+        "WEB_CONCURRENCY": str(workers),
+        "SUPABASE_URL": ambiente.postgrest,
+        "SUPABASE_KEY": "chave-de-teste",
+        "DIARIO_DIR": os.path.join(pasta, "diario"),
+        "REPLICA_DB": os.path.join(pasta, "replica.sqlite3"),
+        "ESTADO_DB": os.path.join(pasta, "compartilhado.sqlite3"),
+        "METRICAS_PUBLICAR_INTERVALO": "0.5",
+        # Sem réplica: sócio fora do cache vai ao stand-in, que é o que a conferência conta;
+        # sem o índice da portaria, que também lê cadastros em segundo plano
+        "REPLICA_ATIVA": "0",
+        "CHECKIN_ATIVO": "0",
+        # Os 200 cadastros da semente se repetem o tempo todo; o limite por IP fica no padrão
+        "LIMITE_IDENTIDADE_RAJADA": "1000000",
+    })
+    proc = subir(
+        [sys.executable, "-m", "gunicorn", "server:app", "-c", "gunicorn.conf.py", "--log-level", "warning"],
+        env, f"{url}/health",
+    )
+    # Todos os workers de pé antes de medir
+    time.sleep(1 + 0.2 * workers)
+    return proc, url
+
+
+def _gerar(argumentos: tuple) -> dict:
+    url, cenario, contexto, total, concorrencia = argumentos
+    return asyncio.run(disparar(url, CENARIOS[cenario], contexto, total, concorrencia))
+
+
+def medir(pool: Pool, geradores: int, url: str, cenario: str, ids: list, requisicoes: int,
+          concorrencia: int, rodada: int) -> dict:
+    por_gerador = max(1, requisicoes // geradores)
+    argumentos = [
+        (url, cenario, {"rodada": rodada * geradores + g, "ids": ids}, por_gerador, concorrencia)
+        for g in range(geradores)
+    ]
+    inicio = time.perf_counter()
+    resultados = pool.map(_gerar, argumentos)
+    duracao = time.perf_counter() - inicio
+    total = sum(r["requisicoes"] for r in resultados)
+    status = {}
+    for r in resultados:
+        for codigo, n in r["status"].items():
+            status[codigo] = status.get(codigo, 0) + n
+    return {
+        "requisicoes": total,
+        "vazao_rps": round(total / duracao, 1),
+        "p50_ms": max(r["latencia_ms"]["p50"] for r in resultados),
+        "p95_ms": max(r["latencia_ms"]["p95"] for r in resultados),
+        "status": status,
+    }
+
+
+def conferir_estado(ambiente: Ambiente, url: str, workers: int) -> list:
+    """Estado único entre workers. Devolve as falhas."""
+    falhas = []
+    with httpx.Client(base_url=url, timeout=10) as cliente:
+        # Limite por IP: rajada padrão de 30 para a máquina toda
+        inicio = time.perf_counter()
+        aceitas = sum(
+            cliente.post("/verificar", data={"email": f"robo{i}@exemplo.com"},
+                         headers={"X-Forwarded-For": IP_ROBO}).status_code != 429
+            for i in range(120)
+        )
+        teto = 30 + int(time.perf_counter() - inicio) + 1
+        print(f"    limite por IP: {aceitas}/120 aceitas (teto {teto}; sem estado comum seria até {30 * workers})")
+        if aceitas > teto:
+            falhas.append(f"{workers} workers: {aceitas} aceitas de um IP só")
+
+        # Cache: cada sócio buscado no Supabase uma vez, por qualquer worker
+        novos = httpx.post(f"{ambiente.postgrest}/__semear", json={"cadastros": [
+            {"email": f"conferencia{i}@exemplo.com", "status": "socio", "convites_disponiveis": 0}
+            for i in range(20)
+        ]}).json()["cadastros"]
+        ambiente.zerar_contagem()
+        for _ in range(workers * 5):
+            for id in novos:
+                cliente.get(f"/api/socio/{id}", headers={"Connection": "close"})
+        buscas = ambiente.contagem()["supabase"]
+        buscas = sum(n for chave, n in buscas.items() if chave.startswith("GET"))
+        print(f"    cache: {buscas} buscas no Supabase para {len(novos)} sócios lidos {workers * 5}x")
+        if buscas > len(novos):
+            falhas.append(f"{workers} workers: cache de sócios dividido ({buscas} buscas)")
+
+        # Métricas: /metrics de qualquer worker soma todos
+        enviados = 200
+        for _ in range(enviados):
+            cliente.get("/health", headers={"Connection": "close"})
+        time.sleep(1.5)
+        texto = cliente.get("/metrics").text
+        contados = sum(int(n) for n in re.findall(
+            r'prelude_http_respostas_total\{app="server",metodo="GET",rota="/health",status="200"\} (\d+)', texto))
+        vistos = len(set(re.findall(r'worker="(\d+)"', texto)))
+        print(f"    /metrics: {contados} respostas de /health contadas (enviadas ≥ {enviados}), {vistos} workers")
+        if contados < enviados or vistos < workers:
+            falhas.append(f"{workers} workers: /metrics viu {contados} de {enviados} em {vistos} workers")
+    return falhas
+
+
+def conferir_trava() -> list:
+    """Outro processo com o arquivo travado: cache e limite não esperam; invalidação espera."""
+    falhas = []
+    caminho = os.path.join(tempfile.mkdtemp(prefix="trava-"), "compartilhado.sqlite3")
+    estado = EstadoCompartilhado(caminho, espera_ms=50)
+    cache, baldes = estado.cache("socio"), estado.baldes("ip", por_minuto=60, rajada=1)
+    cache.guardar(1, "valor")
+    outro = sqlite3.connect(caminho, isolation_level=None, check_same_thread=False)
+    outro.execute("BEGIN IMMEDIATE")
+
+    inicio = time.perf_counter()
+    # WAL: a leitura nem espera; guardar e consumir escrevem, desistem em 50 ms
+    lido, passou = cache.obter(1), [baldes.consumir(["x"]) for _ in range(3)]
+    cache.guardar(2, "outro")
+    decorrido = (time.perf_counter() - inicio) * 1000
+    print(f"    arquivo travado: 5 chamadas em {decorrido:.0f} ms (espera máxima 50 ms cada)")
+    if decorrido > 5 * 50 * 2 or lido != "valor" or any(passou):
+        falhas.append(f"trava: cache/limite esperaram {decorrido:.0f} ms ou não seguiram em frente")
+
+    threading.Timer(0.3, outro.execute, ("COMMIT",)).start()
+    inicio = time.perf_counter()
+    cache.invalidar(1)
+    decorrido = (time.perf_counter() - inicio) * 1000
+    print(f"    invalidação esperou {decorrido:.0f} ms pela trava")
+    if decorrido < 250 or cache.obter(1) is not AUSENTE:
+        falhas.append("trava: invalidação desistiu antes da trava sair")
+    outro.close()
+    estado.fechar()
+    return falhas
+
+
+def principal() -> int:
+    parser = argparse.ArgumentParser(description="Vazão do server.py por número de workers")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--requisicoes", type=int, default=3000)
+    parser.add_argument("--concorrencia", type=int, default=16, help="conexões por gerador")
+    parser.add_argument("--geradores", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="latência do stand-in do Supabase")
+    args = parser.parse_args()
+
+    print("Trava do arquivo compartilhado")
+    falhas = conferir_trava()
+    ambiente = Ambiente(args.latencia_ms, 0.0, 0.0, apps=())
+    resultados = {}
+    print(f"CPUs: {os.cpu_count()} | geradores: {args.geradores} × {args.concorrencia} conexões")
+    try:
+        with Pool(args.geradores) as pool:
+            for rodada, workers in enumerate(int(w) for w in args.workers.split(",")):
+                ids = ambiente.reiniciar(cadastros_semente())[:-1]
+                pasta = tempfile.mkdtemp(prefix="workers-")
+                proc, url = subir_gunicorn(ambiente, workers, pasta)
+                try:
+                    print(f"\n{workers} worker(s)")
+                    for cenario in CENARIOS:
+                        # Aquecimento: cache, conexões e réplica fora da medição
+                        medir(pool, args.geradores, url, cenario, ids, 400, 4, 1000 + rodada)
+                        resultado = medir(pool, args.geradores, url, cenario, ids, args.requisicoes,
+                                          args.concorrencia, rodada)
+                        resultados.setdefault(cenario, {})[workers] = resultado
+                        print(f"  {cenario:<10} {resultado['vazao_rps']:>8.1f} req/s | p50 {resultado['p50_ms']:>7.1f} ms"
+                              f" | p95 {resultado['p95_ms']:>7.1f} ms | {resultado['status']}")
+                    if workers > 1:
+                        falhas += conferir_estado(ambiente, url, workers)
+                finally:
+                    proc.terminate()
+                    proc.wait()
+    finally:
+        ambiente.encerrar()
+
+    print("\nEscala (vazão relativa a 1 worker)")
+    for cenario, por_workers in resultados.items():
+        base = por_workers.get(1) or next(iter(por_workers.values()))
+        print(f"  {cenario:<10} " + " | ".join(
+            f"{w}w: {r['vazao_rps'] / base['vazao_rps']:.2f}x" for w, r in por_workers.items()))
+    print("\n" + ("❌ Falhas: " + "; ".join(falhas) if falhas else "✅ Estado compartilhado consistente."))
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(principal())
@@ -1,68 +1,107 @@
 from fastapi import FastAPI, Request
-from supabase import create_client
+from fastapi.responses import JSONResponse
+from fila import FilaIndicacoes
+from idempotencia import RegistroMensagens
+from identidade import normalizar_telefone
+from metricas import METRICAS, configurar_logs, instalar
+from repositorio import RepositorioCadastros
+from whatsapp import ClienteWhatsApp
+import asyncio
 import os
-import requests
 import re
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-WHATSAPP_TOKEN = os.getenv("WHATSAPP_TOKEN")
-PHONE_NUMBER_ID = os.getenv("PHONE_NUMBER_ID")
+log = configurar_logs("bot")
+
+_repositorio = None
+
+
+def obter_repositorio():
+    """Cria o repositório no primeiro uso; None se o Supabase não estiver configurado."""
+    global _repositorio
+    if _repositorio is None:
+        _repositorio = RepositorioCadastros.do_ambiente()
+    return _repositorio
+
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 app = FastAPI()
+instalar(app, "bot")
+
+
+@app.on_event("startup")
+async def startup_event():
+    # O webhook só enfileira; os trabalhadores da fila fazem banco e envios
+    app.state.mensagens = RegistroMensagens.do_ambiente()
+    app.state.mensagens.podar()
+    app.state.whatsapp = ClienteWhatsApp.do_ambiente()
+    app.state.fila = FilaIndicacoes.do_ambiente(obter_repositorio, app.state.whatsapp, app.state.mensagens)
+    app.state.fila.iniciar()
+    METRICAS.medidor("prelude_fila_eventos", "Eventos do webhook esperando um trabalhador",
+                     lambda: app.state.fila.pendentes)
+
+    repositorio = obter_repositorio()
+    if repositorio and os.getenv("AQUECER_NA_PARTIDA", "1") == "1":
+        app.state.aquecimento = asyncio.create_task(repositorio.aquecer())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await app.state.fila.parar()
+    if app.state.whatsapp:
+        await app.state.whatsapp.fechar()
+    if _repositorio:
+        await _repositorio.fechar()
+    app.state.mensagens.fechar()
+
+
+def extrair_mensagens(data: dict) -> list:
+    """Todas as mensagens de texto do payload (a Meta pode agrupar várias)."""
+    mensagens = []
+    for entry in data.get("entry") or []:
+        for change in entry.get("changes") or []:
+            for message in (change.get("value") or {}).get("messages") or []:
+                texto = (message.get("text") or {}).get("body")
+                if message.get("id") and message.get("from") and texto:
+                    mensagens.append(message)
+    return mensagens
+
+
+def extrair_numeros(texto: str) -> list:
+    """Números de telefone do texto, normalizados e sem repetição."""
+    numeros = (normalizar_telefone(n) for n in re.findall(r"\+?\d{10,14}", texto))
+    return list(dict.fromkeys(n for n in numeros if n))
+
 
 @app.post("/webhook")
 async def webhook(request: Request):
-    data = await request.json()
-    entry = data.get("entry", [])[0]
-    changes = entry.get("changes", [])[0]
-    message = changes.get("value", {}).get("messages", [])[0]
-
-    from_number = message["from"]
-    text = message["text"]["body"]
-
-    # procura números de telefone na mensagem
-    numeros = re.findall(r"\+?\d{10,14}", text)
-    if not numeros:
-        return {"message": "sem números encontrados"}
-
-    # checa se o remetente é founder
-    founder = supabase.table("cadastros").select("*").eq("whatsapp", from_number).eq("status", "Founder").execute()
-    if not founder.data:
-        return {"message": "não é founder"}
-
-    # salva cada indicação
-    for numero in numeros:
-        supabase.table("indicacoes").insert({
-            "founder_whatsapp": from_number,
-            "convidado_whatsapp": numero,
-            "status": "pendente"
-        }).execute()
-
-        # envia convite ao convidado
-        convite_texto = (
-            "🎄 Prelude — Golden Christmas 2025\n\n"
-            "Você foi indicado para o Natal da Prelude.\n"
-            "Um espaço reservado para reencontros entre amigos.\n\n"
-            "Confirme sua presença respondendo com seu nome completo.\n"
-            "— Prelude"
-        )
-        enviar_whatsapp(numero, convite_texto)
-
-    # atualiza contador
-    supabase.rpc("decrementar_convites", {"founder": from_number}).execute()
-
-    return {"message": "indicações processadas"}
-
-def enviar_whatsapp(numero, texto):
-    url = f"https://graph.facebook.com/v21.0/{PHONE_NUMBER_ID}/messages"
-    headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}", "Content-Type": "application/json"}
-    payload = {
-        "messaging_product": "whatsapp",
-        "to": numero,
-        "type": "text",
-        "text": {"body": texto}
-    }
-    r = requests.post(url, headers=headers, json=payload)
-    print("📤 Enviado:", numero, "->", r.status_code)
+    try:
+        data = await request.json()
+    except ValueError:
+        return JSONResponse({"message": "JSON inválido"}, status_code=400)
+    if not isinstance(data, dict):
+        return JSONResponse({"message": "JSON inválido"}, status_code=400)
+
+    mensagens = extrair_mensagens(data)
+    if not mensagens:
+        return {"message": "nada a processar"}
+
+    # Reentregas da Meta: só o que nunca foi aceito segue adiante. O SQLite
+    # pode esperar a trava de outro processo: fora do laço de eventos
+    novos = set(await asyncio.to_thread(app.state.mensagens.marcar, [m["id"] for m in mensagens]))
+    evento = {"mensagens": []}
+    for message in mensagens:
+        if message["id"] not in novos:
+            continue
+        novos.discard(message["id"])  # o mesmo ID repetido dentro do payload
+        numeros = extrair_numeros(message["text"]["body"])
+        if numeros:
+            evento["mensagens"].append({"id": message["id"], "founder_whatsapp": message["from"], "numeros": numeros})
+
+    if not evento["mensagens"]:
+        return {"message": "nada a processar"}
+
+    # founder, inserts, convites e contador ficam com os trabalhadores da fila
+    if not app.state.fila.enfileirar(evento):
+        await asyncio.to_thread(app.state.mensagens.esquecer, [m["id"] for m in evento["mensagens"]])
+        log.warning("⚠️ Fila do webhook cheia (%d eventos); pedindo reentrega", app.state.fila.pendentes)
+        return JSONResponse({"message": "fila cheia, tente novamente"}, status_code=503)
+    return {"message": "indicações recebidas"}
@@ -0,0 +1,90 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# cache.py — cache em memória com LRU e expiração (TTL)
+# ===============================
+
+import threading
+import time
+from collections import OrderedDict
+
+AUSENTE = object()
+
+
+class CacheTTL:
+    """Cache LRU limitado com TTL por item.
+
+    `None` é um valor válido: resultados negativos ("não existe") ficam em
+    cache com `ttl_negativo`, normalmente menor que o TTL dos positivos.
+    Seguro para uso a partir de várias threads.
+    """
+
+    def __init__(self, max_itens: int = 1024, ttl: float = 60.0, ttl_negativo: float = None,
+                 relogio=time.monotonic):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.ttl_negativo = ttl if ttl_negativo is None else ttl_negativo
+        self._relogio = relogio
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, padrao=AUSENTE):
+        """Retorna o valor em cache ou `padrao` (AUSENTE) se não houver/expirou."""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return padrao
+            valor, expira_em = item
+            if expira_em <= self._relogio():
+                del self._itens[chave]
+                self.falhas += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def guardar(self, chave, valor) -> None:
+        ttl = self.ttl_negativo if valor is None else self.ttl
+        with self._lock:
+            self._itens[chave] = (valor, self._relogio() + ttl)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, chave) -> None:
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+
+class ContadoresCache:
+    """Acertos, falhas e revalidações (304) por endpoint, para medir a economia."""
+
+    EVENTOS = ("acertos", "falhas", "revalidados")
+
+    def __init__(self):
+        self._por_endpoint = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, endpoint: str, evento: str) -> None:
+        with self._lock:
+            contadores = self._por_endpoint.setdefault(endpoint, dict.fromkeys(self.EVENTOS, 0))
+            contadores[evento] += 1
+
+    def resumo(self) -> dict:
+        with self._lock:
+            resumo = {}
+            for endpoint, contadores in self._por_endpoint.items():
+                consultas = contadores["acertos"] + contadores["falhas"]
+                resumo[endpoint] = dict(
+                    contadores, taxa_acerto=round(contadores["acertos"] / consultas, 4) if consultas else None
+                )
+            return resumo
@@ -0,0 +1,487 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# campanha.py — envio em massa pelo WhatsApp, retomável
+# ===============================
+#
+#   python campanha.py enviar lembrete-24 --texto "Oi {primeiro_nome}, é amanhã! 🎄"
+#   python campanha.py enviar lembrete-24 --modelo lembrete_evento --parametros primeiro_nome
+#   python campanha.py enviar lembrete-24 --status socio,Founder --simular
+#   python campanha.py situacao lembrete-24
+#
+# Percorre `cadastros` por id (keyset), filtrando por status, monta a
+# mensagem de cada pessoa e envia pelo ClienteWhatsApp (httpx assíncrono,
+# pool de conexões) com no máximo --simultaneos envios em voo e um balde de
+# fichas na vazão da Graph API (80 mensagens/s por número de telefone no
+# plano padrão; --mps se o número tiver limite maior).
+#
+# O progresso fica num SQLite (CAMPANHA_DB), uma linha por pessoa e campanha:
+#   enviando — reservada antes do POST;
+#   enviado  — a Graph API devolveu o wamid;
+#   falhou   — erro definitivo (número inválido...) ou temporário esgotado.
+# Rodar de novo a mesma campanha pula quem já recebeu e retoma do último id
+# com a página inteira resolvida. Uma linha parada em "enviando" é incerta: o
+# processo caiu (ou a conexão caiu) com o POST em voo e a mensagem pode ter
+# saído. Por padrão ela não é repetida; --reenviar-incertos manda de novo.
+# Falhas temporárias são tentadas de novo na próxima rodada. Um mesmo número
+# em dois cadastros recebe uma mensagem só.
+#
+# Ctrl-C para de buscar e espera os envios em voo terminarem: nada fica
+# incerto. O relatório final traz vazão, contagens e exemplos de falha.
+
+import asyncio
+import json
+import logging
+import os
+import random
+import signal
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+
+from compartilhado import ConexaoLocal
+from identidade import normalizar_telefone
+from limites import BaldesDeFichas
+from whatsapp import ErroEnvio
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+log = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS envios (
+    campanha TEXT NOT NULL,
+    cadastro_id INTEGER NOT NULL,
+    numero TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    temporario INTEGER NOT NULL DEFAULT 0,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    wamid TEXT,
+    erro TEXT,
+    atualizado_em REAL NOT NULL,
+    PRIMARY KEY (campanha, cadastro_id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS envios_numero ON envios (campanha, numero);
+CREATE TABLE IF NOT EXISTS cursores (campanha TEXT PRIMARY KEY, ultimo_id INTEGER NOT NULL);
+"""
+
+STATUS_PADRAO = ("convidado", "socio", "sócio", "Founder")
+COLUNAS = "id,nome,apelido,whatsapp,status"
+MPS_PADRAO = 80  # Graph API: mensagens/s por número de telefone, plano padrão
+MAX_EXEMPLOS = 20
+MAX_IDS_BUSCA = 100  # ids por busca id=in.(...) ao refazer, para a URL não crescer demais
+
+
+# ============================================================
+# 💾 PROGRESSO
+# ============================================================
+class Progresso:
+    """Checkpoint das campanhas: uma linha por pessoa + cursor por campanha."""
+
+    def __init__(self, caminho: str):
+        # NORMAL em WAL: sobrevive à queda do processo, que é o caso a cobrir
+        self._local = ConexaoLocal(caminho, ESQUEMA)
+
+    @classmethod
+    def do_ambiente(cls):
+        return cls(os.getenv("CAMPANHA_DB", os.path.join(BASE_DIR, "diario", "campanhas.sqlite3")))
+
+    def reservar(self, campanha: str, cadastro_id: int, numero: str, reenviar_incertos: bool = False):
+        """Marca "enviando" antes do POST. None = pode enviar; senão, o motivo para pular."""
+        with self._local.transacao() as conexao:
+            linha = conexao.execute(
+                "SELECT estado, temporario FROM envios WHERE campanha = ? AND cadastro_id = ?",
+                (campanha, cadastro_id),
+            ).fetchone()
+            if linha is None:
+                try:
+                    conexao.execute(
+                        "INSERT INTO envios (campanha, cadastro_id, numero, estado, tentativas, atualizado_em)"
+                        " VALUES (?, ?, ?, 'enviando', 1, ?)",
+                        (campanha, cadastro_id, numero, time.time()),
+                    )
+                except sqlite3.IntegrityError:
+                    return "repetidos"
+                return None
+            estado, temporario = linha
+            if estado == "enviado":
+                return "ja_enviados"
+            if estado == "enviando" and not reenviar_incertos:
+                return "incertos_anteriores"
+            if estado == "falhou" and not temporario:
+                return "falhas_anteriores"
+            conexao.execute(
+                "UPDATE envios SET estado = 'enviando', tentativas = tentativas + 1, erro = NULL,"
+                " atualizado_em = ? WHERE campanha = ? AND cadastro_id = ?",
+                (time.time(), campanha, cadastro_id),
+            )
+            return None
+
+    def situacao(self, campanha: str, cadastro_id: int):
+        """O motivo que `reservar` daria, sem reservar (simulação)."""
+        linha = self._local.conexao.execute(
+            "SELECT estado, temporario FROM envios WHERE campanha = ? AND cadastro_id = ?", (campanha, cadastro_id),
+        ).fetchone()
+        if linha is None:
+            return None
+        return {
+            ("enviado", 0): "ja_enviados", ("enviado", 1): "ja_enviados",
+            ("enviando", 0): "incertos_anteriores", ("enviando", 1): "incertos_anteriores",
+            ("falhou", 0): "falhas_anteriores",
+        }.get(tuple(linha))
+
+    def concluir(self, campanha: str, cadastro_id: int, wamid: str) -> None:
+        self._atualizar(campanha, cadastro_id, estado="enviado", wamid=wamid, temporario=0)
+
+    def falhar(self, campanha: str, cadastro_id: int, erro: str, temporario: bool) -> None:
+        self._atualizar(campanha, cadastro_id, estado="falhou", erro=erro[:500], temporario=int(temporario))
+
+    def _atualizar(self, campanha: str, cadastro_id: int, **campos) -> None:
+        atribuicoes = ", ".join(f"{campo} = ?" for campo in campos)
+        with self._local.transacao() as conexao:
+            conexao.execute(
+                f"UPDATE envios SET {atribuicoes}, atualizado_em = ? WHERE campanha = ? AND cadastro_id = ?",
+                (*campos.values(), time.time(), campanha, cadastro_id),
+            )
+
+    def a_refazer(self, campanha: str, reenviar_incertos: bool = False) -> list:
+        """Ids já passados pelo cursor que voltam: falhas temporárias (e incertos, se pedido)."""
+        estados = "(estado = 'falhou' AND temporario = 1)" + (" OR estado = 'enviando'" if reenviar_incertos else "")
+        return [id for (id,) in self._local.conexao.execute(
+            f"SELECT cadastro_id FROM envios WHERE campanha = ? AND cadastro_id <= ? AND ({estados})"
+            " ORDER BY cadastro_id",
+            (campanha, self.cursor(campanha)),
+        )]
+
+    def cursor(self, campanha: str) -> int:
+        linha = self._local.conexao.execute(
+            "SELECT ultimo_id FROM cursores WHERE campanha = ?", (campanha,)
+        ).fetchone()
+        return linha[0] if linha else 0
+
+    def avancar(self, campanha: str, ultimo_id: int) -> None:
+        with self._local.transacao() as conexao:
+            conexao.execute(
+                "INSERT INTO cursores (campanha, ultimo_id) VALUES (?, ?)"
+                " ON CONFLICT (campanha) DO UPDATE SET ultimo_id = max(ultimo_id, excluded.ultimo_id)",
+                (campanha, ultimo_id),
+            )
+
+    def recomecar(self, campanha: str) -> None:
+        """Volta o cursor ao começo; quem já recebeu continua marcado."""
+        with self._local.transacao() as conexao:
+            conexao.execute("DELETE FROM cursores WHERE campanha = ?", (campanha,))
+
+    def resumo(self, campanha: str) -> dict:
+        contagens = {"enviado": 0, "enviando": 0, "falhou_temporario": 0, "falhou_definitivo": 0}
+        for estado, temporario, n in self._local.conexao.execute(
+            "SELECT estado, temporario, count(*) FROM envios WHERE campanha = ? GROUP BY estado, temporario",
+            (campanha,),
+        ):
+            if estado == "falhou":
+                estado = "falhou_temporario" if temporario else "falhou_definitivo"
+            contagens[estado] = contagens.get(estado, 0) + n
+        return {**contagens, "cursor": self.cursor(campanha)}
+
+    def fechar(self) -> None:
+        self._local.fechar()
+
+
+# ============================================================
+# ✉️ CAMPANHA
+# ============================================================
+class _Campos(dict):
+    def __missing__(self, chave):
+        return ""
+
+
+def campos_de(cadastro: dict) -> dict:
+    """Variáveis disponíveis no texto e nos parâmetros do modelo."""
+    nome = (cadastro.get("nome") or "").strip()
+    apelido = (cadastro.get("apelido") or "").strip()
+    return _Campos(
+        id=cadastro.get("id"),
+        nome=nome,
+        apelido=apelido,
+        primeiro_nome=(apelido or nome).split(" ")[0] if (apelido or nome) else "",
+        status=cadastro.get("status") or "",
+    )
+
+
+class Campanha:
+    """O que mandar (texto livre ou modelo aprovado) e para quais status."""
+
+    def __init__(self, nome: str, status=STATUS_PADRAO, texto: str = None, modelo: str = None,
+                 idioma: str = "pt_BR", parametros=()):
+        if not texto and not modelo:
+            raise ValueError("Informe o texto ou o modelo da campanha.")
+        self.nome = nome
+        self.status = tuple(status)
+        self.texto = texto
+        self.modelo = modelo
+        self.idioma = idioma
+        self.parametros = tuple(parametros)
+        # Placeholder quebrado aparece agora, não na primeira pessoa
+        self.montar({"id": 0, "nome": "Teste"})
+
+    def montar(self, cadastro: dict):
+        """Texto pronto, ou a lista de parâmetros do modelo."""
+        campos = campos_de(cadastro)
+        if self.modelo:
+            return [campos[p] for p in self.parametros]
+        return self.texto.format_map(campos)
+
+    async def enviar(self, whatsapp, numero: str, cadastro: dict) -> dict:
+        if self.modelo:
+            return await whatsapp.enviar_modelo(numero, self.modelo, self.idioma, self.montar(cadastro))
+        return await whatsapp.enviar_texto(numero, self.montar(cadastro))
+
+    def filtros(self) -> dict:
+        return {"status": f"in.({','.join(json.dumps(s, ensure_ascii=False) for s in self.status)})"}
+
+
+# ============================================================
+# 🚀 DISPARO
+# ============================================================
+class Disparo:
+    """Uma rodada de envio de uma campanha."""
+
+    def __init__(self, campanha: Campanha, repositorio, whatsapp, progresso: Progresso,
+                 mps: float = MPS_PADRAO, simultaneos: int = 20, tamanho_pagina: int = 500,
+                 max_tentativas: int = 4, atraso_base: float = 1.0, atraso_max: float = 30.0,
+                 reenviar_incertos: bool = False, simular: bool = False):
+        self.campanha = campanha
+        self.repositorio = repositorio
+        self.whatsapp = whatsapp
+        self.progresso = progresso
+        self.simultaneos = simultaneos
+        self.tamanho_pagina = tamanho_pagina
+        self.max_tentativas = max_tentativas
+        self.atraso_base = atraso_base
+        self.atraso_max = atraso_max
+        self.reenviar_incertos = reenviar_incertos
+        self.simular = simular
+        # Rajada de um segundo de vazão: começa cheio, nunca passa de `mps` na média
+        self._balde = BaldesDeFichas(por_minuto=mps * 60, rajada=max(1, int(mps)))
+        self._parando = False
+        self._paginas = OrderedDict()  # último id da página -> itens ainda não resolvidos
+        self._vistos = set()  # simulação: números já contados (o índice único faz isso de verdade)
+        self.relatorio = {
+            "campanha": campanha.nome, "simulacao": simular,
+            "lidos": 0, "enviados": 0, "ja_enviados": 0, "repetidos": 0, "sem_whatsapp": 0,
+            "incertos": 0, "incertos_anteriores": 0, "falhas_temporarias": 0, "falhas_definitivas": 0,
+            "falhas_anteriores": 0, "novas_tentativas": 0, "interrompido": False, "exemplos": [],
+        }
+
+    def parar(self) -> None:
+        """Para de buscar; os envios já em voo terminam e são gravados."""
+        self._parando = True
+        self.relatorio["interrompido"] = True
+
+    async def executar(self) -> dict:
+        inicio = time.monotonic()
+        fila = asyncio.Queue(maxsize=self.simultaneos * 2)
+        trabalhadores = [asyncio.create_task(self._trabalhador(fila)) for _ in range(self.simultaneos)]
+        try:
+            await self._produzir(fila, inicio)
+            await fila.join()
+        finally:
+            for tarefa in trabalhadores:
+                tarefa.cancel()
+            await asyncio.gather(*trabalhadores, return_exceptions=True)
+        duracao = time.monotonic() - inicio
+        self.relatorio["duracao_s"] = round(duracao, 2)
+        self.relatorio["vazao_msgs_s"] = round(self.relatorio["enviados"] / duracao, 1) if duracao else 0.0
+        if not self.simular:
+            self.relatorio["progresso"] = self.progresso.resumo(self.campanha.nome)
+        log.info("📣 Campanha %s: %s", self.campanha.nome,
+                 {k: v for k, v in self.relatorio.items() if k != "exemplos"})
+        return self.relatorio
+
+    async def _ler(self):
+        """(chave, página): primeiro o que ficou para trás, depois do cursor em diante.
+
+        Chave None = página fora da ordem do cursor (não o avança).
+        """
+        nome = self.campanha.nome
+        if not self.simular:
+            refazer = self.progresso.a_refazer(nome, self.reenviar_incertos)
+            for inicio in range(0, len(refazer), MAX_IDS_BUSCA):
+                ids = ",".join(map(str, refazer[inicio:inicio + MAX_IDS_BUSCA]))
+                pagina = await self.repositorio.selecionar(
+                    {**self.campanha.filtros(), "id": f"in.({ids})", "order": "id.asc"}, COLUNAS,
+                )
+                if pagina:
+                    yield None, pagina
+        depois_de = 0 if self.simular else self.progresso.cursor(nome)
+        async for pagina in self.repositorio.paginar(
+            COLUNAS, self.tamanho_pagina, self.campanha.filtros(), depois_de=depois_de,
+        ):
+            yield pagina[-1]["id"], pagina
+
+    async def _produzir(self, fila: asyncio.Queue, inicio: float) -> None:
+        async for chave, pagina in self._ler():
+            if self._parando:
+                return
+            if chave is not None:
+                self._paginas[chave] = len(pagina)
+            self.relatorio["lidos"] += len(pagina)
+            for cadastro in pagina:
+                await fila.put((chave, cadastro))
+            decorrido = time.monotonic() - inicio
+            log.info("📣 %s: %d lidos, %d enviados, %.1f msg/s", self.campanha.nome,
+                     self.relatorio["lidos"], self.relatorio["enviados"],
+                     self.relatorio["enviados"] / decorrido if decorrido else 0.0)
+
+    async def _trabalhador(self, fila: asyncio.Queue) -> None:
+        while True:
+            chave, cadastro = await fila.get()
+            try:
+                # Parando: o que ainda está na fila nem foi reservado; fica para a próxima
+                if not self._parando:
+                    await self._processar(cadastro)
+                    self._resolvido(chave)
+            except Exception as e:
+                log.error("🚨 Campanha %s, cadastro %s: %s", self.campanha.nome, cadastro.get("id"), e)
+                self.parar()
+            finally:
+                fila.task_done()
+
+    def _resolvido(self, chave: int) -> None:
+        """Avança o cursor até a última página com todos os itens resolvidos."""
+        if chave is None:
+            return
+        self._paginas[chave] -= 1
+        while self._paginas and next(iter(self._paginas.values())) == 0:
+            ultimo_id, _ = self._paginas.popitem(last=False)
+            if not self.simular:
+                self.progresso.avancar(self.campanha.nome, ultimo_id)
+
+    async def _processar(self, cadastro: dict) -> None:
+        numero = normalizar_telefone(cadastro.get("whatsapp"))
+        if not numero:
+            self.relatorio["sem_whatsapp"] += 1
+            return
+        nome = self.campanha.nome
+        if self.simular:
+            motivo = self.progresso.situacao(nome, cadastro["id"]) or ("repetidos" if numero in self._vistos else None)
+            self._vistos.add(numero)
+        else:
+            motivo = self.progresso.reservar(nome, cadastro["id"], numero, self.reenviar_incertos)
+        if motivo:
+            self.relatorio[motivo] += 1
+            return
+        if self.simular:
+            self.relatorio["enviados"] += 1
+            if len(self.relatorio["exemplos"]) < 5:
+                self.relatorio["exemplos"].append({"numero": numero, "mensagem": self.campanha.montar(cadastro)})
+            return
+
+        try:
+            resposta = await self._com_retentativas(numero, cadastro)
+        except ErroEnvio as e:
+            if e.incerto:
+                # Fica "enviando": a próxima rodada não repete sem --reenviar-incertos
+                self.relatorio["incertos"] += 1
+            else:
+                self.progresso.falhar(nome, cadastro["id"], str(e), e.temporario)
+                self.relatorio["falhas_temporarias" if e.temporario else "falhas_definitivas"] += 1
+            if len(self.relatorio["exemplos"]) < MAX_EXEMPLOS:
+                self.relatorio["exemplos"].append({"cadastro_id": cadastro["id"], "numero": numero, "erro": str(e)})
+            return
+        wamid = ((resposta.get("messages") or [{}])[0]).get("id")
+        self.progresso.concluir(nome, cadastro["id"], wamid)
+        self.relatorio["enviados"] += 1
+
+    async def _com_retentativas(self, numero: str, cadastro: dict) -> dict:
+        """Backoff exponencial + jitter em 429/5xx; incerto ou definitivo sobe na hora."""
+        for tentativa in range(self.max_tentativas):
+            while espera := self._balde.consumir(("graph",)):
+                await asyncio.sleep(espera)
+            try:
+                return await self.campanha.enviar(self.whatsapp, numero, cadastro)
+            except ErroEnvio as e:
+                if e.incerto or not e.temporario or tentativa == self.max_tentativas - 1:
+                    raise
+                self.relatorio["novas_tentativas"] += 1
+                atraso = min(self.atraso_max, self.atraso_base * 2 ** tentativa) * random.uniform(0.5, 1.0)
+                log.warning("⏳ Envio para %s: tentativa %d falhou (%s); nova em %.1fs",
+                            numero, tentativa + 1, e, atraso)
+                await asyncio.sleep(atraso)
+
+
+# ============================================================
+# 🖥️ CLI
+# ============================================================
+async def _cli(argumentos) -> int:
+    from repositorio import RepositorioCadastros
+    from whatsapp import ClienteWhatsApp
+
+    progresso = Progresso.do_ambiente()
+    if argumentos.comando == "situacao":
+        print(json.dumps(progresso.resumo(argumentos.campanha), indent=2, ensure_ascii=False))
+        progresso.fechar()
+        return 0
+
+    try:
+        campanha = Campanha(
+            argumentos.campanha, argumentos.status.split(","), texto=argumentos.texto,
+            modelo=argumentos.modelo, idioma=argumentos.idioma,
+            parametros=[p for p in (argumentos.parametros or "").split(",") if p],
+        )
+    except (ValueError, KeyError, IndexError) as e:
+        print(f"⚠️ Mensagem inválida: {e}", file=sys.stderr)
+        return 1
+    repositorio = RepositorioCadastros.do_ambiente()
+    whatsapp = ClienteWhatsApp.do_ambiente()
+    if repositorio is None or (whatsapp is None and not argumentos.simular):
+        print("⚠️ Defina SUPABASE_URL, SUPABASE_KEY, WHATSAPP_TOKEN e PHONE_NUMBER_ID.", file=sys.stderr)
+        return 1
+    if argumentos.recomecar:
+        progresso.recomecar(campanha.nome)
+
+    disparo = Disparo(
+        campanha, repositorio, whatsapp, progresso, mps=argumentos.mps, simultaneos=argumentos.simultaneos,
+        reenviar_incertos=argumentos.reenviar_incertos, simular=argumentos.simular,
+    )
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sinal, disparo.parar)
+    try:
+        relatorio = await disparo.executar()
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+        return 0
+    finally:
+        await repositorio.fechar()
+        if whatsapp:
+            await whatsapp.fechar()
+        progresso.fechar()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", stream=sys.stderr)
+    parser = argparse.ArgumentParser(description="Envio em massa pelo WhatsApp, retomável")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    p_enviar = comandos.add_parser("enviar", help="envia (ou retoma) uma campanha")
+    p_enviar.add_argument("campanha", help="nome da campanha; o mesmo nome retoma de onde parou")
+    p_enviar.add_argument("--status", default=",".join(STATUS_PADRAO), help="status que recebem, separados por vírgula")
+    p_enviar.add_argument("--texto", help="texto livre com {nome}, {apelido}, {primeiro_nome}, {status}")
+    p_enviar.add_argument("--modelo", help="nome do modelo aprovado na Meta")
+    p_enviar.add_argument("--idioma", default="pt_BR")
+    p_enviar.add_argument("--parametros", help="campos que preenchem o modelo, em ordem (ex.: primeiro_nome)")
+    p_enviar.add_argument("--mps", type=float, default=float(os.getenv("CAMPANHA_MPS", MPS_PADRAO)),
+                          help="mensagens por segundo")
+    p_enviar.add_argument("--simultaneos", type=int, default=int(os.getenv("CAMPANHA_SIMULTANEOS", "20")))
+    p_enviar.add_argument("--simular", action="store_true", help="só conta e mostra exemplos, não envia")
+    p_enviar.add_argument("--reenviar-incertos", action="store_true",
+                          help="manda de novo quem ficou em 'enviando' numa queda (pode duplicar)")
+    p_enviar.add_argument("--recomecar", action="store_true",
+                          help="relê desde o primeiro id (quem já recebeu continua pulado)")
+    p_situacao = comandos.add_parser("situacao", help="contagens do checkpoint de uma campanha")
+    p_situacao.add_argument("campanha")
+    sys.exit(asyncio.run(_cli(parser.parse_args())))
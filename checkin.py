@@ -0,0 +1,306 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# checkin.py — check-in na porta do evento
+# ===============================
+#
+# Na noite do evento a portaria confere centenas de pessoas por minuto; o
+# /verificar, com uma ida ao Supabase por consulta, não dá conta. Aqui:
+#   - IndiceConvidados: quem pode entrar (CHECKIN_STATUS) fica em memória,
+#     por id, e-mail e WhatsApp normalizados. Carrega na partida e depois só
+#     lê o que mudou, em páginas keyset por updated_at (sql/004), como a
+#     réplica. Também acompanha a tabela checkins (sql/005) para saber quem
+#     já entrou por outro aparelho.
+#   - QR: "id.assinatura", HMAC-SHA256 com CHECKIN_SEGREDO; conferir um QR
+#     não consulta nada.
+#   - Portaria: cada entrada vai primeiro para um DiarioLocal próprio
+#     (CHECKIN_DIARIO_DIR) e depois, em lotes, para checkins num insert que
+#     ignora duplicados. Sem internet a porta continua conferindo; o diário
+#     esvazia quando a conexão volta (e é relido se o processo reiniciar).
+#
+#   python checkin.py qr <id>        # token do QR de um cadastro
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from diario import DiarioLocal
+from identidade import normalizar_email, normalizar_telefone
+from metricas import METRICAS
+from replica import paginas_depois, recuar
+from repositorio import ErroRepositorio
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+log = logging.getLogger(__name__)
+
+STATUS_LIBERADOS = "socio,sócio,convidado,founder"
+COLUNAS_INDICE = "id,nome,apelido,status,email,whatsapp,updated_at"
+COLUNAS_CHECKINS = "id,cadastro_id,entrou_em,registrado_em"
+
+
+# ============================================================
+# 🔏 QR ASSINADO
+# ============================================================
+def _assinatura(id: int, segredo: str) -> str:
+    digest = hmac.new(segredo.encode(), f"checkin:{id}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:12]).decode()
+
+
+def assinar_qr(id: int, segredo: str) -> str:
+    """Conteúdo do QR de um cadastro: curto o bastante para um QR pequeno."""
+    return f"{int(id)}.{_assinatura(int(id), segredo)}"
+
+
+def ler_qr(token: str, segredo: str):
+    """id do cadastro se o QR foi assinado com `segredo`; senão None."""
+    id, _, assinatura = (token or "").strip().partition(".")
+    if not segredo or not id.isdigit() or not assinatura:
+        return None
+    if not hmac.compare_digest(assinatura.encode(), _assinatura(int(id), segredo).encode()):
+        return None
+    return int(id)
+
+
+# ============================================================
+# 🗂️ ÍNDICE EM MEMÓRIA
+# ============================================================
+class IndiceConvidados:
+    """Quem pode entrar, por id, e-mail e WhatsApp, + quem já entrou.
+
+    Só o loop do asyncio mexe nos dicionários: nada de lock no caminho da porta.
+    """
+
+    def __init__(self, status_liberados=STATUS_LIBERADOS.split(","), janela: float = 5.0):
+        self.status_liberados = {s.strip().lower() for s in status_liberados if s.strip()}
+        self.janela = janela
+        self._por_id = {}
+        self._por_email = {}
+        self._por_whatsapp = {}
+        self.entradas = {}  # cadastro_id -> entrou_em (ISO)
+        self._cursores = {}  # tabela -> (ts, id)
+        self.atualizado_em = None
+
+    def __len__(self) -> int:
+        return len(self._por_id)
+
+    def aplicar(self, linhas: list) -> None:
+        """Cadastros novos ou alterados; quem deixou de estar liberado sai."""
+        for linha in linhas:
+            self.remover((linha["id"],))
+            if str(linha.get("status") or "").lower() not in self.status_liberados:
+                continue
+            convidado = {chave: linha.get(chave) for chave in ("id", "nome", "apelido", "status")}
+            email = normalizar_email(linha.get("email"))
+            whatsapp = normalizar_telefone(linha.get("whatsapp"))
+            self._por_id[linha["id"]] = (convidado, email, whatsapp)
+            if email:
+                self._por_email[email] = convidado
+            if whatsapp:
+                self._por_whatsapp[whatsapp] = convidado
+
+    def remover(self, ids) -> None:
+        for id in ids:
+            anterior = self._por_id.pop(id, None)
+            if anterior is None:
+                continue
+            _, email, whatsapp = anterior
+            if email and self._por_email.get(email, {}).get("id") == id:
+                del self._por_email[email]
+            if whatsapp and self._por_whatsapp.get(whatsapp, {}).get("id") == id:
+                del self._por_whatsapp[whatsapp]
+
+    def _aplicar_entradas(self, linhas: list) -> None:
+        for linha in linhas:
+            self.entradas.setdefault(linha["cadastro_id"], linha["entrou_em"])
+
+    def buscar(self, id: int = None, email: str = None, whatsapp: str = None):
+        """Convidado liberado (id, nome, apelido, status) ou None."""
+        if id is not None:
+            item = self._por_id.get(id)
+            return item[0] if item else None
+        if email:
+            return self._por_email.get(normalizar_email(email))
+        if whatsapp:
+            return self._por_whatsapp.get(normalizar_telefone(whatsapp))
+        return None
+
+    async def atualizar(self, repositorio, tamanho_pagina: int = 1000) -> int:
+        """Traz o que mudou desde a última vez (tudo, na primeira). Retorna quantas linhas vieram."""
+        inicio = time.time()
+        tabela = getattr(repositorio, "tabela", "cadastros")
+        total = 0
+        for nome, coluna_ts, colunas, aplicar in (
+            (tabela, "updated_at", COLUNAS_INDICE, self.aplicar),
+            (f"{tabela}_excluidos", "excluido_em", "id,excluido_em",
+             lambda pagina: self.remover(linha["id"] for linha in pagina)),
+            ("checkins", "registrado_em", COLUNAS_CHECKINS, self._aplicar_entradas),
+        ):
+            ts, ultimo_id = self._cursores.get(nome, (None, 0))
+            if ts:
+                ts, ultimo_id = recuar(ts, self.janela), 0
+            async for pagina in paginas_depois(repositorio, nome, coluna_ts, colunas, ts, ultimo_id, tamanho_pagina):
+                aplicar(pagina)
+                total += len(pagina)
+                cursor = (pagina[-1][coluna_ts], pagina[-1]["id"])
+                if nome not in self._cursores or cursor > self._cursores[nome]:
+                    self._cursores[nome] = cursor
+        self.atualizado_em = inicio
+        return total
+
+
+# ============================================================
+# 🚪 PORTARIA
+# ============================================================
+class Portaria:
+    """Confere na memória, grava no diário local e manda os check-ins em lotes."""
+
+    def __init__(self, indice: IndiceConvidados, diario: DiarioLocal, segredo: str = None, lote: int = 200,
+                 tabela: str = "checkins"):
+        self.indice = indice
+        self.diario = diario
+        self.segredo = segredo
+        self.lote = lote
+        self.tabela = tabela
+        self._pendentes = deque()  # (id no diário, linha)
+        self._lote_cheio = asyncio.Event()
+
+    @classmethod
+    def do_ambiente(cls):
+        """Portaria do .env; None com CHECKIN_ATIVO=0. Criar na partida (o diário tem thread)."""
+        if os.getenv("CHECKIN_ATIVO", "1") != "1":
+            return None
+        segredo = os.getenv("CHECKIN_SEGREDO")
+        if not segredo:
+            log.warning("⚠️ CHECKIN_SEGREDO não definido: check-in só por e-mail/WhatsApp, sem QR")
+        return cls(
+            IndiceConvidados(os.getenv("CHECKIN_STATUS", STATUS_LIBERADOS).split(","),
+                             janela=float(os.getenv("REPLICA_JANELA", "5"))),
+            DiarioLocal(os.getenv("CHECKIN_DIARIO_DIR", os.path.join(BASE_DIR, "diario", "checkin"))),
+            segredo=segredo,
+            lote=int(os.getenv("CHECKIN_LOTE", "200")),
+        )
+
+    @property
+    def pronta(self) -> bool:
+        return self.indice.atualizado_em is not None
+
+    def pendentes(self) -> int:
+        return len(self._pendentes)
+
+    def retomar(self) -> int:
+        """Volta para a fila de envio o que ficou só no diário (queda, reinício)."""
+        entradas = self.diario.pendentes()
+        for entrada in entradas:
+            linha = entrada["dados"]
+            self.indice.entradas.setdefault(linha["cadastro_id"], linha["entrou_em"])
+            self._pendentes.append((entrada["id"], linha))
+        if entradas:
+            log.info("🚪 %d check-in(s) do diário local aguardando envio", len(entradas))
+        return len(entradas)
+
+    def conferir(self, qr: str = None, email: str = None, whatsapp: str = None, portaria: str = None) -> dict:
+        """Confere e, se liberado e ainda não entrou, registra a entrada. Só memória e diário."""
+        if qr:
+            id = ler_qr(qr, self.segredo)
+            convidado = self.indice.buscar(id=id) if id is not None else None
+        else:
+            convidado = self.indice.buscar(email=email, whatsapp=whatsapp)
+        if convidado is None:
+            resultado = {"resultado": "nao_encontrado"}
+        elif convidado["id"] in self.indice.entradas:
+            resultado = {"resultado": "ja_entrou", "convidado": convidado,
+                         "entrou_em": self.indice.entradas[convidado["id"]]}
+        else:
+            entrou_em = datetime.now(timezone.utc).isoformat()
+            self.indice.entradas[convidado["id"]] = entrou_em
+            linha = {"cadastro_id": convidado["id"], "entrou_em": entrou_em, "portaria": portaria}
+            self._pendentes.append((self.diario.registrar(linha), linha))
+            if len(self._pendentes) >= self.lote:
+                self._lote_cheio.set()
+            resultado = {"resultado": "ok", "convidado": convidado, "entrou_em": entrou_em}
+        METRICAS.incrementar("prelude_checkin_total", (("resultado", resultado["resultado"]),),
+                             ajuda="Conferências na portaria por resultado")
+        return resultado
+
+    async def enviar(self, repositorio) -> int:
+        """Manda os check-ins pendentes em lotes. Falhou: voltam para a frente da fila."""
+        enviados = 0
+        while self._pendentes:
+            lote = [self._pendentes.popleft() for _ in range(min(self.lote, len(self._pendentes)))]
+            try:
+                await repositorio.inserir_lote(self.tabela, [linha for _, linha in lote],
+                                               ignorar_conflito_em="cadastro_id")
+            except BaseException:
+                self._pendentes.extendleft(reversed(lote))
+                raise
+            for id_diario, _ in lote:
+                self.diario.marcar_sincronizado(id_diario)
+            enviados += len(lote)
+        return enviados
+
+    async def esperar_lote(self, intervalo: float) -> None:
+        """Dorme até `intervalo` segundos ou até juntar um lote cheio."""
+        try:
+            await asyncio.wait_for(self._lote_cheio.wait(), intervalo)
+        except asyncio.TimeoutError:
+            pass
+        self._lote_cheio.clear()
+
+    def fechar(self) -> None:
+        self.diario.fechar()
+
+
+# ============================================================
+# 🔄 LAÇO DE FUNDO
+# ============================================================
+def medir(portaria: Portaria) -> None:
+    METRICAS.medidor("prelude_checkin_indice", "Convidados liberados no índice da portaria", lambda: len(portaria.indice))
+    METRICAS.medidor("prelude_checkin_entradas", "Pessoas que já entraram", lambda: len(portaria.indice.entradas))
+    METRICAS.medidor("prelude_checkin_pendentes", "Check-ins ainda não enviados ao Supabase", portaria.pendentes)
+
+
+async def manter(portaria: Portaria, repositorio, intervalo: float = None, intervalo_podar: float = 300.0) -> None:
+    """Envia os lotes e atualiza o índice, para sempre. Rodar com asyncio.create_task."""
+    intervalo = intervalo if intervalo is not None else float(os.getenv("CHECKIN_INTERVALO", "1"))
+    fora_do_ar = False
+    podado_em = time.monotonic()
+    while True:
+        try:
+            enviados = await portaria.enviar(repositorio)
+            await portaria.indice.atualizar(repositorio)
+            if fora_do_ar:
+                log.info("✅ Supabase de volta; %d check-in(s) enviados", enviados)
+            fora_do_ar = False
+            if time.monotonic() - podado_em > intervalo_podar:
+                await asyncio.to_thread(portaria.diario.podar)
+                podado_em = time.monotonic()
+        except ErroRepositorio as e:
+            if not fora_do_ar:
+                log.warning("⚠️ Portaria sem Supabase (conferindo pela memória): %s", e)
+            fora_do_ar = True
+        except Exception as e:
+            log.exception("🚨 Erro na manutenção da portaria: %s", e)
+        await portaria.esperar_lote(intervalo)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from dotenv import load_dotenv
+
+    load_dotenv(os.path.join(BASE_DIR, ".env"))
+    if len(sys.argv) == 3 and sys.argv[1] == "qr" and sys.argv[2].isdigit():
+        segredo = os.getenv("CHECKIN_SEGREDO")
+        if not segredo:
+            print("Defina CHECKIN_SEGREDO no .env.")
+            sys.exit(2)
+        print(assinar_qr(int(sys.argv[2]), segredo))
+    else:
+        print("Uso: python checkin.py qr <id>")
+        sys.exit(2)
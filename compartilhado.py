@@ -0,0 +1,445 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# compartilhado.py — estado comum aos workers de uma máquina (SQLite WAL)
+# ===============================
+#
+# Com vários workers (gunicorn.conf.py), cada um é um processo com memória
+# própria: o cache de sócios esquentaria N vezes e uma invalidação feita num
+# worker não chegaria aos outros; os baldes de limites.py deixariam passar N
+# vezes a rajada; /metrics mostraria só o worker que atendeu a coleta.
+#
+# Aqui esse estado vai para um SQLite em WAL no disco local (ESTADO_DB), que
+# todos os workers leem e escrevem:
+#   - CacheCompartilhado: mesma interface do CacheTTL (cache.py);
+#   - BaldesCompartilhados: mesma interface do BaldesDeFichas (limites.py);
+#   - métricas: cada worker publica seu instantâneo a cada poucos segundos e
+#     o /metrics de qualquer um soma os de todos.
+#
+# Liga com ESTADO_COMPARTILHADO=1, o padrão quando WEB_CONCURRENCY > 1. Com
+# um processo só, a memória local continua mais rápida e nada muda.
+#
+# Conexão SQLite não atravessa fork: ConexaoLocal abre uma por processo no
+# primeiro uso, o que deixa o app ser pré-carregado no master do gunicorn.
+#
+# As chamadas rodam dentro do laço de eventos (cache e limite a cada
+# requisição), então a espera pela trava do arquivo é curta (ESTADO_ESPERA_MS,
+# 50 ms): esgotada, o cache responde "não tenho" e o limite deixa passar, em
+# vez de parar o worker inteiro. Só a invalidação espera o tempo todo — perdê-la
+# deixaria os outros workers servindo o registro velho.
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from cache import AUSENTE
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+log = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    grupo TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    valor BLOB,
+    expira_em REAL NOT NULL,
+    PRIMARY KEY (grupo, chave)
+);
+CREATE INDEX IF NOT EXISTS cache_expira_em ON cache (grupo, expira_em);
+CREATE TABLE IF NOT EXISTS baldes (
+    grupo TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    fichas REAL NOT NULL,
+    instante REAL NOT NULL,
+    PRIMARY KEY (grupo, chave)
+);
+CREATE TABLE IF NOT EXISTS metricas (
+    app TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    dados TEXT NOT NULL,
+    publicado_em REAL NOT NULL,
+    PRIMARY KEY (app, pid)
+);
+"""
+
+PODAR_A_CADA = 1000  # escritas entre duas podas de itens vencidos/baldes cheios
+ESPERA_PADRAO_MS = 5000  # busy_timeout de quem pode esperar (réplica, campanha, invalidação)
+
+
+def travado(erro: sqlite3.OperationalError) -> bool:
+    """Outro processo segurou o arquivo além da espera (busy_timeout)."""
+    return "locked" in str(erro) or "busy" in str(erro)
+
+
+# ============================================================
+# 🔌 CONEXÃO POR PROCESSO
+# ============================================================
+class ConexaoLocal:
+    """Conexão SQLite (WAL) aberta no primeiro uso em cada processo.
+
+    Depois de um fork o filho esquece a conexão e o lock herdados e abre os
+    seus. A conexão herdada não é fechada no filho (é do pai); só deixa de
+    ser usada.
+    """
+
+    _herdadas = []
+
+    def __init__(self, caminho: str, esquema: str = "", sincronismo: str = "NORMAL",
+                 espera_ms: int = ESPERA_PADRAO_MS):
+        self.caminho = caminho
+        self.esquema = esquema
+        self.sincronismo = sincronismo
+        self.espera_ms = espera_ms
+        self._conexao = None
+        self._trava_fd = None
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        os.register_at_fork(after_in_child=self._esquecer)
+
+    def _esquecer(self) -> None:
+        if self._conexao is not None:
+            ConexaoLocal._herdadas.append(self._conexao)
+        self._conexao = None
+        # O fd herdado dividiria o flock com o pai: cada processo abre o seu
+        self._trava_fd = None
+        self.lock = threading.Lock()
+
+    @property
+    def conexao(self) -> sqlite3.Connection:
+        if self._conexao is None:
+            conexao = sqlite3.connect(self.caminho, check_same_thread=False, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute(f"PRAGMA synchronous={self.sincronismo}")
+            conexao.execute(f"PRAGMA busy_timeout={int(self.espera_ms)}")
+            if self.esquema:
+                conexao.executescript(self.esquema)
+            self._conexao = conexao
+        return self._conexao
+
+    @contextmanager
+    def transacao(self):
+        """BEGIN IMMEDIATE ... COMMIT sob o lock: leitura e escrita atômicas entre processos."""
+        with self.lock:
+            conexao = self.conexao
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                yield conexao
+                conexao.execute("COMMIT")
+            except BaseException:
+                conexao.execute("ROLLBACK")
+                raise
+
+    @contextmanager
+    def paciente(self):
+        """A conexão sob o lock, esperando a trava do arquivo o tempo padrão (não `espera_ms`)."""
+        with self.lock:
+            conexao = self.conexao
+            if self.espera_ms >= ESPERA_PADRAO_MS:
+                yield conexao
+                return
+            conexao.execute(f"PRAGMA busy_timeout={ESPERA_PADRAO_MS}")
+            try:
+                yield conexao
+            finally:
+                conexao.execute(f"PRAGMA busy_timeout={int(self.espera_ms)}")
+
+    @contextmanager
+    def exclusivo(self):
+        """flock não bloqueante em `caminho.lock`: True se este processo ficou com a vez."""
+        if self._trava_fd is None:
+            self._trava_fd = os.open(self.caminho + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._trava_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(self._trava_fd, fcntl.LOCK_UN)
+
+    def fechar(self) -> None:
+        with self.lock:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
+            if self._trava_fd is not None:
+                os.close(self._trava_fd)
+                self._trava_fd = None
+
+
+# ============================================================
+# 🗃️ ESTADO COMPARTILHADO
+# ============================================================
+class EstadoCompartilhado:
+    """Cache, baldes de limite e métricas de todos os workers num SQLite só."""
+
+    def __init__(self, caminho: str, espera_ms: int = 50):
+        self.caminho = caminho
+        self.local = ConexaoLocal(caminho, ESQUEMA, espera_ms=espera_ms)
+
+    @classmethod
+    def do_ambiente(cls):
+        """Estado do .env; None com um worker só (ou ESTADO_COMPARTILHADO=0)."""
+        padrao = "1" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "0"
+        if os.getenv("ESTADO_COMPARTILHADO", padrao) != "1":
+            return None
+        return cls(
+            os.getenv("ESTADO_DB", os.path.join(BASE_DIR, "diario", "compartilhado.sqlite3")),
+            espera_ms=int(os.getenv("ESTADO_ESPERA_MS", "50")),
+        )
+
+    def cache(self, grupo: str, max_itens: int = 1024, ttl: float = 60.0, ttl_negativo: float = None):
+        return CacheCompartilhado(self, grupo, max_itens, ttl, ttl_negativo)
+
+    def baldes(self, grupo: str, por_minuto: float, rajada: int, max_chaves: int = 100_000):
+        return BaldesCompartilhados(self, grupo, por_minuto, rajada, max_chaves)
+
+    def reiniciar(self) -> None:
+        """Esquece cache e métricas de uma rodada anterior (chamado pelo master ao subir)."""
+        with self.local.paciente() as conexao:
+            conexao.execute("DELETE FROM cache")
+            conexao.execute("DELETE FROM metricas")
+
+    # --------------------------------------------------------
+    # Métricas
+    # --------------------------------------------------------
+    def publicar_metricas(self, app: str, instantaneo: dict) -> None:
+        with self.local.lock:
+            self.local.conexao.execute(
+                "INSERT INTO metricas (app, pid, dados, publicado_em) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (app, pid) DO UPDATE SET dados = excluded.dados, publicado_em = excluded.publicado_em",
+                (app, os.getpid(), json.dumps(instantaneo, default=str), time.time()),
+            )
+
+    def retirar_metricas(self, app: str) -> None:
+        with self.local.lock:
+            self.local.conexao.execute("DELETE FROM metricas WHERE app = ? AND pid = ?", (app, os.getpid()))
+
+    def metricas_dos_outros(self, app: str, max_idade: float) -> list:
+        """Instantâneos dos outros workers vivos (publicados há menos de `max_idade` s)."""
+        limite = time.time() - max_idade
+        with self.local.lock:
+            conexao = self.local.conexao
+            # Worker que morreu sem se despedir para de contar
+            conexao.execute("DELETE FROM metricas WHERE app = ? AND publicado_em < ?", (app, limite))
+            linhas = conexao.execute(
+                "SELECT dados FROM metricas WHERE app = ? AND pid != ?", (app, os.getpid())
+            ).fetchall()
+        return [json.loads(linha[0]) for linha in linhas]
+
+    def fechar(self) -> None:
+        self.local.fechar()
+
+
+class CacheCompartilhado:
+    """CacheTTL no SQLite: um valor por chave para todos os workers.
+
+    Os valores vão em pickle (só processos desta máquina escrevem aqui).
+    Ler não escreve nada, então em vez de LRU, ao passar de `max_itens`
+    saem primeiro os itens que venceriam antes.
+    """
+
+    def __init__(self, estado: EstadoCompartilhado, grupo: str, max_itens: int = 1024, ttl: float = 60.0,
+                 ttl_negativo: float = None, relogio=time.time):
+        self.local = estado.local
+        self.grupo = grupo
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.ttl_negativo = ttl if ttl_negativo is None else ttl_negativo
+        self._relogio = relogio
+        self._escritas = 0
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, padrao=AUSENTE):
+        """Retorna o valor em cache ou `padrao` (AUSENTE) se não houver/expirou."""
+        try:
+            with self.local.lock:
+                linha = self.local.conexao.execute(
+                    "SELECT valor FROM cache WHERE grupo = ? AND chave = ? AND expira_em > ?",
+                    (self.grupo, repr(chave), self._relogio()),
+                ).fetchone()
+        except sqlite3.OperationalError as e:
+            if not travado(e):
+                raise
+            log.warning("⚠️ Cache %s travado por outro worker; seguindo sem ele", self.grupo)
+            linha = None
+        if linha is None:
+            self.falhas += 1
+            return padrao
+        self.acertos += 1
+        return pickle.loads(linha[0])
+
+    def guardar(self, chave, valor) -> None:
+        ttl = self.ttl_negativo if valor is None else self.ttl
+        try:
+            with self.local.lock:
+                self.local.conexao.execute(
+                    "INSERT INTO cache (grupo, chave, valor, expira_em) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (grupo, chave) DO UPDATE SET valor = excluded.valor, expira_em = excluded.expira_em",
+                    (self.grupo, repr(chave), pickle.dumps(valor, pickle.HIGHEST_PROTOCOL), self._relogio() + ttl),
+                )
+        except sqlite3.OperationalError as e:
+            if not travado(e):
+                raise
+            log.warning("⚠️ Cache %s travado por outro worker; item não guardado", self.grupo)
+            return
+        self._escritas += 1
+        if self._escritas % PODAR_A_CADA == 0 or self._escritas == 1:
+            self.podar()
+
+    def podar(self) -> None:
+        """Apaga os vencidos e, acima de `max_itens`, os que venceriam primeiro."""
+        try:
+            with self.local.transacao() as conexao:
+                conexao.execute("DELETE FROM cache WHERE grupo = ? AND expira_em <= ?", (self.grupo, self._relogio()))
+                excesso = conexao.execute(
+                    "SELECT count(*) FROM cache WHERE grupo = ?", (self.grupo,)
+                ).fetchone()[0] - self.max_itens
+                if excesso > 0:
+                    conexao.execute(
+                        "DELETE FROM cache WHERE grupo = ? AND chave IN "
+                        "(SELECT chave FROM cache WHERE grupo = ? ORDER BY expira_em LIMIT ?)",
+                        (self.grupo, self.grupo, excesso),
+                    )
+        except sqlite3.OperationalError as e:
+            if not travado(e):
+                raise
+            # fica para a próxima poda
+
+    def invalidar(self, chave) -> None:
+        with self.local.paciente() as conexao:
+            conexao.execute("DELETE FROM cache WHERE grupo = ? AND chave = ?", (self.grupo, repr(chave)))
+
+    def limpar(self) -> None:
+        with self.local.paciente() as conexao:
+            conexao.execute("DELETE FROM cache WHERE grupo = ?", (self.grupo,))
+
+    def __len__(self) -> int:
+        with self.local.lock:
+            return self.local.conexao.execute(
+                "SELECT count(*) FROM cache WHERE grupo = ? AND expira_em > ?", (self.grupo, self._relogio())
+            ).fetchone()[0]
+
+
+class BaldesCompartilhados:
+    """BaldesDeFichas no SQLite: a rajada vale para a máquina, não para cada worker.
+
+    Balde ausente = balde cheio; a poda apaga os que já encheram de novo e,
+    acima de `max_chaves`, os parados há mais tempo.
+    """
+
+    def __init__(self, estado: EstadoCompartilhado, grupo: str, por_minuto: float, rajada: int,
+                 max_chaves: int = 100_000, relogio=time.time):
+        self.local = estado.local
+        self.grupo = grupo
+        self.taxa = por_minuto / 60.0
+        self.rajada = float(rajada)
+        self.max_chaves = max_chaves
+        self._relogio = relogio
+        self._escritas = 0
+
+    def consumir(self, chaves) -> float:
+        """Tira uma ficha de cada chave. 0 se passou; senão, segundos até haver ficha.
+
+        É tudo ou nada: se alguma chave está vazia, nenhuma perde ficha.
+        """
+        if self.taxa <= 0:
+            return 0.0
+        try:
+            with self.local.transacao() as conexao:
+                agora = self._relogio()
+                saldos = []
+                for chave in chaves:
+                    linha = conexao.execute(
+                        "SELECT fichas, instante FROM baldes WHERE grupo = ? AND chave = ?", (self.grupo, chave)
+                    ).fetchone()
+                    fichas, instante = linha or (self.rajada, agora)
+                    saldos.append((chave, min(self.rajada, fichas + max(0.0, agora - instante) * self.taxa)))
+                espera = max(((1.0 - fichas) / self.taxa for _, fichas in saldos if fichas < 1.0), default=0.0)
+                if espera:
+                    return espera
+                conexao.executemany(
+                    "INSERT INTO baldes (grupo, chave, fichas, instante) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (grupo, chave) DO UPDATE SET fichas = excluded.fichas, instante = excluded.instante",
+                    [(self.grupo, chave, fichas - 1.0, agora) for chave, fichas in saldos],
+                )
+        except sqlite3.OperationalError as e:
+            if not travado(e):
+                raise
+            # Melhor deixar passar uma requisição a mais do que parar o worker
+            log.warning("⚠️ Baldes %s travados por outro worker; requisição passa sem limite", self.grupo)
+            return 0.0
+        self._escritas += 1
+        if self._escritas % PODAR_A_CADA == 0:
+            self.podar()
+        return 0.0
+
+    def podar(self) -> None:
+        try:
+            with self.local.transacao() as conexao:
+                agora = self._relogio()
+                conexao.execute(
+                    "DELETE FROM baldes WHERE grupo = ? AND fichas + (? - instante) * ? >= ?",
+                    (self.grupo, agora, self.taxa, self.rajada),
+                )
+                excesso = conexao.execute(
+                    "SELECT count(*) FROM baldes WHERE grupo = ?", (self.grupo,)
+                ).fetchone()[0] - self.max_chaves
+                if excesso > 0:
+                    conexao.execute(
+                        "DELETE FROM baldes WHERE grupo = ? AND chave IN "
+                        "(SELECT chave FROM baldes WHERE grupo = ? ORDER BY instante LIMIT ?)",
+                        (self.grupo, self.grupo, excesso),
+                    )
+        except sqlite3.OperationalError as e:
+            if not travado(e):
+                raise
+            # fica para a próxima poda
+
+    def __len__(self) -> int:
+        with self.local.lock:
+            return self.local.conexao.execute(
+                "SELECT count(*) FROM baldes WHERE grupo = ?", (self.grupo,)
+            ).fetchone()[0]
+
+
+# ============================================================
+# 📊 MÉTRICAS DE TODOS OS WORKERS
+# ============================================================
+def compartilhar_metricas(estado: EstadoCompartilhado, nome_app: str, metricas, intervalo: float = None):
+    """Faz o /metrics deste worker somar os outros. Devolve a tarefa que publica o deste.
+
+    Chamar na partida de cada worker (dentro do loop do asyncio); na parada,
+    cancelar a tarefa e chamar `estado.retirar_metricas(nome_app)`.
+    """
+    intervalo = intervalo if intervalo is not None else float(os.getenv("METRICAS_PUBLICAR_INTERVALO", "5"))
+
+    def vizinhos():
+        try:
+            return estado.metricas_dos_outros(nome_app, max_idade=3 * intervalo)
+        except sqlite3.OperationalError as e:
+            if not travado(e):
+                raise
+            log.warning("⚠️ Métricas dos outros workers travadas; /metrics só com este")
+            return []
+
+    metricas.vizinhos = vizinhos
+
+    async def publicar():
+        while True:
+            try:
+                estado.publicar_metricas(nome_app, metricas.instantaneo())
+            except Exception as e:
+                log.warning("⚠️ Falha ao publicar métricas do worker: %s", e)
+            await asyncio.sleep(intervalo)
+
+    return asyncio.create_task(publicar())
@@ -0,0 +1,289 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# deduplicacao.py — encontra e mescla cadastros duplicados em lote
+# ===============================
+#
+#   python deduplicacao.py                      # só o relatório (nada muda)
+#   python deduplicacao.py --plano plano.json   # relatório + plano completo
+#   python deduplicacao.py --aplicar [--lote 200]
+#
+# Os dois /verificar, o bot e importações antigas deixaram a mesma pessoa em
+# mais de uma linha: "+5521…" num lugar e "21…" no outro, e-mail com outra
+# caixa, um cadastro só com e-mail e outro só com WhatsApp ligados por um
+# terceiro que tem os dois. Comparar par a par ou buscar linha por linha não
+# escala, então:
+#   1. lê `cadastros` por id (keyset), página por página, num DataFrame;
+#   2. normaliza e-mail e telefone com operações vetorizadas do pandas, com a
+#      mesma regra de identidade.py / sql/002;
+#   3. agrupa numa passada de hash (factorize) por e-mail e por WhatsApp e
+#      junta os grupos que compartilham qualquer chave (componentes ligados,
+#      propagando o menor rótulo com NumPy);
+#   4. monta o plano: fica o cadastro mais antigo (menor id), os convites do
+#      grupo são somados, o status de maior precedência vence, campos vazios
+#      são preenchidos pelos outros e quem_indicou apontando para um removido
+#      passa a apontar para o mantido;
+#   5. aplica em lotes de grupos pela RPC mesclar_cadastros (sql/006), um
+#      lote por transação.
+#
+# O server.py expõe o mesmo em /admin/deduplicar.
+
+import asyncio
+import json
+import logging
+import sys
+
+import numpy as np
+import pandas as pd
+
+from identidade import normalizar_email, normalizar_telefone
+
+log = logging.getLogger(__name__)
+
+COLUNAS = (
+    "id", "nome", "apelido", "email", "whatsapp", "status", "convites_disponiveis", "quem_indicou", "created_at",
+)
+# Maior precedência primeiro; status fora da lista perdem para todos
+PRECEDENCIA_STATUS = ("founder", "sócio", "socio", "convidado", "interessado", "aguardando")
+MAX_EXEMPLOS = 20  # grupos listados no relatório
+
+
+# ============================================================
+# 📥 LEITURA
+# ============================================================
+async def carregar(repositorio, tamanho_pagina: int = 1000) -> pd.DataFrame:
+    """Lê `cadastros` inteiro, uma página por vez, num DataFrame ordenado por id."""
+    paginas = []
+    async for pagina in repositorio.paginar(",".join(COLUNAS), tamanho_pagina):
+        paginas.append(pd.DataFrame.from_records(pagina, columns=COLUNAS))
+    if not paginas:
+        return pd.DataFrame(columns=COLUNAS)
+    return pd.concat(paginas, ignore_index=True)
+
+
+# ============================================================
+# 🔑 CHAVES (vetorizadas)
+# ============================================================
+# O acessor .str do pandas chama Python por elemento e sai mais lento que um
+# laço. Aqui o texto vira uma matriz de code points (uma linha por valor,
+# zeros no fim) e a regra é aplicada em colunas de NumPy. Linhas fora do
+# ASCII (raras) passam pela função de identidade.py, para o resultado ser
+# sempre idêntico ao das colunas email_norm / whatsapp_norm.
+def _matriz(valores: pd.Series) -> np.ndarray:
+    texto = valores.to_numpy(dtype=object)
+    texto = np.where(pd.notna(texto), texto, "").astype(str)
+    return texto.view(np.uint32).reshape(len(texto), texto.dtype.itemsize // 4)
+
+
+def _chaves(matriz: np.ndarray, fora_ascii: np.ndarray, valores: pd.Series, regra) -> pd.Series:
+    chaves = np.ascontiguousarray(matriz).view(f"U{max(matriz.shape[1], 1)}").ravel().astype(object)
+    if fora_ascii.any():
+        chaves[fora_ascii] = [regra(v) for v in valores.to_numpy(dtype=object)[fora_ascii]]
+    chaves[chaves == ""] = np.nan
+    return pd.Series(chaves, index=valores.index)
+
+
+def chaves_email(emails: pd.Series) -> pd.Series:
+    """normalizar_email em coluna inteira; vazio vira NaN."""
+    texto = emails.to_numpy(dtype=object)
+    # Só o espaço, como strip(" ") / btrim(email): tab e quebra de linha ficam
+    texto = np.char.strip(np.where(pd.notna(texto), texto, "").astype(str), " ")
+    matriz = texto.view(np.uint32).reshape(len(texto), texto.dtype.itemsize // 4)
+    matriz[(matriz >= 65) & (matriz <= 90)] += 32  # A-Z → a-z
+    return _chaves(matriz, (matriz > 127).any(axis=1), emails, normalizar_email)
+
+
+def chaves_telefone(numeros: pd.Series) -> pd.Series:
+    """normalizar_telefone em coluna inteira; vazio vira NaN."""
+    matriz = _matriz(numeros)
+    linhas, largura = matriz.shape
+    digito = (matriz >= 48) & (matriz <= 57)
+    # lstrip("0") depois de tirar o que não é dígito: vale a partir do primeiro 1-9
+    significativo = digito & (matriz != 48)
+    inicio = np.where(significativo.any(axis=1), significativo.argmax(axis=1), largura)
+    manter = digito & (np.arange(largura) >= inicio[:, None])
+    # Junta os dígitos à esquerda, na ordem (sort estável de cada linha)
+    ordem = np.argsort(~manter, axis=1, kind="stable")
+    digitos = np.take_along_axis(np.where(manter, matriz, 0), ordem, axis=1)
+    saida = np.zeros((linhas, largura + 2), dtype=np.uint32)
+    saida[:, :largura] = digitos
+    c0, c1 = saida[:, 0], saida[:, 1]
+    prefixar = ~((c0 == 53) & (c1 == 53)) & (((c0 == 50) & (c1 == 49)) | (manter.sum(axis=1) == 11))
+    saida[prefixar, 2:] = digitos[prefixar]
+    saida[prefixar, :2] = 53  # "55"
+    return _chaves(saida, (matriz > 127).any(axis=1), numeros, normalizar_telefone)
+
+
+def componentes(*chaves: pd.Series) -> np.ndarray:
+    """Para cada linha, a posição da primeira linha do seu grupo.
+
+    Duas linhas ficam no mesmo grupo se compartilham qualquer chave, direta
+    ou indiretamente. Cada chave é codificada numa passada de hash; depois o
+    menor rótulo é propagado dentro de cada código e por salto de ponteiro
+    até estabilizar (poucas voltas: as cadeias reais são curtas).
+    """
+    rotulo = np.arange(len(chaves[0]))
+    codigos = []
+    for chave in chaves:
+        codigo = pd.factorize(chave)[0]
+        com = codigo >= 0
+        codigos.append((codigo[com], com, int(codigo.max()) + 1 if len(codigo) else 0))
+    while True:
+        anterior = rotulo.copy()
+        for codigo, com, quantos in codigos:
+            menor = np.full(quantos, len(rotulo))
+            np.minimum.at(menor, codigo, rotulo[com])
+            rotulo[com] = np.minimum(rotulo[com], menor[codigo])
+        rotulo = rotulo[rotulo]
+        if np.array_equal(rotulo, anterior):
+            return rotulo
+
+
+# ============================================================
+# 🧮 PLANO
+# ============================================================
+def _nativo(valor):
+    """Valor do pandas/NumPy para JSON (NA vira None)."""
+    if valor is None or valor is pd.NA or (isinstance(valor, float) and np.isnan(valor)):
+        return None
+    return valor.item() if isinstance(valor, np.generic) else valor
+
+
+def planejar(cadastros: pd.DataFrame) -> tuple:
+    """Devolve (grupos, relatorio). Cada grupo: {"manter", "remover", "campos"}."""
+    df = cadastros.sort_values("id", kind="stable").reset_index(drop=True)
+    df["email_chave"] = chaves_email(df["email"])
+    df["whatsapp_chave"] = chaves_telefone(df["whatsapp"])
+    rotulo = componentes(df["email_chave"], df["whatsapp_chave"])
+    ids = df["id"].to_numpy()
+    df["manter"] = ids[rotulo]
+    repetido = np.bincount(rotulo, minlength=len(df))[rotulo] > 1
+
+    relatorio = {
+        "cadastros": len(df), "grupos": 0, "removidos": 0, "religados": 0, "convites_somados": 0, "exemplos": [],
+    }
+    if not repetido.any():
+        return [], relatorio
+
+    removidos = df["id"][repetido & (df["id"] != df["manter"])]
+    # Indicação de um removido passa ao mantido do grupo dele
+    indicou = pd.to_numeric(df["quem_indicou"], errors="coerce")
+    indicou_mantido = indicou.map(pd.Series(df["manter"].to_numpy(), index=ids)).fillna(indicou)
+    relatorio["religados"] = int((indicou.isin(removidos) & ~df["id"].isin(removidos)).sum())
+
+    grupo = df[repetido].assign(
+        quem_indicou=indicou_mantido[repetido],
+        convites_disponiveis=pd.to_numeric(df["convites_disponiveis"][repetido], errors="coerce").fillna(0),
+        precedencia=df["status"][repetido].astype(object).str.strip().str.lower()
+        .map(dict(zip(PRECEDENCIA_STATUS, range(len(PRECEDENCIA_STATUS))))).fillna(len(PRECEDENCIA_STATUS)),
+    )
+    # Indicação de dentro do próprio grupo deixa de valer
+    grupo["quem_indicou"] = grupo["quem_indicou"].mask(grupo["quem_indicou"] == grupo["manter"])
+    for campo in ("nome", "apelido"):
+        texto = grupo[campo].astype(object).str.strip()
+        grupo[campo] = texto.mask(texto == "")
+
+    # first() pula NA: o primeiro valor preenchido, do mais antigo para o mais novo
+    campos = grupo.groupby("manter")[["nome", "apelido", "email_chave", "whatsapp_chave", "quem_indicou"]].first()
+    campos["status"] = (
+        grupo.sort_values(["precedencia", "id"], kind="stable").drop_duplicates("manter").set_index("manter")["status"]
+    )
+    # Grupos em ordem de mantido, como o índice de `campos`
+    removidos_em_ordem = grupo[grupo["id"] != grupo["manter"]].sort_values(["manter", "id"])
+    _, cortes = np.unique(removidos_em_ordem["manter"].to_numpy(), return_index=True)
+    cortes = cortes.tolist() + [len(removidos_em_ordem)]
+    ids_removidos = removidos_em_ordem["id"].tolist()
+    remover = [ids_removidos[a:b] for a, b in zip(cortes, cortes[1:])]
+
+    def valores(coluna: pd.Series) -> list:
+        return coluna.astype(object).where(coluna.notna(), None).tolist()
+
+    grupos = [
+        {
+            "manter": manter,
+            "remover": ids,
+            "campos": {
+                "nome": nome, "apelido": apelido, "email": email, "whatsapp": whatsapp, "status": status,
+                "quem_indicou": None if quem_indicou is None else int(quem_indicou),
+            },
+        }
+        for manter, ids, nome, apelido, email, whatsapp, status, quem_indicou in zip(
+            campos.index.tolist(), remover, valores(campos["nome"]), valores(campos["apelido"]),
+            valores(campos["email_chave"]), valores(campos["whatsapp_chave"]), valores(campos["status"]),
+            valores(campos["quem_indicou"]),
+        )
+    ]
+    relatorio["grupos"] = len(grupos)
+    relatorio["removidos"] = len(removidos)
+    relatorio["convites_somados"] = int(grupo.loc[grupo["id"] != grupo["manter"], "convites_disponiveis"].sum())
+
+    exemplos = {g["manter"]: {**g, "linhas": []} for g in grupos[:MAX_EXEMPLOS]}
+    exibir = ["id", "nome", "email", "whatsapp", "status", "convites_disponiveis", "quem_indicou"]
+    amostra = df.loc[df["manter"].isin(list(exemplos)), exibir + ["manter"]].assign(quem_indicou=indicou.astype("Int64"))
+    for registro in amostra.to_dict("records"):
+        exemplos[registro.pop("manter")]["linhas"].append({k: _nativo(v) for k, v in registro.items()})
+    relatorio["exemplos"] = list(exemplos.values())
+    return grupos, relatorio
+
+
+# ============================================================
+# 🔀 APLICAÇÃO
+# ============================================================
+async def aplicar(repositorio, grupos: list, tamanho_lote: int = 200) -> dict:
+    """Manda o plano à RPC mesclar_cadastros, `tamanho_lote` grupos por chamada."""
+    total = {"grupos": 0, "removidos": 0, "religados": 0, "lotes": 0}
+    for inicio in range(0, len(grupos), tamanho_lote):
+        resultado = await repositorio.mesclar_cadastros(grupos[inicio:inicio + tamanho_lote])
+        for campo in ("grupos", "removidos", "religados"):
+            total[campo] += (resultado or {}).get(campo, 0)
+        total["lotes"] += 1
+    return total
+
+
+async def deduplicar(repositorio, simular: bool = True, tamanho_lote: int = 200,
+                     tamanho_pagina: int = 1000) -> tuple:
+    """Lê, planeja e (sem `simular`) aplica. Devolve (grupos, relatorio)."""
+    cadastros = await carregar(repositorio, tamanho_pagina)
+    # Pandas segura o laço de eventos por alguns segundos numa base grande
+    grupos, relatorio = await asyncio.to_thread(planejar, cadastros)
+    relatorio["simulacao"] = simular
+    if not simular:
+        relatorio["aplicado"] = await aplicar(repositorio, grupos, tamanho_lote)
+    log.info("🧹 Deduplicação: %s", {k: v for k, v in relatorio.items() if k != "exemplos"})
+    return grupos, relatorio
+
+
+# ============================================================
+# 🖥️ CLI
+# ============================================================
+async def _cli(argumentos) -> int:
+    from repositorio import RepositorioCadastros
+
+    repositorio = RepositorioCadastros.do_ambiente()
+    if repositorio is None:
+        print("⚠️ Defina SUPABASE_URL e SUPABASE_KEY.", file=sys.stderr)
+        return 1
+    try:
+        grupos, relatorio = await deduplicar(
+            repositorio, simular=not argumentos.aplicar, tamanho_lote=argumentos.lote,
+        )
+        if argumentos.plano:
+            with open(argumentos.plano, "w", encoding="utf-8") as arquivo:
+                json.dump(grupos, arquivo, ensure_ascii=False, indent=1)
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str))
+        return 0
+    finally:
+        await repositorio.fechar()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", stream=sys.stderr)
+    parser = argparse.ArgumentParser(description="Encontra e mescla cadastros duplicados")
+    parser.add_argument("--aplicar", action="store_true", help="mescla de verdade (sem isso, só o relatório)")
+    parser.add_argument("--lote", type=int, default=200, help="grupos por transação")
+    parser.add_argument("--plano", help="grava o plano completo (JSON) neste arquivo")
+    sys.exit(asyncio.run(_cli(parser.parse_args())))
@@ -0,0 +1,251 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# diario.py — diário local append-only (write-ahead) dos cadastros
+# ===============================
+#
+# Substitui o backup CSV linha a linha. A rota só enfileira; uma thread em
+# segundo plano grava em lote (group commit) em arquivos JSONL rotativos:
+#
+#   {"tipo": "registro", "id": "...", "ts": "...", "dados": {...}}
+#   {"tipo": "sincronizado", "id": "..."}
+#
+# Um registro sem marca "sincronizado" ainda não chegou ao Supabase e pode ser
+# reenviado depois de uma queda:
+#
+#   python diario.py pendentes
+#   python diario.py replay
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODOS_FSYNC = ("lote", "periodico", "nunca")
+_PARAR = object()
+
+
+class DiarioLocal:
+    """Diário append-only com flusher em segundo plano.
+
+    modo_fsync:
+      "lote"      — um fsync por lote gravado (group commit, padrão)
+      "periodico" — no máximo um fsync a cada `intervalo_fsync` segundos
+      "nunca"     — deixa a descarga para o sistema operacional
+
+    Vários processos podem escrever no mesmo diretório: cada lote é gravado
+    sob `flock` no arquivo `.lock`, que também serializa a rotação.
+    """
+
+    PREFIXO = "diario-"
+    SUFIXO = ".jsonl"
+
+    def __init__(self, diretorio: str, modo_fsync: str = "lote", intervalo_fsync: float = 1.0,
+                 max_bytes_segmento: int = 8 * 1024 * 1024, max_lote: int = 512):
+        if modo_fsync not in MODOS_FSYNC:
+            raise ValueError(f"modo_fsync inválido: {modo_fsync!r} (use {', '.join(MODOS_FSYNC)})")
+        self.diretorio = diretorio
+        self.modo_fsync = modo_fsync
+        self.intervalo_fsync = intervalo_fsync
+        self.max_bytes_segmento = max_bytes_segmento
+        self.max_lote = max_lote
+        os.makedirs(diretorio, exist_ok=True)
+
+        self._fila = queue.Queue()
+        self._arquivo = None
+        self._ultimo_fsync = 0.0
+        self._lock_fd = os.open(os.path.join(diretorio, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        self._thread = threading.Thread(target=self._laco, name="diario-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+
+    @classmethod
+    def do_ambiente(cls):
+        return cls(
+            os.getenv("DIARIO_DIR", os.path.join(BASE_DIR, "diario")),
+            modo_fsync=os.getenv("DIARIO_FSYNC", "lote"),
+            intervalo_fsync=float(os.getenv("DIARIO_INTERVALO_FSYNC", "1")),
+            max_bytes_segmento=int(float(os.getenv("DIARIO_MAX_MB", "8")) * 1024 * 1024),
+        )
+
+    # --------------------------------------------------------
+    # API do caminho da requisição (só enfileira)
+    # --------------------------------------------------------
+    def registrar(self, dados: dict) -> str:
+        """Enfileira um cadastro novo e devolve o id da entrada no diário."""
+        if not self._thread.is_alive():
+            # Depois de fechar() ninguém mais grava: melhor falhar do que perder calado
+            raise RuntimeError(f"diário {self.diretorio} já fechado")
+        id_entrada = uuid.uuid4().hex
+        self._fila.put({
+            "tipo": "registro",
+            "id": id_entrada,
+            "ts": datetime.now().isoformat(),
+            "dados": dados,
+        })
+        return id_entrada
+
+    def marcar_sincronizado(self, id_entrada: str) -> None:
+        self._fila.put({"tipo": "sincronizado", "id": id_entrada})
+
+    def descarregar(self) -> None:
+        """Bloqueia até tudo o que foi enfileirado estar gravado."""
+        self._fila.join()
+
+    def fechar(self) -> None:
+        if not self._thread.is_alive():
+            return
+        self._fila.put(_PARAR)
+        self._thread.join()
+        if self._arquivo:
+            self._arquivo.close()
+            self._arquivo = None
+        os.close(self._lock_fd)
+
+    # --------------------------------------------------------
+    # Flusher
+    # --------------------------------------------------------
+    def _laco(self) -> None:
+        parar = False
+        while not parar:
+            lote = [self._fila.get()]
+            # Group commit: junta o que chegou enquanto o lote anterior gravava
+            while len(lote) < self.max_lote:
+                try:
+                    lote.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            if _PARAR in lote:
+                parar = True
+            entradas = [e for e in lote if e is not _PARAR]
+            try:
+                if entradas:
+                    self._gravar(entradas)
+            except Exception as e:
+                logging.error(f"Erro ao gravar diário local: {e}")
+            finally:
+                for _ in lote:
+                    self._fila.task_done()
+
+    def _gravar(self, entradas: list) -> None:
+        dados = "".join(json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in entradas)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            arquivo = self._segmento_atual()
+            arquivo.write(dados.encode("utf-8"))
+            arquivo.flush()
+            agora = time.monotonic()
+            if self.modo_fsync == "lote" or (
+                self.modo_fsync == "periodico" and agora - self._ultimo_fsync >= self.intervalo_fsync
+            ):
+                os.fsync(arquivo.fileno())
+                self._ultimo_fsync = agora
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _segmento_atual(self):
+        """Abre (ou rotaciona para) o segmento mais recente. Chamar sob flock."""
+        segmentos = self.segmentos()
+        caminho = segmentos[-1] if segmentos else self._caminho_segmento(1)
+        if os.path.exists(caminho) and os.path.getsize(caminho) >= self.max_bytes_segmento:
+            caminho = self._caminho_segmento(self._numero(caminho) + 1)
+        if self._arquivo is None or self._arquivo.name != caminho:
+            if self._arquivo:
+                self._arquivo.close()
+            self._arquivo = open(caminho, "ab")
+        return self._arquivo
+
+    def _caminho_segmento(self, numero: int) -> str:
+        return os.path.join(self.diretorio, f"{self.PREFIXO}{numero:06d}{self.SUFIXO}")
+
+    def _numero(self, caminho: str) -> int:
+        return int(os.path.basename(caminho)[len(self.PREFIXO):-len(self.SUFIXO)])
+
+    # --------------------------------------------------------
+    # Leitura / replay
+    # --------------------------------------------------------
+    def segmentos(self) -> list:
+        nomes = sorted(
+            n for n in os.listdir(self.diretorio)
+            if n.startswith(self.PREFIXO) and n.endswith(self.SUFIXO)
+        )
+        return [os.path.join(self.diretorio, n) for n in nomes]
+
+    def _entradas(self, caminho: str):
+        with open(caminho, "rb") as f:
+            for linha in f:
+                try:
+                    yield json.loads(linha)
+                except ValueError:
+                    # Última linha truncada por uma queda no meio da escrita
+                    continue
+
+    def pendentes(self) -> list:
+        """Registros ainda sem marca de sincronizado, na ordem em que foram gravados."""
+        registros = {}
+        for caminho in self.segmentos():
+            for entrada in self._entradas(caminho):
+                if entrada.get("tipo") == "registro":
+                    registros[entrada["id"]] = entrada
+                elif entrada.get("tipo") == "sincronizado":
+                    registros.pop(entrada.get("id"), None)
+        return list(registros.values())
+
+    def podar(self) -> int:
+        """Apaga segmentos antigos (não o atual) cujos registros já foram todos sincronizados."""
+        pendentes = {e["id"] for e in self.pendentes()}
+        removidos = 0
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            for caminho in self.segmentos()[:-1]:
+                ids = {e["id"] for e in self._entradas(caminho) if e.get("tipo") == "registro"}
+                if not ids & pendentes:
+                    os.remove(caminho)
+                    removidos += 1
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        return removidos
+
+
+def replay(diario: DiarioLocal) -> tuple:
+    """Reenvia ao Supabase os registros pendentes. Retorna (enviados, falhas)."""
+    import main
+
+    enviados = falhas = 0
+    for entrada in diario.pendentes():
+        dados = entrada["dados"]
+        # Só marca com o registro confirmado no Supabase: um que ficou na fila
+        # da réplica ainda pode se perder, e o diário é a garantia dele
+        if main.buscar_supabase(dados.get("email"), dados.get("whatsapp")) or main.salvar_supabase(dados, fila=False):
+            diario.marcar_sincronizado(entrada["id"])
+            enviados += 1
+        else:
+            falhas += 1
+    diario.descarregar()
+    diario.podar()
+    return enviados, falhas
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    comando = sys.argv[1] if len(sys.argv) > 1 else "pendentes"
+    diario = DiarioLocal.do_ambiente()
+
+    if comando == "pendentes":
+        for entrada in diario.pendentes():
+            print(entrada["ts"], entrada["dados"].get("email"), entrada["dados"].get("whatsapp"))
+    elif comando == "replay":
+        enviados, falhas = replay(diario)
+        print(f"🔁 Replay concluído: {enviados} enviado(s), {falhas} falha(s).")
+    else:
+        print("Uso: python diario.py [pendentes|replay]")
+        sys.exit(2)
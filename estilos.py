@@ -0,0 +1,284 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# estilos.py — fontes auto-hospedadas (subset WOFF2) e CSS crítico inline
+# ===============================
+#
+# Build das fontes (rodar de novo se mudar o texto dos templates):
+#
+#   python estilos.py
+#
+# Gera em static/build/ um WOFF2 por face, só com os glifos que os templates
+# usam, e o fontes.json que o helper `fontes_head()` consulta. A fonte da
+# marca (CopyrightKlimTypeFoundry) não tem acentos; os acentos caem para
+# Playfair Display / Libre Baskerville. Para servi-las localmente, coloque os
+# TTFs (licença OFL, baixados do Google Fonts) em static/fonts/fallback/ com os
+# nomes de FONTES abaixo; enquanto não existirem, `fontes_head()` mantém o CSS
+# do Google Fonts, mas carregado sem bloquear a renderização.
+#
+# Em tempo de execução, `inlinar_css_critico(html)` troca o <link> do
+# static/style.css pelas regras que a página realmente usa, inline, e carrega
+# o arquivo completo de forma assíncrona.
+
+import glob
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+
+from markupsafe import Markup
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+STYLE_CSS = os.path.join(BASE_DIR, "static", "style.css")
+DESTINO = os.path.join(BASE_DIR, "static", "build")
+MANIFESTO_FONTES = os.path.join(DESTINO, "fontes.json")
+PREFIXO_URL = "/static/build"
+
+FONTES = [
+    {"familia": "CopyrightKlimTypeFoundry", "peso": 400, "arquivo": "static/fonts/CopyrightKlimTypeFoundry.ttf"},
+    {"familia": "Playfair Display", "peso": 400, "arquivo": "static/fonts/fallback/PlayfairDisplay-Regular.ttf"},
+    {"familia": "Playfair Display", "peso": 600, "arquivo": "static/fonts/fallback/PlayfairDisplay-SemiBold.ttf"},
+    {"familia": "Libre Baskerville", "peso": 400, "arquivo": "static/fonts/fallback/LibreBaskerville-Regular.ttf"},
+]
+FONTE_PRINCIPAL = "CopyrightKlimTypeFoundry"
+
+GOOGLE_FONTS_CSS = (
+    "https://fonts.googleapis.com/css2?family=Playfair+Display:wght@400;600"
+    "&family=Libre+Baskerville&display=swap"
+)
+
+# Garante o português completo mesmo que a cópia atual não use todas as letras
+PORTUGUES = "áàâãéêíóôõúüçÁÀÂÃÉÊÍÓÔÕÚÜÇ«»“”‘’–—…•ªº°€"
+
+
+# ============================================================
+# 🔤 BUILD DAS FONTES
+# ============================================================
+def caracteres_usados(templates_dir: str = TEMPLATES_DIR) -> set:
+    """Todos os caracteres dos templates + ASCII imprimível + acentos do português."""
+    caracteres = {chr(c) for c in range(0x20, 0x7F)} | set(PORTUGUES)
+    for caminho in glob.glob(os.path.join(templates_dir, "*.html")):
+        with open(caminho, encoding="utf-8") as f:
+            caracteres |= set(f.read())
+    return {c for c in caracteres if c.isprintable()}
+
+
+def _unicode_range(codigos) -> str:
+    return ", ".join(f"U+{c:04X}" for c in sorted(codigos))
+
+
+def gerar_fontes(destino: str = DESTINO) -> list:
+    """Gera os subsets WOFF2 e o fontes.json. Faces sem TTF de origem são puladas."""
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    os.makedirs(destino, exist_ok=True)
+    usados = {ord(c) for c in caracteres_usados()}
+
+    with TTFont(os.path.join(BASE_DIR, FONTES[0]["arquivo"])) as principal:
+        cobertos_pela_principal = set(principal.getBestCmap())
+
+    faces = []
+    for fonte in FONTES:
+        origem = os.path.join(BASE_DIR, fonte["arquivo"])
+        if not os.path.exists(origem):
+            print(f"⚠️ {fonte['arquivo']} não encontrado — {fonte['familia']} {fonte['peso']} pulada.")
+            continue
+
+        # Fallbacks só precisam do que a fonte principal não cobre (acentos etc.)
+        alvo = usados if fonte["familia"] == FONTE_PRINCIPAL else usados - cobertos_pela_principal
+        with TTFont(origem) as ttf:
+            codigos = sorted(alvo & set(ttf.getBestCmap()))
+
+        opcoes = subset.Options()
+        opcoes.flavor = "woff2"
+        opcoes.layout_features = ["kern", "liga", "calt"]
+        opcoes.name_IDs = ["*"]
+        fonte_ttf = subset.load_font(origem, opcoes)
+        subsetter = subset.Subsetter(opcoes)
+        subsetter.populate(unicodes=codigos)
+        subsetter.subset(fonte_ttf)
+
+        temporario = os.path.join(destino, ".subset.woff2")
+        subset.save_font(fonte_ttf, temporario, opcoes)
+        with open(temporario, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:10]
+        base = re.sub(r"\W+", "", fonte["familia"]).lower()
+        arquivo = f"fonte-{base}-{fonte['peso']}.{digest}.woff2"
+        os.replace(temporario, os.path.join(destino, arquivo))
+
+        faces.append({
+            "familia": fonte["familia"],
+            "peso": fonte["peso"],
+            "url": f"{PREFIXO_URL}/{arquivo}",
+            "bytes": os.path.getsize(os.path.join(destino, arquivo)),
+            "unicode_range": None if fonte["familia"] == FONTE_PRINCIPAL else _unicode_range(codigos),
+        })
+        print(f"🔤 {fonte['familia']} {fonte['peso']}: {len(codigos)} glifo(s), {faces[-1]['bytes']} bytes")
+
+    # Remove subsets antigos
+    atuais = {os.path.basename(face["url"]) for face in faces}
+    for caminho in glob.glob(os.path.join(destino, "fonte-*.woff2")):
+        if os.path.basename(caminho) not in atuais:
+            os.remove(caminho)
+
+    with open(os.path.join(destino, "fontes.json"), "w", encoding="utf-8") as f:
+        json.dump(faces, f, indent=2, ensure_ascii=False)
+    return faces
+
+
+# ============================================================
+# 🧩 HELPER DE TEMPLATE: <head> das fontes
+# ============================================================
+@lru_cache(maxsize=1)
+def carregar_fontes(caminho: str = MANIFESTO_FONTES) -> tuple:
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            return tuple(json.load(f))
+    except FileNotFoundError:
+        return ()
+
+
+@lru_cache(maxsize=1)
+def fontes_head() -> Markup:
+    """Preload + @font-face das fontes locais; Google Fonts só para as famílias sem subset."""
+    faces = carregar_fontes()
+    if not faces:
+        faces = ({
+            "familia": FONTE_PRINCIPAL, "peso": 400, "unicode_range": None,
+            "url": "/static/fonts/dd4859ed4bc3e51f1e18d2ace306faeb.woff2",
+        },)
+
+    partes = []
+    regras = []
+    for face in faces:
+        if face["familia"] == FONTE_PRINCIPAL:
+            partes.append(f'<link rel="preload" href="{face["url"]}" as="font" type="font/woff2" crossorigin>')
+        intervalo = f"unicode-range:{face['unicode_range']};" if face.get("unicode_range") else ""
+        regras.append(
+            f'@font-face{{font-family:"{face["familia"]}";src:url("{face["url"]}") format("woff2");'
+            f"font-weight:{face['peso']};font-style:normal;font-display:swap;{intervalo}}}"
+        )
+    partes.append(f"<style>{''.join(regras)}</style>")
+
+    locais = {face["familia"] for face in faces}
+    if not {"Playfair Display", "Libre Baskerville"} <= locais:
+        # Sem os fallbacks locais: Google Fonts fora do caminho crítico
+        partes.append('<link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>')
+        partes.append(
+            f'<link rel="stylesheet" href="{GOOGLE_FONTS_CSS.replace("&", "&amp;")}" '
+            "media=\"print\" onload=\"this.media='all'\">"
+        )
+    return Markup("\n  ".join(partes))
+
+
+def registrar_helpers(templates) -> None:
+    templates.env.globals.update(fontes_head=fontes_head)
+
+
+# ============================================================
+# ✂️ CSS CRÍTICO
+# ============================================================
+_RE_COMENTARIO = re.compile(r"/\*.*?\*/", re.S)
+_RE_PSEUDO = re.compile(r"::?[\w-]+(\([^)]*\))?")
+_RE_LINK_STYLE = re.compile(r'<link rel="stylesheet" href="/static/style\.css"\s*/?>')
+
+
+def _blocos(css: str) -> list:
+    """Divide o CSS em (prelúdio, corpo) de primeiro nível, respeitando chaves aninhadas."""
+    blocos, nivel, inicio, abertura = [], 0, 0, 0
+    for i, c in enumerate(css):
+        if c == "{":
+            if nivel == 0:
+                abertura = i
+            nivel += 1
+        elif c == "}":
+            nivel -= 1
+            if nivel == 0:
+                blocos.append((css[inicio:abertura].strip(), css[abertura + 1:i].strip()))
+                inicio = i + 1
+    return blocos
+
+
+def _vocabulario(html: str) -> tuple:
+    classes = set()
+    for valor in re.findall(r'class="([^"]*)"', html):
+        classes.update(valor.split())
+    ids = set(re.findall(r'id="([^"]*)"', html))
+    tags = {t.lower() for t in re.findall(r"<([a-zA-Z][\w-]*)", html)}
+    return frozenset(classes), frozenset(ids), frozenset(tags)
+
+
+def _seletor_usado(seletor: str, classes: set, ids: set, tags: set) -> bool:
+    seletor = _RE_PSEUDO.sub("", seletor).strip()
+    if not seletor or seletor in ("*", "html", "body"):
+        return True
+    for composto in re.split(r"[\s>+~]+", seletor):
+        if not composto or composto == "*":
+            continue
+        tag = re.match(r"^[a-zA-Z][\w-]*", composto)
+        if tag and tag.group(0).lower() not in tags:
+            return False
+        if any(c not in classes for c in re.findall(r"\.([\w-]+)", composto)):
+            return False
+        if any(i not in ids for i in re.findall(r"#([\w-]+)", composto)):
+            return False
+    return True
+
+
+def _filtrar(css: str, vocabulario: tuple) -> str:
+    saida = []
+    for preludio, corpo in _blocos(css):
+        if preludio.startswith("@font-face"):
+            continue  # as fontes vêm de fontes_head()
+        if preludio.startswith("@media") or preludio.startswith("@supports"):
+            interno = _filtrar(corpo, vocabulario)
+            if interno:
+                saida.append(f"{preludio}{{{interno}}}")
+        elif preludio.startswith("@") or preludio == ":root":
+            saida.append(f"{preludio}{{{corpo}}}")
+        elif any(_seletor_usado(s, *vocabulario) for s in preludio.split(",")):
+            saida.append(f"{preludio}{{{corpo}}}")
+    return "".join(saida)
+
+
+@lru_cache(maxsize=1)
+def _style_css() -> str:
+    with open(STYLE_CSS, encoding="utf-8") as f:
+        css = _RE_COMENTARIO.sub("", f.read())
+    # URLs relativas do style.css passam a valer a partir de qualquer página
+    css = re.sub(r'url\("(?!/|https?:|data:)', 'url("/static/', css)
+    return re.sub(r"\s+", " ", css)
+
+
+@lru_cache(maxsize=32)
+def _css_do_vocabulario(vocabulario: tuple) -> str:
+    return _filtrar(_style_css(), vocabulario)
+
+
+def css_critico(html: str) -> str:
+    """Regras do static/style.css usadas pelos elementos presentes no HTML.
+
+    Páginas renderizadas por pessoa mudam o texto, não os elementos: o
+    filtro roda uma vez por conjunto de classes/ids/tags.
+    """
+    return _css_do_vocabulario(_vocabulario(html))
+
+
+def inlinar_css_critico(html: str) -> str:
+    """Inline do CSS crítico; o style.css completo vem depois, sem bloquear."""
+    if not _RE_LINK_STYLE.search(html):
+        return html
+    substituto = (
+        f"<style>{css_critico(html)}</style>\n"
+        '  <link rel="preload" href="/static/style.css" as="style" '
+        "onload=\"this.onload=null;this.rel='stylesheet'\">\n"
+        '  <noscript><link rel="stylesheet" href="/static/style.css"></noscript>'
+    )
+    return _RE_LINK_STYLE.sub(lambda _: substituto, html, count=1)
+
+
+if __name__ == "__main__":
+    faces = gerar_fontes()
+    print(f"✅ {len(faces)} face(s) gerada(s) em {os.path.relpath(DESTINO, BASE_DIR)}/.")
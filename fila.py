@@ -0,0 +1,251 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# fila.py — processamento em segundo plano das indicações do bot
+# ===============================
+#
+# O webhook só valida, enfileira e responde 200. Os trabalhadores desta fila
+# fazem o resto: confirmam o founder, gravam as indicações num único insert,
+# debitam o contador e mandam os convites pela Graph API com concorrência
+# limitada, intervalo mínimo por destino e novas tentativas com backoff
+# exponencial. O que esgota as tentativas vai para o dead-letter (DiarioLocal).
+#
+# Só falhas temporárias (queda, timeout, 5xx, 429) são tentadas de novo; 4xx,
+# envios incertos (timeout depois de a mensagem sair) e erros do próprio
+# código vão direto ao dead-letter. As escritas no
+# Supabase usam o ID da mensagem do WhatsApp como chave (sql/007): repetir
+# depois de um timeout que chegou a gravar não duplica indicação nem débito.
+#
+# A Meta já recebeu 200 por tudo o que está na fila: ao parar, o que não deu
+# tempo de processar (na fila ou no meio do processamento) vai para o
+# dead-letter antes de o processo sair. Se nem o dead-letter aceitar, os IDs
+# saem do RegistroMensagens (idempotencia.py): a reentrega da Meta volta a valer.
+
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime
+
+from diario import DiarioLocal
+from identidade import normalizar_telefone
+from metricas import METRICAS
+from repositorio import ErroRepositorio, temporario
+from whatsapp import ErroEnvio, LimitadorPorDestino
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+log = logging.getLogger(__name__)
+
+CONVITE_TEXTO = (
+    "🎄 Prelude — Golden Christmas 2025\n\n"
+    "Você foi indicado para o Natal da Prelude.\n"
+    "Um espaço reservado para reencontros entre amigos.\n\n"
+    "Confirme sua presença respondendo com seu nome completo.\n"
+    "— Prelude"
+)
+
+
+def _retentavel(erro: Exception) -> bool:
+    if isinstance(erro, ErroEnvio):
+        # incerto: a mensagem pode ter chegado; reenviar arrisca duplicar o convite
+        return erro.temporario and not erro.incerto
+    if isinstance(erro, ErroRepositorio):
+        return temporario(erro)
+    return False
+
+
+class FilaIndicacoes:
+    def __init__(self, obter_repositorio, whatsapp, dead_letter: DiarioLocal, registro=None,
+                 trabalhadores: int = 4, max_fila: int = 1000, max_envios_simultaneos: int = 10,
+                 intervalo_por_destino: float = 1.0, max_tentativas: int = 5,
+                 atraso_base: float = 0.5, atraso_max: float = 30.0):
+        self.obter_repositorio = obter_repositorio
+        self.whatsapp = whatsapp
+        self.dead_letter = dead_letter
+        self.registro = registro
+        self.n_trabalhadores = trabalhadores
+        self.max_tentativas = max_tentativas
+        self.atraso_base = atraso_base
+        self.atraso_max = atraso_max
+        self._fila = asyncio.Queue(maxsize=max_fila)
+        self._envios = asyncio.Semaphore(max_envios_simultaneos)
+        self._limitador = LimitadorPorDestino(intervalo_por_destino)
+        self._tarefas = []
+
+    @classmethod
+    def do_ambiente(cls, obter_repositorio, whatsapp, registro=None):
+        return cls(
+            obter_repositorio,
+            whatsapp,
+            DiarioLocal(os.getenv("DEAD_LETTER_DIR", os.path.join(BASE_DIR, "diario", "dead-letter"))),
+            registro,
+            trabalhadores=int(os.getenv("WEBHOOK_TRABALHADORES", "4")),
+            max_fila=int(os.getenv("WEBHOOK_MAX_FILA", "1000")),
+            max_envios_simultaneos=int(os.getenv("WHATSAPP_MAX_SIMULTANEOS", "10")),
+            intervalo_por_destino=float(os.getenv("WHATSAPP_INTERVALO_DESTINO", "1")),
+            max_tentativas=int(os.getenv("WHATSAPP_MAX_TENTATIVAS", "5")),
+        )
+
+    # --------------------------------------------------------
+    # Ciclo de vida
+    # --------------------------------------------------------
+    def iniciar(self) -> None:
+        self._tarefas = [
+            asyncio.create_task(self._trabalhador(), name=f"indicacoes-{i}")
+            for i in range(self.n_trabalhadores)
+        ]
+
+    async def parar(self, timeout: float = 10.0) -> None:
+        """Espera a fila esvaziar (até `timeout`) e encerra os trabalhadores.
+
+        O que sobrar — eventos no meio do processamento e ainda na fila — vai
+        para o dead-letter, gravado em disco antes de retornar.
+        """
+        try:
+            await asyncio.wait_for(self._fila.join(), timeout)
+        except asyncio.TimeoutError:
+            log.warning("⚠️ Encerrando com %d evento(s) na fila; vão para o dead-letter.", self._fila.qsize())
+        # Cancelado no meio de `processar`, o trabalhador guarda o próprio evento
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+        while not self._fila.empty():
+            self._descartar(self._fila.get_nowait(), "encerrado antes de processar")
+            self._fila.task_done()
+        await asyncio.to_thread(self.dead_letter.descarregar)
+
+    def enfileirar(self, evento: dict) -> bool:
+        """Coloca o evento na fila sem esperar. False se a fila estiver cheia."""
+        try:
+            self._fila.put_nowait(evento)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    @property
+    def pendentes(self) -> int:
+        return self._fila.qsize()
+
+    async def esperar_vazia(self) -> None:
+        await self._fila.join()
+
+    # --------------------------------------------------------
+    # Trabalho
+    # --------------------------------------------------------
+    async def _trabalhador(self) -> None:
+        while True:
+            evento = await self._fila.get()
+            try:
+                await self.processar(evento)
+            except asyncio.CancelledError:
+                # Parada no meio: parte dos convites pode ter saído
+                self._descartar(evento, "encerrado no meio do processamento", interrompido=True)
+                raise
+            except Exception as e:
+                self._descartar(evento, str(e))
+            finally:
+                self._fila.task_done()
+
+    def _descartar(self, evento: dict, erro: str, interrompido: bool = False) -> None:
+        """Evento que não será processado: dead-letter ou, se nem isso, IDs livres para a reentrega."""
+        try:
+            self.dead_letter.registrar({"tipo": "evento", "evento": evento, "erro": erro, "interrompido": interrompido})
+        except Exception as e:
+            log.error("🚨 Evento do webhook perdido (%s); dead-letter indisponível: %s", erro, e)
+            if self.registro is not None:
+                self.registro.esquecer([m["id"] for m in evento["mensagens"]])
+            return
+        log.error("🚨 Evento do webhook enviado ao dead-letter: %s", erro)
+        METRICAS.incrementar("prelude_dead_letter_total", (("tipo", "evento"),),
+                             ajuda="Itens enviados ao dead-letter")
+
+    async def _com_retentativas(self, operacao, descricao: str):
+        """Executa `operacao()` com backoff exponencial + jitter nas falhas temporárias."""
+        for tentativa in range(self.max_tentativas):
+            try:
+                return await operacao()
+            except Exception as e:
+                if not _retentavel(e) or tentativa == self.max_tentativas - 1:
+                    raise
+                erro = e
+            atraso = min(self.atraso_max, self.atraso_base * 2 ** tentativa) * random.uniform(0.5, 1.0)
+            log.warning("⏳ %s: tentativa %d falhou (%s); nova em %.1fs", descricao, tentativa + 1, erro, atraso)
+            await asyncio.sleep(atraso)
+
+    async def processar(self, evento: dict) -> None:
+        """Processa todas as mensagens de um payload do webhook.
+
+        Uma busca para todos os remetentes, um insert para todas as indicações
+        e um convite por número distinto, mesmo que venha em várias mensagens.
+        """
+        repositorio = self.obter_repositorio()
+        if repositorio is None:
+            raise RuntimeError("Supabase não configurado")
+        mensagens = evento["mensagens"]
+
+        remetentes = sorted({normalizar_telefone(m["founder_whatsapp"]) for m in mensagens})
+        encontrados = await self._com_retentativas(
+            lambda: repositorio.selecionar(
+                {"whatsapp_norm": f"in.({','.join(remetentes)})", "status": "eq.Founder"},
+                "whatsapp_norm",
+            ),
+            "busca dos founders",
+        )
+        founders = {f["whatsapp_norm"] for f in encontrados}
+        for m in mensagens:
+            if normalizar_telefone(m["founder_whatsapp"]) not in founders:
+                log.info("Indicação ignorada: %s não é founder", m["founder_whatsapp"])
+        mensagens = [m for m in mensagens if normalizar_telefone(m["founder_whatsapp"]) in founders]
+        if not mensagens:
+            return
+
+        linhas = {}
+        for m in mensagens:
+            for numero in m["numeros"]:
+                linhas.setdefault((m["founder_whatsapp"], numero), {
+                    "founder_whatsapp": m["founder_whatsapp"],
+                    "convidado_whatsapp": numero,
+                    "status": "pendente",
+                    "mensagem_id": m["id"],
+                })
+        await self._com_retentativas(
+            lambda: repositorio.inserir_lote("indicacoes", list(linhas.values()),
+                                             ignorar_conflito_em="mensagem_id,convidado_whatsapp"),
+            "insert das indicações",
+        )
+        # Um débito por mensagem, como quando cada mensagem chegava sozinha;
+        # a mesma mensagem de novo (nova tentativa, evento reprocessado) não debita
+        for m in mensagens:
+            await self._com_retentativas(
+                lambda: repositorio.rpc("decrementar_convites_mensagem",
+                                        {"founder": m["founder_whatsapp"], "mensagem_id": m["id"]}),
+                "decremento de convites",
+            )
+        numeros = dict.fromkeys(linha["convidado_whatsapp"] for linha in linhas.values())
+        await asyncio.gather(*(self._enviar(numero, CONVITE_TEXTO) for numero in numeros))
+
+    async def _enviar(self, numero: str, texto: str) -> None:
+        if not self.whatsapp:
+            log.warning("⚠️ WhatsApp não configurado; convite para %s no dead-letter.", numero)
+            self.dead_letter.registrar({"tipo": "envio", "numero": numero, "texto": texto,
+                                        "erro": "WhatsApp não configurado"})
+            return
+
+        async def enviar():
+            await self._limitador.aguardar(numero)
+            async with self._envios:
+                return await self.whatsapp.enviar_texto(numero, texto)
+
+        try:
+            await self._com_retentativas(enviar, f"envio para {numero}")
+            log.debug("📤 Enviado: %s", numero)
+        except Exception as e:
+            log.error("❌ Envio para %s falhou de vez: %s", numero, e)
+            METRICAS.incrementar("prelude_dead_letter_total", (("tipo", "envio"),),
+                                 ajuda="Itens enviados ao dead-letter")
+            self.dead_letter.registrar({
+                "tipo": "envio", "numero": numero, "texto": texto,
+                "erro": str(e), "incerto": getattr(e, "incerto", False),
+                "falhou_em": datetime.now().isoformat(),
+            })
@@ -0,0 +1,46 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# gunicorn.conf.py — vários workers do server.py na mesma máquina
+# ===============================
+#
+#   gunicorn server:app -c gunicorn.conf.py        (Procfile: web-workers)
+#
+# WEB_CONCURRENCY workers uvicorn (padrão: um por CPU). O app é importado
+# uma vez no master (preload_app) e os workers nascem dele por fork, já
+# prontos: erro de import derruba a partida em vez de cada worker, e as
+# páginas de memória ficam divididas até alguém escrever nelas.
+#
+# Com mais de um worker, o server.py liga o estado compartilhado
+# (compartilhado.py): cache de sócios, baldes de limite e /metrics valem
+# para a máquina inteira, não para cada processo.
+
+import multiprocessing
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+# O app decide pelo estado compartilhado olhando esta variável
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+preload_app = True
+
+# Mesmo comportamento do uvicorn sozinho atrás do proxy (limites.py lê o IP real)
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 10
+keepalive = 5
+# Recicla workers aos poucos (vazamento de memória não vira queda); jitter evita reciclar todos juntos
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+
+def on_starting(server):
+    """No master, antes dos workers: cache e métricas de uma rodada anterior não valem mais."""
+    from compartilhado import EstadoCompartilhado
+
+    estado = EstadoCompartilhado.do_ambiente()
+    if estado:
+        estado.reiniciar()
+        estado.fechar()
@@ -0,0 +1,89 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# idempotencia.py — IDs de mensagens do WhatsApp já processadas
+# ===============================
+#
+# A Meta reentrega o mesmo webhook quando não recebe 200 a tempo (e às vezes
+# mesmo quando recebe). Cada mensagem tem um ID (wamid.*); guardamos os IDs
+# vistos num LRU em memória, na frente de um SQLite local que sobrevive a
+# reinícios e é compartilhado entre processos. O INSERT OR IGNORE do SQLite é
+# quem decide, de forma atômica, se a mensagem é nova.
+
+import os
+import sqlite3
+import threading
+import time
+
+from cache import AUSENTE, CacheTTL
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class RegistroMensagens:
+    """Conjunto persistente de IDs de mensagens já aceitas."""
+
+    def __init__(self, caminho: str, max_memoria: int = 50_000, retencao: float = 7 * 86400):
+        self.caminho = caminho
+        self.retencao = retencao
+        # Só guardamos positivos ("já vi"): um ID visto nunca deixa de ser visto
+        self._memoria = CacheTTL(max_itens=max_memoria, ttl=retencao)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.execute("PRAGMA busy_timeout=5000")
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS mensagens (id TEXT PRIMARY KEY, recebida_em REAL NOT NULL)"
+        )
+
+    @classmethod
+    def do_ambiente(cls):
+        return cls(
+            os.getenv("MENSAGENS_DB", os.path.join(BASE_DIR, "diario", "mensagens.sqlite3")),
+            max_memoria=int(os.getenv("MENSAGENS_MAX_MEMORIA", "50000")),
+            retencao=float(os.getenv("MENSAGENS_RETENCAO_DIAS", "7")) * 86400,
+        )
+
+    def marcar(self, ids: list) -> list:
+        """Marca os IDs como vistos e retorna só os que ainda não tinham sido."""
+        candidatos = [i for i in dict.fromkeys(ids) if self._memoria.obter(i) is AUSENTE]
+        if not candidatos:
+            return []
+        agora = time.time()
+        novos = []
+        with self._lock:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                for id in candidatos:
+                    cursor = self._conexao.execute(
+                        "INSERT OR IGNORE INTO mensagens (id, recebida_em) VALUES (?, ?)", (id, agora)
+                    )
+                    if cursor.rowcount:
+                        novos.append(id)
+                self._conexao.execute("COMMIT")
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+        for id in candidatos:
+            self._memoria.guardar(id, True)
+        return novos
+
+    def esquecer(self, ids: list) -> None:
+        """Desfaz `marcar` (ex.: fila cheia) para que a reentrega seja aceita."""
+        with self._lock:
+            self._conexao.executemany("DELETE FROM mensagens WHERE id = ?", [(i,) for i in ids])
+        for id in ids:
+            self._memoria.invalidar(id)
+
+    def podar(self) -> int:
+        """Apaga IDs mais velhos que a retenção. Retorna quantos saíram."""
+        with self._lock:
+            cursor = self._conexao.execute(
+                "DELETE FROM mensagens WHERE recebida_em < ?", (time.time() - self.retencao,)
+            )
+        return cursor.rowcount
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._conexao.close()
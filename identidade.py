@@ -0,0 +1,33 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# identidade.py — chaves normalizadas de e-mail e telefone
+# ===============================
+#
+# Mesma regra das colunas geradas email_norm / whatsapp_norm
+# (sql/002_chaves_identidade.sql). Se mudar aqui, mude lá também.
+
+import re
+
+
+def normalizar_email(email: str) -> str:
+    """E-mail sem espaços nas pontas e em minúsculas.
+
+    Só o espaço, como o btrim(email) da coluna email_norm: um strip() sem
+    argumento tiraria também tab e quebra de linha, e a mesma pessoa teria
+    uma chave aqui e outra no banco.
+    """
+    return (email or "").strip(" ").lower()
+
+
+def normalizar_telefone(numero: str) -> str:
+    """Normaliza números de telefone para formato padrão (5521XXXXXXXX)."""
+    if not numero:
+        return ""
+    numero = re.sub(r"\D", "", numero)
+    numero = numero.lstrip("0")
+    if not numero.startswith("55"):
+        if numero.startswith("21"):
+            numero = "55" + numero
+        elif len(numero) == 11:
+            numero = "55" + numero
+    return numero
@@ -0,0 +1,218 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# imagens.py — variantes responsivas das imagens e assets com hash
+# ===============================
+#
+# Build (rodar de novo sempre que mudar algo em static/images):
+#
+#   python imagens.py
+#
+# Gera em static/build/ uma variante por largura e formato (AVIF, WebP e JPEG
+# progressivo), com o hash do conteúdo no nome, e o manifest.json que os
+# helpers de template consultam. Como o nome muda quando o conteúdo muda, os
+# arquivos de static/build/ são servidos com Cache-Control immutable.
+
+import hashlib
+import json
+import os
+
+from fastapi.staticfiles import StaticFiles
+from markupsafe import Markup, escape
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ORIGEM = os.path.join(BASE_DIR, "static", "images")
+DESTINO = os.path.join(BASE_DIR, "static", "build")
+MANIFESTO = os.path.join(DESTINO, "manifest.json")
+PREFIXO_URL = "/static/build"
+
+LARGURAS = (480, 800, 1080, 1440, 1920)
+
+# formato → (extensão, MIME, opções do Pillow), em ordem de preferência
+FORMATOS = {
+    "avif": ("avif", "image/avif", {"quality": 55, "speed": 4}),
+    "webp": ("webp", "image/webp", {"quality": 78, "method": 6}),
+    "jpeg": ("jpg", "image/jpeg", {"quality": 80, "progressive": True, "optimize": True}),
+}
+
+
+# ============================================================
+# 🏗️ BUILD
+# ============================================================
+def _formatos_disponiveis() -> dict:
+    from PIL import features
+
+    disponiveis = {}
+    for formato, config in FORMATOS.items():
+        if formato == "jpeg" or features.check(formato):
+            disponiveis[formato] = config
+        else:
+            print(f"⚠️ Pillow sem suporte a {formato.upper()} — variantes puladas.")
+    return disponiveis
+
+
+def gerar(origem: str = ORIGEM, destino: str = DESTINO, larguras=LARGURAS) -> dict:
+    """Gera as variantes de todas as imagens de `origem` e grava o manifest."""
+    import io
+
+    from PIL import Image, ImageOps
+
+    os.makedirs(destino, exist_ok=True)
+    formatos = _formatos_disponiveis()
+    manifesto = {}
+    gerados = set()
+
+    for nome in sorted(os.listdir(origem)):
+        base, ext = os.path.splitext(nome)
+        if ext.lower() not in (".jpg", ".jpeg", ".png"):
+            continue
+
+        with Image.open(os.path.join(origem, nome)) as original:
+            imagem = ImageOps.exif_transpose(original).convert("RGB")
+        largura_original, altura_original = imagem.size
+        # Larguras menores que a original (com folga de 5%) + a própria original
+        alvos = [l for l in sorted(larguras) if l < largura_original * 0.95] + [largura_original]
+
+        entrada = {"largura": largura_original, "altura": altura_original, "variantes": {}}
+        for formato, (extensao, _, opcoes) in formatos.items():
+            variantes = []
+            for largura in alvos:
+                altura = round(altura_original * largura / largura_original)
+                redimensionada = imagem if largura == largura_original else imagem.resize(
+                    (largura, altura), Image.Resampling.LANCZOS
+                )
+                buffer = io.BytesIO()
+                redimensionada.save(buffer, format=formato.upper(), **opcoes)
+                dados = buffer.getvalue()
+                digest = hashlib.sha256(dados).hexdigest()[:10]
+                arquivo = f"{base}-{largura}w.{digest}.{extensao}"
+                with open(os.path.join(destino, arquivo), "wb") as f:
+                    f.write(dados)
+                gerados.add(arquivo)
+                variantes.append({"largura": largura, "url": f"{PREFIXO_URL}/{arquivo}", "bytes": len(dados)})
+            entrada["variantes"][formato] = variantes
+        manifesto[nome] = entrada
+        print(f"🖼️ {nome}: {len(alvos)} largura(s) × {len(formatos)} formato(s)")
+
+    # Remove variantes antigas que não estão mais no manifest
+    extensoes = tuple(f".{extensao}" for extensao, _, _ in FORMATOS.values())
+    for arquivo in os.listdir(destino):
+        if arquivo.endswith(extensoes) and arquivo not in gerados:
+            os.remove(os.path.join(destino, arquivo))
+
+    with open(os.path.join(destino, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False)
+    return manifesto
+
+
+# ============================================================
+# 🧩 HELPERS DE TEMPLATE
+# ============================================================
+_manifesto = None
+
+
+def carregar_manifesto(caminho: str = MANIFESTO) -> dict:
+    """Lê o manifest uma vez; sem build, os helpers caem para a imagem original."""
+    global _manifesto
+    if _manifesto is None:
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                _manifesto = json.load(f)
+        except FileNotFoundError:
+            _manifesto = {}
+    return _manifesto
+
+
+def _variante(variantes: list, largura: int) -> dict:
+    """Menor variante com pelo menos `largura` px (ou a maior que existir)."""
+    for variante in variantes:
+        if variante["largura"] >= largura:
+            return variante
+    return variantes[-1]
+
+
+def imagem_url(nome: str, largura: int = None, formato: str = "jpeg") -> str:
+    entrada = carregar_manifesto().get(nome)
+    if not entrada or formato not in entrada["variantes"]:
+        return f"/static/images/{nome}"
+    return _variante(entrada["variantes"][formato], largura or entrada["largura"])["url"]
+
+
+def fundo_responsivo(nome: str, largura: int) -> Markup:
+    """Declarações CSS de background-image: JPEG para todos, image-set com AVIF/WebP para quem suporta."""
+    entrada = carregar_manifesto().get(nome)
+    if not entrada:
+        return Markup(f'background-image: url("/static/images/{escape(nome)}");')
+
+    jpeg = _variante(entrada["variantes"]["jpeg"], largura)["url"]
+    opcoes = [
+        f'url("{_variante(entrada["variantes"][formato], largura)["url"]}") type("{mime}")'
+        for formato, (_, mime, _) in FORMATOS.items()
+        if formato in entrada["variantes"]
+    ]
+    return Markup(
+        f'background-image: url("{jpeg}"); '
+        f'background-image: image-set({", ".join(opcoes)});'
+    )
+
+
+def imagem_responsiva(nome: str, alt: str = "", sizes: str = "100vw", classe: str = None,
+                      carregamento: str = "lazy") -> Markup:
+    """<picture> com um <source> por formato moderno e srcset por largura."""
+    entrada = carregar_manifesto().get(nome)
+    atributos_classe = f' class="{escape(classe)}"' if classe else ""
+    if not entrada:
+        return Markup(
+            f'<img src="/static/images/{escape(nome)}" alt="{escape(alt)}"{atributos_classe} '
+            f'loading="{carregamento}" decoding="async">'
+        )
+
+    def srcset(formato):
+        return ", ".join(f'{v["url"]} {v["largura"]}w' for v in entrada["variantes"][formato])
+
+    fontes = "".join(
+        f'<source type="{mime}" srcset="{srcset(formato)}" sizes="{escape(sizes)}">'
+        for formato, (_, mime, _) in FORMATOS.items()
+        if formato != "jpeg" and formato in entrada["variantes"]
+    )
+    return Markup(
+        f"<picture>{fontes}"
+        f'<img src="{imagem_url(nome)}" srcset="{srcset("jpeg")}" sizes="{escape(sizes)}" '
+        f'width="{entrada["largura"]}" height="{entrada["altura"]}" alt="{escape(alt)}"{atributos_classe} '
+        f'loading="{carregamento}" decoding="async"></picture>'
+    )
+
+
+def registrar_helpers(templates) -> None:
+    templates.env.globals.update(
+        imagem_url=imagem_url,
+        fundo_responsivo=fundo_responsivo,
+        imagem_responsiva=imagem_responsiva,
+    )
+
+
+# ============================================================
+# 📦 ARQUIVOS ESTÁTICOS COM CACHE
+# ============================================================
+class StaticFilesComCache(StaticFiles):
+    """StaticFiles que marca assets com hash no nome (static/build/) como imutáveis.
+
+    O resto continua com revalidação por ETag/Last-Modified (no-cache), já que
+    o nome não muda quando o arquivo muda.
+    """
+
+    CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        resposta = super().file_response(full_path, stat_result, scope, status_code)
+        caminho = os.path.realpath(full_path)
+        if os.path.dirname(caminho) == os.path.realpath(DESTINO) and not caminho.endswith(".json"):
+            resposta.headers["Cache-Control"] = self.CACHE_IMUTAVEL
+        else:
+            resposta.headers.setdefault("Cache-Control", "no-cache")
+        return resposta
+
+
+if __name__ == "__main__":
+    manifesto = gerar()
+    antes = sum(os.path.getsize(os.path.join(ORIGEM, n)) for n in manifesto)
+    print(f"✅ {len(manifesto)} imagem(ns) processada(s); originais somam {antes / 1024:.0f} KB.")
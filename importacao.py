@@ -0,0 +1,271 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# importacao.py — importação e exportação em massa de cadastros
+# ===============================
+#
+#   python importacao.py importar lista.csv [--simular] [--lote 500]
+#   python importacao.py exportar [--formato csv|jsonl] > cadastros.csv
+#
+# Importação: lê o CSV em streaming (colunas como as do database.csv: nome,
+# email, whatsapp, status, convites_disponiveis), normaliza e-mail/telefone,
+# descarta repetições dentro do arquivo e, a cada lote, busca os cadastros já
+# existentes (email_norm/whatsapp_norm, uma consulta a cada 100 linhas) e faz
+# no máximo dois POSTs: um insert das linhas novas e um upsert por id das
+# existentes. Campos vazios
+# no CSV não apagam o que já está no banco.
+#
+# Exportação: percorre `cadastros` por id (keyset) e gera CSV ou JSONL em
+# pedaços, com memória constante qualquer que seja o tamanho da tabela.
+#
+# O server.py expõe as duas coisas em /admin/importar e /admin/exportar.
+
+import asyncio
+import codecs
+import csv
+import io
+import json
+import logging
+import sys
+
+from identidade import normalizar_email, normalizar_telefone
+
+log = logging.getLogger(__name__)
+
+COLUNAS_IMPORTACAO = ("nome", "apelido", "email", "whatsapp", "status", "convites_disponiveis")
+COLUNAS_EXPORTACAO = (
+    "id", "nome", "apelido", "email", "whatsapp", "status", "convites_disponiveis", "quem_indicou", "created_at",
+)
+STATUS_PADRAO = "convidado"
+MAX_EXEMPLOS = 20  # linhas com problema listadas no relatório
+MAX_CHAVES_BUSCA = 100
+
+
+class ErroImportacao(Exception):
+    """CSV sem as colunas mínimas."""
+
+
+# ============================================================
+# 📥 LEITURA DO CSV
+# ============================================================
+async def linhas_csv(pedacos):
+    """Converte pedaços de bytes (arquivo, corpo da requisição) em dicts por linha.
+
+    Só entrega ao `csv` registros completos: um campo entre aspas pode ter
+    quebra de linha, então espera o número de aspas ficar par.
+    """
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    pendente = ""
+    cabecalho = None
+    numero = 1  # linha do arquivo (o cabeçalho é a 1)
+
+    def registros(texto):
+        return csv.reader(io.StringIO(texto))
+
+    async for pedaco in pedacos:
+        # Incremental: um caractere acentuado pode vir partido entre dois pedaços
+        pendente += decodificador.decode(pedaco) if isinstance(pedaco, bytes) else pedaco
+        corte = pendente.rfind("\n")
+        if corte < 0:
+            continue
+        completo, resto = pendente[: corte + 1], pendente[corte + 1:]
+        if completo.count('"') % 2:
+            continue  # ainda dentro de um campo com quebra de linha
+        pendente = resto
+        for campos in registros(completo):
+            if cabecalho is None:
+                cabecalho = [c.strip().lower() for c in campos]
+                if "email" not in cabecalho and "whatsapp" not in cabecalho:
+                    raise ErroImportacao("O CSV precisa de uma coluna email ou whatsapp.")
+                continue
+            numero += 1
+            if any(c.strip() for c in campos):
+                yield numero, dict(zip(cabecalho, campos))
+    if pendente.strip():
+        for campos in registros(pendente):
+            if cabecalho is None:
+                raise ErroImportacao("O CSV precisa de uma coluna email ou whatsapp.")
+            numero += 1
+            if any(c.strip() for c in campos):
+                yield numero, dict(zip(cabecalho, campos))
+
+
+async def pedacos_arquivo(caminho: str, tamanho: int = 64 * 1024):
+    with open(caminho, "rb") as f:
+        while pedaco := f.read(tamanho):
+            yield pedaco
+
+
+def preparar(bruto: dict) -> dict:
+    """Linha do CSV → colunas de `cadastros`. Vazios viram None; e-mail/telefone normalizados."""
+    linha = {}
+    for coluna in COLUNAS_IMPORTACAO:
+        valor = (bruto.get(coluna) or "").strip()
+        linha[coluna] = valor or None
+    linha["email"] = normalizar_email(linha["email"]) or None
+    linha["whatsapp"] = normalizar_telefone(linha["whatsapp"]) or None
+    if linha["convites_disponiveis"] is not None:
+        linha["convites_disponiveis"] = int(linha["convites_disponiveis"])
+    return linha
+
+
+# ============================================================
+# 🔁 IMPORTAÇÃO
+# ============================================================
+def _valor_in(valor: str) -> str:
+    return '"' + valor.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+async def _existentes(repositorio, linhas: list) -> tuple:
+    """Cadastros com algum dos e-mails ou telefones das linhas.
+
+    Uma busca a cada MAX_CHAVES_BUSCA linhas, para a URL não passar de ~8 KB.
+    """
+    por_email, por_whatsapp = {}, {}
+    for inicio in range(0, len(linhas), MAX_CHAVES_BUSCA):
+        parte = linhas[inicio:inicio + MAX_CHAVES_BUSCA]
+        emails = sorted({l["email"] for l in parte if l["email"]})
+        telefones = sorted({l["whatsapp"] for l in parte if l["whatsapp"]})
+        filtros = []
+        if emails:
+            filtros.append(f"email_norm.in.({','.join(map(_valor_in, emails))})")
+        if telefones:
+            filtros.append(f"whatsapp_norm.in.({','.join(map(_valor_in, telefones))})")
+        encontrados = await repositorio.selecionar(
+            {"or": f"({','.join(filtros)})"}, "id,email_norm,whatsapp_norm," + ",".join(COLUNAS_IMPORTACAO),
+        )
+        por_email.update({l["email_norm"]: l for l in encontrados if l.get("email_norm")})
+        por_whatsapp.update({l["whatsapp_norm"]: l for l in encontrados if l.get("whatsapp_norm")})
+    return por_email, por_whatsapp
+
+
+async def _gravar_lote(repositorio, lote: list, relatorio: dict, simular: bool) -> None:
+    por_email, por_whatsapp = await _existentes(repositorio, [linha for _, linha in lote])
+    novos, atualizados = [], []
+    for numero, linha in lote:
+        encontrados = {
+            r["id"]: r for r in (por_email.get(linha["email"]), por_whatsapp.get(linha["whatsapp"])) if r
+        }
+        if len(encontrados) > 1:
+            _anotar(relatorio, "conflitos", numero, "e-mail e WhatsApp pertencem a cadastros diferentes")
+            continue
+        if not encontrados:
+            novos.append({**linha, "status": linha["status"] or STATUS_PADRAO,
+                          "convites_disponiveis": linha["convites_disponiveis"] or 0})
+            continue
+        existente = next(iter(encontrados.values()))
+        mesclado = {c: linha[c] if linha[c] is not None else existente.get(c) for c in COLUNAS_IMPORTACAO}
+        if any(mesclado[c] != existente.get(c) for c in COLUNAS_IMPORTACAO):
+            atualizados.append({"id": existente["id"], **mesclado})
+        else:
+            relatorio["sem_mudanca"] += 1
+
+    if not simular:
+        await repositorio.inserir_lote(repositorio.tabela, novos)
+        await repositorio.atualizar_lote(atualizados)
+    relatorio["inseridos"] += len(novos)
+    relatorio["atualizados"] += len(atualizados)
+    relatorio["lotes"] += 1
+
+
+def _anotar(relatorio: dict, tipo: str, numero: int, motivo: str) -> None:
+    relatorio[tipo] += 1
+    if len(relatorio["exemplos"]) < MAX_EXEMPLOS:
+        relatorio["exemplos"].append({"linha": numero, "problema": tipo, "motivo": motivo})
+
+
+async def importar(repositorio, linhas, tamanho_lote: int = 500, simular: bool = False) -> dict:
+    """Importa as linhas (async iterável de (número, dict)) em lotes. Retorna o relatório."""
+    relatorio = {
+        "lidas": 0, "inseridos": 0, "atualizados": 0, "sem_mudanca": 0,
+        "duplicados_no_arquivo": 0, "invalidos": 0, "conflitos": 0, "lotes": 0,
+        "simulacao": simular, "exemplos": [],
+    }
+    vistos = set()  # chaves já importadas neste arquivo (só as chaves, não as linhas)
+    lote = []
+    async for numero, bruto in linhas:
+        relatorio["lidas"] += 1
+        try:
+            linha = preparar(bruto)
+        except ValueError:
+            _anotar(relatorio, "invalidos", numero, "convites_disponiveis não é um número")
+            continue
+        if not linha["email"] and not linha["whatsapp"]:
+            _anotar(relatorio, "invalidos", numero, "sem e-mail nem WhatsApp")
+            continue
+        chaves = {("e", linha["email"]), ("w", linha["whatsapp"])} - {("e", None), ("w", None)}
+        if chaves & vistos:
+            _anotar(relatorio, "duplicados_no_arquivo", numero, "e-mail ou WhatsApp já apareceu antes no arquivo")
+            continue
+        vistos |= chaves
+        lote.append((numero, linha))
+        if len(lote) >= tamanho_lote:
+            await _gravar_lote(repositorio, lote, relatorio, simular)
+            lote = []
+    if lote:
+        await _gravar_lote(repositorio, lote, relatorio, simular)
+    log.info("📥 Importação: %s", {k: v for k, v in relatorio.items() if k != "exemplos"})
+    return relatorio
+
+
+# ============================================================
+# 📤 EXPORTAÇÃO
+# ============================================================
+async def exportar(repositorio, formato: str = "csv", tamanho_pagina: int = 1000):
+    """Gera o conteúdo de `cadastros` em pedaços de texto, página por página."""
+    colunas = ",".join(COLUNAS_EXPORTACAO)
+    if formato == "csv":
+        buffer = io.StringIO()
+        escritor = csv.DictWriter(buffer, fieldnames=COLUNAS_EXPORTACAO, extrasaction="ignore")
+        escritor.writeheader()
+        yield buffer.getvalue()
+    async for pagina in repositorio.paginar(colunas, tamanho_pagina):
+        if formato == "csv":
+            buffer.seek(0)
+            buffer.truncate()
+            escritor.writerows(pagina)
+            yield buffer.getvalue()
+        else:
+            yield "".join(json.dumps(linha, ensure_ascii=False, default=str) + "\n" for linha in pagina)
+
+
+# ============================================================
+# 🖥️ CLI
+# ============================================================
+async def _cli(argumentos) -> int:
+    from repositorio import RepositorioCadastros
+
+    repositorio = RepositorioCadastros.do_ambiente()
+    if repositorio is None:
+        print("⚠️ Defina SUPABASE_URL e SUPABASE_KEY.", file=sys.stderr)
+        return 1
+    try:
+        if argumentos.comando == "importar":
+            relatorio = await importar(
+                repositorio, linhas_csv(pedacos_arquivo(argumentos.arquivo)),
+                tamanho_lote=argumentos.lote, simular=argumentos.simular,
+            )
+            print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+        else:
+            async for pedaco in exportar(repositorio, argumentos.formato):
+                sys.stdout.write(pedaco)
+        return 0
+    finally:
+        await repositorio.fechar()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", stream=sys.stderr)
+    parser = argparse.ArgumentParser(description="Importação/exportação em massa de cadastros")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    p_importar = comandos.add_parser("importar", help="importa um CSV")
+    p_importar.add_argument("arquivo")
+    p_importar.add_argument("--lote", type=int, default=500)
+    p_importar.add_argument("--simular", action="store_true", help="só mostra o que faria")
+    p_exportar = comandos.add_parser("exportar", help="exporta cadastros para a saída padrão")
+    p_exportar.add_argument("--formato", choices=["csv", "jsonl"], default="csv")
+    sys.exit(asyncio.run(_cli(parser.parse_args())))
@@ -0,0 +1,226 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# limites.py — limite de taxa e corte de carga no /verificar
+# ===============================
+#
+# /verificar é público, sem login, e cada envio custa de uma a três idas ao
+# Supabase. O MiddlewareLimites decide antes de qualquer chamada externa:
+#   1. balde de fichas por IP (LIMITE_IP_POR_MINUTO, rajada LIMITE_IP_RAJADA);
+#   2. teto de requisições em voo na rota (LIMITE_SIMULTANEAS): acima dele,
+#      503 na hora em vez de enfileirar e deixar todo mundo lento;
+#   3. balde por identidade — e-mail e WhatsApp normalizados do formulário
+#      (LIMITE_IDENTIDADE_POR_MINUTO, rajada LIMITE_IDENTIDADE_RAJADA), para
+#      quem troca de IP mas martela os mesmos cadastros.
+# Estourou um balde → 429 com Retry-After. Baldes em memória, por processo;
+# com vários workers, no SQLite de compartilhado.py.
+#
+# O IP vem de scope["client"]. Atrás de proxy (Render), o uvicorn só troca
+# pelo X-Forwarded-For se o proxy for confiável: FORWARDED_ALLOW_IPS="*".
+#
+# LIMITES_ATIVOS=0 desliga tudo (ex. para medir o app sem proteção).
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+from identidade import normalizar_email, normalizar_telefone
+from metricas import METRICAS
+
+ROTAS_PROTEGIDAS = ("/verificar",)
+MAX_CORPO = 16 * 1024  # o formulário tem dois campos; mais que isso não é gente
+
+MENSAGENS = {
+    413: "<h3>Formulário grande demais.</h3>",
+    429: "<h3>Muitas tentativas seguidas. Aguarde alguns instantes e tente de novo.</h3>",
+    503: "<h3>Estamos com muitos acessos agora. Tente de novo em alguns segundos.</h3>",
+}
+
+
+# ============================================================
+# 🪣 BALDES DE FICHAS
+# ============================================================
+class BaldesDeFichas:
+    """Token bucket por chave (IP, e-mail...), com no máximo `max_chaves` baldes.
+
+    Cada balde enche `por_minuto` fichas por minuto até `rajada`. Ao passar
+    de `max_chaves`, o balde usado há mais tempo é esquecido — volta cheio,
+    o que só favorece quem estava quieto.
+    """
+
+    def __init__(self, por_minuto: float, rajada: int, max_chaves: int = 100_000, relogio=time.monotonic):
+        self.taxa = por_minuto / 60.0
+        self.rajada = float(rajada)
+        self.max_chaves = max_chaves
+        self._relogio = relogio
+        self._baldes = OrderedDict()  # chave -> (fichas, instante)
+        self._lock = threading.Lock()
+
+    def consumir(self, chaves) -> float:
+        """Tira uma ficha de cada chave. 0 se passou; senão, segundos até haver ficha.
+
+        É tudo ou nada: se alguma chave está vazia, nenhuma perde ficha.
+        """
+        if self.taxa <= 0:
+            return 0.0
+        with self._lock:
+            agora = self._relogio()
+            saldos = []
+            for chave in chaves:
+                fichas, instante = self._baldes.get(chave, (self.rajada, agora))
+                saldos.append((chave, min(self.rajada, fichas + (agora - instante) * self.taxa)))
+            espera = max(((1.0 - fichas) / self.taxa for _, fichas in saldos if fichas < 1.0), default=0.0)
+            if espera:
+                return espera
+            for chave, fichas in saldos:
+                self._baldes[chave] = (fichas - 1.0, agora)
+                self._baldes.move_to_end(chave)
+            while len(self._baldes) > self.max_chaves:
+                self._baldes.popitem(last=False)
+            return 0.0
+
+    def __len__(self) -> int:
+        return len(self._baldes)
+
+
+class Limites:
+    """Configuração e estado dos limites de um app."""
+
+    def __init__(self, por_ip: BaldesDeFichas, por_identidade: BaldesDeFichas, max_simultaneas: int):
+        self.por_ip = por_ip
+        self.por_identidade = por_identidade
+        self.max_simultaneas = max_simultaneas
+        self.em_voo = 0
+
+    @classmethod
+    def do_ambiente(cls, estado=None, nome_app: str = ""):
+        """Limites a partir do .env; None com LIMITES_ATIVOS=0.
+
+        Com `estado` (compartilhado.py), os baldes ficam no SQLite comum aos
+        workers; o teto de simultâneas continua por processo, porque protege
+        o loop de cada worker.
+        """
+        if os.getenv("LIMITES_ATIVOS", "1") != "1":
+            return None
+        max_chaves = int(os.getenv("LIMITE_MAX_CHAVES", "100000"))
+
+        def baldes(grupo: str, por_minuto: float, rajada: int):
+            if estado is not None:
+                return estado.baldes(f"{nome_app}:{grupo}", por_minuto, rajada, max_chaves)
+            return BaldesDeFichas(por_minuto, rajada, max_chaves)
+
+        return cls(
+            baldes("ip", float(os.getenv("LIMITE_IP_POR_MINUTO", "60")), int(os.getenv("LIMITE_IP_RAJADA", "30"))),
+            baldes(
+                "identidade",
+                float(os.getenv("LIMITE_IDENTIDADE_POR_MINUTO", "2")),
+                int(os.getenv("LIMITE_IDENTIDADE_RAJADA", "5")),
+            ),
+            int(os.getenv("LIMITE_SIMULTANEAS", "64")),
+        )
+
+
+def chaves_identidade(corpo: bytes) -> list:
+    """Chaves de identidade do formulário (x-www-form-urlencoded) já normalizadas."""
+    campos = parse_qs(corpo.decode("utf-8", "replace"))
+    email = normalizar_email((campos.get("email") or [""])[0])
+    whatsapp = normalizar_telefone((campos.get("whatsapp") or [""])[0])
+    return [chave for chave in (email and f"e:{email}", whatsapp and f"w:{whatsapp}") if chave]
+
+
+# ============================================================
+# 🚧 MIDDLEWARE ASGI
+# ============================================================
+class MiddlewareLimites:
+    """Aplica os limites nas rotas protegidas (POST). ASGI puro, como o de métricas."""
+
+    def __init__(self, app, nome_app: str, limites: Limites, rotas=ROTAS_PROTEGIDAS):
+        self.app = app
+        self.nome_app = nome_app
+        self.limites = limites
+        self.rotas = set(rotas)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.rotas:
+            await self.app(scope, receive, send)
+            return
+
+        # Para o middleware de métricas, que fica por fora, rotular as recusas
+        scope["rota_protegida"] = scope["path"]
+        limites = self.limites
+        ip = (scope.get("client") or ("?",))[0]
+        espera = limites.por_ip.consumir((ip,))
+        if espera:
+            await self._recusar(send, 429, "ip", espera)
+            return
+        if limites.em_voo >= limites.max_simultaneas:
+            await self._recusar(send, 503, "concorrencia", 1)
+            return
+
+        limites.em_voo += 1
+        try:
+            corpo, mensagens = await self._ler_corpo(receive)
+            if corpo is None:
+                await self._recusar(send, 413, "corpo", 0)
+                return
+            espera = limites.por_identidade.consumir(chaves_identidade(corpo))
+            if espera:
+                await self._recusar(send, 429, "identidade", espera)
+                return
+
+            async def reenviar():
+                # O app lê de novo o corpo que já consumimos
+                if mensagens:
+                    return mensagens.pop(0)
+                return await receive()
+
+            await self.app(scope, reenviar, send)
+        finally:
+            limites.em_voo -= 1
+
+    @staticmethod
+    async def _ler_corpo(receive) -> tuple:
+        """Lê o corpo inteiro (até MAX_CORPO). Devolve (bytes ou None, mensagens para reenviar)."""
+        mensagens, partes, tamanho = [], [], 0
+        while True:
+            mensagem = await receive()
+            mensagens.append(mensagem)
+            if mensagem["type"] != "http.request":
+                break
+            partes.append(mensagem.get("body", b""))
+            tamanho += len(partes[-1])
+            if tamanho > MAX_CORPO:
+                return None, mensagens
+            if not mensagem.get("more_body"):
+                break
+        return b"".join(partes), mensagens
+
+    async def _recusar(self, send, status: int, motivo: str, espera: float) -> None:
+        METRICAS.incrementar(
+            "prelude_limites_recusas_total", (("app", self.nome_app), ("motivo", motivo)),
+            ajuda="Requisições recusadas pelos limites antes de chegar ao app",
+        )
+        corpo = MENSAGENS[status].encode()
+        headers = [
+            (b"content-type", b"text/html; charset=utf-8"),
+            (b"content-length", str(len(corpo)).encode()),
+        ]
+        if espera:
+            headers.append((b"retry-after", str(max(1, math.ceil(espera))).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": corpo})
+
+
+def proteger(app, nome_app: str, rotas=ROTAS_PROTEGIDAS, estado=None):
+    """Liga os limites do .env nas rotas protegidas do app FastAPI. Devolve os Limites (ou None)."""
+    limites = Limites.do_ambiente(estado, nome_app)
+    if limites is None:
+        return None
+    app.add_middleware(MiddlewareLimites, nome_app=nome_app, limites=limites, rotas=rotas)
+    METRICAS.medidor(
+        "prelude_limites_em_voo", "Requisições em andamento nas rotas protegidas",
+        lambda: {(("app", nome_app),): limites.em_voo},
+    )
+    return limites
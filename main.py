@@ -5,26 +5,42 @@
 
 from fastapi import FastAPI, Request, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from datetime import datetime
+from cache import CacheTTL, AUSENTE
+from identidade import normalizar_email, normalizar_telefone
+from diario import DiarioLocal
+from imagens import StaticFilesComCache, registrar_helpers
+import estilos
 from dotenv import load_dotenv
-import pandas as pd
+from partida import importar_tardio
+from limites import proteger
+from metricas import configurar_logs, cronometrar, instalar
+from replica import ReplicaCadastros, chave_identidade, manter, medir
+from repositorio import ORCAMENTOS, RepositorioCadastros, valor_postgrest
+from resiliencia import Politica
+from sessoes import Sessoes
+import asyncio
 import os
-import re
-import requests
-import logging
+
+requests = importar_tardio("requests")
 
 # --- CONFIGURAÇÕES GERAIS ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ENV_PATH = os.path.join(BASE_DIR, ".env")
 load_dotenv(ENV_PATH)
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+log = configurar_logs("main")
 
 app = FastAPI(title="Prelude Golden Christmas 2025")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# O último middleware adicionado fica por fora: as métricas envolvem os limites
+# e contam também as recusas (429/503/413)
+proteger(app, "main")
+instalar(app, "main")
+app.mount("/static", StaticFilesComCache(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
+registrar_helpers(templates)
+estilos.registrar_helpers(templates)
 
 # --- SUPABASE CONFIG ---
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -32,9 +48,9 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_TABLE = "cadastros"
 
 if not SUPABASE_URL or not SUPABASE_KEY:
-    logging.warning("⚠️ Variáveis SUPABASE_URL e SUPABASE_KEY não configuradas.")
+    log.warning("⚠️ Variáveis SUPABASE_URL e SUPABASE_KEY não configuradas.")
 else:
-    logging.info(f"🔗 Conectando ao Supabase: {SUPABASE_URL}")
+    log.info("🔗 Conectando ao Supabase: %s", SUPABASE_URL)
 
 HEADERS = {
     "apikey": SUPABASE_KEY or "",
@@ -42,97 +58,190 @@ HEADERS = {
     "Content-Type": "application/json",
 }
 
-DB_PATH = os.path.join(BASE_DIR, "backup_database.csv")
+# Orçamentos, disjuntor e novas tentativas nas leituras: a mesma política do
+# repositorio.py (server.py e bot.py), aqui em volta das chamadas requests
+POLITICA = Politica.do_ambiente(
+    "supabase", "SUPABASE", ORCAMENTOS, orcamento_padrao=float(os.getenv("REPO_TIMEOUT", "5")),
+)
 
+# Diário local append-only (substitui o backup_database.csv)
+DIARIO = DiarioLocal.do_ambiente()
 
-# ============================================================
-# 📱 FUNÇÃO DE NORMALIZAÇÃO DE TELEFONE
-# ============================================================
-def normalizar_telefone(numero: str) -> str:
-    """Normaliza números de telefone para formato padrão (5521XXXXXXXX)."""
-    if not numero:
-        return ""
-    numero = re.sub(r"\D", "", numero)
-    numero = numero.lstrip("0")
-    if not numero.startswith("55"):
-        if numero.startswith("21"):
-            numero = "55" + numero
-        elif len(numero) == 11:
-            numero = "55" + numero
-    return numero
+# Cópia local de cadastros: leituras sem rede e fila de escritas durante quedas
+REPLICA = ReplicaCadastros.do_ambiente()
 
+# Quem passou pelo /verificar: id do cadastro num cookie assinado (sessoes.py)
+SESSOES = Sessoes.do_ambiente()
 
-# ============================================================
-# 💾 BACKUP LOCAL
-# ============================================================
-def salvar_backup_local(registro: dict) -> None:
-    try:
-        df = pd.DataFrame([registro])
-        if os.path.exists(DB_PATH):
-            df.to_csv(DB_PATH, mode="a", index=False, header=False)
-        else:
-            df.to_csv(DB_PATH, index=False)
-        logging.info(f"💾 Backup local salvo: {registro['email']}")
-    except Exception as e:
-        logging.error(f"Erro ao salvar backup local: {e}")
+# Cache de buscas por identidade: ("email_norm", x) / ("whatsapp_norm", y) → registro ou None
+# (e ("id", n) → registro, guardado pelo /verificar para a página do founder)
+CACHE_BUSCA = CacheTTL(
+    max_itens=int(os.getenv("CACHE_BUSCA_MAX", "2048")),
+    ttl=float(os.getenv("CACHE_BUSCA_TTL", "300")),
+    ttl_negativo=float(os.getenv("CACHE_BUSCA_TTL_NEGATIVO", "30")),
+)
 
 
 # ============================================================
 # 🔍 BUSCA NO SUPABASE
 # ============================================================
+class ErroSupabase(Exception):
+    """5xx ou 429 do PostgREST: conta no disjuntor e vale tentar de novo."""
+
+    def __init__(self, resposta):
+        super().__init__(f"{resposta.status_code} — {resposta.text}")
+        self.status = resposta.status_code
+
+
+def _supabase(operacao: str, metodo: str, idempotente: bool = False, **kwargs):
+    """Uma chamada requests à tabela dentro da POLITICA; 4xx volta como resposta."""
+    url = f"{SUPABASE_URL}/rest/v1/{SUPABASE_TABLE}"
+
+    def tentar(restante: float):
+        with cronometrar("supabase", SUPABASE_TABLE, metodo):
+            resposta = requests.request(metodo, url, headers=HEADERS, timeout=restante, **kwargs)
+        if resposta.status_code >= 500 or resposta.status_code == 429:
+            raise ErroSupabase(resposta)
+        return resposta
+
+    return POLITICA.executar_sync(operacao, tentar, idempotente=idempotente)
+
+
+def _chaves_identidade(email: str, whatsapp: str) -> list:
+    chaves = []
+    if email:
+        chaves.append(("email_norm", email))
+    if whatsapp:
+        chaves.append(("whatsapp_norm", whatsapp))
+    return chaves
+
+
 def buscar_supabase(email: str, whatsapp: str):
-    """Busca registro existente por e-mail OU WhatsApp."""
+    """Busca registro existente por e-mail OU WhatsApp.
+
+    Uma única consulta `or=(email_norm.eq…,whatsapp_norm.eq…)` nas chaves
+    indexadas (sql/002); o resultado (inclusive
+    "não encontrado") fica em CACHE_BUSCA, então repetições não vão à rede.
+    O e-mail tem prioridade sobre o WhatsApp, como antes.
+
+    Com a réplica local em dia, um acerto nela responde sem ir à rede; se o
+    Supabase falhar, vale o que a réplica tiver em vez de "não encontrado".
+    """
     if not SUPABASE_URL or not SUPABASE_KEY:
         return None
 
-    email = (email or "").strip().lower()
+    email = normalizar_email(email)
     whatsapp = normalizar_telefone(whatsapp)
+    chaves = _chaves_identidade(email, whatsapp)
+    if not chaves:
+        return None
+
+    # Cache: só responde daqui se todas as chaves pedidas forem conhecidas
+    em_cache = [CACHE_BUSCA.obter(chave) for chave in chaves]
+    if all(valor is not AUSENTE for valor in em_cache):
+        return next((valor for valor in em_cache if valor), None)
+
+    if REPLICA is not None and REPLICA.atualizada():
+        registro = REPLICA.buscar(email, whatsapp)
+        if registro:
+            return registro
 
     try:
-        # Busca exata por e-mail (sem codificação de %25)
-        query_email = f"?email=eq.{email}&select=*"
-        url_email = f"{SUPABASE_URL}/rest/v1/{SUPABASE_TABLE}{query_email}"
-        r1 = requests.get(url_email, headers=HEADERS, timeout=10)
-        logging.info(f"🔍 Busca por e-mail → {url_email} → {r1.status_code}")
-        if r1.ok and r1.json():
-            logging.info(f"✅ Registro encontrado via e-mail: {r1.json()[0]}")
-            return r1.json()[0]
-
-        # Busca exata por WhatsApp
-        if whatsapp:
-            query_whatsapp = f"?whatsapp=eq.{whatsapp}&select=*"
-            url_whatsapp = f"{SUPABASE_URL}/rest/v1/{SUPABASE_TABLE}{query_whatsapp}"
-            r2 = requests.get(url_whatsapp, headers=HEADERS, timeout=10)
-            logging.info(f"🔍 Busca por WhatsApp → {url_whatsapp} → {r2.status_code}")
-            if r2.ok and r2.json():
-                logging.info(f"✅ Registro encontrado via WhatsApp: {r2.json()[0]}")
-                return r2.json()[0]
-
-        logging.info("⚠️ Nenhum registro correspondente encontrado (email/whatsapp).")
-        return None
+        filtro = ",".join(f"{campo}.eq.{valor_postgrest(valor)}" for campo, valor in chaves)
+        resposta = _supabase("buscar", "GET", idempotente=True, params={"or": f"({filtro})", "select": "*"})
+        log.debug("🔍 Busca por e-mail/WhatsApp → %s", resposta.status_code)
+        if not resposta.ok:
+            log.error("❌ Erro Supabase: %s — %s", resposta.status_code, resposta.text)
+            return REPLICA.buscar(email, whatsapp) if REPLICA is not None else None
+        linhas = resposta.json()
+
+        encontrados = {}
+        for campo, valor in chaves:
+            registro = next((linha for linha in linhas if linha.get(campo) == valor), None)
+            encontrados[campo] = registro
+            CACHE_BUSCA.guardar((campo, valor), registro)
+
+        registro = encontrados.get("email_norm") or encontrados.get("whatsapp_norm")
+        if registro:
+            log.debug("✅ Registro encontrado: id %s", registro.get("id"))
+        else:
+            log.debug("Nenhum registro correspondente encontrado (email/whatsapp).")
+        return registro
 
     except Exception as e:
-        logging.error(f"Erro na busca Supabase: {e}")
+        log.error("Erro na busca Supabase: %s", e)
+        return REPLICA.buscar(email, whatsapp) if REPLICA is not None else None
+
+
+def buscar_por_id(id: int):
+    """Registro pelo id (página do founder): do cache, senão uma ida ao Supabase."""
+    registro = CACHE_BUSCA.obter(("id", id))
+    if registro is not AUSENTE:
+        return registro
+    if not SUPABASE_URL or not SUPABASE_KEY:
         return None
+    try:
+        resposta = _supabase("buscar", "GET", idempotente=True,
+                             params={"id": f"eq.{id}", "select": "*", "limit": 1})
+        if not resposta.ok:
+            log.error("❌ Erro Supabase: %s — %s", resposta.status_code, resposta.text)
+            return None
+        registro = next(iter(resposta.json()), None)
+    except Exception as e:
+        log.error("Erro na busca Supabase: %s", e)
+        return None
+    CACHE_BUSCA.guardar(("id", id), registro)
+    return registro
+
+
+def invalidar_busca(registro: dict) -> None:
+    """Remove do cache as chaves de identidade de um registro que mudou."""
+    email = normalizar_email(registro.get("email"))
+    whatsapp = normalizar_telefone(registro.get("whatsapp"))
+    for chave in _chaves_identidade(email, whatsapp):
+        CACHE_BUSCA.invalidar(chave)
+    if registro.get("id") is not None:
+        CACHE_BUSCA.invalidar(("id", registro["id"]))
 
 
 # ============================================================
 # 💾 SALVAMENTO NO SUPABASE
 # ============================================================
-def salvar_supabase(registro: dict) -> None:
+def salvar_supabase(registro: dict, fila: bool = True) -> bool:
+    """Envia o registro ao Supabase. Retorna True se foi gravado (lá ou na fila durável).
+
+    Se o Supabase estiver fora (ou já houver escritas esperando), o registro
+    vai para a fila da réplica e é reenviado, na ordem, quando ele voltar.
+    Com `fila=False`, True só quando o Supabase confirmou a gravação.
+    """
     if not SUPABASE_URL or not SUPABASE_KEY:
-        logging.warning("⚠️ Supabase não configurado, pulando upload remoto.")
-        return
+        log.warning("⚠️ Supabase não configurado, pulando upload remoto.")
+        return False
+    if REPLICA is not None and REPLICA.pendentes():
+        # não passa na frente do que está esperando
+        return fila and enfileirar_registro(registro)
     try:
-        url = f"{SUPABASE_URL}/rest/v1/{SUPABASE_TABLE}"
-        response = requests.post(url, headers=HEADERS, json=registro, timeout=10)
-        logging.info(f"Resposta Supabase: {response.status_code} — {response.text}")
+        response = _supabase("escrever", "POST", json=registro)
         if response.status_code in (200, 201):
-            logging.info(f"✅ Registro salvo: {registro['email']} ({registro['status']})")
-        else:
-            logging.error(f"❌ Erro Supabase: {response.status_code} — {response.text}")
+            log.debug("✅ Registro salvo (%s)", registro["status"])
+            return True
+        log.error("❌ Erro Supabase: %s — %s", response.status_code, response.text)
+        return False
     except Exception as e:
-        logging.error(f"⚠️ Falha ao conectar com Supabase: {e}")
+        # queda, 5xx/429 (ErroSupabase) ou disjuntor aberto
+        log.error("⚠️ Falha ao conectar com Supabase: %s", e)
+        return fila and enfileirar_registro(registro)
+    finally:
+        invalidar_busca(registro)
+
+
+def enfileirar_registro(registro: dict) -> bool:
+    """Guarda o insert na fila durável da réplica. True se ficou guardado."""
+    if REPLICA is None:
+        return False
+    REPLICA.enfileirar("inserir", registro, chave_identidade(registro))
+    log.warning("📥 Supabase indisponível; registro na fila da réplica (%d pendente(s))", REPLICA.pendentes())
+    return True
 
 
 # ============================================================
@@ -142,7 +251,7 @@ def get_status(email: str, whatsapp: str) -> str:
     registro = buscar_supabase(email, whatsapp)
     if registro:
         status = registro.get("status", "restrito")
-        logging.info(f"✅ Registro identificado: {registro}")
+        log.debug("✅ Registro identificado: id %s (%s)", registro.get("id"), status)
         return status
     return "restrito"
 
@@ -155,9 +264,11 @@ def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
+# def, não async def: buscar_supabase/salvar_supabase bloqueiam (requests e as
+# esperas da POLITICA) e o FastAPI roda rotas def no threadpool, fora do laço
 @app.post("/verificar", response_class=HTMLResponse)
-async def verificar(request: Request, email: str = Form(...), whatsapp: str = Form("")):
-    email = (email or "").strip().lower()
+def verificar(request: Request, email: str = Form(...), whatsapp: str = Form("")):
+    email = normalizar_email(email)
     whatsapp = normalizar_telefone(whatsapp)
     timestamp = datetime.now().isoformat()
 
@@ -165,7 +276,7 @@ async def verificar(request: Request, email: str = Form(...), whatsapp: str = Fo
 
     if existente:
         status = existente.get("status", "restrito")
-        logging.info(f"⚠️ Registro existente, não será duplicado: {email} ({status})")
+        log.debug("Registro existente, não será duplicado (%s)", status)
     else:
         status = "restrito"
         registro = {
@@ -178,17 +289,27 @@ async def verificar(request: Request, email: str = Form(...), whatsapp: str = Fo
             "convites_disponiveis": 0,
             "created_at": timestamp,
         }
-        salvar_backup_local(registro)
-        salvar_supabase(registro)
-        logging.info(f"🆕 Novo registro criado: {email} ({status})")
+        id_diario = DIARIO.registrar(registro)
+        if salvar_supabase(registro):
+            DIARIO.marcar_sincronizado(id_diario)
+        log.info("🆕 Novo registro criado (%s)", status)
 
     redirect_map = {"sócio": "/founder", "convidado": "/guest", "restrito": "/restrito"}
-    return RedirectResponse(url=redirect_map.get(status, "/restrito"), status_code=303)
+    resposta = RedirectResponse(url=redirect_map.get(status, "/restrito"), status_code=303)
+    if existente and existente.get("id") is not None:
+        # a página de destino já sai do cache, sem nova busca
+        CACHE_BUSCA.guardar(("id", existente["id"]), existente)
+        SESSOES.gravar(resposta, request, existente["id"])
+    return resposta
 
 
 @app.get("/founder", response_class=HTMLResponse)
 def founder_page(request: Request):
-    return templates.TemplateResponse("founder.html", {"request": request})
+    id = SESSOES.do_request(request)
+    socio = buscar_por_id(id) if id is not None else None
+    if not socio:
+        return RedirectResponse(url="/", status_code=303)
+    return templates.TemplateResponse("founder.html", {"request": request, "socio": socio})
 
 
 @app.get("/guest", response_class=HTMLResponse)
@@ -210,10 +331,31 @@ def optout(request: Request):
     return templates.TemplateResponse("index.html", {"request": request, "mensagem": mensagem})
 
 
+# ============================================================
+# 🔄 RÉPLICA LOCAL
+# ============================================================
+@app.on_event("startup")
+async def iniciar_replica():
+    repositorio = RepositorioCadastros.do_ambiente()
+    if REPLICA is not None and repositorio:
+        medir(REPLICA)
+        app.state.repositorio = repositorio
+        app.state.replica = asyncio.create_task(manter(REPLICA, repositorio))
+
+
+@app.on_event("shutdown")
+async def parar_replica():
+    if getattr(app.state, "replica", None):
+        app.state.replica.cancel()
+        await app.state.repositorio.fechar()
+    if REPLICA is not None:
+        REPLICA.fechar()
+
+
 # ============================================================
 # 🚀 EXECUÇÃO LOCAL
 # ============================================================
 if __name__ == "__main__":
     import uvicorn
-    logging.info("🚀 Servidor iniciado em http://127.0.0.1:8000")
+    log.info("🚀 Servidor iniciado em http://127.0.0.1:8000")
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,296 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# metricas.py — tempos por rota, chamadas externas, /metrics e logs
+# ===============================
+#
+# Três peças, sem dependência externa:
+#   - MiddlewareMetricas: middleware ASGI que mede cada requisição por rota
+#     (o template, ex. /api/socio/{id}, não o caminho) e conta os status;
+#   - cronometrar(servico, tabela, operacao): mede uma chamada ao Supabase ou
+#     à Graph API (funciona com `with` dentro de código síncrono ou assíncrono);
+#   - instalar(app, nome): liga o middleware e expõe GET /metrics no formato
+#     texto do Prometheus.
+#
+# `configurar_logs(nome)` troca os print() por logging com nível (LOG_NIVEL)
+# e, com LOG_FORMATO=json, uma linha JSON por evento.
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Segundos. Cobre de cache em memória (~100 µs) a chamada externa lenta.
+LIMITES_PADRAO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ============================================================
+# 📊 HISTOGRAMAS E CONTADORES
+# ============================================================
+class Histograma:
+    __slots__ = ("limites", "baldes", "soma", "contagem")
+
+    def __init__(self, limites=LIMITES_PADRAO):
+        self.limites = limites
+        self.baldes = [0] * (len(limites) + 1)  # o último é o +Inf
+        self.soma = 0.0
+        self.contagem = 0
+
+    def observar(self, valor: float) -> None:
+        self.baldes[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.contagem += 1
+
+
+class Metricas:
+    """Registro de histogramas/contadores com rótulos, seguro entre threads."""
+
+    def __init__(self, limites=LIMITES_PADRAO):
+        self.limites = limites
+        self._histogramas = {}  # (nome, rótulos) -> Histograma
+        self._contadores = {}   # (nome, rótulos) -> int
+        self._medidores = {}    # nome -> (ajuda, função que devolve {rótulos: valor})
+        self._ajuda = {}
+        self._lock = threading.Lock()
+        # Outros workers da máquina: função que devolve seus instantâneos (compartilhado.py)
+        self.vizinhos = None
+
+    def observar(self, nome: str, rotulos: tuple, valor: float, ajuda: str = "") -> None:
+        with self._lock:
+            histograma = self._histogramas.get((nome, rotulos))
+            if histograma is None:
+                histograma = self._histogramas[(nome, rotulos)] = Histograma(self.limites)
+                self._ajuda.setdefault(nome, ajuda)
+            histograma.observar(valor)
+
+    def incrementar(self, nome: str, rotulos: tuple, valor: int = 1, ajuda: str = "") -> None:
+        with self._lock:
+            self._contadores[(nome, rotulos)] = self._contadores.get((nome, rotulos), 0) + valor
+            self._ajuda.setdefault(nome, ajuda)
+
+    def medidor(self, nome: str, ajuda: str, funcao) -> None:
+        """Valor lido na hora da coleta (tamanho de fila, itens em cache...)."""
+        self._medidores[nome] = (ajuda, funcao)
+
+    def instantaneo(self) -> dict:
+        """Tudo o que este processo mediu, em JSON, para somar com outros workers."""
+        with self._lock:
+            histogramas = [[nome, rotulos, list(h.baldes), h.soma, h.contagem]
+                           for (nome, rotulos), h in self._histogramas.items()]
+            contadores = [[nome, rotulos, valor] for (nome, rotulos), valor in self._contadores.items()]
+            ajuda = dict(self._ajuda)
+        medidores = {}
+        for nome, (ajuda_medidor, funcao) in list(self._medidores.items()):
+            try:
+                valores = funcao()
+            except Exception as e:
+                logging.getLogger(__name__).warning("medidor %s falhou: %s", nome, e)
+                continue
+            if not isinstance(valores, dict):
+                valores = {(): valores}
+            medidores[nome] = [ajuda_medidor, [[rotulos, valor] for rotulos, valor in valores.items()
+                                               if valor is not None]]
+        return {"pid": os.getpid(), "histogramas": histogramas, "contadores": contadores,
+                "medidores": medidores, "ajuda": ajuda}
+
+    def exportar(self) -> str:
+        """Formato texto do Prometheus (text/plain; version=0.0.4).
+
+        Com `vizinhos` definido (compartilhado.py), soma os histogramas e
+        contadores dos outros workers; medidores ganham o rótulo `worker`.
+        """
+        instantaneos = [self.instantaneo()]
+        if self.vizinhos is not None:
+            try:
+                instantaneos += self.vizinhos()
+            except Exception as e:
+                logging.getLogger(__name__).warning("métricas dos outros workers indisponíveis: %s", e)
+
+        histogramas, contadores, medidores, ajuda = {}, {}, {}, {}
+        por_worker = len(instantaneos) > 1
+        for instantaneo in instantaneos:
+            ajuda.update({nome: texto for nome, texto in instantaneo["ajuda"].items() if nome not in ajuda})
+            for nome, rotulos, baldes, soma, contagem in instantaneo["histogramas"]:
+                chave = (nome, _tupla(rotulos))
+                anterior = histogramas.get(chave)
+                if anterior is None:
+                    histogramas[chave] = (list(baldes), soma, contagem)
+                else:
+                    histogramas[chave] = ([a + b for a, b in zip(anterior[0], baldes)],
+                                          anterior[1] + soma, anterior[2] + contagem)
+            for nome, rotulos, valor in instantaneo["contadores"]:
+                chave = (nome, _tupla(rotulos))
+                contadores[chave] = contadores.get(chave, 0) + valor
+            for nome, (ajuda_medidor, valores) in instantaneo["medidores"].items():
+                _, series = medidores.setdefault(nome, (ajuda_medidor, {}))
+                for rotulos, valor in valores:
+                    rotulos = _tupla(rotulos)
+                    if por_worker:
+                        rotulos += (("worker", instantaneo["pid"]),)
+                    series[rotulos] = valor
+
+        linhas = []
+        anunciados = set()
+
+        def cabecalho(nome, tipo, ajuda_nome):
+            if nome not in anunciados:
+                anunciados.add(nome)
+                linhas.append(f"# HELP {nome} {ajuda_nome or nome}")
+                linhas.append(f"# TYPE {nome} {tipo}")
+
+        for (nome, rotulos), (baldes, soma, contagem) in sorted(histogramas.items()):
+            cabecalho(nome, "histogram", ajuda.get(nome))
+            acumulado = 0
+            for limite, n in zip(self.limites + (float("inf"),), baldes):
+                acumulado += n
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                linhas.append(f"{nome}_bucket{_rotulos(rotulos + (('le', le),))} {acumulado}")
+            linhas.append(f"{nome}_sum{_rotulos(rotulos)} {soma:.6f}")
+            linhas.append(f"{nome}_count{_rotulos(rotulos)} {contagem}")
+
+        for (nome, rotulos), valor in sorted(contadores.items()):
+            cabecalho(nome, "counter", ajuda.get(nome))
+            linhas.append(f"{nome}{_rotulos(rotulos)} {valor}")
+
+        for nome, (ajuda_medidor, series) in sorted(medidores.items()):
+            cabecalho(nome, "gauge", ajuda_medidor)
+            for rotulos, valor in series.items():
+                linhas.append(f"{nome}{_rotulos(rotulos)} {valor}")
+        return "\n".join(linhas) + "\n"
+
+
+def _tupla(rotulos) -> tuple:
+    """Rótulos que voltaram do JSON como listas → tupla de pares, como na memória."""
+    return tuple(tuple(par) for par in rotulos)
+
+
+def _rotulos(rotulos: tuple) -> str:
+    if not rotulos:
+        return ""
+    partes = []
+    for chave, valor in rotulos:
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{chave}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+METRICAS = Metricas()
+
+
+# ============================================================
+# ⏱️ CHAMADAS EXTERNAS
+# ============================================================
+@contextmanager
+def cronometrar(servico: str, tabela: str, operacao: str):
+    """Mede uma chamada ao Supabase/Graph API. Exceções contam como resultado "erro"."""
+    inicio = time.perf_counter()
+    resultado = "ok"
+    try:
+        yield
+    except BaseException:
+        resultado = "erro"
+        raise
+    finally:
+        rotulos = (("servico", servico), ("tabela", tabela), ("operacao", operacao))
+        METRICAS.observar(
+            "prelude_upstream_segundos", rotulos, time.perf_counter() - inicio,
+            "Duração das chamadas ao Supabase e à Graph API",
+        )
+        METRICAS.incrementar(
+            "prelude_upstream_total", rotulos + (("resultado", resultado),),
+            ajuda="Chamadas ao Supabase e à Graph API por resultado",
+        )
+
+
+# ============================================================
+# 🌐 MIDDLEWARE ASGI
+# ============================================================
+class MiddlewareMetricas:
+    """Latência e status por rota. ASGI puro: nada de BaseHTTPMiddleware no caminho."""
+
+    def __init__(self, app, nome_app: str, metricas: Metricas = METRICAS):
+        self.app = app
+        self.nome_app = nome_app
+        self.metricas = metricas
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            # Template da rota (o roteador grava em scope["route"]); recusada pelo
+            # limites.py antes do roteador, a rota protegida (caminho fixo); sem rota = 404
+            rota = getattr(scope.get("route"), "path", None) or scope.get("rota_protegida") or "(sem rota)"
+            rotulos = (("app", self.nome_app), ("metodo", scope["method"]), ("rota", rota))
+            self.metricas.observar(
+                "prelude_http_segundos", rotulos, time.perf_counter() - inicio,
+                "Duração das requisições HTTP por rota",
+            )
+            self.metricas.incrementar(
+                "prelude_http_respostas_total", rotulos + (("status", status),),
+                ajuda="Respostas HTTP por rota e status",
+            )
+
+
+def instalar(app, nome_app: str, metricas: Metricas = METRICAS) -> None:
+    """Liga o middleware e registra GET /metrics no app FastAPI."""
+    from fastapi.responses import PlainTextResponse
+
+    app.add_middleware(MiddlewareMetricas, nome_app=nome_app, metricas=metricas)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4")
+
+
+# ============================================================
+# 📝 LOGS
+# ============================================================
+class FormatoJSON(logging.Formatter):
+    """Uma linha JSON por evento; campos passados em `extra=` entram no objeto."""
+
+    PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+    def format(self, registro: logging.LogRecord) -> str:
+        evento = {
+            "ts": self.formatTime(registro, "%Y-%m-%dT%H:%M:%S"),
+            "nivel": registro.levelname,
+            "logger": registro.name,
+            "msg": registro.getMessage(),
+        }
+        evento.update({k: v for k, v in vars(registro).items() if k not in self.PADRAO})
+        if registro.exc_info:
+            evento["exc"] = self.formatException(registro.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+def configurar_logs(nome: str) -> logging.Logger:
+    """Configura o logging do processo (uma vez) e devolve o logger do app."""
+    raiz = logging.getLogger()
+    if not getattr(raiz, "_prelude_configurado", False):
+        saida = logging.StreamHandler(sys.stdout)
+        if os.getenv("LOG_FORMATO", "texto") == "json":
+            saida.setFormatter(FormatoJSON())
+        else:
+            saida.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s"))
+        raiz.handlers[:] = [saida]
+        raiz.setLevel(os.getenv("LOG_NIVEL", "INFO").upper())
+        # O httpx loga cada requisição em INFO: barulho demais no caminho quente
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        raiz._prelude_configurado = True
+    return logging.getLogger(nome)
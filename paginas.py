@@ -0,0 +1,152 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# paginas.py — cache de páginas pré-renderizadas e pré-comprimidas
+# ===============================
+#
+# Cada template é renderizado uma vez (na partida) e guardado em três
+# variantes: original, gzip e brotli (se o pacote `brotli` estiver instalado).
+# Servir uma página vira uma consulta a dicionário: escolhe a variante pelo
+# Accept-Encoding e responde 304 se o If-None-Match bater com o ETag.
+#
+# Em desenvolvimento (PAGINAS_RECARREGAR=1) o template é re-renderizado quando
+# o arquivo muda no disco.
+#
+# Páginas com dados da pessoa (a do sócio, com o saldo de convites) não cabem
+# no cache: `resposta_com_dados` renderiza a cada requisição — o template é
+# compilado uma vez pelo Jinja e o CSS crítico sai do cache de estilos.py — e
+# comprime com gzip rápido, sem ETag nem cache no navegador.
+
+import gzip
+import hashlib
+import logging
+import os
+import threading
+
+from fastapi.responses import HTMLResponse, Response
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele servimos só gzip
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+
+class Pagina:
+    __slots__ = ("variantes", "etags", "mtime")
+
+    def __init__(self, html: str, mtime: float):
+        corpo = html.encode("utf-8")
+        digest = hashlib.sha256(corpo).hexdigest()[:32]
+        self.mtime = mtime
+        self.variantes = {"identity": corpo, "gzip": gzip.compress(corpo, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.variantes["br"] = brotli.compress(corpo, quality=11)
+        # ETag forte por representação: o mesmo conteúdo comprimido é outro corpo
+        self.etags = {
+            codificacao: f'"{digest}"' if codificacao == "identity" else f'"{digest}-{codificacao}"'
+            for codificacao in self.variantes
+        }
+
+
+def _escolher_codificacao(accept_encoding: str, disponiveis) -> str:
+    aceitas = set()
+    for parte in accept_encoding.split(","):
+        nome, _, parametros = parte.strip().partition(";")
+        if parametros.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        aceitas.add(nome.strip().lower())
+    for codificacao in ("br", "gzip"):
+        if codificacao in disponiveis and (codificacao in aceitas or "*" in aceitas):
+            return codificacao
+    return "identity"
+
+
+class CachePaginas:
+    """Páginas estáticas renderizadas uma vez e servidas da memória."""
+
+    def __init__(self, templates, templates_dir, recarregar: bool = False, pos_processar=None):
+        self.env = templates.env
+        self.templates_dir = templates_dir
+        self.recarregar = recarregar
+        self.pos_processar = pos_processar
+        self._paginas = {}
+        self._lock = threading.Lock()
+
+    def carregar(self, nomes) -> None:
+        """Pré-renderiza os templates; os que falharem ficam para o primeiro acesso."""
+        for nome in nomes:
+            try:
+                self._renderizar(nome)
+            except Exception as e:
+                log.warning("⚠️ Não foi possível pré-renderizar %s: %r", nome, e)
+
+    def _renderizar(self, nome: str):
+        caminho = os.path.join(self.templates_dir, nome)
+        with self._lock:
+            mtime = os.path.getmtime(caminho)
+            html = self.env.get_template(nome).render()
+            if self.pos_processar:
+                html = self.pos_processar(html)
+            pagina = Pagina(html, mtime)
+            self._paginas[nome] = pagina
+            return pagina
+
+    def obter(self, nome: str) -> Pagina:
+        pagina = self._paginas.get(nome)
+        if pagina is None:
+            return self._renderizar(nome)
+        if self.recarregar and os.path.getmtime(os.path.join(self.templates_dir, nome)) != pagina.mtime:
+            return self._renderizar(nome)
+        return pagina
+
+    def resposta(self, nome: str, request) -> Response:
+        try:
+            pagina = self.obter(nome)
+        except FileNotFoundError:
+            caminho = os.path.join(self.templates_dir, nome)
+            return HTMLResponse(
+                content=f"<h1>Arquivo não encontrado:</h1><p>{caminho}</p>",
+                status_code=500
+            )
+        except Exception as e:
+            log.exception("🚨 Erro ao renderizar %s: %r", nome, e)
+            return HTMLResponse(f"<h3>Erro ao renderizar {nome}:</h3><pre>{e}</pre>", status_code=500)
+
+        codificacao = _escolher_codificacao(request.headers.get("accept-encoding", ""), pagina.variantes)
+        etag = pagina.etags[codificacao]
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            pedidas = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if "*" in pedidas or pedidas & set(pagina.etags.values()):
+                return Response(status_code=304, headers=headers)
+
+        if codificacao != "identity":
+            headers["Content-Encoding"] = codificacao
+        return Response(
+            content=pagina.variantes[codificacao],
+            media_type="text/html; charset=utf-8",
+            headers=headers,
+        )
+
+    def resposta_com_dados(self, nome: str, request, contexto: dict) -> Response:
+        try:
+            html = self.env.get_template(nome).render(**contexto)
+            if self.pos_processar:
+                html = self.pos_processar(html)
+        except Exception as e:
+            log.exception("🚨 Erro ao renderizar %s: %r", nome, e)
+            return HTMLResponse(f"<h3>Erro ao renderizar {nome}:</h3><pre>{e}</pre>", status_code=500)
+
+        corpo = html.encode("utf-8")
+        headers = {"Cache-Control": "private, no-store", "Vary": "Accept-Encoding, Cookie"}
+        if _escolher_codificacao(request.headers.get("accept-encoding", ""), ("gzip",)) == "gzip":
+            corpo = gzip.compress(corpo, compresslevel=6, mtime=0)
+            headers["Content-Encoding"] = "gzip"
+        return Response(content=corpo, media_type="text/html; charset=utf-8", headers=headers)
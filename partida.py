@@ -0,0 +1,27 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# partida.py — utilitários de partida rápida (imports tardios)
+# ===============================
+
+import importlib.util
+import sys
+
+
+def importar_tardio(nome: str):
+    """Devolve o módulo `nome` sem executá-lo ainda.
+
+    O código do módulo só roda no primeiro acesso a um atributo, então
+    dependências pesadas (httpx, supabase, pandas…) saem do tempo de boot e
+    passam a custar apenas na primeira requisição que realmente as usa.
+    """
+    if nome in sys.modules:
+        return sys.modules[nome]
+    spec = importlib.util.find_spec(nome)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {nome!r}", name=nome)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nome] = modulo
+    loader.exec_module(modulo)
+    return modulo
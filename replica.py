@@ -0,0 +1,509 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# replica.py — réplica local (SQLite) de cadastros e fila de escritas
+# ===============================
+#
+# Modo degradado: com o Supabase lento ou fora, as leituras continuam saindo
+# de uma cópia local e as escritas esperam numa fila durável.
+#
+#   - ReplicaCadastros: SQLite (WAL) com os cadastros indexados por id,
+#     email_norm e whatsapp_norm; uma busca local leva microssegundos.
+#     Sincroniza por (updated_at, id) (sql/004) em páginas keyset, relendo
+#     os últimos REPLICA_JANELA segundos para não perder transações que
+#     commitaram fora de ordem. Exclusões vêm de cadastros_excluidos.
+#   - Fila de escritas (tabela `fila`): inserir/atualizar/excluir que não
+#     chegaram ao Supabase, reenviadas na ordem. Enquanto houver fila, as
+#     escritas novas entram atrás dela para não passar na frente.
+#   - RepositorioReplicado: mesma interface do RepositorioCadastros (server.py),
+#     lendo local primeiro e escrevendo no Supabase ou na fila.
+#   - manter(): laço de fundo que reenvia a fila e sincroniza.
+#
+# Convites (registrar_convites) não entram na fila: o saldo só é confiável
+# no Supabase, então durante a queda a rota responde erro como antes.
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from compartilhado import ConexaoLocal
+from identidade import normalizar_email, normalizar_telefone
+from metricas import METRICAS
+from repositorio import ErroRepositorio, temporario
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+log = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cadastros (
+    id INTEGER PRIMARY KEY,
+    email_norm TEXT,
+    whatsapp_norm TEXT,
+    dados TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cadastros_email_norm ON cadastros (email_norm);
+CREATE INDEX IF NOT EXISTS cadastros_whatsapp_norm ON cadastros (whatsapp_norm);
+CREATE TABLE IF NOT EXISTS estado (chave TEXT PRIMARY KEY, valor TEXT);
+CREATE TABLE IF NOT EXISTS fila (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    operacao TEXT NOT NULL,
+    chave TEXT,
+    dados TEXT NOT NULL,
+    criada_em REAL NOT NULL,
+    erro TEXT
+);
+CREATE INDEX IF NOT EXISTS fila_pendentes ON fila (seq) WHERE erro IS NULL;
+"""
+
+
+def _valor_postgrest(valor) -> str:
+    return '"' + str(valor).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def recuar(ts: str, janela: float) -> str:
+    """Volta um cursor `janela` segundos: releitura barata, nada se perde."""
+    try:
+        return (datetime.fromisoformat(ts) - timedelta(seconds=janela)).isoformat()
+    except ValueError:
+        return ts
+
+
+async def paginas_depois(repositorio, tabela: str, coluna_ts: str, colunas: str, ts, ultimo_id: int,
+                         tamanho_pagina: int = 1000):
+    """Páginas keyset de `tabela` depois de (ts, ultimo_id), em ordem (coluna_ts, id).
+
+    ts None = desde o começo. Usado pela réplica e pelo índice da portaria (checkin.py).
+    """
+    while True:
+        filtros = {"order": f"{coluna_ts}.asc,id.asc"}
+        if ts:
+            ts_q = _valor_postgrest(ts)
+            filtros["or"] = f"({coluna_ts}.gt.{ts_q},and({coluna_ts}.eq.{ts_q},id.gt.{ultimo_id}))"
+        pagina = await repositorio.selecionar(filtros, colunas, limite=tamanho_pagina, tabela=tabela)
+        if not pagina:
+            return
+        yield pagina
+        ts, ultimo_id = pagina[-1][coluna_ts], pagina[-1]["id"]
+        if len(pagina) < tamanho_pagina:
+            return
+
+
+# ============================================================
+# 🗄️ RÉPLICA
+# ============================================================
+class ReplicaCadastros:
+    """Cópia local de `cadastros` + fila durável das escritas pendentes."""
+
+    def __init__(self, caminho: str, janela: float = 5.0, max_atraso: float = 30.0):
+        self.caminho = caminho
+        self.janela = janela
+        self.max_atraso = max_atraso
+        # FULL: uma escrita aceita na fila sobrevive a queda de energia, não só do processo
+        self._local = ConexaoLocal(caminho, ESQUEMA, sincronismo="FULL")
+
+    # Uma conexão e um lock por processo (os workers do gunicorn nascem de fork)
+    @property
+    def _conexao(self):
+        return self._local.conexao
+
+    @property
+    def _lock(self):
+        return self._local.lock
+
+    @classmethod
+    def do_ambiente(cls):
+        """Réplica do .env; None com REPLICA_ATIVA=0."""
+        if os.getenv("REPLICA_ATIVA", "1") != "1":
+            return None
+        return cls(
+            os.getenv("REPLICA_DB", os.path.join(BASE_DIR, "diario", "replica.sqlite3")),
+            janela=float(os.getenv("REPLICA_JANELA", "5")),
+            max_atraso=float(os.getenv("REPLICA_MAX_ATRASO", "30")),
+        )
+
+    # --------------------------------------------------------
+    # Leitura local
+    # --------------------------------------------------------
+    def _uma(self, sql: str, parametros: tuple):
+        with self._lock:
+            linha = self._conexao.execute(sql, parametros).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def buscar_por_id(self, id):
+        return self._uma("SELECT dados FROM cadastros WHERE id = ?", (int(id),))
+
+    def buscar_por_email(self, email: str):
+        email = normalizar_email(email)
+        return self._uma("SELECT dados FROM cadastros WHERE email_norm = ?", (email,)) if email else None
+
+    def buscar_por_whatsapp(self, whatsapp: str):
+        whatsapp = normalizar_telefone(whatsapp)
+        return self._uma("SELECT dados FROM cadastros WHERE whatsapp_norm = ?", (whatsapp,)) if whatsapp else None
+
+    def buscar(self, email: str, whatsapp: str):
+        """E-mail tem prioridade sobre WhatsApp, como no main.py."""
+        return self.buscar_por_email(email) or self.buscar_por_whatsapp(whatsapp)
+
+    @property
+    def sincronizado_em(self):
+        """Início da última sincronização completa, feita por qualquer worker da máquina."""
+        valor = self._estado("sincronizado_em")
+        return float(valor) if valor else None
+
+    def atraso(self):
+        """Segundos desde o início da última sincronização completa (None = nunca)."""
+        sincronizado_em = self.sincronizado_em
+        return None if sincronizado_em is None else max(0.0, time.time() - sincronizado_em)
+
+    def atualizada(self) -> bool:
+        atraso = self.atraso()
+        return atraso is not None and atraso <= self.max_atraso
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conexao.execute("SELECT count(*) FROM cadastros").fetchone()[0]
+
+    # --------------------------------------------------------
+    # Escrita local
+    # --------------------------------------------------------
+    def guardar(self, linhas: list, exceto=()) -> None:
+        """Grava/atualiza linhas completas de `cadastros` (com id)."""
+        registros = [
+            (
+                linha["id"],
+                normalizar_email(linha.get("email")) or None,
+                normalizar_telefone(linha.get("whatsapp")) or None,
+                json.dumps(linha, ensure_ascii=False, default=str),
+            )
+            for linha in linhas if linha and linha.get("id") is not None and linha["id"] not in exceto
+        ]
+        if not registros:
+            return
+        with self._lock:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                self._conexao.executemany(
+                    "INSERT INTO cadastros (id, email_norm, whatsapp_norm, dados) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET email_norm = excluded.email_norm, "
+                    "whatsapp_norm = excluded.whatsapp_norm, dados = excluded.dados",
+                    registros,
+                )
+                self._conexao.execute("COMMIT")
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+
+    def remover(self, ids: list) -> None:
+        with self._lock:
+            self._conexao.executemany("DELETE FROM cadastros WHERE id = ?", [(int(i),) for i in ids])
+
+    def _estado(self, chave: str):
+        with self._lock:
+            linha = self._conexao.execute("SELECT valor FROM estado WHERE chave = ?", (chave,)).fetchone()
+        return linha[0] if linha else None
+
+    def _gravar_estado(self, chave: str, valor) -> None:
+        with self._lock:
+            self._conexao.execute(
+                "INSERT INTO estado (chave, valor) VALUES (?, ?) "
+                "ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor",
+                (chave, json.dumps(valor) if not isinstance(valor, str) else valor),
+            )
+
+    # --------------------------------------------------------
+    # Sincronização incremental
+    # --------------------------------------------------------
+    def _cursor(self, nome: str) -> tuple:
+        valor = self._estado(f"cursor_{nome}")
+        return tuple(json.loads(valor)) if valor else (None, 0)
+
+    async def _percorrer(self, repositorio, tabela: str, coluna_ts: str, colunas: str, tamanho_pagina: int):
+        """Páginas de `tabela` depois do cursor salvo, em ordem (coluna_ts, id)."""
+        ts, ultimo_id = self._cursor(tabela)
+        if ts:
+            ts, ultimo_id = recuar(ts, self.janela), 0
+        async for pagina in paginas_depois(repositorio, tabela, coluna_ts, colunas, ts, ultimo_id, tamanho_pagina):
+            yield pagina
+            cursor = (pagina[-1][coluna_ts], pagina[-1]["id"])
+            anterior = self._cursor(tabela)
+            if anterior[0] is None or cursor > tuple(anterior):
+                self._gravar_estado(f"cursor_{tabela}", list(cursor))
+
+    async def sincronizar(self, repositorio, tamanho_pagina: int = 1000) -> int:
+        """Traz do Supabase o que mudou desde a última vez. Retorna quantas linhas vieram."""
+        with self._local.exclusivo() as minha_vez:
+            if not minha_vez:
+                return 0  # outro worker já está sincronizando a mesma réplica
+            inicio = time.time()
+            total = 0
+            tabela = getattr(repositorio, "tabela", "cadastros")
+            async for pagina in self._percorrer(repositorio, tabela, "updated_at", "*", tamanho_pagina):
+                # Linha com escrita na fila: a versão local (já com a mudança) vale mais
+                self.guardar(pagina, exceto=self._ids_na_fila())
+                total += len(pagina)
+            async for pagina in self._percorrer(
+                repositorio, f"{tabela}_excluidos", "excluido_em", "id,excluido_em", tamanho_pagina
+            ):
+                self.remover([linha["id"] for linha in pagina])
+                total += len(pagina)
+            self._gravar_estado("sincronizado_em", str(inicio))
+            return total
+
+    # --------------------------------------------------------
+    # Fila de escritas
+    # --------------------------------------------------------
+    def enfileirar(self, operacao: str, dados: dict, chave: str = None) -> int:
+        """Guarda uma escrita para reenviar depois. Uma só por (operação, chave) pendente."""
+        with self._lock:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                if chave:
+                    existente = self._conexao.execute(
+                        "SELECT seq FROM fila WHERE erro IS NULL AND operacao = ? AND chave = ?",
+                        (operacao, chave),
+                    ).fetchone()
+                    if existente and operacao == "inserir":
+                        self._conexao.execute("COMMIT")
+                        return existente[0]
+                cursor = self._conexao.execute(
+                    "INSERT INTO fila (operacao, chave, dados, criada_em) VALUES (?, ?, ?, ?)",
+                    (operacao, chave, json.dumps(dados, ensure_ascii=False, default=str), time.time()),
+                )
+                self._conexao.execute("COMMIT")
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+        return cursor.lastrowid
+
+    def pendentes(self) -> int:
+        with self._lock:
+            return self._conexao.execute("SELECT count(*) FROM fila WHERE erro IS NULL").fetchone()[0]
+
+    def _ids_na_fila(self) -> set:
+        with self._lock:
+            chaves = self._conexao.execute(
+                "SELECT chave FROM fila WHERE erro IS NULL AND chave LIKE 'id:%'"
+            ).fetchall()
+        return {int(c[0][3:]) for c in chaves}
+
+    def _proximos(self, limite: int) -> list:
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT seq, operacao, dados FROM fila WHERE erro IS NULL ORDER BY seq LIMIT ?", (limite,)
+            ).fetchall()
+        return [(seq, operacao, json.loads(dados)) for seq, operacao, dados in linhas]
+
+    def _concluir(self, seq: int, erro: str = None) -> None:
+        with self._lock:
+            if erro is None:
+                self._conexao.execute("DELETE FROM fila WHERE seq = ?", (seq,))
+            else:
+                # Falha definitiva: fica registrada para análise, fora da fila
+                self._conexao.execute("UPDATE fila SET erro = ? WHERE seq = ?", (erro, seq))
+
+    async def reenviar(self, repositorio) -> int:
+        """Reenvia a fila na ordem, parando na primeira falha temporária."""
+        enviados = 0
+        with self._local.exclusivo() as minha_vez:
+            if not minha_vez:
+                return 0  # outro processo já está reenviando
+            try:
+                while itens := self._proximos(100):
+                    for seq, operacao, dados in itens:
+                        try:
+                            await self._aplicar(repositorio, operacao, dados)
+                        except ErroRepositorio as e:
+                            if temporario(e):
+                                raise
+                            log.error("❌ Escrita da fila descartada (%s #%s): %s", operacao, seq, e)
+                            METRICAS.incrementar("prelude_replica_descartes_total", (("operacao", operacao),),
+                                                 ajuda="Escritas da fila recusadas pelo Supabase")
+                            self._concluir(seq, str(e))
+                            continue
+                        self._concluir(seq)
+                        enviados += 1
+            finally:
+                if enviados:
+                    log.info("🔁 %d escrita(s) da fila reenviadas ao Supabase", enviados)
+        return enviados
+
+    async def _aplicar(self, repositorio, operacao: str, dados: dict) -> None:
+        if operacao == "inserir":
+            self.guardar([await repositorio.inserir(dados)])
+        elif operacao == "atualizar":
+            self.guardar(await repositorio.atualizar(dados["id"], dados["campos"]))
+        elif operacao == "excluir":
+            await repositorio.excluir(dados["id"])
+            self.remover([dados["id"]])
+        else:
+            raise ValueError(f"operação desconhecida na fila: {operacao}")
+
+    def fechar(self) -> None:
+        self._local.fechar()
+
+
+def chave_identidade(registro: dict):
+    email = normalizar_email(registro.get("email"))
+    whatsapp = normalizar_telefone(registro.get("whatsapp"))
+    return f"e:{email}" if email else f"w:{whatsapp}" if whatsapp else None
+
+
+# ============================================================
+# 🔀 REPOSITÓRIO COM RÉPLICA
+# ============================================================
+class RepositorioReplicado:
+    """RepositorioCadastros com leituras locais e escritas que sobrevivem à queda.
+
+    Leitura: com a réplica em dia, um acerto local responde sem ir à rede; um
+    "não encontrado" ainda confirma no Supabase (pode ser um cadastro de
+    segundos atrás). Com o Supabase fora, vale o que a réplica tiver.
+    O que não está aqui (rpc, selecionar, lotes...) vai direto ao Supabase;
+    registrar_convites também, mas traz o saldo novo para a réplica.
+    """
+
+    def __init__(self, repositorio, replica: ReplicaCadastros):
+        self.repositorio = repositorio
+        self.replica = replica
+
+    def __getattr__(self, nome):
+        return getattr(self.repositorio, nome)
+
+    async def _ler(self, local, remoto):
+        if self.replica.atualizada():
+            linha = local()
+            if linha is not None:
+                return linha
+        try:
+            linha = await remoto()
+        except ErroRepositorio as e:
+            if not temporario(e):
+                raise
+            log.warning("⚠️ Supabase indisponível, lendo da réplica local: %s", e)
+            return local()
+        if linha:
+            self.replica.guardar([linha])
+        return linha
+
+    async def buscar_por_id(self, id: int, colunas: str = "*"):
+        if colunas != "*":
+            return await self.repositorio.buscar_por_id(id, colunas)
+        return await self._ler(lambda: self.replica.buscar_por_id(id), lambda: self.repositorio.buscar_por_id(id))
+
+    async def buscar_por_email(self, email: str):
+        return await self._ler(
+            lambda: self.replica.buscar_por_email(email), lambda: self.repositorio.buscar_por_email(email)
+        )
+
+    async def buscar_por_whatsapp(self, whatsapp: str):
+        return await self._ler(
+            lambda: self.replica.buscar_por_whatsapp(whatsapp), lambda: self.repositorio.buscar_por_whatsapp(whatsapp)
+        )
+
+    async def buscar_por_identidade(self, email: str, whatsapp: str):
+        return await self._ler(
+            lambda: self.replica.buscar(email, whatsapp), lambda: self.repositorio.buscar_por_identidade(email, whatsapp)
+        )
+
+    async def _escrever(self, remoto) -> tuple:
+        """(True, resultado) se a escrita foi ao Supabase; (False, None) se vai para a fila."""
+        if self.replica.pendentes():
+            return False, None  # não passa na frente do que está esperando
+        try:
+            return True, await remoto()
+        except ErroRepositorio as e:
+            if not temporario(e):
+                raise
+            log.warning("⚠️ Supabase indisponível, escrita vai para a fila: %s", e)
+            return False, None
+
+    async def inserir(self, registro: dict):
+        """Linha criada, ou None se o cadastro ficou na fila (ainda sem id)."""
+        enviado, linha = await self._escrever(lambda: self.repositorio.inserir(registro))
+        if enviado:
+            self.replica.guardar([linha])
+            return linha
+        self.replica.enfileirar("inserir", registro, chave_identidade(registro))
+        return None
+
+    async def atualizar(self, id: int, campos: dict) -> list:
+        enviado, alteradas = await self._escrever(lambda: self.repositorio.atualizar(id, campos))
+        if enviado:
+            self.replica.guardar(alteradas)
+            return alteradas
+        self.replica.enfileirar("atualizar", {"id": id, "campos": campos}, f"id:{id}")
+        local = self.replica.buscar_por_id(id)
+        if local is None:
+            return []
+        local.update(campos)
+        self.replica.guardar([local])
+        return [local]
+
+    async def registrar_convites(self, socio_id: int, convidados: list) -> dict:
+        """RPC direto ao Supabase; o saldo que ele devolve já vale na réplica.
+
+        Sem isso, até a próxima sincronização a leitura local devolveria o
+        saldo de antes do débito (e o cache da página do sócio o guardaria).
+        """
+        try:
+            resultado = await self.repositorio.registrar_convites(socio_id, convidados)
+        except ErroRepositorio as e:
+            if temporario(e):
+                # timeout ou 5xx: o débito pode ter acontecido; relê do Supabase
+                await self._reler(socio_id)
+            raise
+        restantes = (resultado or {}).get("convites_restantes")
+        local = self.replica.buscar_por_id(socio_id)
+        if restantes is not None and local is not None:
+            local["convites_disponiveis"] = restantes
+            self.replica.guardar([local])
+        return resultado
+
+    async def _reler(self, id: int) -> None:
+        try:
+            linha = await self.repositorio.buscar_por_id(id)
+        except ErroRepositorio as e:
+            log.warning("⚠️ Não deu para reler o cadastro %s do Supabase: %s", id, e)
+            return
+        if linha:
+            self.replica.guardar([linha], exceto=self.replica._ids_na_fila())
+
+    async def excluir(self, id: int) -> None:
+        enviado, _ = await self._escrever(lambda: self.repositorio.excluir(id))
+        if not enviado:
+            self.replica.enfileirar("excluir", {"id": id}, f"id:{id}")
+        self.replica.remover([id])
+
+
+# ============================================================
+# 🔄 LAÇO DE FUNDO
+# ============================================================
+def medir(replica: ReplicaCadastros) -> None:
+    METRICAS.medidor(
+        "prelude_replica_atraso_segundos", "Segundos desde a última sincronização completa da réplica",
+        replica.atraso,
+    )
+    METRICAS.medidor("prelude_replica_linhas", "Cadastros na réplica local", lambda: len(replica))
+    METRICAS.medidor("prelude_replica_fila", "Escritas esperando o Supabase voltar", replica.pendentes)
+
+
+async def manter(replica: ReplicaCadastros, repositorio, intervalo: float = None) -> None:
+    """Reenvia a fila e sincroniza, para sempre. Rodar com asyncio.create_task."""
+    intervalo = intervalo if intervalo is not None else float(os.getenv("REPLICA_INTERVALO", "2"))
+    fora_do_ar = False
+    while True:
+        try:
+            await replica.reenviar(repositorio)
+            await replica.sincronizar(repositorio)
+            if fora_do_ar:
+                log.info("✅ Supabase de volta; réplica sincronizada")
+            fora_do_ar = False
+        except ErroRepositorio as e:
+            if not fora_do_ar:
+                log.warning("⚠️ Sincronização da réplica falhou: %s", e)
+            fora_do_ar = True
+        except Exception as e:
+            log.exception("🚨 Erro na manutenção da réplica: %s", e)
+        await asyncio.sleep(intervalo)
@@ -0,0 +1,285 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# repositorio.py — acesso assíncrono à tabela cadastros (PostgREST)
+# ===============================
+
+import asyncio
+import os
+
+from identidade import normalizar_email, normalizar_telefone
+from metricas import cronometrar
+from partida import importar_tardio
+from resiliencia import CircuitoAberto, OrcamentoEsgotado, Politica
+
+httpx = importar_tardio("httpx")
+
+
+class ErroRepositorio(Exception):
+    """Falha ao falar com o PostgREST: timeout, conexão ou status de erro."""
+
+    def __init__(self, mensagem: str, status: int = None):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def temporario(erro: ErroRepositorio) -> bool:
+    """Queda, timeout, 5xx ou 429: vale tentar de novo. 4xx é definitivo."""
+    return erro.status is None or erro.status >= 500 or erro.status == 429
+
+
+def _temporario(erro: Exception) -> bool:
+    return not isinstance(erro, ErroRepositorio) or temporario(erro)
+
+
+def duplicado(erro: ErroRepositorio) -> bool:
+    """409/23505: um índice único (email_norm, whatsapp_norm...) já tem a chave."""
+    return erro.status == 409
+
+
+def valor_postgrest(valor: str) -> str:
+    """Protege o valor para uso dentro de um filtro or=(...) do PostgREST."""
+    return '"' + valor.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+# Orçamento por operação (segundos, tentativas incluídas); o resto usa REPO_TIMEOUT
+ORCAMENTOS = {"buscar": 2.0}
+HEDGE_MS = 300  # consultas por chave: uma segunda cópia se a primeira passar disso
+
+
+# ============================================================
+# 🗄️ REPOSITÓRIO DE CADASTROS
+# ============================================================
+class RepositorioCadastros:
+    """Cliente assíncrono da tabela `cadastros`.
+
+    Um único `httpx.AsyncClient` (pool com keep-alive) é compartilhado por
+    todas as rotas; um semáforo limita quantas chamadas ficam em voo ao mesmo
+    tempo. Cada chamada passa pela `politica` (resiliencia.py): orçamento de
+    tempo por operação, disjuntor, novas tentativas nas leituras e hedge nas
+    consultas por chave. Disjuntor aberto vira ErroRepositorio sem status
+    (temporário), o mesmo de uma queda: a réplica e a fila assumem na hora.
+    Aponta para qualquer servidor compatível com PostgREST — em testes, um
+    stand-in local via `transport`.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        chave: str,
+        tabela: str = "cadastros",
+        max_conexoes: int = 20,
+        max_simultaneas: int = 20,
+        timeout: float = 5.0,
+        transport: "httpx.AsyncBaseTransport" = None,
+        politica: Politica = None,
+    ):
+        self.tabela = tabela
+        self.timeout = timeout
+        self.politica = politica or Politica(
+            "supabase", {op: min(s, timeout) for op, s in ORCAMENTOS.items()}, orcamento_padrao=timeout,
+            hedge_apos=HEDGE_MS / 1000, temporario=_temporario,
+        )
+        self._semaforo = asyncio.Semaphore(max_simultaneas)
+        self._cliente = httpx.AsyncClient(
+            base_url=f"{url.rstrip('/')}/rest/v1",
+            headers={
+                "apikey": chave,
+                "Authorization": f"Bearer {chave}",
+                "Content-Type": "application/json",
+            },
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=max_conexoes,
+                max_keepalive_connections=max_conexoes,
+                keepalive_expiry=30.0,
+            ),
+            transport=transport,
+        )
+
+    @classmethod
+    def do_ambiente(cls):
+        """Monta o repositório a partir do .env; None se o Supabase não estiver configurado."""
+        url = os.getenv("SUPABASE_URL")
+        chave = os.getenv("SUPABASE_KEY")
+        if not url or not chave:
+            return None
+        timeout = float(os.getenv("REPO_TIMEOUT", "5"))
+        return cls(
+            url,
+            chave,
+            max_conexoes=int(os.getenv("REPO_MAX_CONEXOES", "20")),
+            max_simultaneas=int(os.getenv("REPO_MAX_SIMULTANEAS", "20")),
+            timeout=timeout,
+            politica=Politica.do_ambiente(
+                "supabase", "SUPABASE", ORCAMENTOS, orcamento_padrao=timeout, hedge_ms=HEDGE_MS,
+                temporario=_temporario,
+            ),
+        )
+
+    # --------------------------------------------------------
+    # Núcleo HTTP
+    # --------------------------------------------------------
+    async def _requisitar(self, metodo: str, caminho: str, *, params=None, json=None,
+                          prefer: str = None, timeout: float = None, operacao: str = None):
+        """Uma chamada ao PostgREST dentro da política do serviço.
+
+        `operacao` escolhe o orçamento ("buscar", "ler", "escrever"...); só GET
+        é repetido, e só "buscar" tem hedge. `timeout` limita cada tentativa.
+        """
+        headers = {"Prefer": prefer} if prefer else None
+        operacao = operacao or ("ler" if metodo == "GET" else "escrever")
+
+        async def tentar(restante: float):
+            async with self._semaforo:
+                with cronometrar("supabase", caminho.strip("/"), metodo):
+                    try:
+                        resp = await self._cliente.request(
+                            metodo,
+                            caminho,
+                            params=params,
+                            json=json,
+                            headers=headers,
+                            timeout=min(restante, timeout or self.timeout),
+                        )
+                    except httpx.TimeoutException as e:
+                        raise ErroRepositorio(f"Timeout em {metodo} {caminho}") from e
+                    except httpx.HTTPError as e:
+                        raise ErroRepositorio(f"Falha de conexão em {metodo} {caminho}: {e}") from e
+
+                    if resp.status_code >= 400:
+                        raise ErroRepositorio(f"{resp.status_code} — {resp.text}", resp.status_code)
+            return resp.json() if resp.content else []
+
+        try:
+            return await self.politica.executar(operacao, tentar, idempotente=metodo == "GET", hedge=operacao == "buscar")
+        except (CircuitoAberto, OrcamentoEsgotado) as e:
+            raise ErroRepositorio(f"{e} ({metodo} {caminho})") from e
+
+    # --------------------------------------------------------
+    # Leitura
+    # --------------------------------------------------------
+    async def selecionar(self, filtros: dict, colunas: str = "*", limite: int = None, tabela: str = None,
+                         operacao: str = "ler") -> list:
+        """Lê de `cadastros` ou, com `tabela`, de outra tabela/view (ex. os agregados do painel)."""
+        params = {"select": colunas, **filtros}
+        if limite:
+            params["limit"] = str(limite)
+        return await self._requisitar("GET", f"/{tabela or self.tabela}", params=params, operacao=operacao)
+
+    async def buscar_por_id(self, id: int, colunas: str = "*"):
+        linhas = await self.selecionar({"id": f"eq.{id}"}, colunas, limite=1, operacao="buscar")
+        return linhas[0] if linhas else None
+
+    async def buscar_por_email(self, email: str):
+        """Igualdade exata na chave indexada email_norm (sql/002)."""
+        email = normalizar_email(email)
+        if not email:
+            return None
+        linhas = await self.selecionar({"email_norm": f"eq.{email}"}, limite=1, operacao="buscar")
+        return linhas[0] if linhas else None
+
+    async def buscar_por_whatsapp(self, whatsapp: str):
+        """Igualdade exata na chave indexada whatsapp_norm (sql/002)."""
+        whatsapp = normalizar_telefone(whatsapp)
+        if not whatsapp:
+            return None
+        linhas = await self.selecionar({"whatsapp_norm": f"eq.{whatsapp}"}, limite=1, operacao="buscar")
+        return linhas[0] if linhas else None
+
+    async def buscar_por_identidade(self, email: str, whatsapp: str):
+        """Cadastro com o e-mail OU o WhatsApp, numa consulta só (sql/002).
+
+        Com as duas chaves em cadastros diferentes, vale o do e-mail, como em
+        main.buscar_supabase.
+        """
+        chaves = [
+            (coluna, valor)
+            for coluna, valor in (("email_norm", normalizar_email(email)), ("whatsapp_norm", normalizar_telefone(whatsapp)))
+            if valor
+        ]
+        if not chaves:
+            return None
+        filtro = ",".join(f"{coluna}.eq.{valor_postgrest(valor)}" for coluna, valor in chaves)
+        linhas = await self.selecionar({"or": f"({filtro})"}, limite=len(chaves), operacao="buscar")
+        return next((linha for coluna, valor in chaves for linha in linhas if linha.get(coluna) == valor), None)
+
+    # --------------------------------------------------------
+    # Escrita
+    # --------------------------------------------------------
+    async def inserir(self, registro: dict) -> dict:
+        linhas = await self._requisitar(
+            "POST", f"/{self.tabela}", json=registro, prefer="return=representation"
+        )
+        return linhas[0] if linhas else None
+
+    async def atualizar(self, id: int, campos: dict) -> list:
+        return await self._requisitar(
+            "PATCH", f"/{self.tabela}", params={"id": f"eq.{id}"},
+            json=campos, prefer="return=representation",
+        )
+
+    async def excluir(self, id: int) -> None:
+        await self._requisitar("DELETE", f"/{self.tabela}", params={"id": f"eq.{id}"})
+
+    async def inserir_lote(self, tabela: str, linhas: list, ignorar_conflito_em: str = None) -> None:
+        """Insere várias linhas de qualquer tabela num único POST.
+
+        Com `ignorar_conflito_em` (coluna com índice único), linhas que já
+        existem são puladas em vez de derrubar o lote: reenviar é inofensivo.
+        """
+        if not linhas:
+            return
+        if ignorar_conflito_em:
+            await self._requisitar(
+                "POST", f"/{tabela}", params={"on_conflict": ignorar_conflito_em}, json=linhas,
+                prefer="resolution=ignore-duplicates,return=minimal",
+            )
+        else:
+            await self._requisitar("POST", f"/{tabela}", json=linhas, prefer="return=minimal")
+
+    async def atualizar_lote(self, linhas: list) -> None:
+        """Atualiza várias linhas de `cadastros` num único POST (upsert pela chave primária).
+
+        Todas as linhas precisam ter `id` e as mesmas colunas.
+        """
+        if linhas:
+            await self._requisitar(
+                "POST", f"/{self.tabela}", params={"on_conflict": "id"}, json=linhas,
+                prefer="resolution=merge-duplicates,return=minimal",
+            )
+
+    async def paginar(self, colunas: str = "*", tamanho_pagina: int = 1000, filtros: dict = None,
+                      depois_de: int = 0):
+        """Percorre a tabela em ordem de id, uma página por vez (keyset, sem OFFSET).
+
+        `depois_de` retoma de um id já visto (checkpoint de quem percorre).
+        """
+        ultimo = depois_de
+        while True:
+            pagina = await self.selecionar(
+                {**(filtros or {}), "id": f"gt.{ultimo}", "order": "id.asc"}, colunas, limite=tamanho_pagina
+            )
+            if not pagina:
+                return
+            yield pagina
+            if len(pagina) < tamanho_pagina:
+                return
+            ultimo = pagina[-1]["id"]
+
+    async def rpc(self, funcao: str, parametros: dict):
+        return await self._requisitar("POST", f"/rpc/{funcao}", json=parametros)
+
+    async def registrar_convites(self, socio_id: int, convidados: list) -> dict:
+        """Resgate atômico: debita e insere os convidados numa só chamada (sql/001)."""
+        return await self.rpc("registrar_convites", {"p_socio_id": socio_id, "p_convidados": convidados})
+
+    async def mesclar_cadastros(self, grupos: list) -> dict:
+        """Mescla um lote de grupos duplicados numa transação (sql/006)."""
+        return await self.rpc("mesclar_cadastros", {"p_grupos": grupos})
+
+    async def aquecer(self) -> None:
+        """Abre uma conexão do pool (DNS + TLS) antes da primeira requisição real."""
+        await self.selecionar({}, "id", limite=1)
+
+    async def fechar(self) -> None:
+        await self._cliente.aclose()
@@ -0,0 +1,305 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# resiliencia.py — orçamento de latência, disjuntor, novas tentativas e hedge
+# ===============================
+#
+# Uma Politica por serviço externo (Supabase, Graph API), usada pelos
+# clientes de repositorio.py e whatsapp.py (server.py e bot.py) e pelas
+# chamadas `requests` do main.py. Cada chamada diz a sua operação e:
+#   1. tem um orçamento total de tempo (tentativas e espera incluídas):
+#      ninguém fica pendurado num serviço que parou de responder;
+#   2. passa por um disjuntor: com falhas demais na janela recente, ele abre
+#      e as chamadas falham na hora (CircuitoAberto) — quem chamou serve o
+#      que tiver (réplica local, fila de escritas) em vez de esperar timeout.
+#      Depois de `espera` segundos, deixa passar uma chamada de teste;
+#   3. se for leitura (idempotente), tenta de novo com espera aleatória
+#      (full jitter) enquanto sobrar orçamento;
+#   4. se for consulta com hedge, dispara uma segunda cópia quando a primeira
+#      passa de `hedge_apos` e fica com a que responder primeiro.
+#
+# Configuração pelo .env, com o prefixo do serviço (SUPABASE_, GRAPH_):
+#   <P>_ORCAMENTO_<OPERACAO>   segundos por operação (ex. SUPABASE_ORCAMENTO_BUSCAR=1.5)
+#   <P>_TENTATIVAS             tentativas das leituras (padrão 3)
+#   <P>_HEDGE_MS               atraso do hedge nas consultas; 0 desliga
+#   <P>_DISJUNTOR_LIMIAR       fração de falhas que abre (padrão 0.5)
+#   <P>_DISJUNTOR_MINIMO       chamadas mínimas na janela antes de abrir (padrão 20)
+#   <P>_DISJUNTOR_ESPERA       segundos aberto até a chamada de teste (padrão 5)
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+
+from metricas import METRICAS
+
+log = logging.getLogger(__name__)
+
+FECHADO, ABERTO, MEIO_ABERTO = "fechado", "aberto", "meio_aberto"
+
+# Políticas vivas no processo, para o medidor do /metrics
+_POLITICAS = weakref.WeakSet()
+
+
+class CircuitoAberto(Exception):
+    """O disjuntor do serviço está aberto: a chamada nem saiu."""
+
+
+class OrcamentoEsgotado(Exception):
+    """Acabou o tempo da operação antes de uma resposta."""
+
+
+# ============================================================
+# 🔌 DISJUNTOR
+# ============================================================
+class Disjuntor:
+    """Abre com `limiar` de falhas nas últimas `janela` chamadas (pelo menos `minimo`).
+
+    Aberto, recusa tudo por `espera` segundos; depois deixa passar uma
+    chamada de teste por vez (meio aberto): sucesso fecha, falha reabre.
+    Seguro para uso a partir de várias threads (main.py).
+    """
+
+    def __init__(self, nome: str, limiar: float = 0.5, minimo: int = 20, janela: int = 50,
+                 espera: float = 5.0, relogio=time.monotonic):
+        self.nome = nome
+        self.limiar = limiar
+        self.minimo = minimo
+        self.espera = espera
+        self._relogio = relogio
+        self._resultados = deque(maxlen=max(janela, minimo))
+        self._estado = FECHADO
+        self._aberto_em = 0.0
+        self._testando = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            if self._estado == ABERTO and self._relogio() - self._aberto_em >= self.espera:
+                return MEIO_ABERTO
+            return self._estado
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self._estado == FECHADO:
+                return True
+            if self._estado == ABERTO:
+                if self._relogio() - self._aberto_em < self.espera:
+                    return False
+                self._estado = MEIO_ABERTO
+            if self._testando:
+                return False
+            self._testando = True
+            return True
+
+    def registrar(self, sucesso: bool) -> None:
+        with self._lock:
+            if self._estado == MEIO_ABERTO:
+                self._testando = False
+                if sucesso:
+                    log.info("✅ %s respondeu: disjuntor fechado", self.nome)
+                    self._estado = FECHADO
+                    self._resultados.clear()
+                else:
+                    self._abrir()
+                return
+            if self._estado == ABERTO:
+                return  # resposta atrasada de antes de abrir
+            self._resultados.append(sucesso)
+            falhas = self._resultados.count(False)
+            if len(self._resultados) >= self.minimo and falhas / len(self._resultados) >= self.limiar:
+                log.warning("🔌 %s: %d falhas em %d chamadas, disjuntor aberto por %.0fs",
+                            self.nome, falhas, len(self._resultados), self.espera)
+                self._abrir()
+
+    def liberar(self) -> None:
+        """Chamada de teste que terminou sem resultado (cancelada): outra pode testar."""
+        with self._lock:
+            self._testando = False
+
+    def _abrir(self) -> None:
+        self._estado = ABERTO
+        self._aberto_em = self._relogio()
+        self._testando = False
+
+
+# ============================================================
+# 🛡️ POLÍTICA POR SERVIÇO
+# ============================================================
+class Politica:
+    """Orçamentos, disjuntor, novas tentativas e hedge de um serviço externo.
+
+    `temporario(erro)` diz se uma falha conta contra o serviço (queda,
+    timeout, 5xx) e merece nova tentativa; as demais (ex. 4xx) mostram que o
+    serviço está de pé e sobem direto.
+    """
+
+    def __init__(self, nome: str, orcamentos: dict = None, orcamento_padrao: float = 5.0,
+                 disjuntor: Disjuntor = None, tentativas: int = 3, atraso_base: float = 0.05,
+                 atraso_max: float = 1.0, hedge_apos: float = 0.0, temporario=None):
+        self.nome = nome
+        self.orcamentos = dict(orcamentos or {})
+        self.orcamento_padrao = orcamento_padrao
+        self.disjuntor = disjuntor or Disjuntor(nome)
+        self.tentativas = max(1, tentativas)
+        self.atraso_base = atraso_base
+        self.atraso_max = atraso_max
+        self.hedge_apos = hedge_apos
+        self.temporario = temporario or (lambda erro: True)
+        _POLITICAS.add(self)
+
+    @classmethod
+    def do_ambiente(cls, nome: str, prefixo: str, orcamentos: dict, orcamento_padrao: float,
+                    hedge_ms: float = 0.0, temporario=None):
+        def valor(chave, padrao):
+            return float(os.getenv(f"{prefixo}_{chave}", str(padrao)))
+
+        return cls(
+            nome,
+            orcamentos={op: valor(f"ORCAMENTO_{op.upper()}", s) for op, s in orcamentos.items()},
+            orcamento_padrao=orcamento_padrao,
+            disjuntor=Disjuntor(
+                nome,
+                limiar=valor("DISJUNTOR_LIMIAR", 0.5),
+                minimo=int(valor("DISJUNTOR_MINIMO", 20)),
+                espera=valor("DISJUNTOR_ESPERA", 5.0),
+            ),
+            tentativas=int(valor("TENTATIVAS", 3)),
+            hedge_apos=valor("HEDGE_MS", hedge_ms) / 1000,
+            temporario=temporario,
+        )
+
+    def orcamento(self, operacao: str) -> float:
+        return self.orcamentos.get(operacao, self.orcamento_padrao)
+
+    def _contar(self, evento: str) -> None:
+        METRICAS.incrementar(
+            "prelude_resiliencia_total", (("servico", self.nome), ("evento", evento)),
+            ajuda="Novas tentativas, hedges e recusas do disjuntor por serviço",
+        )
+
+    def _espera(self, tentativa: int, restante: float) -> float:
+        return min(restante, random.uniform(0, min(self.atraso_max, self.atraso_base * 2 ** tentativa)))
+
+    def _resultado(self, erro: Exception) -> bool:
+        """Registra a falha no disjuntor; True se ela é temporária."""
+        temporario = self.temporario(erro)
+        self.disjuntor.registrar(not temporario)
+        return temporario
+
+    # --------------------------------------------------------
+    # Assíncrono (server.py, bot.py)
+    # --------------------------------------------------------
+    async def executar(self, operacao: str, chamada, idempotente: bool = False, hedge: bool = False):
+        """`await chamada(timeout)` dentro do orçamento de `operacao`.
+
+        Leituras (`idempotente`) são repetidas; `hedge` dispara uma cópia
+        quando a primeira demora mais que `hedge_apos`.
+        """
+        loop = asyncio.get_running_loop()
+        prazo = loop.time() + self.orcamento(operacao)
+        tentativas = self.tentativas if idempotente else 1
+        for tentativa in range(tentativas):
+            restante = prazo - loop.time()
+            if restante <= 0:
+                break
+            try:
+                if hedge and idempotente and self.hedge_apos:
+                    resultado = await self._com_hedge(chamada, prazo)
+                else:
+                    resultado = await self._uma(chamada, prazo)
+            except (CircuitoAberto, OrcamentoEsgotado):
+                raise
+            except Exception as erro:
+                if not self._resultado(erro) or tentativa == tentativas - 1:
+                    raise
+                self._contar("nova_tentativa")
+                await asyncio.sleep(self._espera(tentativa, prazo - loop.time()))
+                continue
+            self.disjuntor.registrar(True)
+            return resultado
+        self._contar("orcamento_esgotado")
+        raise OrcamentoEsgotado(f"{self.nome}: {operacao} passou de {self.orcamento(operacao):.1f}s")
+
+    async def _uma(self, chamada, prazo: float):
+        loop = asyncio.get_running_loop()
+        if not self.disjuntor.permitir():
+            self._contar("circuito_aberto")
+            raise CircuitoAberto(f"{self.nome} indisponível (disjuntor aberto)")
+        restante = prazo - loop.time()
+        try:
+            # asyncio.timeout, não wait_for: no 3.11 o wait_for pode engolir o
+            # cancelamento de quem chamou (campanha cancelada seguiria enviando)
+            async with asyncio.timeout(restante):
+                return await chamada(restante)
+        except TimeoutError:
+            self.disjuntor.registrar(False)
+            self._contar("orcamento_esgotado")
+            raise OrcamentoEsgotado(f"{self.nome}: sem resposta em {restante:.1f}s") from None
+        except asyncio.CancelledError:
+            self.disjuntor.liberar()
+            raise
+
+    async def _com_hedge(self, chamada, prazo: float):
+        loop = asyncio.get_running_loop()
+        tarefas = [asyncio.ensure_future(self._uma(chamada, prazo))]
+        try:
+            feitas, _ = await asyncio.wait(tarefas, timeout=min(self.hedge_apos, max(0.0, prazo - loop.time())))
+            if not feitas and prazo - loop.time() > 0 and self.disjuntor.estado == FECHADO:
+                self._contar("hedge")
+                tarefas.append(asyncio.ensure_future(self._uma(chamada, prazo)))
+            erro = None
+            pendentes = set(tarefas)
+            while pendentes:
+                feitas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in feitas:
+                    if tarefa.exception() is None:
+                        if tarefa is not tarefas[0]:
+                            self._contar("hedge_venceu")
+                        return tarefa.result()
+                    erro = erro or tarefa.exception()
+            raise erro
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+
+    # --------------------------------------------------------
+    # Síncrono (main.py, requests)
+    # --------------------------------------------------------
+    def executar_sync(self, operacao: str, chamada, idempotente: bool = False):
+        """Como `executar`, sem hedge, para código síncrono: `chamada(timeout)`.
+
+        Bloqueia quem chama (inclusive nas esperas entre tentativas): chame
+        fora do laço de eventos — rotas `def` do FastAPI rodam no threadpool.
+        """
+        prazo = time.monotonic() + self.orcamento(operacao)
+        tentativas = self.tentativas if idempotente else 1
+        for tentativa in range(tentativas):
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            if not self.disjuntor.permitir():
+                self._contar("circuito_aberto")
+                raise CircuitoAberto(f"{self.nome} indisponível (disjuntor aberto)")
+            try:
+                resultado = chamada(restante)
+            except Exception as erro:
+                if not self._resultado(erro) or tentativa == tentativas - 1:
+                    raise
+                self._contar("nova_tentativa")
+                time.sleep(self._espera(tentativa, prazo - time.monotonic()))
+                continue
+            self.disjuntor.registrar(True)
+            return resultado
+        self._contar("orcamento_esgotado")
+        raise OrcamentoEsgotado(f"{self.nome}: {operacao} passou de {self.orcamento(operacao):.1f}s")
+
+
+METRICAS.medidor(
+    "prelude_disjuntor_aberto", "1 se o disjuntor do serviço está aberto (ou testando)",
+    lambda: {(("servico", p.nome),): int(p.disjuntor.estado != FECHADO) for p in list(_POLITICAS)},
+)
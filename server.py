@@ -1,11 +1,30 @@
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from supabase import create_client
 from dotenv import load_dotenv
 from pathlib import Path
+from repositorio import RepositorioCadastros, ErroRepositorio, duplicado
+from cache import AUSENTE, CacheTTL, ContadoresCache
+from compartilhado import EstadoCompartilhado, compartilhar_metricas
+from identidade import normalizar_email, normalizar_telefone
+from paginas import CachePaginas
+from imagens import StaticFilesComCache, registrar_helpers
+from limites import proteger
+from metricas import METRICAS, configurar_logs, instalar
+from importacao import ErroImportacao, exportar, importar, linhas_csv
+from deduplicacao import deduplicar
+from replica import ReplicaCadastros, RepositorioReplicado, chave_identidade, manter, medir
+from sessoes import Sessoes
+import checkin
+import estilos
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+import asyncio
+import hashlib
+import hmac
+import json
 import os
+import time
 
 # ==============================================================
 # 🚀 Inicialização e leitura do .env
@@ -13,49 +32,73 @@ import os
 
 base_dir = Path(__file__).resolve().parent
 env_path = base_dir / ".env"
-print("🧠 Carregando variáveis de ambiente...", env_path)
 load_dotenv(dotenv_path=env_path)
+log = configurar_logs("server")
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-print("✅ .env encontrado:", env_path.exists())
-print("🔗 SUPABASE_URL =", SUPABASE_URL)
-print("🔑 SUPABASE_KEY =", (SUPABASE_KEY[:8] + "...") if SUPABASE_KEY else None)
+AQUECER_NA_PARTIDA = os.getenv("AQUECER_NA_PARTIDA", "1") == "1"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+CHECKIN_TOKEN = os.getenv("CHECKIN_TOKEN")
 
 # ==============================================================
-# ⚙️ Conexão com o Supabase
+# ⚙️ Conexão com o Supabase (criada no primeiro uso)
 # ==============================================================
 
-supabase = None
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-        print("✅ Conectado ao Supabase com sucesso.")
-    except Exception as e:
-        print("🚨 Erro ao conectar ao Supabase:", e)
-else:
-    print("⚠️ Variáveis SUPABASE_URL ou SUPABASE_KEY não definidas no .env")
+_repositorio = None
+
+# Cópia local de cadastros para quando o Supabase estiver lento ou fora (replica.py)
+REPLICA = ReplicaCadastros.do_ambiente()
+
+# Com vários workers (gunicorn.conf.py): cache, limites e métricas comuns a todos
+ESTADO = EstadoCompartilhado.do_ambiente()
+
+# Quem já passou pelo /verificar: id do cadastro num cookie assinado (sessoes.py)
+SESSOES = Sessoes.do_ambiente()
+
+
+def obter_repositorio():
+    """Cria o repositório no primeiro uso; None se o Supabase não estiver configurado."""
+    global _repositorio
+    if _repositorio is None:
+        _repositorio = RepositorioCadastros.do_ambiente()
+        if _repositorio and REPLICA is not None:
+            _repositorio = RepositorioReplicado(_repositorio, REPLICA)
+    return _repositorio
 
 # ==============================================================
 # 🌐 Configuração do servidor FastAPI
 # ==============================================================
 
 app = FastAPI(title="Prelude Golden Christmas 2025 — Sistema de Convites")
+# O último middleware adicionado fica por fora: as métricas envolvem os limites
+# e contam também as recusas (429/503/413)
+proteger(app, "server", estado=ESTADO)
+instalar(app, "server")
 
 templates_dir = base_dir / "templates"
 static_dir = base_dir / "static"
-print("📂 templates_dir:", templates_dir.resolve())
-print("📂 static_dir   :", static_dir.resolve())
 
 try:
-    app.mount("/static", StaticFiles(directory=str(static_dir), check_dir=False), name="static")
+    app.mount("/static", StaticFilesComCache(directory=str(static_dir), check_dir=False), name="static")
     if not static_dir.exists():
-        print("⚠️ AVISO: pasta 'static/' não encontrada. O app sobe mesmo assim; arquivos estáticos retornarão 404.")
+        log.warning("⚠️ Pasta 'static/' não encontrada. O app sobe mesmo assim; arquivos estáticos retornarão 404.")
 except Exception as e:
-    print("🚨 Falha ao montar /static:", e)
+    log.error("🚨 Falha ao montar /static: %s", e)
 
 templates = Jinja2Templates(directory=str(templates_dir.resolve()))
+registrar_helpers(templates)
+estilos.registrar_helpers(templates)
+
+# Páginas sem dados por usuário: renderizadas uma vez e servidas da memória
+# (a do sócio leva o saldo de convites: renderizada por requisição)
+PAGINAS_ESTATICAS = ["index.html", "convidado.html", "restrito.html", "painel.html"]
+paginas = CachePaginas(
+    templates,
+    str(templates_dir),
+    recarregar=os.getenv("PAGINAS_RECARREGAR", "0") == "1",
+    pos_processar=estilos.inlinar_css_critico,
+)
 
 # ==============================================================
 # 🏥 Health-check rápido
@@ -71,13 +114,7 @@ async def health():
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
-    html_path = templates_dir / "index.html"
-    if not html_path.exists():
-        return HTMLResponse(
-            content=f"<h1>Arquivo não encontrado:</h1><p>{html_path}</p>",
-            status_code=500
-        )
-    return templates.TemplateResponse("index.html", {"request": request})
+    return paginas.resposta("index.html", request)
 
 # ==============================================================
 # 🔍 Verificação de e-mail/whatsapp
@@ -89,79 +126,108 @@ async def verificar(
     email: str = Form(None),
     whatsapp: str = Form(None)
 ):
-    if not supabase:
+    repositorio = obter_repositorio()
+    if not repositorio:
         return JSONResponse({"erro": "Serviço Supabase indisponível."}, status_code=503)
 
-    query = supabase.table("cadastros")
+    email = normalizar_email(email)
+    whatsapp = normalizar_telefone(whatsapp)
 
-    try:
-        # Busca o registro existente
-        if email:
-            result = query.select("*").ilike("email", f"%{email}%").execute()
-        elif whatsapp:
-            result = query.select("*").ilike("whatsapp", f"%{whatsapp}%").execute()
-        else:
-            return HTMLResponse("<h3>Informe seu e-mail ou WhatsApp.</h3>", status_code=400)
+    if not email and not whatsapp:
+        return HTMLResponse("<h3>Informe seu e-mail ou WhatsApp.</h3>", status_code=400)
 
-        data = result.data
+    try:
+        # Uma consulta pelas duas chaves normalizadas: o WhatsApp informado junto
+        # com um e-mail novo pode já ser de um cadastro (índice único em sql/002)
+        pessoa = await repositorio.buscar_por_identidade(email, whatsapp)
 
-        # 🚨 Se não existir: grava e salva ID no localStorage
-        if not data:
-            print("⚠️ Nenhum registro encontrado — criando novo")
+        # 🚨 Se não existir: grava e abre a sessão com o novo ID
+        if not pessoa:
+            log.debug("Nenhum registro encontrado — criando novo")
 
             novo = {
-                "email": email,
-                "whatsapp": whatsapp,
+                "email": email or None,
+                "whatsapp": whatsapp or None,
                 "status": "aguardando",
                 "convites_disponiveis": 0
             }
 
-            insert_resp = query.insert(novo).execute()
-            pessoa = insert_resp.data[0]
-            pessoa_id = pessoa["id"]
-
-            html = f"""
-            <script>
-              localStorage.setItem("socio_id", "{pessoa_id}");
-              localStorage.setItem("email", "{email or ''}");
-              localStorage.setItem("whatsapp", "{whatsapp or ''}");
-              window.location.href = "/restrito";
-            </script>
-            """
-            return HTMLResponse(html)
-
-        # Registro existe — redireciona com dados carregados
-        pessoa = data[0]
-        status = pessoa.get("status", "").lower()
-        destino = "/socio" if status in ["socio", "sócio"] else "/convidado"
-
-        html = f"""
-        <script>
-          localStorage.setItem("socio_id", "{pessoa['id']}");
-          localStorage.setItem("email", "{pessoa.get('email','')}");
-          localStorage.setItem("whatsapp", "{pessoa.get('whatsapp','')}");
-          window.location.href = "{destino}";
-        </script>
-        """
-        return HTMLResponse(content=html)
+            try:
+                pessoa = await repositorio.inserir(novo)
+            except ErroRepositorio as e:
+                if not duplicado(e):
+                    raise
+                # Outra requisição gravou a mesma chave entre a busca e o insert
+                pessoa = await repositorio.buscar_por_identidade(email, whatsapp)
+                if not pessoa:
+                    raise
+            else:
+                resposta = RedirectResponse("/restrito", status_code=303)
+                if pessoa:
+                    SESSOES.gravar(resposta, request, pessoa["id"])
+                else:
+                    # None: Supabase fora; o cadastro ficou na fila da réplica, ainda
+                    # sem id. O cookie pendente guarda quem é até o id existir.
+                    SESSOES.gravar_pendente(resposta, request, chave_identidade(novo))
+                return resposta
+
+        # Registro existe — a página de destino já sai do cache, sem nova busca
+        CACHE_SOCIO.guardar(int(pessoa["id"]), representar_socio(pessoa))
+        resposta = RedirectResponse(destino_por_status(pessoa.get("status")), status_code=303)
+        SESSOES.gravar(resposta, request, pessoa["id"])
+        return resposta
 
     except Exception as e:
-        print("🚨 Erro interno no /verificar:", repr(e))
-        return HTMLResponse(f"<h3>Erro interno:</h3><pre>{e}</pre>", status_code=500)
+        log.exception("🚨 Erro interno no /verificar: %r", e)
+        return HTMLResponse("<h3>Não foi possível verificar agora. Tente de novo em instantes.</h3>", status_code=500)
 
 # ==============================================================
-# 🖥️ Página do sócio
+# 🖥️ Página do sócio — renderizada com o registro da sessão
 # ==============================================================
 
+def destino_por_status(status) -> str:
+    return "/socio" if (status or "").lower() in ["socio", "sócio"] else "/convidado"
+
+
+async def id_do_pendente(chave: str):
+    """id do cadastro que entrou na fila da réplica, se já chegou ao Supabase."""
+    repositorio = obter_repositorio()
+    tipo, _, valor = (chave or "").partition(":")
+    if not repositorio or not valor:
+        return None
+    try:
+        if tipo == "e":
+            pessoa = await repositorio.buscar_por_email(valor)
+        elif tipo == "w":
+            pessoa = await repositorio.buscar_por_whatsapp(valor)
+        else:
+            return None
+    except Exception as e:
+        log.warning("⚠️ Cadastro pendente ainda sem id: %s", e)
+        return None
+    return int(pessoa["id"]) if pessoa and pessoa.get("id") is not None else None
+
+
 @app.get("/socio", response_class=HTMLResponse)
 async def socio_page(request: Request):
-    html_path = templates_dir / "socio.html"
-    if not html_path.exists():
-        return HTMLResponse(
-            content=f"<h1>Arquivo não encontrado:</h1><p>{html_path}</p>",
-            status_code=500
-        )
-    return templates.TemplateResponse("socio.html", {"request": request})
+    id = SESSOES.do_request(request)
+    if id is None:
+        return RedirectResponse("/", status_code=303)
+    try:
+        representacao = await obter_representacao(id, "/socio")
+    except ErroSocio as e:
+        return HTMLResponse(f"<h3>{e.mensagem}</h3>", status_code=e.status)
+
+    if representacao is None:
+        # cadastro removido (opt-out, deduplicação): a sessão não vale mais
+        resposta = RedirectResponse("/", status_code=303)
+        SESSOES.apagar(resposta)
+        return resposta
+    socio = json.loads(representacao["corpo"])
+    destino = destino_por_status(socio.get("status"))
+    if destino != "/socio":
+        return RedirectResponse(destino, status_code=303)
+    return paginas.resposta_com_dados("socio.html", request, {"socio": socio})
 
 # ==============================================================
 # 🖥️ Página do convidado
@@ -169,13 +235,7 @@ async def socio_page(request: Request):
 
 @app.get("/convidado", response_class=HTMLResponse)
 async def convidado_page(request: Request):
-    html_path = templates_dir / "convidado.html"
-    if not html_path.exists():
-        return HTMLResponse(
-            content=f"<h1>Arquivo não encontrado:</h1><p>{html_path}</p>",
-            status_code=500
-        )
-    return templates.TemplateResponse("convidado.html", {"request": request})
+    return paginas.resposta("convidado.html", request)
 
 # ==============================================================
 # 🖥️ Página restrita
@@ -183,100 +243,266 @@ async def convidado_page(request: Request):
 
 @app.get("/restrito", response_class=HTMLResponse)
 async def restrito_page(request: Request):
-    html_path = templates_dir / "restrito.html"
-    print("🔎 GET /restrito ->", html_path.resolve(), "existe?", html_path.exists())
-    if not html_path.exists():
-        return HTMLResponse(
-            content=f"<h1>Arquivo não encontrado:</h1><p>{html_path}</p>",
-            status_code=500
-        )
-    try:
-        return templates.TemplateResponse("restrito.html", {"request": request})
-    except Exception as e:
-        print("🚨 Erro ao renderizar restrito.html:", repr(e))
-        return HTMLResponse(f"<h3>Erro ao renderizar restrito.html:</h3><pre>{e}</pre>", status_code=500)
+    # Remover dados e registrar interesse agem sobre o cadastro da sessão
+    if SESSOES.do_request(request) is not None:
+        return paginas.resposta("restrito.html", request)
+
+    # Cadastro feito com o Supabase fora: vale o cookie pendente; quando a fila
+    # da réplica já o gravou, o pendente vira sessão
+    chave = SESSOES.pendente_do_request(request)
+    if chave is None:
+        return RedirectResponse("/", status_code=303)
+    resposta = paginas.resposta("restrito.html", request)
+    id = await id_do_pendente(chave)
+    if id is not None:
+        SESSOES.gravar(resposta, request, id)
+    return resposta
 
 # ==============================================================
 # 📡 Endpoint: buscar dados do sócio
 # ==============================================================
 
-@app.get("/api/socio/{id}")
-async def get_socio(id: int):
-    if not supabase:
-        return JSONResponse({"erro": "Serviço Supabase indisponível."}, status_code=503)
-
+# Registro do sócio já serializado, com ETag e Last-Modified. Invalidado por
+# quem escreve no registro (convites, interesse, opt-out).
+# Com ESTADO, um cache só para todos os workers: a invalidação vale para todos.
+_config_cache_socio = dict(
+    max_itens=int(os.getenv("CACHE_SOCIO_MAX", "2048")),
+    ttl=float(os.getenv("CACHE_SOCIO_TTL", "60")),
+    ttl_negativo=float(os.getenv("CACHE_SOCIO_TTL_NEGATIVO", "10")),
+)
+CACHE_SOCIO = ESTADO.cache("socio", **_config_cache_socio) if ESTADO else CacheTTL(**_config_cache_socio)
+CONTADORES_CACHE = ContadoresCache()
+METRICAS.medidor("prelude_cache_itens", "Itens no cache de sócios", lambda: len(CACHE_SOCIO))
+METRICAS.medidor(
+    "prelude_cache_eventos", "Acertos, falhas e 304 do cache por endpoint",
+    lambda: {
+        (("endpoint", endpoint), ("evento", evento)): n
+        for endpoint, contadores in CONTADORES_CACHE.resumo().items()
+        for evento, n in contadores.items() if evento in ContadoresCache.EVENTOS
+    },
+)
+
+
+def representar_socio(socio: dict) -> dict:
+    corpo = json.dumps(socio, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    # Last-Modified: updated_at do registro se houver; senão, quando foi lido
+    modificado_em = time.time()
+    if socio.get("updated_at"):
+        try:
+            modificado_em = datetime.fromisoformat(str(socio["updated_at"])).timestamp()
+        except ValueError:
+            pass
+    return {
+        "corpo": corpo,
+        "etag": f'"{hashlib.sha256(corpo).hexdigest()[:32]}"',
+        "modificado_em": int(modificado_em),
+    }
+
+
+def invalidar_socio(id) -> None:
     try:
-        result = supabase.table("cadastros").select("*").eq("id", id).single().execute()
-        if not result.data:
-            return JSONResponse({"erro": "Sócio não encontrado"}, status_code=404)
-        return result.data
+        CACHE_SOCIO.invalidar(int(id))
+    except (TypeError, ValueError):
+        pass
+
+
+def nao_modificado(request: Request, etag: str, modificado_em: int) -> bool:
+    """If-None-Match tem precedência; If-Modified-Since só vale sem ele."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        pedidas = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in pedidas or etag in pedidas
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return modificado_em <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class ErroSocio(Exception):
+    def __init__(self, mensagem: str, status: int):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        self.status = status
+
+
+async def obter_representacao(id: int, endpoint: str = "/api/socio"):
+    """Registro serializado do cache, ou do Supabase na falta; None se não existe."""
+    representacao = CACHE_SOCIO.obter(id)
+    if representacao is not AUSENTE:
+        CONTADORES_CACHE.registrar(endpoint, "acertos")
+        return representacao
+    CONTADORES_CACHE.registrar(endpoint, "falhas")
+    repositorio = obter_repositorio()
+    if not repositorio:
+        raise ErroSocio("Serviço Supabase indisponível.", 503)
+    try:
+        socio = await repositorio.buscar_por_id(id)
     except Exception as e:
-        return JSONResponse({"erro": str(e)}, status_code=500)
+        raise ErroSocio(str(e), 500)
+    representacao = representar_socio(socio) if socio else None
+    CACHE_SOCIO.guardar(id, representacao)
+    return representacao
+
+
+@app.get("/api/socio/{id}")
+async def get_socio(id: int, request: Request):
+    try:
+        representacao = await obter_representacao(id)
+    except ErroSocio as e:
+        return JSONResponse({"erro": e.mensagem}, status_code=e.status)
+
+    if representacao is None:
+        return JSONResponse({"erro": "Sócio não encontrado"}, status_code=404)
+
+    headers = {
+        "ETag": representacao["etag"],
+        "Last-Modified": formatdate(representacao["modificado_em"], usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+    if nao_modificado(request, representacao["etag"], representacao["modificado_em"]):
+        CONTADORES_CACHE.registrar("/api/socio", "revalidados")
+        return Response(status_code=304, headers=headers)
+    return Response(content=representacao["corpo"], media_type="application/json", headers=headers)
+
+
+@app.get("/api/cache")
+async def estatisticas_cache():
+    return {"endpoints": CONTADORES_CACHE.resumo(), "socios_em_cache": len(CACHE_SOCIO)}
 
 # ==============================================================
-# 📩 Endpoint: cadastrar convidado e reduzir convites
+# 📩 Endpoint: cadastrar convidado(s) e reduzir convites
 # ==============================================================
 
+MAX_CONVIDADOS_POR_LOTE = 50
+
+ERROS_CONVITE = {
+    "socio_nao_encontrado": ("Sócio não encontrado.", 404),
+    "sem_convites": ("Você já usou todos os convites disponíveis.", 400),
+    "sem_convidados": ("Nenhum convidado enviado.", 400),
+}
+
+
+def montar_convidado(data: dict) -> dict:
+    return {
+        "nome": data.get("nome"),
+        "apelido": data.get("apelido"),
+        "whatsapp": data.get("whatsapp"),
+        "email": data.get("email"),
+    }
+
+
+def sem_sessao(request: Request, html: bool = False):
+    """Resposta para quem chega sem o cadastro da sessão (nunca um id do cliente)."""
+    if SESSOES.pendente_do_request(request) is not None:
+        mensagem, status = "Seu cadastro ainda está sendo gravado. Tente de novo em instantes.", 503
+    else:
+        mensagem, status = "Sessão expirada. Volte ao início e informe seu e-mail ou WhatsApp.", 401
+    if html:
+        return HTMLResponse(f"<h3>{mensagem}</h3>", status_code=status)
+    return JSONResponse({"erro": mensagem}, status_code=status)
+
+
+async def id_da_sessao(request: Request):
+    """id do cadastro da sessão ou, com o cookie pendente, o id que a fila já gravou."""
+    id = SESSOES.do_request(request)
+    if id is None:
+        chave = SESSOES.pendente_do_request(request)
+        if chave is not None:
+            id = await id_do_pendente(chave)
+    return id
+
+
+async def resgatar_convites(socio_id, convidados: list):
+    """Debita e insere os convidados numa única chamada atômica ao Supabase."""
+    repositorio = obter_repositorio()
+    try:
+        socio_id = int(socio_id)
+    except (TypeError, ValueError):
+        return JSONResponse({"erro": "Sócio não encontrado."}, status_code=404)
+
+    try:
+        resultado = await repositorio.registrar_convites(socio_id, convidados)
+    except ErroRepositorio as e:
+        if e.status == 409:
+            return JSONResponse({"erro": "Este convidado já está na lista."}, status_code=409)
+        log.error("🚨 Erro geral no convite do sócio %s: %s", socio_id, e)
+        return JSONResponse({"erro": f"Erro ao salvar convidado: {str(e)}"}, status_code=500)
+    except Exception as e:
+        log.exception("🚨 Erro geral no convite do sócio %s: %s", socio_id, e)
+        return JSONResponse({"erro": f"Erro ao salvar convidado: {str(e)}"}, status_code=500)
+    finally:
+        # O saldo mudou — ou pode ter mudado, se a chamada caiu no meio
+        invalidar_socio(socio_id)
+
+    if not resultado.get("ok"):
+        mensagem, status_code = ERROS_CONVITE.get(
+            resultado.get("erro"), ("Erro ao salvar convidado.", 500)
+        )
+        return JSONResponse({"erro": mensagem}, status_code=status_code)
+
+    log.info("✅ %d convidado(s) do sócio %s; restam %s", len(convidados), socio_id, resultado["convites_restantes"])
+    return JSONResponse({
+        "ok": True,
+        "mensagem": "Convite registrado." if len(convidados) == 1 else f"{len(convidados)} convites registrados.",
+        "convites_restantes": resultado["convites_restantes"],
+        "ids": resultado.get("ids") or [],
+    })
+
+
 @app.post("/api/convidar")
 async def convidar_amigo(request: Request):
-    if not supabase:
+    repositorio = obter_repositorio()
+    if not repositorio:
         return JSONResponse({"erro": "Serviço Supabase indisponível."}, status_code=503)
 
+    socio_id = SESSOES.do_request(request)
+    if socio_id is None:
+        return sem_sessao(request)
+
     data = await request.json()
-    socio_id = data.get("quem_indicou")
+    return await resgatar_convites(socio_id, [montar_convidado(data)])
 
-    try:
-        socio_resp = supabase.table("cadastros").select("id, convites_disponiveis").eq("id", socio_id).single().execute()
-        socio = socio_resp.data
-        print("🎯 Sócio encontrado:", socio)
 
-        if not socio:
-            return JSONResponse({"erro": "Sócio não encontrado."}, status_code=404)
+@app.post("/api/convidar/lote")
+async def convidar_amigos_lote(request: Request):
+    repositorio = obter_repositorio()
+    if not repositorio:
+        return JSONResponse({"erro": "Serviço Supabase indisponível."}, status_code=503)
 
-        convites_restantes = int(socio.get("convites_disponiveis") or 0)
-        if convites_restantes <= 0:
-            return JSONResponse({"erro": "Você já usou todos os convites disponíveis."}, status_code=400)
+    socio_id = SESSOES.do_request(request)
+    if socio_id is None:
+        return sem_sessao(request)
 
-        convidado = {
-            "nome": data.get("nome"),
-            "apelido": data.get("apelido"),
-            "whatsapp": data.get("whatsapp"),
-            "email": data.get("email"),
-            "status": "convidado",
-            "quem_indicou": socio_id
-        }
-
-        insert_resp = supabase.table("cadastros").insert(convidado).execute()
-        print("✅ Convidado adicionado:", insert_resp.data)
-
-        novo_total = convites_restantes - 1
-        update_resp = supabase.table("cadastros").update({"convites_disponiveis": novo_total}).eq("id", socio_id).execute()
-        print("📉 Resultado do update:", update_resp)
-
-        return JSONResponse({
-            "ok": True,
-            "mensagem": f"Convite registrado.",
-            "convites_restantes": novo_total
-        })
+    data = await request.json()
+    convidados = data.get("convidados") or []
+    if not isinstance(convidados, list) or not convidados:
+        return JSONResponse({"erro": "Nenhum convidado enviado."}, status_code=400)
+    if len(convidados) > MAX_CONVIDADOS_POR_LOTE:
+        return JSONResponse(
+            {"erro": f"Máximo de {MAX_CONVIDADOS_POR_LOTE} convidados por envio."}, status_code=400
+        )
 
-    except Exception as e:
-        print("🚨 Erro geral no convite:", e)
-        return JSONResponse({"erro": f"Erro ao salvar convidado: {str(e)}"}, status_code=500)
+    return await resgatar_convites(socio_id, [montar_convidado(c) for c in convidados])
 
 # ==============================================================
-# ❌ Opt-out: remove pelo ID
+# ❌ Opt-out: remove o cadastro da sessão
 # ==============================================================
 
 @app.get("/optout", response_class=HTMLResponse)
-async def optout(request: Request, id: int = None):
-    if not supabase:
+async def optout(request: Request):
+    repositorio = obter_repositorio()
+    if not repositorio:
         return HTMLResponse("<h3>Serviço Supabase indisponível.</h3>", status_code=503)
 
-    if not id:
-        return HTMLResponse("<h3>ID não encontrado. Volte e tente novamente.</h3>", status_code=400)
+    id = await id_da_sessao(request)
+    if id is None:
+        return sem_sessao(request, html=True)
 
     try:
-        supabase.table("cadastros").delete().eq("id", id).execute()
+        await repositorio.excluir(id)
 
         html = """
         <script>
@@ -287,11 +513,15 @@ async def optout(request: Request, id: int = None):
           window.location.href = "/";
         </script>
         """
-        return HTMLResponse(html)
+        resposta = HTMLResponse(html)
+        SESSOES.apagar(resposta)
+        return resposta
 
     except Exception as e:
-        print("🚨 Erro ao excluir dados:", e)
+        log.error("🚨 Erro ao excluir dados de %s: %s", id, e)
         return HTMLResponse(f"<h3>Erro ao excluir dados:</h3><pre>{e}</pre>", status_code=500)
+    finally:
+        invalidar_socio(id)
 
 # ==============================================================
 # ✳️ Registrar interesse futuro — atualiza o mesmo ID
@@ -299,31 +529,285 @@ async def optout(request: Request, id: int = None):
 
 @app.post("/api/interesse")
 async def registrar_interesse(request: Request):
-    if not supabase:
+    repositorio = obter_repositorio()
+    if not repositorio:
         return JSONResponse({"erro": "Serviço Supabase indisponível."}, status_code=503)
 
-    data = await request.json()
-    pessoa_id = data.get("id")
+    pessoa_id = await id_da_sessao(request)
+    if pessoa_id is None:
+        return sem_sessao(request)
 
-    if not pessoa_id:
-        return JSONResponse({"erro": "ID não enviado"}, status_code=400)
+    data = await request.json()
 
     try:
-        supabase.table("cadastros").update({
+        await repositorio.atualizar(pessoa_id, {
             "nome": data.get("nome"),
             "apelido": data.get("apelido"),
             "status": "interessado"
-        }).eq("id", pessoa_id).execute()
+        })
 
         return JSONResponse({"mensagem": "Seu interesse foi registrado com sucesso"})
     except Exception as e:
-        print("🚨 Erro ao registrar interesse:", e)
+        log.error("🚨 Erro ao registrar interesse de %s: %s", pessoa_id, e)
         return JSONResponse({"erro": str(e)}, status_code=500)
+    finally:
+        invalidar_socio(pessoa_id)
+
+# ==============================================================
+# 🗂️ Admin: importação, exportação e deduplicação em massa (Authorization: Bearer ADMIN_TOKEN)
+# ==============================================================
+
+def admin_autorizado(request: Request) -> bool:
+    if not ADMIN_TOKEN:
+        return False
+    fornecido = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    return hmac.compare_digest(fornecido.encode(), ADMIN_TOKEN.encode())
+
+
+@app.post("/admin/importar")
+async def admin_importar(request: Request, simular: bool = False, lote: int = 500):
+    """Corpo = o CSV, lido em streaming. ?simular=1 só devolve o relatório."""
+    if not admin_autorizado(request):
+        return JSONResponse({"erro": "Não autorizado."}, status_code=401)
+    repositorio = obter_repositorio()
+    if not repositorio:
+        return JSONResponse({"erro": "Serviço Supabase indisponível."}, status_code=503)
+
+    try:
+        relatorio = await importar(
+            repositorio, linhas_csv(request.stream()), tamanho_lote=max(1, min(lote, 1000)), simular=simular,
+        )
+    except ErroImportacao as e:
+        return JSONResponse({"erro": str(e)}, status_code=400)
+    except ErroRepositorio as e:
+        log.error("🚨 Importação interrompida: %s", e)
+        return JSONResponse({"erro": f"Importação interrompida: {e}"}, status_code=502)
+    finally:
+        if not simular:
+            CACHE_SOCIO.limpar()
+    return relatorio
+
+
+@app.get("/admin/exportar")
+async def admin_exportar(request: Request, formato: str = "csv"):
+    if not admin_autorizado(request):
+        return JSONResponse({"erro": "Não autorizado."}, status_code=401)
+    if formato not in ("csv", "jsonl"):
+        return JSONResponse({"erro": "Formato deve ser csv ou jsonl."}, status_code=400)
+    repositorio = obter_repositorio()
+    if not repositorio:
+        return JSONResponse({"erro": "Serviço Supabase indisponível."}, status_code=503)
+
+    return StreamingResponse(
+        exportar(repositorio, formato),
+        media_type="text/csv; charset=utf-8" if formato == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="cadastros.{formato}"'},
+    )
+
+
+@app.post("/admin/deduplicar")
+async def admin_deduplicar(request: Request, aplicar: bool = False, lote: int = 200):
+    """Sem ?aplicar=1 só devolve o relatório do que seria mesclado."""
+    if not admin_autorizado(request):
+        return JSONResponse({"erro": "Não autorizado."}, status_code=401)
+    repositorio = obter_repositorio()
+    if not repositorio:
+        return JSONResponse({"erro": "Serviço Supabase indisponível."}, status_code=503)
+
+    try:
+        _, relatorio = await deduplicar(repositorio, simular=not aplicar, tamanho_lote=max(1, min(lote, 1000)))
+    except ErroRepositorio as e:
+        log.error("🚨 Deduplicação interrompida: %s", e)
+        return JSONResponse({"erro": f"Deduplicação interrompida: {e}"}, status_code=502)
+    finally:
+        if aplicar:
+            CACHE_SOCIO.limpar()
+    return relatorio
+
+# ==============================================================
+# 📊 Painel dos founders (agregados mantidos por trigger, sql/003)
+# ==============================================================
+
+COLUNAS_PAINEL = (
+    "founder_id,nome,apelido,status,founder,convites_disponiveis,"
+    "convidados,convidados_por_status,indicacoes,indicacoes_por_status"
+)
+COLUNAS_PAINEL_TOTAIS = (
+    "cadastros,founders,convites_disponiveis,convidados,convidados_por_status,"
+    "indicacoes,indicacoes_por_status,atualizado_em"
+)
+COLUNAS_PAINEL_CONVIDADOS = "id,nome,apelido,status,whatsapp,email,created_at"
+MAX_PAGINA_PAINEL = 100
+
+
+@app.get("/painel", response_class=HTMLResponse)
+async def painel_page(request: Request):
+    """Página estática; os dados vêm de /api/painel com o ADMIN_TOKEN."""
+    return paginas.resposta("painel.html", request)
+
+
+@app.get("/api/painel")
+async def painel_founders(request: Request, cursor: int = 0, limite: int = 25):
+    """Uma página de founders (keyset por founder_id) + os totais do evento."""
+    if not admin_autorizado(request):
+        return JSONResponse({"erro": "Não autorizado."}, status_code=401)
+    repositorio = obter_repositorio()
+    if not repositorio:
+        return JSONResponse({"erro": "Serviço Supabase indisponível."}, status_code=503)
+
+    limite = max(1, min(limite, MAX_PAGINA_PAINEL))
+    try:
+        totais, founders = await asyncio.gather(
+            repositorio.selecionar({}, COLUNAS_PAINEL_TOTAIS, limite=1, tabela="painel_totais"),
+            repositorio.selecionar(
+                {"founder_id": f"gt.{cursor}", "order": "founder_id.asc"},
+                COLUNAS_PAINEL, limite=limite, tabela="painel_founders",
+            ),
+        )
+    except ErroRepositorio as e:
+        log.error("🚨 Erro ao carregar o painel: %s", e)
+        return JSONResponse({"erro": "Falha ao carregar o painel."}, status_code=502)
+
+    return {
+        "totais": totais[0] if totais else None,
+        "founders": founders,
+        "proximo_cursor": founders[-1]["founder_id"] if len(founders) == limite else None,
+    }
+
+
+@app.get("/api/painel/{founder_id}/convidados")
+async def painel_convidados(founder_id: int, request: Request, cursor: int = 0, limite: int = 50):
+    """Convidados de um founder (quem_indicou), por id, uma página por vez."""
+    if not admin_autorizado(request):
+        return JSONResponse({"erro": "Não autorizado."}, status_code=401)
+    repositorio = obter_repositorio()
+    if not repositorio:
+        return JSONResponse({"erro": "Serviço Supabase indisponível."}, status_code=503)
+
+    limite = max(1, min(limite, MAX_PAGINA_PAINEL))
+    try:
+        convidados = await repositorio.selecionar(
+            {"quem_indicou": f"eq.{founder_id}", "id": f"gt.{cursor}", "order": "id.asc"},
+            COLUNAS_PAINEL_CONVIDADOS, limite=limite,
+        )
+    except ErroRepositorio as e:
+        log.error("🚨 Erro ao listar convidados do founder %s: %s", founder_id, e)
+        return JSONResponse({"erro": "Falha ao carregar os convidados."}, status_code=502)
+
+    return {
+        "convidados": convidados,
+        "proximo_cursor": convidados[-1]["id"] if len(convidados) == limite else None,
+    }
+
+# ==============================================================
+# 🚪 Check-in na porta (checkin.py; Authorization: Bearer CHECKIN_TOKEN)
+# ==============================================================
+
+def portaria_autorizada(request: Request) -> bool:
+    """Os aparelhos da porta usam CHECKIN_TOKEN; o ADMIN_TOKEN também vale."""
+    fornecido = request.headers.get("authorization", "").removeprefix("Bearer ").strip().encode()
+    return any(token and hmac.compare_digest(fornecido, token.encode()) for token in (CHECKIN_TOKEN, ADMIN_TOKEN))
+
+
+@app.post("/api/checkin")
+async def fazer_checkin(request: Request):
+    """{"qr": "..."} ou {"email": "..."} / {"whatsapp": "..."}, mais "portaria" opcional."""
+    if not portaria_autorizada(request):
+        return JSONResponse({"erro": "Não autorizado."}, status_code=401)
+    portaria = getattr(app.state, "portaria", None)
+    if portaria is None or not portaria.pronta:
+        return JSONResponse({"erro": "Lista de convidados ainda carregando."}, status_code=503)
+    try:
+        dados = await request.json()
+    except ValueError:
+        dados = None
+    if not isinstance(dados, dict) or not (dados.get("qr") or dados.get("email") or dados.get("whatsapp")):
+        return JSONResponse({"erro": "Informe qr, email ou whatsapp."}, status_code=400)
+
+    resultado = portaria.conferir(dados.get("qr"), dados.get("email"), dados.get("whatsapp"), dados.get("portaria"))
+    return JSONResponse(resultado, status_code=404 if resultado["resultado"] == "nao_encontrado" else 200)
+
+
+@app.get("/api/checkin")
+async def estado_checkin(request: Request):
+    if not portaria_autorizada(request):
+        return JSONResponse({"erro": "Não autorizado."}, status_code=401)
+    portaria = getattr(app.state, "portaria", None)
+    if portaria is None:
+        return JSONResponse({"erro": "Check-in desligado."}, status_code=503)
+    atualizado_em = portaria.indice.atualizado_em
+    return {
+        "liberados": len(portaria.indice),
+        "entradas": len(portaria.indice.entradas),
+        "pendentes": portaria.pendentes(),
+        "atraso_s": round(time.time() - atualizado_em, 1) if atualizado_em else None,
+    }
+
+
+@app.get("/api/checkin/qr/{id}")
+async def qr_checkin(id: int, request: Request):
+    """Conteúdo do QR de um cadastro (para gerar os convites)."""
+    if not admin_autorizado(request):
+        return JSONResponse({"erro": "Não autorizado."}, status_code=401)
+    segredo = os.getenv("CHECKIN_SEGREDO")
+    if not segredo:
+        return JSONResponse({"erro": "CHECKIN_SEGREDO não definido."}, status_code=503)
+    return {"id": id, "qr": checkin.assinar_qr(id, segredo)}
 
 # ==============================================================
 # ✅ Mensagem de inicialização
 # ==============================================================
 
+async def aquecer_repositorio():
+    """Abre a primeira conexão com o Supabase sem atrasar a partida do servidor."""
+    repositorio = obter_repositorio()
+    if not repositorio:
+        return
+    inicio = time.perf_counter()
+    try:
+        await repositorio.aquecer()
+        log.info("🔥 Conexão com o Supabase aquecida em %.0f ms", (time.perf_counter() - inicio) * 1000)
+    except Exception as e:
+        log.warning("⚠️ Falha ao aquecer conexão com o Supabase: %s", e)
+
+
 @app.on_event("startup")
 async def startup_event():
-    print("🌟 Servidor Prelude Golden Christmas iniciado com sucesso.")
+    paginas.carregar(PAGINAS_ESTATICAS)
+    log.info("🔗 SUPABASE_URL = %s", SUPABASE_URL)
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        log.warning("⚠️ Variáveis SUPABASE_URL ou SUPABASE_KEY não definidas no .env")
+    else:
+        if AQUECER_NA_PARTIDA:
+            app.state.aquecimento = asyncio.create_task(aquecer_repositorio())
+        if REPLICA is not None:
+            medir(REPLICA)
+            app.state.replica = asyncio.create_task(manter(REPLICA, obter_repositorio().repositorio))
+        # Criada aqui e não no import: o diário da portaria tem thread, e threads não passam pelo fork
+        app.state.portaria = checkin.Portaria.do_ambiente()
+        if app.state.portaria:
+            app.state.portaria.retomar()
+            checkin.medir(app.state.portaria)
+            repositorio = obter_repositorio()
+            app.state.checkin = asyncio.create_task(
+                checkin.manter(app.state.portaria, getattr(repositorio, "repositorio", repositorio))
+            )
+    if ESTADO:
+        app.state.metricas = compartilhar_metricas(ESTADO, "server", METRICAS)
+    log.info("🌟 Servidor Prelude Golden Christmas iniciado com sucesso.")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if getattr(app.state, "replica", None):
+        app.state.replica.cancel()
+    if getattr(app.state, "portaria", None):
+        app.state.checkin.cancel()
+        app.state.portaria.fechar()
+    if _repositorio:
+        await _repositorio.fechar()
+    if REPLICA is not None:
+        REPLICA.fechar()
+    if ESTADO:
+        app.state.metricas.cancel()
+        ESTADO.retirar_metricas("server")
+        ESTADO.fechar()
@@ -0,0 +1,123 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# sessoes.py — sessão em cookie assinado (HMAC), sem estado no servidor
+# ===============================
+#
+# O /verificar identifica a pessoa e grava o cookie "prelude_sessao" com
+# "id.expira.assinatura" (HMAC-SHA256 com SESSAO_SEGREDO). As páginas e a API
+# leem o id do cookie, sem localStorage e sem ida extra para descobrir quem é.
+#
+# Nada fica guardado no servidor: qualquer worker valida o cookie, desde que
+# todos usem o mesmo segredo. Sem SESSAO_SEGREDO, o segredo é derivado da
+# SUPABASE_KEY (igual em todos os workers); sem nenhuma das duas, um segredo
+# aleatório por processo — as sessões caem a cada reinício.
+#
+# Cookie HttpOnly e SameSite=Lax; Secure quando a requisição chegou por HTTPS
+# (direto ou via X-Forwarded-Proto do proxy). Validade: SESSAO_TTL segundos.
+#
+# Cadastro novo com o Supabase fora fica na fila da réplica, ainda sem id: no
+# lugar da sessão vai o cookie "prelude_pendente", assinado do mesmo jeito,
+# com a chave de identidade ("e:email" ou "w:whatsapp"). Quando o cadastro
+# chega ao Supabase, a chave acha o id e o pendente vira sessão.
+
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+
+log = logging.getLogger(__name__)
+
+NOME_COOKIE = "prelude_sessao"
+NOME_COOKIE_PENDENTE = "prelude_pendente"
+TTL_PADRAO = 30 * 24 * 3600  # até depois da festa
+
+
+def _assinatura(corpo: str, segredo: bytes, dominio: str = "sessao") -> str:
+    digest = hmac.new(segredo, f"{dominio}:{corpo}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode()
+
+
+class Sessoes:
+    """Emite e confere cookies de sessão com o id do cadastro."""
+
+    def __init__(self, segredo, ttl: float = TTL_PADRAO, nome_cookie: str = NOME_COOKIE,
+                 nome_cookie_pendente: str = NOME_COOKIE_PENDENTE, relogio=time.time):
+        self.segredo = segredo.encode() if isinstance(segredo, str) else segredo
+        self.ttl = ttl
+        self.nome_cookie = nome_cookie
+        self.nome_cookie_pendente = nome_cookie_pendente
+        self._relogio = relogio
+
+    @classmethod
+    def do_ambiente(cls):
+        segredo = os.getenv("SESSAO_SEGREDO")
+        if not segredo and os.getenv("SUPABASE_KEY"):
+            segredo = hmac.new(os.environ["SUPABASE_KEY"].encode(), b"prelude-sessao", hashlib.sha256).digest()
+        if not segredo:
+            log.warning("⚠️ SESSAO_SEGREDO não definido: sessões valem só até o processo reiniciar")
+            segredo = secrets.token_bytes(32)
+        return cls(segredo, ttl=float(os.getenv("SESSAO_TTL", str(TTL_PADRAO))))
+
+    def _assinar(self, valor: str, dominio: str) -> str:
+        corpo = f"{valor}.{int(self._relogio() + self.ttl)}"
+        return f"{corpo}.{_assinatura(corpo, self.segredo, dominio)}"
+
+    def _conferir(self, cookie: str, dominio: str):
+        valor, _, resto = (cookie or "").partition(".")
+        expira, _, assinatura = resto.partition(".")
+        if not valor or not expira.isdigit() or not assinatura:
+            return None
+        esperada = _assinatura(f"{valor}.{expira}", self.segredo, dominio)
+        if not hmac.compare_digest(assinatura.encode(), esperada.encode()):
+            return None
+        if int(expira) < self._relogio():
+            return None
+        return valor
+
+    def emitir(self, cadastro_id: int) -> str:
+        return self._assinar(str(int(cadastro_id)), "sessao")
+
+    def ler(self, valor: str):
+        """id do cadastro se o cookie foi assinado aqui e não venceu; senão None."""
+        id = self._conferir(valor, "sessao")
+        return int(id) if id and id.isdigit() else None
+
+    def emitir_pendente(self, chave: str) -> str:
+        return self._assinar(base64.urlsafe_b64encode(chave.encode()).decode().rstrip("="), "pendente")
+
+    def ler_pendente(self, valor: str):
+        """Chave de identidade do cadastro na fila, se o cookie vale; senão None."""
+        chave = self._conferir(valor, "pendente")
+        if not chave:
+            return None
+        try:
+            return base64.urlsafe_b64decode(chave + "=" * (-len(chave) % 4)).decode()
+        except ValueError:
+            return None
+
+    def do_request(self, request):
+        return self.ler(request.cookies.get(self.nome_cookie))
+
+    def pendente_do_request(self, request):
+        return self.ler_pendente(request.cookies.get(self.nome_cookie_pendente))
+
+    def _definir(self, resposta, request, nome: str, valor: str) -> None:
+        https = request.url.scheme == "https" or request.headers.get("x-forwarded-proto", "") == "https"
+        resposta.set_cookie(nome, valor, max_age=int(self.ttl), path="/", httponly=True, samesite="lax", secure=https)
+
+    def gravar(self, resposta, request, cadastro_id: int) -> None:
+        self._definir(resposta, request, self.nome_cookie, self.emitir(cadastro_id))
+        if self.nome_cookie_pendente in request.cookies:
+            resposta.delete_cookie(self.nome_cookie_pendente, path="/")
+
+    def gravar_pendente(self, resposta, request, chave: str) -> None:
+        """Cadastro na fila, ainda sem id: marca quem é, no lugar da sessão."""
+        self._definir(resposta, request, self.nome_cookie_pendente, self.emitir_pendente(chave))
+        resposta.delete_cookie(self.nome_cookie, path="/")
+
+    def apagar(self, resposta) -> None:
+        resposta.delete_cookie(self.nome_cookie, path="/")
+        resposta.delete_cookie(self.nome_cookie_pendente, path="/")
@@ -0,0 +1,55 @@
+-- ===============================
+-- PRELUDE GOLDEN CHRISTMAS 2025
+-- 001 — resgate atômico de convites (/api/convidar e /api/convidar/lote)
+-- ===============================
+--
+-- Debita N convites do sócio e insere os N convidados numa única transação.
+-- O UPDATE condicional trava a linha do sócio: chamadas concorrentes do mesmo
+-- sócio são serializadas e a condição `convites_disponiveis >= N` é reavaliada
+-- depois do lock, então o contador nunca fica negativo. Se o INSERT falhar, o
+-- débito é desfeito junto.
+--
+-- Chamada via PostgREST: POST /rest/v1/rpc/registrar_convites
+--   {"p_socio_id": 1, "p_convidados": [{"nome": "...", "whatsapp": "..."}]}
+
+create or replace function public.registrar_convites(p_socio_id bigint, p_convidados jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+  v_qtd int := coalesce(jsonb_array_length(p_convidados), 0);
+  v_restantes int;
+  v_ids bigint[];
+begin
+  if v_qtd = 0 then
+    return jsonb_build_object('ok', false, 'erro', 'sem_convidados');
+  end if;
+
+  update public.cadastros
+     set convites_disponiveis = convites_disponiveis - v_qtd
+   where id = p_socio_id
+     and coalesce(convites_disponiveis, 0) >= v_qtd
+  returning convites_disponiveis into v_restantes;
+
+  if not found then
+    select coalesce(convites_disponiveis, 0) into v_restantes
+      from public.cadastros
+     where id = p_socio_id;
+
+    if not found then
+      return jsonb_build_object('ok', false, 'erro', 'socio_nao_encontrado');
+    end if;
+    return jsonb_build_object('ok', false, 'erro', 'sem_convites', 'convites_restantes', v_restantes);
+  end if;
+
+  with novos as (
+    insert into public.cadastros (nome, apelido, whatsapp, email, status, quem_indicou)
+    select c->>'nome', c->>'apelido', c->>'whatsapp', c->>'email', 'convidado', p_socio_id
+      from jsonb_array_elements(p_convidados) as c
+    returning id
+  )
+  select array_agg(id) into v_ids from novos;
+
+  return jsonb_build_object('ok', true, 'convites_restantes', v_restantes, 'ids', to_jsonb(v_ids));
+end;
+$$;
@@ -0,0 +1,48 @@
+-- ===============================
+-- PRELUDE GOLDEN CHRISTMAS 2025
+-- 002 — chaves de identidade normalizadas e indexadas
+-- ===============================
+--
+-- Substitui as buscas ilike '%x%' (varredura sequencial) por igualdade exata
+-- em colunas normalizadas com índice único:
+--   email_norm    = e-mail sem espaços, em minúsculas
+--   whatsapp_norm = identidade.normalizar_telefone(whatsapp)
+--
+-- As colunas são geradas (STORED): o ADD COLUMN já faz o backfill das linhas
+-- existentes e toda escrita futura (server.py, main.py, bot.py, painel do
+-- Supabase) fica normalizada sem depender do cliente.
+--
+-- Antes de criar os índices únicos, confira duplicatas:
+--   select email_norm, count(*) from cadastros
+--    where email_norm is not null group by 1 having count(*) > 1;
+--   select whatsapp_norm, count(*) from cadastros
+--    where whatsapp_norm is not null group by 1 having count(*) > 1;
+
+-- Porta fiel de identidade.normalizar_telefone (vazio vira NULL).
+create or replace function public.normalizar_telefone(numero text)
+returns text
+language sql
+immutable
+as $$
+  select case
+           when n = '' then null
+           when n like '55%' then n
+           when n like '21%' or length(n) = 11 then '55' || n
+           else n
+         end
+    from (select ltrim(regexp_replace(coalesce(numero, ''), '\D', '', 'g'), '0') as n) as s
+$$;
+
+alter table public.cadastros
+  add column if not exists email_norm text
+    generated always as (nullif(lower(btrim(email)), '')) stored,
+  add column if not exists whatsapp_norm text
+    generated always as (public.normalizar_telefone(whatsapp)) stored;
+
+create unique index if not exists cadastros_email_norm_key
+  on public.cadastros (email_norm)
+  where email_norm is not null;
+
+create unique index if not exists cadastros_whatsapp_norm_key
+  on public.cadastros (whatsapp_norm)
+  where whatsapp_norm is not null;
@@ -0,0 +1,306 @@
+-- ===============================
+-- PRELUDE GOLDEN CHRISTMAS 2025
+-- 003 — painel dos founders: agregados mantidos por trigger
+-- ===============================
+--
+-- O painel (/painel e /api/painel no server.py) mostra, por founder, quantos
+-- convidados ele trouxe e em que status estão, quantos convites ainda tem e
+-- os totais do evento. Em vez de agregar `cadastros` a cada carga (uma
+-- consulta por founder), os números ficam prontos em duas tabelas:
+--
+--   painel_founders  uma linha por founder (ou por quem tem convidados):
+--                    nome, status, convites_disponiveis e contagens por status
+--                    dos convidados do site (cadastros.quem_indicou) e das
+--                    indicações do WhatsApp (tabela indicacoes, via bot.py)
+--   painel_totais    uma linha só, com os totais do evento
+--
+-- Triggers em `cadastros` e `indicacoes` ajustam as contagens na mesma
+-- transação da escrita: registrar_convites (sql/001), o insert em lote das
+-- indicações do bot e edições pelo painel do Supabase entram sem mudar o
+-- cliente. O painel lê uma página por id (keyset) + a linha de totais, então
+-- o custo de uma carga depende só do tamanho da página.
+--
+-- A linha de painel_totais é atualizada por toda escrita: escritas simultâneas
+-- se enfileiram nela até o commit. Com as transações curtas do projeto isso é
+-- imperceptível; se um dia pesar, troque por N linhas somadas na leitura.
+--
+-- Se os números divergirem (trigger desligado, restauração parcial):
+--   select public.painel_recalcular();
+
+create table if not exists public.painel_founders (
+  founder_id bigint primary key references public.cadastros (id) on delete cascade,
+  nome text,
+  apelido text,
+  whatsapp text,
+  status text,
+  founder boolean not null default false,
+  convites_disponiveis int not null default 0,
+  convidados int not null default 0,
+  convidados_por_status jsonb not null default '{}',
+  indicacoes int not null default 0,
+  indicacoes_por_status jsonb not null default '{}',
+  atualizado_em timestamptz not null default now()
+);
+
+create table if not exists public.painel_totais (
+  id boolean primary key default true check (id),
+  cadastros int not null default 0,
+  founders int not null default 0,
+  convites_disponiveis bigint not null default 0,
+  convidados int not null default 0,
+  convidados_por_status jsonb not null default '{}',
+  indicacoes int not null default 0,
+  indicacoes_por_status jsonb not null default '{}',
+  atualizado_em timestamptz not null default now()
+);
+
+insert into public.painel_totais default values on conflict do nothing;
+
+-- Página de convidados de um founder: quem_indicou = X and id > cursor order by id
+create index if not exists cadastros_quem_indicou_id
+  on public.cadastros (quem_indicou, id)
+  where quem_indicou is not null;
+
+-- Founder do bot (founder_whatsapp) → cadastro, pela chave de sql/002
+create index if not exists indicacoes_founder_norm
+  on public.indicacoes (public.normalizar_telefone(founder_whatsapp));
+
+-- Mesma regra do server.py / bot.py: "Founder", "socio" ou "sócio"
+create or replace function public.eh_founder(p_status text)
+returns boolean
+language sql
+immutable
+as $$
+  select lower(coalesce(p_status, '')) in ('founder', 'socio', 'sócio')
+$$;
+
+-- {"convidado": 3} + ("convidado", 1) → {"convidado": 4}
+create or replace function public.painel_somar(p_contagens jsonb, p_status text, p_delta int)
+returns jsonb
+language sql
+immutable
+as $$
+  select jsonb_set(
+           p_contagens,
+           array[s],
+           to_jsonb(coalesce((p_contagens ->> s)::int, 0) + p_delta)
+         )
+    from (select coalesce(nullif(p_status, ''), 'sem status') as s) as x
+$$;
+
+-- ============================================================
+-- cadastros: o próprio founder e os convidados dele
+-- ============================================================
+create or replace function public.painel_cadastros()
+returns trigger
+language plpgsql
+as $$
+declare
+  v_era_founder boolean := tg_op <> 'INSERT' and public.eh_founder(old.status);
+  v_e_founder boolean := tg_op <> 'DELETE' and public.eh_founder(new.status);
+begin
+  -- Totais de cadastros, founders e convites ainda disponíveis
+  update public.painel_totais
+     set cadastros = cadastros + case tg_op when 'INSERT' then 1 when 'DELETE' then -1 else 0 end,
+         founders = founders + v_e_founder::int - v_era_founder::int,
+         convites_disponiveis = convites_disponiveis
+           + case when v_e_founder then coalesce(new.convites_disponiveis, 0) else 0 end
+           - case when v_era_founder then coalesce(old.convites_disponiveis, 0) else 0 end,
+         atualizado_em = now()
+   where id;
+
+  -- Linha do próprio cadastro no painel (se é founder ou já tem convidados)
+  if tg_op <> 'DELETE' then
+    if v_e_founder then
+      insert into public.painel_founders as p
+             (founder_id, nome, apelido, whatsapp, status, founder, convites_disponiveis)
+      values (new.id, new.nome, new.apelido, new.whatsapp, new.status, true,
+              coalesce(new.convites_disponiveis, 0))
+      on conflict (founder_id) do update
+         set nome = excluded.nome, apelido = excluded.apelido, whatsapp = excluded.whatsapp,
+             status = excluded.status, founder = true,
+             convites_disponiveis = excluded.convites_disponiveis, atualizado_em = now();
+    elsif tg_op = 'UPDATE' then
+      update public.painel_founders
+         set nome = new.nome, apelido = new.apelido, whatsapp = new.whatsapp, status = new.status,
+             founder = false, convites_disponiveis = coalesce(new.convites_disponiveis, 0),
+             atualizado_em = now()
+       where founder_id = new.id;
+    end if;
+  end if;
+
+  -- Convidados: sai da contagem antiga, entra na nova (só se algo mudou)
+  if tg_op = 'UPDATE'
+     and old.quem_indicou is not distinct from new.quem_indicou
+     and old.status is not distinct from new.status then
+    return null;
+  end if;
+
+  if tg_op <> 'INSERT' and old.quem_indicou is not null then
+    update public.painel_founders
+       set convidados = convidados - 1,
+           convidados_por_status = public.painel_somar(convidados_por_status, old.status, -1),
+           atualizado_em = now()
+     where founder_id = old.quem_indicou;
+    update public.painel_totais
+       set convidados = convidados - 1,
+           convidados_por_status = public.painel_somar(convidados_por_status, old.status, -1)
+     where id;
+  end if;
+
+  if tg_op <> 'DELETE' and new.quem_indicou is not null then
+    insert into public.painel_founders (founder_id, nome, apelido, whatsapp, status, convites_disponiveis)
+    select c.id, c.nome, c.apelido, c.whatsapp, c.status, coalesce(c.convites_disponiveis, 0)
+      from public.cadastros as c
+     where c.id = new.quem_indicou
+    on conflict (founder_id) do nothing;
+
+    update public.painel_founders
+       set convidados = convidados + 1,
+           convidados_por_status = public.painel_somar(convidados_por_status, new.status, 1),
+           atualizado_em = now()
+     where founder_id = new.quem_indicou;
+    update public.painel_totais
+       set convidados = convidados + 1,
+           convidados_por_status = public.painel_somar(convidados_por_status, new.status, 1)
+     where id;
+  end if;
+
+  return null;
+end;
+$$;
+
+drop trigger if exists painel_cadastros on public.cadastros;
+create trigger painel_cadastros
+  after insert or delete or update of status, quem_indicou, convites_disponiveis, nome, apelido, whatsapp
+  on public.cadastros
+  for each row execute function public.painel_cadastros();
+
+-- ============================================================
+-- indicacoes: indicações recebidas pelo WhatsApp (bot.py)
+-- ============================================================
+create or replace function public.painel_indicacoes()
+returns trigger
+language plpgsql
+as $$
+declare
+  v_founder bigint;
+begin
+  if tg_op = 'UPDATE'
+     and old.founder_whatsapp is not distinct from new.founder_whatsapp
+     and old.status is not distinct from new.status then
+    return null;
+  end if;
+
+  if tg_op <> 'INSERT' then
+    select id into v_founder
+      from public.cadastros
+     where whatsapp_norm = public.normalizar_telefone(old.founder_whatsapp);
+
+    update public.painel_founders
+       set indicacoes = indicacoes - 1,
+           indicacoes_por_status = public.painel_somar(indicacoes_por_status, old.status, -1),
+           atualizado_em = now()
+     where founder_id = v_founder;
+    update public.painel_totais
+       set indicacoes = indicacoes - 1,
+           indicacoes_por_status = public.painel_somar(indicacoes_por_status, old.status, -1)
+     where id;
+  end if;
+
+  if tg_op <> 'DELETE' then
+    select id into v_founder
+      from public.cadastros
+     where whatsapp_norm = public.normalizar_telefone(new.founder_whatsapp);
+
+    insert into public.painel_founders (founder_id, nome, apelido, whatsapp, status, founder, convites_disponiveis)
+    select c.id, c.nome, c.apelido, c.whatsapp, c.status, public.eh_founder(c.status),
+           coalesce(c.convites_disponiveis, 0)
+      from public.cadastros as c
+     where c.id = v_founder
+    on conflict (founder_id) do nothing;
+
+    update public.painel_founders
+       set indicacoes = indicacoes + 1,
+           indicacoes_por_status = public.painel_somar(indicacoes_por_status, new.status, 1),
+           atualizado_em = now()
+     where founder_id = v_founder;
+    update public.painel_totais
+       set indicacoes = indicacoes + 1,
+           indicacoes_por_status = public.painel_somar(indicacoes_por_status, new.status, 1),
+           atualizado_em = now()
+     where id;
+  end if;
+
+  return null;
+end;
+$$;
+
+drop trigger if exists painel_indicacoes on public.indicacoes;
+create trigger painel_indicacoes
+  after insert or delete or update of founder_whatsapp, status
+  on public.indicacoes
+  for each row execute function public.painel_indicacoes();
+
+-- ============================================================
+-- Recalcular do zero (backfill desta migração e reparo)
+-- ============================================================
+create or replace function public.painel_recalcular()
+returns void
+language plpgsql
+as $$
+begin
+  lock table public.painel_founders, public.painel_totais in exclusive mode;
+  delete from public.painel_founders;
+
+  with convidados as (
+    select quem_indicou as founder_id, count(*) as total,
+           jsonb_object_agg(s, n) as por_status
+      from (select quem_indicou, coalesce(nullif(status, ''), 'sem status') as s, count(*) as n
+              from public.cadastros
+             where quem_indicou is not null
+             group by 1, 2) as x
+     group by 1
+  ),
+  indicacoes as (
+    select c.id as founder_id, sum(n) as total, jsonb_object_agg(s, n) as por_status
+      from (select public.normalizar_telefone(founder_whatsapp) as w,
+                   coalesce(nullif(status, ''), 'sem status') as s, count(*) as n
+              from public.indicacoes
+             group by 1, 2) as x
+      join public.cadastros as c on c.whatsapp_norm = x.w
+     group by 1
+  )
+  insert into public.painel_founders
+         (founder_id, nome, apelido, whatsapp, status, founder, convites_disponiveis,
+          convidados, convidados_por_status, indicacoes, indicacoes_por_status)
+  select c.id, c.nome, c.apelido, c.whatsapp, c.status, public.eh_founder(c.status),
+         coalesce(c.convites_disponiveis, 0),
+         coalesce(cv.total, 0), coalesce(cv.por_status, '{}'),
+         coalesce(ind.total, 0), coalesce(ind.por_status, '{}')
+    from public.cadastros as c
+    left join convidados as cv on cv.founder_id = c.id
+    left join indicacoes as ind on ind.founder_id = c.id
+   where public.eh_founder(c.status) or cv.founder_id is not null or ind.founder_id is not null;
+
+  update public.painel_totais as t
+     set cadastros = (select count(*) from public.cadastros),
+         founders = (select count(*) from public.cadastros where public.eh_founder(status)),
+         convites_disponiveis = (select coalesce(sum(convites_disponiveis), 0)
+                                   from public.cadastros where public.eh_founder(status)),
+         convidados = (select count(*) from public.cadastros where quem_indicou is not null),
+         convidados_por_status = coalesce((
+           select jsonb_object_agg(s, n)
+             from (select coalesce(nullif(status, ''), 'sem status') as s, count(*) as n
+                     from public.cadastros where quem_indicou is not null group by 1) as x), '{}'),
+         indicacoes = (select count(*) from public.indicacoes),
+         indicacoes_por_status = coalesce((
+           select jsonb_object_agg(s, n)
+             from (select coalesce(nullif(status, ''), 'sem status') as s, count(*) as n
+                     from public.indicacoes group by 1) as x), '{}'),
+         atualizado_em = now()
+   where t.id;
+end;
+$$;
+
+select public.painel_recalcular();
@@ -0,0 +1,59 @@
+-- ===============================
+-- PRELUDE GOLDEN CHRISTMAS 2025
+-- 004 — sincronização incremental da réplica local (replica.py)
+-- ===============================
+--
+-- A réplica SQLite de cada processo pede só o que mudou desde a última vez:
+--   select ... where (updated_at, id) > (cursor) order by updated_at, id
+-- Para isso `cadastros` ganha updated_at, mantido por trigger em toda escrita
+-- (server.py, main.py, bot.py, RPCs, painel do Supabase), com índice na
+-- ordem da paginação. Exclusões não deixam linha para sincronizar; um
+-- trigger grava o id em `cadastros_excluidos`, lida do mesmo jeito.
+
+alter table public.cadastros
+  add column if not exists updated_at timestamptz not null default now();
+
+create or replace function public.tocar_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at := now();
+  return new;
+end;
+$$;
+
+drop trigger if exists cadastros_updated_at on public.cadastros;
+create trigger cadastros_updated_at
+  before update on public.cadastros
+  for each row execute function public.tocar_updated_at();
+
+create index if not exists cadastros_updated_at_id
+  on public.cadastros (updated_at, id);
+
+create table if not exists public.cadastros_excluidos (
+  id bigint primary key,
+  excluido_em timestamptz not null default now()
+);
+
+create index if not exists cadastros_excluidos_excluido_em
+  on public.cadastros_excluidos (excluido_em, id);
+
+create or replace function public.registrar_exclusao()
+returns trigger
+language plpgsql
+as $$
+begin
+  insert into public.cadastros_excluidos (id) values (old.id)
+  on conflict (id) do update set excluido_em = now();
+  return null;
+end;
+$$;
+
+drop trigger if exists cadastros_exclusao on public.cadastros;
+create trigger cadastros_exclusao
+  after delete on public.cadastros
+  for each row execute function public.registrar_exclusao();
+
+-- Lápides só precisam viver mais que a réplica mais atrasada; de tempos em tempos:
+--   delete from public.cadastros_excluidos where excluido_em < now() - interval '30 days';
@@ -0,0 +1,27 @@
+-- ===============================
+-- PRELUDE GOLDEN CHRISTMAS 2025
+-- 005 — check-in na porta do evento (checkin.py)
+-- ===============================
+--
+-- Uma linha por pessoa que entrou. O índice único em cadastro_id é o que
+-- torna o envio idempotente: a portaria manda os lotes com
+--   POST /checkins?on_conflict=cadastro_id   Prefer: resolution=ignore-duplicates
+-- e um lote reenviado (queda no meio, diário relido na partida, dois
+-- aparelhos lendo o mesmo QR) não duplica nada.
+--
+-- registrado_em é a hora em que a linha chegou ao banco; as portarias leem
+-- por (registrado_em, id) para saber quem já entrou por outro aparelho.
+
+create table if not exists public.checkins (
+  id bigserial primary key,
+  cadastro_id bigint not null references public.cadastros (id) on delete cascade,
+  entrou_em timestamptz not null,
+  portaria text,
+  registrado_em timestamptz not null default now()
+);
+
+create unique index if not exists checkins_cadastro_id
+  on public.checkins (cadastro_id);
+
+create index if not exists checkins_registrado_em_id
+  on public.checkins (registrado_em, id);
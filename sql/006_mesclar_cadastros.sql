@@ -0,0 +1,84 @@
+-- ===============================
+-- PRELUDE GOLDEN CHRISTMAS 2025
+-- 006 — mescla atômica de cadastros duplicados (deduplicacao.py)
+-- ===============================
+--
+-- Recebe um lote de grupos do plano de deduplicação e, numa única transação,
+-- para cada grupo:
+--   1. trava o cadastro mantido (o mais antigo); se ele sumiu desde o plano,
+--      o grupo fica para a próxima rodada;
+--   2. soma no mantido os convites_disponiveis dos removidos, lidos aqui
+--      dentro (não os do plano, que podem estar velhos);
+--   3. religa quem_indicou e o check-in (sql/005) dos removidos ao mantido;
+--   4. apaga os removidos e só então preenche e-mail/WhatsApp do mantido,
+--      para não bater nos índices únicos do sql/002;
+--   5. campos vazios do mantido recebem os do plano; status vem do plano
+--      (o de maior precedência no grupo).
+-- Um lote que falha é desfeito inteiro: rodar de novo recalcula o plano.
+--
+-- Chamada via PostgREST: POST /rest/v1/rpc/mesclar_cadastros
+--   {"p_grupos": [{"manter": 1, "remover": [7, 9], "campos": {"status": "socio", ...}}]}
+
+create or replace function public.mesclar_cadastros(p_grupos jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+  v_grupo jsonb;
+  v_campos jsonb;
+  v_manter bigint;
+  v_remover bigint[];
+  v_convites int;
+  v_n int;
+  v_grupos int := 0;
+  v_removidos int := 0;
+  v_religados int := 0;
+begin
+  for v_grupo in select * from jsonb_array_elements(coalesce(p_grupos, '[]')) loop
+    v_manter := (v_grupo->>'manter')::bigint;
+    v_campos := coalesce(v_grupo->'campos', '{}');
+    select coalesce(array_agg(x::bigint), '{}') into v_remover
+      from jsonb_array_elements_text(v_grupo->'remover') as x;
+
+    perform 1 from public.cadastros where id = v_manter for update;
+    if not found then
+      continue;
+    end if;
+
+    select coalesce(sum(convites_disponiveis), 0) into v_convites
+      from public.cadastros
+     where id = any(v_remover);
+
+    -- o próprio mantido, se apontava para um removido, fica sem indicação
+    update public.cadastros
+       set quem_indicou = case when id = v_manter then null else v_manter end
+     where quem_indicou = any(v_remover)
+       and id <> all(v_remover);
+    get diagnostics v_n = row_count;
+    v_religados := v_religados + v_n;
+
+    -- uma entrada por pessoa: o check-in mais antigo do grupo passa ao mantido
+    update public.checkins
+       set cadastro_id = v_manter
+     where id = (select id from public.checkins where cadastro_id = any(v_remover) order by entrou_em limit 1)
+       and not exists (select 1 from public.checkins where cadastro_id = v_manter);
+
+    delete from public.cadastros where id = any(v_remover);
+    get diagnostics v_n = row_count;
+    v_removidos := v_removidos + v_n;
+
+    update public.cadastros
+       set convites_disponiveis = coalesce(convites_disponiveis, 0) + v_convites,
+           status = coalesce(v_campos->>'status', status),
+           nome = coalesce(nullif(btrim(nome), ''), v_campos->>'nome'),
+           apelido = coalesce(nullif(btrim(apelido), ''), v_campos->>'apelido'),
+           email = coalesce(nullif(btrim(email), ''), v_campos->>'email'),
+           whatsapp = coalesce(nullif(btrim(whatsapp), ''), v_campos->>'whatsapp'),
+           quem_indicou = coalesce(quem_indicou, (v_campos->>'quem_indicou')::bigint)
+     where id = v_manter;
+    v_grupos := v_grupos + 1;
+  end loop;
+
+  return jsonb_build_object('grupos', v_grupos, 'removidos', v_removidos, 'religados', v_religados);
+end;
+$$;
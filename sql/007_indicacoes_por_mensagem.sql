@@ -0,0 +1,58 @@
+-- ===============================
+-- PRELUDE GOLDEN CHRISTMAS 2025
+-- 007 — indicações do WhatsApp idempotentes por mensagem (fila.py)
+-- ===============================
+--
+-- A fila do bot tenta de novo quando o Supabase dá timeout ou 5xx, e um
+-- timeout não diz se a escrita chegou a ser feita. Com as duas escritas de
+-- uma indicação presas ao ID da mensagem do WhatsApp (wamid.*), repetir é
+-- inofensivo:
+--   POST /indicacoes?on_conflict=mensagem_id,convidado_whatsapp
+--        Prefer: resolution=ignore-duplicates
+--   POST /rpc/decrementar_convites_mensagem {"founder": "...", "mensagem_id": "wamid..."}
+-- O débito só acontece se a mensagem ainda não estiver em convites_debitados,
+-- na mesma transação: a segunda chamada devolve o saldo sem debitar de novo.
+--
+-- Linhas antigas (sem mensagem_id) continuam valendo: nulos não colidem no
+-- índice único.
+
+alter table public.indicacoes add column if not exists mensagem_id text;
+
+create unique index if not exists indicacoes_mensagem_convidado
+  on public.indicacoes (mensagem_id, convidado_whatsapp);
+
+create table if not exists public.convites_debitados (
+  mensagem_id text primary key,
+  founder_whatsapp text not null,
+  debitado_em timestamptz not null default now()
+);
+
+create or replace function public.decrementar_convites_mensagem(founder text, mensagem_id text)
+returns int
+language plpgsql
+as $$
+declare
+  v_founder text := public.normalizar_telefone(founder);
+  v_restantes int;
+begin
+  insert into public.convites_debitados (mensagem_id, founder_whatsapp)
+  values (decrementar_convites_mensagem.mensagem_id, v_founder)
+  on conflict do nothing;
+
+  if not found then
+    -- mensagem já debitada: só o saldo atual
+    select convites_disponiveis into v_restantes
+      from public.cadastros
+     where whatsapp_norm = v_founder
+     limit 1;
+    return v_restantes;
+  end if;
+
+  update public.cadastros
+     set convites_disponiveis = greatest(0, coalesce(convites_disponiveis, 0) - 1)
+   where whatsapp_norm = v_founder
+  returning convites_disponiveis into v_restantes;
+
+  return v_restantes;
+end;
+$$;
@@ -0,0 +1,17 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# tests/conftest.py — raiz do projeto no sys.path e nada em segundo plano
+# ===============================
+#
+#   python -m pytest -q
+#
+# Os módulos do app ficam na raiz (sem pacote), como nos benchmarks/.
+# REPLICA_ATIVA=0 e CHECKIN_ATIVO=0: cada teste monta o que precisa.
+
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+os.environ.update({"REPLICA_ATIVA": "0", "CHECKIN_ATIVO": "0"})
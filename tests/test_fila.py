@@ -0,0 +1,177 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# tests/test_fila.py — novas tentativas e dead-letter da fila do webhook
+# ===============================
+#
+# FilaIndicacoes (fila.py) com Supabase e Graph API falsos, em processo, e o
+# dead-letter num DiarioLocal de verdade numa pasta temporária.
+
+import asyncio
+
+import pytest
+
+from diario import DiarioLocal
+from fila import FilaIndicacoes
+from repositorio import ErroRepositorio
+from whatsapp import ErroEnvio
+
+FOUNDER = "5521999990000"
+
+
+class SupabaseFalso:
+    """Responde como o PostgREST; `falhas[operacao]` são erros a levantar antes de dar certo."""
+
+    def __init__(self, **falhas):
+        self.falhas = {op: list(erros) for op, erros in falhas.items()}
+        self.chamadas = {"selecionar": 0, "inserir_lote": 0, "rpc": 0}
+
+    def _chamar(self, operacao: str):
+        self.chamadas[operacao] += 1
+        if self.falhas.get(operacao):
+            raise self.falhas[operacao].pop(0)
+
+    async def selecionar(self, filtros: dict, colunas: str = "*"):
+        self._chamar("selecionar")
+        return [{"whatsapp_norm": FOUNDER}]
+
+    async def inserir_lote(self, tabela: str, linhas: list, ignorar_conflito_em: str = None):
+        self._chamar("inserir_lote")
+
+    async def rpc(self, funcao: str, parametros: dict):
+        self._chamar("rpc")
+        return 1
+
+
+class WhatsAppFalso:
+    def __init__(self, erros=(), travar: bool = False):
+        self.erros = list(erros)
+        self.travar = travar
+        self.chamadas = 0
+        self.em_voo = asyncio.Event()
+
+    async def enviar_texto(self, numero: str, texto: str):
+        self.chamadas += 1
+        self.em_voo.set()
+        if self.travar:
+            await asyncio.Event().wait()
+        if self.erros:
+            raise self.erros.pop(0)
+        return {"messages": [{"id": "wamid.falso"}]}
+
+
+class RegistroFalso:
+    def __init__(self):
+        self.esquecidos = []
+
+    def esquecer(self, ids: list) -> None:
+        self.esquecidos.extend(ids)
+
+
+def evento(*ids) -> dict:
+    return {"mensagens": [
+        {"id": f"wamid.{i}", "founder_whatsapp": FOUNDER, "numeros": [f"55219800000{i:02d}"]} for i in ids
+    ]}
+
+
+@pytest.fixture
+def dead_letter(tmp_path):
+    diario = DiarioLocal(str(tmp_path / "dead-letter"), modo_fsync="nunca")
+    yield diario
+    diario.fechar()
+
+
+def montar(supabase, whatsapp, dead_letter, **opcoes) -> FilaIndicacoes:
+    opcoes = {"trabalhadores": 1, "intervalo_por_destino": 0.0, "max_tentativas": 3,
+              "atraso_base": 0.001, "atraso_max": 0.01, **opcoes}
+    return FilaIndicacoes(lambda: supabase, whatsapp, dead_letter, **opcoes)
+
+
+def descartados(dead_letter: DiarioLocal) -> list:
+    dead_letter.descarregar()
+    return [entrada["dados"] for entrada in dead_letter.pendentes()]
+
+
+def test_falha_temporaria_tenta_de_novo(dead_letter):
+    supabase = SupabaseFalso(selecionar=[ErroRepositorio("503", status=503), ErroRepositorio("queda")])
+    whatsapp = WhatsAppFalso(erros=[ErroEnvio("429", status=429)])
+    asyncio.run(montar(supabase, whatsapp, dead_letter).processar(evento(1)))
+
+    assert supabase.chamadas == {"selecionar": 3, "inserir_lote": 1, "rpc": 1}
+    assert whatsapp.chamadas == 2
+    assert descartados(dead_letter) == []
+
+
+def test_4xx_nao_tenta_de_novo(dead_letter):
+    supabase = SupabaseFalso(inserir_lote=[ErroRepositorio("400", status=400)])
+    whatsapp = WhatsAppFalso()
+    with pytest.raises(ErroRepositorio):
+        asyncio.run(montar(supabase, whatsapp, dead_letter).processar(evento(1)))
+
+    assert supabase.chamadas["inserir_lote"] == 1
+    assert supabase.chamadas["rpc"] == 0 and whatsapp.chamadas == 0
+
+
+def test_envio_esgota_tentativas_e_vai_para_dead_letter(dead_letter):
+    whatsapp = WhatsAppFalso(erros=[ErroEnvio("503", status=503)] * 3)
+    asyncio.run(montar(SupabaseFalso(), whatsapp, dead_letter).processar(evento(1)))
+
+    assert whatsapp.chamadas == 3
+    [item] = descartados(dead_letter)
+    assert item["tipo"] == "envio" and item["numero"] == "5521980000001"
+    assert item["incerto"] is False
+
+
+def test_envio_incerto_nao_repete(dead_letter):
+    whatsapp = WhatsAppFalso(erros=[ErroEnvio("timeout de leitura", temporario=True, incerto=True)])
+    asyncio.run(montar(SupabaseFalso(), whatsapp, dead_letter).processar(evento(1)))
+
+    assert whatsapp.chamadas == 1
+    [item] = descartados(dead_letter)
+    assert item["tipo"] == "envio" and item["incerto"] is True
+
+
+def test_evento_com_erro_do_codigo_vai_para_dead_letter(dead_letter):
+    async def cenario():
+        fila = FilaIndicacoes(lambda: None, WhatsAppFalso(), dead_letter, trabalhadores=1)
+        fila.iniciar()
+        fila.enfileirar(evento(1))
+        await fila.esperar_vazia()
+        await fila.parar()
+
+    asyncio.run(cenario())
+    [item] = descartados(dead_letter)
+    assert item["tipo"] == "evento" and item["evento"] == evento(1)
+    assert item["interrompido"] is False
+
+
+def test_parar_manda_sobras_para_dead_letter(dead_letter):
+    async def cenario():
+        whatsapp = WhatsAppFalso(travar=True)
+        fila = montar(SupabaseFalso(), whatsapp, dead_letter)
+        fila.iniciar()
+        for i in range(3):
+            fila.enfileirar(evento(i))
+        await whatsapp.em_voo.wait()
+        await fila.parar(timeout=0.05)
+        return fila
+
+    fila = asyncio.run(cenario())
+    itens = descartados(dead_letter)
+    assert fila.pendentes == 0
+    assert sorted(item["evento"]["mensagens"][0]["id"] for item in itens) == ["wamid.0", "wamid.1", "wamid.2"]
+    assert [item["interrompido"] for item in itens] == [True, False, False]
+
+
+def test_dead_letter_fechado_libera_ids(dead_letter):
+    registro = RegistroFalso()
+    dead_letter.fechar()
+
+    async def cenario():
+        fila = FilaIndicacoes(lambda: None, WhatsAppFalso(), dead_letter, registro, trabalhadores=1)
+        fila.iniciar()
+        fila.enfileirar(evento(1, 2))
+        await fila.esperar_vazia()
+        await fila.parar()
+
+    asyncio.run(cenario())
+    assert registro.esquecidos == ["wamid.1", "wamid.2"]
@@ -0,0 +1,100 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# tests/test_replica.py — failover para a réplica local e reenvio da fila
+# ===============================
+#
+# RepositorioReplicado contra o stand-in do PostgREST (benchmarks/stand_ins.py),
+# como benchmarks/replica.py, com o "Supabase" caindo (503) e voltando.
+
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.stand_ins import Falhas, montar_postgrest
+from replica import ReplicaCadastros, RepositorioReplicado
+from repositorio import ErroRepositorio, RepositorioCadastros
+
+CADASTROS = [
+    {"nome": f"Pessoa {i}", "email": f"pessoa{i}@exemplo.com", "whatsapp": f"55219{i:08d}",
+     "status": "convidado", "convites_disponiveis": 0}
+    for i in range(3)
+]
+
+
+def test_queda_e_volta_do_supabase(tmp_path):
+    async def cenario():
+        falhas = Falhas()
+        transporte = httpx.ASGITransport(app=montar_postgrest(falhas))
+        repositorio = RepositorioCadastros("http://stand-in", "chave", transport=transporte)
+        replica = ReplicaCadastros(str(tmp_path / "replica.sqlite3"), janela=0.0)
+        replicado = RepositorioReplicado(repositorio, replica)
+        try:
+            async with httpx.AsyncClient(transport=transporte, base_url="http://stand-in") as controle:
+                await controle.post("/__semear", json={"cadastros": CADASTROS})
+            assert await replica.sincronizar(repositorio) == len(CADASTROS)
+
+            # Queda: leituras da réplica, escritas na fila
+            falhas.atualizar({"taxa_erro": 1.0})
+            pessoa = await replicado.buscar_por_email("pessoa1@exemplo.com")
+            assert pessoa is not None and pessoa["email"] == "pessoa1@exemplo.com"
+            assert await replicado.buscar_por_email("ninguem@exemplo.com") is None
+            assert await replicado.inserir({"email": "novo@exemplo.com", "status": "aguardando"}) is None
+            await replicado.atualizar(pessoa["id"], {"apelido": "Um"})
+            assert replica.pendentes() == 2
+            assert replica.buscar_por_id(pessoa["id"])["apelido"] == "Um"
+            with pytest.raises(ErroRepositorio):
+                await replica.reenviar(repositorio)
+            assert replica.pendentes() == 2
+
+            # Volta: a fila sai na ordem e nada some
+            falhas.atualizar({"taxa_erro": 0.0})
+            assert await replica.reenviar(repositorio) == 2 and replica.pendentes() == 0
+            assert (await repositorio.buscar_por_id(pessoa["id"]))["apelido"] == "Um"
+            assert await repositorio.buscar_por_email("novo@exemplo.com") is not None
+        finally:
+            await repositorio.fechar()
+            replica.fechar()
+
+    asyncio.run(cenario())
+
+
+def test_erro_definitivo_nao_cai_para_a_replica(tmp_path):
+    class Recusa:
+        async def buscar_por_email(self, email: str):
+            raise ErroRepositorio("400", status=400)
+
+    replica = ReplicaCadastros(str(tmp_path / "replica.sqlite3"))
+    try:
+        with pytest.raises(ErroRepositorio) as erro:
+            asyncio.run(RepositorioReplicado(Recusa(), replica).buscar_por_email("a@exemplo.com"))
+        assert erro.value.status == 400
+    finally:
+        replica.fechar()
+
+
+def test_disjuntor_aberto_le_da_replica_sem_ir_a_rede(tmp_path):
+    async def cenario():
+        transporte = httpx.ASGITransport(app=montar_postgrest(Falhas()))
+        repositorio = RepositorioCadastros("http://stand-in", "chave", transport=transporte)
+        replica = ReplicaCadastros(str(tmp_path / "replica.sqlite3"), janela=0.0, max_atraso=0.0)
+        replicado = RepositorioReplicado(repositorio, replica)
+        try:
+            async with httpx.AsyncClient(transport=transporte, base_url="http://stand-in") as controle:
+                await controle.post("/__semear", json={"cadastros": CADASTROS[:1]})
+                await replica.sincronizar(repositorio)
+                # Só no "Supabase": se a busca fosse à rede, acharia
+                await controle.post("/__semear", json={"cadastros": CADASTROS[1:]})
+            disjuntor = repositorio.politica.disjuntor
+            for _ in range(disjuntor.minimo):
+                disjuntor.registrar(False)
+            assert await replicado.buscar_por_email("pessoa0@exemplo.com") is not None
+            assert await replicado.buscar_por_email("pessoa1@exemplo.com") is None
+            with pytest.raises(ErroRepositorio) as erro:
+                await repositorio.buscar_por_email("pessoa1@exemplo.com")
+            assert erro.value.status is None  # recusado na hora, temporário
+        finally:
+            await repositorio.fechar()
+            replica.fechar()
+
+    asyncio.run(cenario())
@@ -0,0 +1,155 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# tests/test_resiliencia.py — disjuntor, novas tentativas, orçamento e hedge
+# ===============================
+#
+# Disjuntor com relógio falso (sem esperar `espera` de verdade) e Politica
+# com chamadas falsas que falham, demoram ou respondem na hora.
+
+import asyncio
+import time
+
+import pytest
+
+from resiliencia import ABERTO, FECHADO, MEIO_ABERTO, CircuitoAberto, Disjuntor, OrcamentoEsgotado, Politica
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self) -> float:
+        return self.agora
+
+
+def disjuntor_aberto(relogio: Relogio) -> Disjuntor:
+    disjuntor = Disjuntor("teste", limiar=0.5, minimo=4, janela=4, espera=5.0, relogio=relogio)
+    for sucesso in (True, False, False, True):
+        assert disjuntor.estado == FECHADO
+        disjuntor.registrar(sucesso)
+    assert disjuntor.estado == ABERTO
+    return disjuntor
+
+
+def test_disjuntor_abre_com_falhas_e_recusa():
+    relogio = Relogio()
+    disjuntor = disjuntor_aberto(relogio)
+    relogio.agora = 4.9
+    assert not disjuntor.permitir()
+
+
+def test_disjuntor_nao_abre_antes_do_minimo():
+    disjuntor = Disjuntor("teste", minimo=4, janela=4, relogio=Relogio())
+    for _ in range(3):
+        disjuntor.registrar(False)
+    assert disjuntor.estado == FECHADO and disjuntor.permitir()
+
+
+def test_meio_aberto_deixa_uma_chamada_e_fecha_com_sucesso():
+    relogio = Relogio()
+    disjuntor = disjuntor_aberto(relogio)
+    relogio.agora = 5.0
+    assert disjuntor.estado == MEIO_ABERTO
+    assert disjuntor.permitir()
+    assert not disjuntor.permitir()  # só uma chamada de teste por vez
+    disjuntor.registrar(True)
+    assert disjuntor.estado == FECHADO and disjuntor.permitir()
+
+
+def test_meio_aberto_reabre_com_falha():
+    relogio = Relogio()
+    disjuntor = disjuntor_aberto(relogio)
+    relogio.agora = 5.0
+    assert disjuntor.permitir()
+    disjuntor.registrar(False)
+    assert disjuntor.estado == ABERTO and not disjuntor.permitir()
+    relogio.agora = 10.0
+    assert disjuntor.permitir()
+
+
+def test_chamada_de_teste_cancelada_libera_outra():
+    relogio = Relogio()
+    disjuntor = disjuntor_aberto(relogio)
+    relogio.agora = 5.0
+    assert disjuntor.permitir()
+    disjuntor.liberar()
+    assert disjuntor.permitir()
+
+
+class Chamada:
+    """`await chamada(timeout)`: levanta `erros` em ordem, depois responde após `demoras`."""
+
+    def __init__(self, erros=(), demoras=()):
+        self.erros = list(erros)
+        self.demoras = list(demoras)
+        self.vezes = 0
+
+    async def __call__(self, timeout: float):
+        self.vezes += 1
+        vez = self.vezes
+        if self.erros:
+            raise self.erros.pop(0)
+        if self.demoras:
+            await asyncio.sleep(self.demoras.pop(0))
+        return vez
+
+
+def politica(**opcoes) -> Politica:
+    opcoes = {"orcamento_padrao": 2.0, "atraso_base": 0.001, "atraso_max": 0.01, **opcoes}
+    return Politica("teste", **opcoes)
+
+
+def test_circuito_aberto_falha_sem_chamar():
+    p = politica(disjuntor=Disjuntor("teste", minimo=2, janela=2), tentativas=1)
+    chamada = Chamada(erros=[RuntimeError("queda")] * 2)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(p.executar("buscar", chamada, idempotente=True))
+    with pytest.raises(CircuitoAberto):
+        asyncio.run(p.executar("buscar", chamada, idempotente=True))
+    assert chamada.vezes == 2
+
+
+def test_leitura_tenta_de_novo_nas_falhas_temporarias():
+    chamada = Chamada(erros=[RuntimeError("503"), RuntimeError("503")])
+    assert asyncio.run(politica(tentativas=3).executar("buscar", chamada, idempotente=True)) == 3
+
+
+def test_escrita_e_falha_definitiva_nao_repetem():
+    escrita = Chamada(erros=[RuntimeError("503")])
+    with pytest.raises(RuntimeError):
+        asyncio.run(politica(tentativas=3).executar("inserir", escrita))
+    assert escrita.vezes == 1
+
+    p = politica(tentativas=3, temporario=lambda erro: not isinstance(erro, ValueError))
+    leitura = Chamada(erros=[ValueError("400")])
+    with pytest.raises(ValueError):
+        asyncio.run(p.executar("buscar", leitura, idempotente=True))
+    assert leitura.vezes == 1
+    assert p.disjuntor._resultados.count(False) == 0  # 4xx não conta contra o serviço
+
+
+def test_orcamento_esgotado():
+    p = politica(orcamentos={"buscar": 0.05})
+    with pytest.raises(OrcamentoEsgotado):
+        asyncio.run(p.executar("buscar", Chamada(demoras=[1.0]), idempotente=True))
+
+
+def test_hedge_fica_com_a_copia_mais_rapida():
+    chamada = Chamada(demoras=[1.0, 0.0])
+    inicio = time.monotonic()
+    resultado = asyncio.run(politica(hedge_apos=0.05).executar("buscar", chamada, idempotente=True, hedge=True))
+    assert resultado == 2 and chamada.vezes == 2
+    assert time.monotonic() - inicio < 0.5
+
+
+def test_hedge_nao_dispara_com_resposta_rapida():
+    chamada = Chamada(demoras=[0.0])
+    assert asyncio.run(politica(hedge_apos=0.05).executar("buscar", chamada, idempotente=True, hedge=True)) == 1
+    assert chamada.vezes == 1
+
+
+def test_hedge_nao_dispara_em_escrita():
+    chamada = Chamada(demoras=[0.1, 0.0])
+    assert asyncio.run(politica(hedge_apos=0.01).executar("inserir", chamada, hedge=True)) == 1
+    assert chamada.vezes == 1
@@ -0,0 +1,145 @@
+# ===============================
+# PRELUDE GOLDEN CHRISTMAS 2025
+# whatsapp.py — cliente assíncrono da WhatsApp Cloud (Graph API)
+# ===============================
+
+import asyncio
+import os
+
+from metricas import cronometrar
+from partida import importar_tardio
+from resiliencia import CircuitoAberto, OrcamentoEsgotado, Politica
+
+httpx = importar_tardio("httpx")
+
+GRAPH_API_URL = "https://graph.facebook.com/v21.0"
+
+
+class ErroEnvio(Exception):
+    """Falha ao enviar mensagem. `temporario` indica se vale tentar de novo.
+
+    `incerto`: o pedido pode ter chegado à Graph API (timeout de leitura,
+    conexão caída no meio); repetir pode entregar a mensagem duas vezes.
+    """
+
+    def __init__(self, mensagem: str, status: int = None, temporario: bool = True, incerto: bool = False):
+        super().__init__(mensagem)
+        self.status = status
+        self.temporario = temporario
+        self.incerto = incerto
+
+
+def _falha_da_graph(erro: Exception) -> bool:
+    """Conta contra a Graph API no disjuntor: queda, timeout e 5xx (429 e 4xx não)."""
+    return not isinstance(erro, ErroEnvio) or erro.status is None or erro.status >= 500
+
+
+def _antes_de_enviar(erro: Exception) -> bool:
+    """Falhou ao abrir a conexão (ou esperando uma do pool): nada saiu."""
+    return isinstance(erro, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+
+class ClienteWhatsApp:
+    """Envio de mensagens pela Graph API com pool de conexões e timeout.
+
+    `url_base` aponta para a Graph API de verdade ou para um stand-in local
+    (GRAPH_API_URL); `transport` permite plugar um app ASGI em testes.
+    Envios passam pelo disjuntor da `politica` (resiliencia.py) e nunca são
+    repetidos aqui: com ele aberto, ErroEnvio temporário e não incerto, e
+    quem chamou (fila, campanha) decide quando tentar de novo.
+    """
+
+    def __init__(self, token: str, phone_number_id: str, url_base: str = GRAPH_API_URL,
+                 max_conexoes: int = 20, timeout: float = 10.0,
+                 transport: "httpx.AsyncBaseTransport" = None, politica: Politica = None):
+        self.phone_number_id = phone_number_id
+        self.politica = politica or Politica("graph", orcamento_padrao=timeout, temporario=_falha_da_graph)
+        self._cliente = httpx.AsyncClient(
+            base_url=url_base.rstrip("/"),
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_conexoes, max_keepalive_connections=max_conexoes),
+            transport=transport,
+        )
+
+    @classmethod
+    def do_ambiente(cls):
+        token = os.getenv("WHATSAPP_TOKEN")
+        phone_number_id = os.getenv("PHONE_NUMBER_ID")
+        if not token or not phone_number_id:
+            return None
+        timeout = float(os.getenv("WHATSAPP_TIMEOUT", "10"))
+        return cls(
+            token,
+            phone_number_id,
+            url_base=os.getenv("GRAPH_API_URL", GRAPH_API_URL),
+            max_conexoes=int(os.getenv("WHATSAPP_MAX_CONEXOES", "20")),
+            timeout=timeout,
+            politica=Politica.do_ambiente("graph", "GRAPH", {}, orcamento_padrao=timeout,
+                                          temporario=_falha_da_graph),
+        )
+
+    async def enviar_texto(self, numero: str, texto: str) -> dict:
+        return await self._enviar(numero, {"type": "text", "text": {"body": texto}})
+
+    async def enviar_modelo(self, numero: str, modelo: str, idioma: str = "pt_BR", parametros=()) -> dict:
+        """Mensagem de modelo aprovado (fora da janela de 24h só passa modelo)."""
+        template = {"name": modelo, "language": {"code": idioma}}
+        if parametros:
+            template["components"] = [{
+                "type": "body",
+                "parameters": [{"type": "text", "text": str(p)} for p in parametros],
+            }]
+        return await self._enviar(numero, {"type": "template", "template": template})
+
+    async def _enviar(self, numero: str, mensagem: dict) -> dict:
+        payload = {"messaging_product": "whatsapp", "to": numero, **mensagem}
+
+        async def tentar(restante: float):
+            with cronometrar("graph", "messages", "POST"):
+                try:
+                    resp = await self._cliente.post(f"/{self.phone_number_id}/messages", json=payload,
+                                                    timeout=restante)
+                except httpx.TimeoutException as e:
+                    raise ErroEnvio(f"Timeout enviando para {numero}", incerto=not _antes_de_enviar(e)) from e
+                except httpx.HTTPError as e:
+                    raise ErroEnvio(f"Falha de conexão enviando para {numero}: {e}",
+                                    incerto=not _antes_de_enviar(e)) from e
+
+                if resp.status_code >= 400:
+                    # 429 e 5xx são transitórios; os demais 4xx (número inválido etc.) não
+                    temporario = resp.status_code == 429 or resp.status_code >= 500
+                    raise ErroEnvio(f"{resp.status_code} — {resp.text}", resp.status_code, temporario)
+            return resp.json() if resp.content else {}
+
+        try:
+            return await self.politica.executar("enviar", tentar)
+        except CircuitoAberto as e:
+            raise ErroEnvio(f"{e}; nada enviado para {numero}") from e
+        except OrcamentoEsgotado as e:
+            # cortado no meio: pode ter chegado
+            raise ErroEnvio(f"{e} enviando para {numero}", incerto=True) from e
+
+    async def fechar(self) -> None:
+        await self._cliente.aclose()
+
+
+class LimitadorPorDestino:
+    """Intervalo mínimo entre duas mensagens para o mesmo número."""
+
+    def __init__(self, intervalo: float = 1.0, max_destinos: int = 10_000):
+        self.intervalo = intervalo
+        self.max_destinos = max_destinos
+        self._proximo = {}
+        self._lock = asyncio.Lock()
+
+    async def aguardar(self, numero: str) -> None:
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            agora = loop.time()
+            if len(self._proximo) > self.max_destinos:
+                self._proximo = {n: t for n, t in self._proximo.items() if t > agora}
+            liberado_em = max(agora, self._proximo.get(numero, 0.0))
+            self._proximo[numero] = liberado_em + self.intervalo
+        if liberado_em > agora:
+            await asyncio.sleep(liberado_em - agora)